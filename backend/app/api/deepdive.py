@@ -10,6 +10,7 @@ from pydantic import BaseModel
 from anthropic import AsyncAnthropic
 
 from ..core import verify_supabase_token
+from ..core.metrics import ClaudeMetrics
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +91,7 @@ DEEPDIVE_SYSTEM_PROMPT = """あなたは面接官の「隣にいる相棒」。
 
 # ===== Claude Client =====
 client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+_claude_metrics = ClaudeMetrics("deepdive")
 
 
 @router.post("/deepdive", response_model=DeepDiveResponse)
@@ -117,11 +119,13 @@ async def get_deepdive_suggestions(
 
 上記の会話を分析し、深掘り質問を提案してください。"""
 
-        response = await client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            system=DEEPDIVE_SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": user_message}]
+        response = await _claude_metrics.call(
+            client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=500,
+                system=DEEPDIVE_SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": user_message}]
+            )
         )
         
         # レスポンスからJSONを抽出
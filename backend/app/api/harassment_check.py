@@ -8,11 +8,13 @@ from pydantic import BaseModel
 from anthropic import AsyncAnthropic
 
 from ..core import verify_supabase_token, settings
+from ..core.metrics import ClaudeMetrics
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["harassment"])
 
 client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+_claude_metrics = ClaudeMetrics("harassment")
 
 SYSTEM_PROMPT = """あなたは管理職のマネジメントを支援するAIです。
 会話を分析し、パワハラリスクのある発言を検知してください。
@@ -77,16 +79,18 @@ async def check_harassment(
     try:
         logger.info(f"[聖人君子AI] Checking transcript: {request.transcript[:200]}...")
 
-        response = await client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=300,
-            system=SYSTEM_PROMPT,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"以下の会話を分析してください:\n\n{request.transcript}"
-                }
-            ]
+        response = await _claude_metrics.call(
+            client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=300,
+                system=SYSTEM_PROMPT,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"以下の会話を分析してください:\n\n{request.transcript}"
+                    }
+                ]
+            )
         )
 
         # Parse response
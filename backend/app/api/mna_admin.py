@@ -0,0 +1,180 @@
+"""
+TONARI for M&A - 運用API
+ワーカーが保持しているセッションと実行状況の確認、バックグラウンドジョブの登録
+"""
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from ..core import verify_supabase_token
+from ..core.config import settings
+from ..models.mna_schemas import ExtractionField
+from ..services.job_queue import JOB_STATUSES, job_queue, job_runner
+from ..services.llm_batch import create_batch_backend
+from ..services.reextraction import REEXTRACT_JOB, ReextractionHandler
+from ..services.runtime_monitor import current_rss_bytes, loop_monitor
+from ..services.session_store import session_store
+from .mna_session import active_sessions, extraction_service, get_progress, lifecycle, ws_manager
+
+router = APIRouter(
+    prefix="/api/mna/admin",
+    tags=["M&A Admin"],
+    dependencies=[Depends(verify_supabase_token)],
+)
+
+
+def _refresh_local_session(session_id: str, fields: dict[str, ExtractionField]) -> None:
+    """再抽出の結果を、このワーカーのメモリに残っているセッションにも反映する."""
+    session = active_sessions.get(session_id)
+    if session is not None:
+        get_progress(session).update(fields)
+
+
+job_runner.register(
+    REEXTRACT_JOB,
+    ReextractionHandler(
+        session_store,
+        extraction_service,
+        create_batch_backend(settings.LLM_BATCH_BACKEND),
+        poll_interval=settings.LLM_BATCH_POLL_INTERVAL,
+        max_resubmits=settings.LLM_BATCH_MAX_RESUBMITS,
+        on_updated=_refresh_local_session,
+    ),
+)
+
+
+@router.get("/sessions")
+async def get_session_memory() -> dict:
+    """このワーカーがメモリに保持しているセッションと見積もり使用量を取得する.
+
+    Returns:
+        dict: セッションごとの状態・メモリ見積もりと合計、追い出し回数
+    """
+    connection_counts = {
+        session_id: len(senders) for session_id, senders in ws_manager.connections.items()
+    }
+    return lifecycle.report(connection_counts)
+
+
+@router.post("/sessions/sweep")
+async def sweep_sessions() -> dict:
+    """追い出しの見直しをすぐに実行する.
+
+    Returns:
+        dict: 追い出したセッションIDと理由
+    """
+    evicted = await lifecycle.sweep()
+    return {"evicted": [{"session_id": session_id, "reason": reason} for session_id, reason in evicted]}
+
+
+@router.get("/runtime")
+async def get_runtime() -> dict:
+    """このワーカーのイベントループの遅延とメモリ使用量を取得する.
+
+    負荷試験（scripts/load_test.py）が定期的に取得する。
+
+    Returns:
+        dict: ワーカーのPID、ループの遅延、RSS、受け持っているセッション数と接続数
+    """
+    return {
+        "pid": os.getpid(),
+        "event_loop_lag": loop_monitor.report(),
+        "rss_bytes": current_rss_bytes(),
+        "active_sessions": len(active_sessions),
+        "connections": sum(len(senders) for senders in ws_manager.connections.values()),
+        "inbound_queue_depth": sum(queue.qsize() for queue in ws_manager.inbound_queues.values()),
+        "outbound_queue_depth": sum(
+            sender.depth for senders in ws_manager.connections.values() for sender in senders
+        ),
+    }
+
+
+class ReextractRequest(BaseModel):
+    """再抽出ジョブの登録リクエスト."""
+
+    session_ids: list[str]
+    # 同じキーで登録し直しても同じジョブを返す（セッションの塊ごとに「キー:番号」で登録する）
+    idempotency_key: Optional[str] = None
+
+
+@router.post("/jobs/reextract")
+async def enqueue_reextraction(data: ReextractRequest) -> dict:
+    """終了したセッションの再抽出ジョブを登録する.
+
+    REEXTRACT_SESSIONS_PER_JOB 件ずつ1つのジョブ（1つのバッチ）にまとめる。
+    進行中のセッションは対象外として結果の skipped に入る。
+
+    Args:
+        data: 対象のセッションIDと冪等キー
+
+    Returns:
+        dict: 登録した（または既にあった）ジョブ
+    """
+    size = max(settings.REEXTRACT_SESSIONS_PER_JOB, 1)
+    chunks = [data.session_ids[i : i + size] for i in range(0, len(data.session_ids), size)]
+    jobs = []
+    for number, session_ids in enumerate(chunks):
+        key = f"{data.idempotency_key}:{number}" if data.idempotency_key else None
+        job, created = await job_queue.enqueue(REEXTRACT_JOB, {"session_ids": session_ids}, key)
+        jobs.append({**job.to_dict(), "created": created})
+    job_runner.notify()
+    return {"jobs": jobs}
+
+
+@router.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50) -> dict:
+    """ジョブを新しい順に取得する.
+
+    Args:
+        status: 状態で絞り込む
+        limit: 最大件数
+
+    Returns:
+        dict: ジョブ、状態ごとの件数、このワーカーの実行状況
+    """
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    return {
+        "jobs": [job.to_dict() for job in await job_queue.list_jobs(status, limit)],
+        "counts": await job_queue.counts(),
+        "runner": job_runner.report(),
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> dict:
+    """ジョブを取得する.
+
+    Args:
+        job_id: ジョブID
+
+    Returns:
+        dict: ジョブ
+
+    Raises:
+        HTTPException: ジョブが見つからない場合
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str) -> dict:
+    """ジョブを取り消す（実行中ならリースの延長時に止まる）.
+
+    Args:
+        job_id: ジョブID
+
+    Returns:
+        dict: 取り消したか
+
+    Raises:
+        HTTPException: ジョブが見つからない場合
+    """
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"cancelled": await job_queue.cancel(job_id)}
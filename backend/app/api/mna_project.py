@@ -18,14 +18,45 @@ from ..models.mna_schemas import (
     ProjectCreate,
     ProjectUpdate,
 )
+from ..services.session_store import session_store
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/mna/projects", tags=["M&A Projects"])
 
-# インメモリストア（本番ではSupabase）
-projects: dict[str, Project] = {}
-outputs: dict[str, Output] = {}
+# 共有ストアの名前空間（本番ではSupabase）
+PROJECT_NAMESPACE = "project"
+OUTPUT_NAMESPACE = "output"
+
+
+async def _load_project(project_id: str) -> Project:
+    """プロジェクトを共有ストアから読み込む.
+
+    Args:
+        project_id: プロジェクトID
+
+    Returns:
+        Project: プロジェクト
+
+    Raises:
+        HTTPException: プロジェクトが見つからない場合
+    """
+    data = await session_store.load_document(PROJECT_NAMESPACE, project_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return Project.model_validate_json(data)
+
+
+async def _list_outputs() -> list[Output]:
+    """成果物をすべて共有ストアから読み込む.
+
+    Returns:
+        list[Output]: 成果物リスト
+    """
+    return [
+        Output.model_validate_json(data)
+        for data in await session_store.list_documents(OUTPUT_NAMESPACE)
+    ]
 
 
 # ========================
@@ -56,7 +87,10 @@ async def list_projects(
     Returns:
         ProjectListResponse: プロジェクト一覧
     """
-    all_projects = list(projects.values())
+    all_projects = [
+        Project.model_validate_json(data)
+        for data in await session_store.list_documents(PROJECT_NAMESPACE)
+    ]
 
     if status:
         all_projects = [p for p in all_projects if p.status == status]
@@ -92,7 +126,7 @@ async def create_project(data: ProjectCreate) -> Project:
         created_at=now,
         updated_at=now,
     )
-    projects[project_id] = project
+    await session_store.save_document(PROJECT_NAMESPACE, project_id, project.model_dump_json())
 
     logger.info(f"Project created: {project_id} - {data.name}")
     return project
@@ -111,10 +145,7 @@ async def get_project(project_id: str) -> Project:
     Raises:
         HTTPException: プロジェクトが見つからない場合
     """
-    project = projects.get(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return await _load_project(project_id)
 
 
 @router.put("/{project_id}", response_model=Project)
@@ -128,9 +159,7 @@ async def update_project(project_id: str, data: ProjectUpdate) -> Project:
     Returns:
         Project: 更新されたプロジェクト
     """
-    project = projects.get(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await _load_project(project_id)
 
     if data.name is not None:
         project.name = data.name
@@ -140,6 +169,7 @@ async def update_project(project_id: str, data: ProjectUpdate) -> Project:
         project.status = data.status
 
     project.updated_at = datetime.now()
+    await session_store.save_document(PROJECT_NAMESPACE, project_id, project.model_dump_json())
     return project
 
 
@@ -153,15 +183,12 @@ async def delete_project(project_id: str) -> dict:
     Returns:
         dict: 削除結果
     """
-    if project_id not in projects:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    del projects[project_id]
+    await _load_project(project_id)
+    await session_store.delete_documents(PROJECT_NAMESPACE, project_id)
 
     # 関連する成果物も削除
-    to_delete = [oid for oid, o in outputs.items() if o.project_id == project_id]
-    for oid in to_delete:
-        del outputs[oid]
+    to_delete = [o.id for o in await _list_outputs() if o.project_id == project_id]
+    await session_store.delete_documents(OUTPUT_NAMESPACE, *to_delete)
 
     logger.info(f"Project deleted: {project_id}")
     return {"message": "Project deleted"}
@@ -188,10 +215,9 @@ async def list_outputs(project_id: str) -> OutputListResponse:
     Returns:
         OutputListResponse: 成果物一覧
     """
-    if project_id not in projects:
-        raise HTTPException(status_code=404, detail="Project not found")
+    await _load_project(project_id)
 
-    project_outputs = [o for o in outputs.values() if o.project_id == project_id]
+    project_outputs = [o for o in await _list_outputs() if o.project_id == project_id]
     project_outputs.sort(key=lambda o: o.created_at, reverse=True)
 
     return OutputListResponse(outputs=project_outputs)
@@ -208,8 +234,7 @@ async def create_output(project_id: str, data: OutputCreate) -> Output:
     Returns:
         Output: 作成された成果物
     """
-    if project_id not in projects:
-        raise HTTPException(status_code=404, detail="Project not found")
+    await _load_project(project_id)
 
     output_id = str(uuid4())
 
@@ -227,7 +252,7 @@ async def create_output(project_id: str, data: OutputCreate) -> Output:
         content=content,
         created_at=datetime.now(),
     )
-    outputs[output_id] = output
+    await session_store.save_document(OUTPUT_NAMESPACE, output_id, output.model_dump_json())
 
     logger.info(f"Output created: {output_id} ({data.output_type.value})")
     return output
@@ -244,8 +269,11 @@ async def get_output(project_id: str, output_id: str) -> Output:
     Returns:
         Output: 成果物
     """
-    output = outputs.get(output_id)
-    if not output or output.project_id != project_id:
+    data = await session_store.load_document(OUTPUT_NAMESPACE, output_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Output not found")
+    output = Output.model_validate_json(data)
+    if output.project_id != project_id:
         raise HTTPException(status_code=404, detail="Output not found")
     return output
 
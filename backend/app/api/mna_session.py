@@ -5,14 +5,20 @@ TONARI for M&A - セッションAPI
 import asyncio
 import json
 import logging
+import time
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Coroutine, Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 
+from ..core.config import settings
+from ..core.metrics import LOOP_TASK_BUCKETS, ROUND_DURATION_BUCKETS, registry
 from ..models.mna_schemas import (
+    FIELD_REGISTRY,
     ExtractionField,
     ExtractionUpdate,
     Hypothesis,
@@ -26,19 +32,86 @@ from ..models.mna_schemas import (
     WSMessage,
     WSMessageType,
 )
+from ..services.extraction_progress import MISSING_FIELDS_SHOWN, ExtractionProgress
+from ..services.fact_extractor import FactExtractor, same_fact
 from ..services.mna_extraction import MnAExtractionService
+from ..services.mna_scheduler import (
+    AdaptiveTriggerPolicy,
+    BufferStats,
+    RoundScheduler,
+    TriggerMetrics,
+    TriggerPolicy,
+)
+from ..services.audio_ingest import AudioPipeline, stt_adapter
+from ..services.broadcast_bus import broadcast_bus
+from ..services.inbound_guard import InboundGuard, SessionInboundLimiter
+from ..services.interim_channel import InterimChannel
 from ..services.mna_suggestion import MnASuggestionService
+from ..services.relevance_gate import RelevanceGate
+from ..services.session_lifecycle import SessionLifecycleManager
+from ..services.session_store import session_store
+from ..services.session_timeline import SessionTimeline
+from ..services.transcript_ingest import TranscriptIngest
+from ..services.transcript_store import TranscriptStore
+from ..services.ws_sender import (
+    SERVICE_RESTART_CLOSE_CODE,
+    ConnectionSender,
+    ReplayBuffer,
+    with_seq,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/mna/sessions", tags=["M&A Sessions"])
 
-# インメモリセッションストア（本番ではRedis等に置き換え）
+# このワーカーでライブ処理しているセッション（ワーカー間の共有状態はsession_store）
 active_sessions: dict[str, SessionState] = {}
 
+# active_sessions のセッションごとの発話ログ（SessionState.utterances に索引を付けたもの）
+transcripts: dict[str, TranscriptStore] = {}
+# active_sessions のセッションごとの抽出の進捗
+progress_trackers: dict[str, ExtractionProgress] = {}
+
 # サービスインスタンス
 extraction_service = MnAExtractionService()
 suggestion_service = MnASuggestionService()
+fact_extractor = (
+    FactExtractor(settings.FACT_EXTRACTOR_CONFIDENCE) if settings.FACT_EXTRACTOR_ENABLED else None
+)
+
+# round_update を受け取るクライアントが接続時に指定するプロトコル（?protocol=2）
+BATCHED_PROTOCOL = "2"
+# 再接続時のスナップショットに含める直近の発話数
+SNAPSHOT_UTTERANCES = 50
+# シリアライズ済みの round_update / transcript_delta の先頭（typeは常に最初のキー）
+_ROUND_UPDATE_PREFIX = f'{{"type":"{WSMessageType.ROUND_UPDATE.value}"'
+_TRANSCRIPT_DELTA_PREFIX = f'{{"type":"{WSMessageType.TRANSCRIPT_DELTA.value}"'
+
+_round_duration = registry.histogram(
+    "tonari_round_duration_seconds",
+    "Extraction and suggestion round (_process_buffer) duration",
+    ROUND_DURATION_BUCKETS,
+).labels()
+_fanout_duration = registry.histogram(
+    "tonari_broadcast_fanout_seconds",
+    "Time to enqueue one broadcast message on this worker's connections",
+    LOOP_TASK_BUCKETS,
+).labels()
+_provisional_outcomes = registry.counter(
+    "tonari_provisional_fields_total",
+    "Rule-extracted provisional fields by outcome (filled / confirmed / overridden by a round)",
+    ("outcome",),
+)
+_provisional_filled = _provisional_outcomes.labels("filled")
+_provisional_confirmed = _provisional_outcomes.labels("confirmed")
+_provisional_overridden = _provisional_outcomes.labels("overridden")
+_skipped_calls = registry.counter(
+    "tonari_round_calls_skipped_total",
+    "Claude calls skipped by the relevance gate (extraction: low information / suggestion: unchanged window)",
+    ("call",),
+)
+_extraction_skipped = _skipped_calls.labels("extraction")
+_suggestion_skipped = _skipped_calls.labels("suggestion")
 
 
 # ========================
@@ -46,6 +119,93 @@ suggestion_service = MnASuggestionService()
 # ========================
 
 
+async def _load_session(session_id: str) -> SessionState:
+    """セッションを取得する.
+
+    このワーカーがWebSocketを受け持っているセッションはローカルのコピーが
+    最新なのでそれを返す。それ以外は別ワーカーで更新されている可能性が
+    あるため共有ストアから読み直す。
+
+    Args:
+        session_id: セッションID
+
+    Returns:
+        SessionState: セッション状態
+
+    Raises:
+        HTTPException: セッションが見つからない場合
+    """
+    session = active_sessions.get(session_id)
+    if session is not None and (not session_store.shared or session_id in ws_manager.connections):
+        lifecycle.touch(session_id)
+        return session
+    session = await session_store.load_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+def get_transcript(session: SessionState) -> TranscriptStore:
+    """セッションの発話ログを取得する.
+
+    索引を保持するのはこのワーカーが受け持つセッション（active_sessions）だけで、
+    追い出すときに一緒に破棄する（ws_manager.evict）。ストアから読んだだけの
+    セッションにはその場で索引を作って返す。ストアから読み直してセッションの
+    オブジェクトが入れ替わった場合は索引を作り直す。
+
+    Args:
+        session: セッション状態
+
+    Returns:
+        TranscriptStore: 発話ログ
+    """
+    if active_sessions.get(session.id) is not session:
+        return TranscriptStore(session.utterances)
+    transcript = transcripts.get(session.id)
+    if transcript is None or transcript.utterances is not session.utterances:
+        transcript = transcripts[session.id] = TranscriptStore(session.utterances)
+    return transcript
+
+
+def get_progress(session: SessionState) -> ExtractionProgress:
+    """セッションの抽出の進捗を取得する.
+
+    進捗を保持するのはこのワーカーが受け持つセッション（active_sessions）だけで、
+    追い出すときに一緒に破棄する（ws_manager.evict）。ストアから読んだだけの
+    セッションにはその場で数えて返す。ストアから読み直してセッションの
+    オブジェクトが入れ替わった場合は数え直す。
+
+    Args:
+        session: セッション状態
+
+    Returns:
+        ExtractionProgress: 抽出の進捗
+    """
+    if active_sessions.get(session.id) is not session:
+        return ExtractionProgress(session.extractions)
+    progress = progress_trackers.get(session.id)
+    if progress is None or progress.extractions is not session.extractions:
+        progress = progress_trackers[session.id] = ExtractionProgress(session.extractions)
+    return progress
+
+
+async def restore_sessions(session_ids: list[str]) -> None:
+    """再起動前に進行中だったセッションをストアから読み込み、受け持ちに戻す.
+
+    クライアントが再接続すれば、そのまま面談を続けられる。
+
+    Args:
+        session_ids: 復元したセッションID
+    """
+    for session_id in session_ids:
+        session = await session_store.load_session(session_id)
+        if session is not None:
+            active_sessions[session_id] = session
+            lifecycle.touch(session_id)
+    if session_ids:
+        logger.info(f"Restored {len(session_ids)} active sessions from the session store")
+
+
 class CreateSessionResponse(BaseModel):
     """セッション作成レスポンス."""
 
@@ -64,6 +224,10 @@ async def create_session(data: SessionCreate) -> CreateSessionResponse:
     Returns:
         CreateSessionResponse: 作成されたセッション情報
     """
+    if ws_manager.draining:
+        # 終了処理中のワーカーでは受け持たない（ロードバランサーが別のワーカーに送り直す）
+        raise HTTPException(status_code=503, detail="Server is restarting", headers={"Retry-After": "1"})
+
     session_id = str(uuid4())
     session = SessionState(
         id=session_id,
@@ -72,6 +236,8 @@ async def create_session(data: SessionCreate) -> CreateSessionResponse:
         started_at=datetime.now(),
     )
     active_sessions[session_id] = session
+    lifecycle.touch(session_id)
+    await session_store.create_session(session)
 
     logger.info(f"Session created: {session_id} for project {data.project_id}")
 
@@ -95,10 +261,7 @@ async def get_session(session_id: str) -> SessionState:
     Raises:
         HTTPException: セッションが見つからない場合
     """
-    session = active_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    return session
+    return await _load_session(session_id)
 
 
 @router.post("/{session_id}/end")
@@ -114,12 +277,11 @@ async def end_session(session_id: str) -> SessionSummary:
     Raises:
         HTTPException: セッションが見つからない場合
     """
-    session = active_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = await _load_session(session_id)
 
     session.status = "completed"
     session.ended_at = datetime.now()
+    await session_store.update_session_fields(session, "status", "ended_at")
 
     duration = None
     if session.ended_at and session.started_at:
@@ -148,19 +310,139 @@ async def get_extractions(session_id: str) -> dict:
     Returns:
         dict: 抽出情報と進捗
     """
-    session = active_sessions.get(session_id)
-    if not session:
+    session = await _load_session(session_id)
+    progress = get_progress(session)
+
+    return {
+        "extractions": session.extractions,
+        "progress": progress.summary(),
+        "missing_fields": progress.missing_fields(session.current_layer)[:MISSING_FIELDS_SHOWN],
+    }
+
+
+@router.get("/{session_id}/triggers")
+async def get_trigger_metrics(session_id: str) -> dict:
+    """抽出トリガー（バッファのフラッシュ）の理由別集計を取得する.
+
+    Args:
+        session_id: セッションID
+
+    Returns:
+        dict: 理由ごとのフラッシュ回数と直近の記録
+
+    Raises:
+        HTTPException: セッションが見つからない場合
+    """
+    if session_id not in active_sessions and not await session_store.session_exists(session_id):
         raise HTTPException(status_code=404, detail="Session not found")
 
-    progress = extraction_service.calculate_extraction_progress(session.extractions)
-    missing = extraction_service.get_missing_fields(
-        session.extractions, session.current_layer
-    )
+    metrics = ws_manager.trigger_metrics.get(session_id) or TriggerMetrics()
+    return metrics.to_dict()
+
+
+@router.get("/{session_id}/timeline")
+async def get_timeline(session_id: str, limit: int = 20) -> dict:
+    """直近のラウンドの各段階の時刻と、段階ごとの所要時間の分布を取得する.
+
+    発話の受信からフラッシュ、プロンプトの組み立て、Claudeへの送信・最初の応答・
+    解析、round_update の送信までを記録している（このワーカーが処理したラウンドのみ）。
+
+    Args:
+        session_id: セッションID
+        limit: 返す直近のラウンド数
 
+    Returns:
+        dict: 段階ごとの p50 / p95 / p99 / 最大と直近のラウンド
+
+    Raises:
+        HTTPException: セッションが見つからない場合
+    """
+    if session_id not in active_sessions and not await session_store.session_exists(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    timeline = ws_manager.timelines.get(session_id) or SessionTimeline(0)
+    return timeline.to_dict(limit)
+
+
+@router.get("/{session_id}/connections")
+async def get_connection_stats(session_id: str) -> dict:
+    """このワーカーが受け持つ接続の送信状況を取得する.
+
+    Args:
+        session_id: セッションID
+
+    Returns:
+        dict: 接続中と直近に切断した接続ごとの送信計測値
+
+    Raises:
+        HTTPException: セッションが見つからない場合
+    """
+    if session_id not in active_sessions and not await session_store.session_exists(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    pipeline = ws_manager.audio_pipelines.get(session_id)
+    limiter = ws_manager.inbound_limiters.get(session_id)
     return {
-        "extractions": session.extractions,
-        "progress": progress,
-        "missing_fields": missing[:10],
+        "connections": [sender.to_dict() for sender in ws_manager.connections.get(session_id, [])],
+        "closed": list(ws_manager.closed_senders.get(session_id, [])),
+        "audio": pipeline.to_dict() if pipeline is not None else None,
+        "inbound_rejected": dict(limiter.rejected) if limiter is not None else {},
+    }
+
+
+@router.get("/{session_id}/utterances")
+async def get_utterances(
+    session_id: str,
+    speaker: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after_seq: Optional[int] = None,
+    limit: int = 100,
+) -> dict:
+    """発話ログを取得する.
+
+    Args:
+        session_id: セッションID
+        speaker: 話者で絞り込む
+        since: この時刻以降の発話（含む）
+        until: この時刻より前の発話
+        after_seq: このシーケンス番号より後の発話（差分取得用）
+        limit: 最大件数（条件に合う発話の直近から数える）
+
+    Returns:
+        dict: 発話とシーケンス番号、全発話数
+
+    Raises:
+        HTTPException: セッションが見つからない場合
+    """
+    session = await _load_session(session_id)
+    transcript = get_transcript(session)
+
+    if since is not None or until is not None:
+        # 発話の時刻はタイムゾーンなしのローカル時刻
+        since, until = (
+            value.astimezone().replace(tzinfo=None) if value and value.tzinfo else value
+            for value in (since, until)
+        )
+        utterances = transcript.between(since, until)
+    elif after_seq is not None:
+        utterances = transcript.window(after_seq + 1)
+    elif speaker is not None:
+        utterances = transcript.by_speaker(speaker, limit)
+    else:
+        utterances = transcript.recent(limit)
+
+    if speaker is not None:
+        utterances = [u for u in utterances if u.speaker == speaker]
+    if after_seq is not None:
+        utterances = [u for u in utterances if transcript.seq_of(u.id) > after_seq]
+    utterances = utterances[-limit:] if limit > 0 else []
+
+    return {
+        "total": len(transcript),
+        "utterances": [
+            {"seq": transcript.seq_of(u.id), **u.model_dump()} for u in utterances
+        ],
     }
 
 
@@ -179,35 +461,162 @@ async def update_extraction(
 
     Returns:
         ExtractionField: 更新後のフィールド
+
+    Raises:
+        HTTPException: 未定義のフィールドキーの場合・セッションが見つからない場合
     """
-    session = active_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    definition = FIELD_REGISTRY.get(field_key)
+    if definition is None:
+        raise HTTPException(status_code=400, detail="Unknown field key")
+
+    session = await _load_session(session_id)
 
-    if field_key in session.extractions:
-        session.extractions[field_key].value = value
-        session.extractions[field_key].confidence = 1.0  # 手動入力は確信度1
+    field = session.extractions.get(field_key)
+    if field is not None:
+        field.value = value
+        field.confidence = 1.0  # 手動入力は確信度1
+        field.provisional = False
     else:
         # 新規フィールドを作成
-        parts = field_key.split(".")
-        if len(parts) != 2:
-            raise HTTPException(status_code=400, detail="Invalid field key format")
-
-        from ..models.mna_schemas import ExtractionCategory
-
-        try:
-            category = ExtractionCategory(parts[0])
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid category")
-
-        session.extractions[field_key] = ExtractionField(
-            category=category,
-            field=parts[1],
+        field = ExtractionField(
+            category=definition.category,
+            field=definition.field,
             value=value,
             confidence=1.0,
+            layer=definition.layer,
         )
+    progress = get_progress(session)
+    changed = progress.set(field_key, field)
+    await session_store.set_extractions(session_id, {field_key: field})
+
+    # 手動更新も他の画面（別ワーカーの接続を含む）に反映する
+    await ws_manager.broadcast(
+        session_id,
+        WSMessage(
+            type=WSMessageType.EXTRACTION_UPDATE,
+            data={"field_key": field_key, "field": field.model_dump()},
+        ),
+    )
+    if changed is not None:
+        await ws_manager.broadcast(
+            session_id,
+            WSMessage(
+                type=WSMessageType.PROGRESS_UPDATE,
+                data=progress.delta([changed], session.current_layer),
+            ),
+        )
+    return field
+
+
+class IngestUtterance(BaseModel):
+    """一括取り込みの発話."""
+
+    speaker: str
+    text: str
+
+
+class TranscriptIngestRequest(BaseModel):
+    """一括取り込みのリクエスト（JSONで送る場合）."""
+
+    text: Optional[str] = None
+    utterances: list[IngestUtterance] = []
+
+
+async def _append_ingested(session: SessionState, utterances: list[Utterance]) -> None:
+    """取り込んだ発話を発話ログとストアに追記する."""
+    if not utterances:
+        return
+    transcript = get_transcript(session)
+    for utterance in utterances:
+        transcript.append(utterance)
+    await session_store.append_utterances(session.id, utterances)
+
 
-    return session.extractions[field_key]
+@router.post("/{session_id}/ingest")
+async def ingest_transcript(session_id: str, request: Request) -> StreamingResponse:
+    """録音の文字起こしや議事録をまとめて取り込み、抽出する.
+
+    本文はテキスト（text/plain・text/markdown、チャンク転送でもよい）か、JSON
+    （{"text": ...} または {"utterances": [{"speaker": ..., "text": ...}]}）。
+    受け取りながら重なりのある窓に区切って並列に抽出し、進捗をNDJSONで返す
+    （accepted → 窓ごとの progress → done。失敗した窓は windows_failed）。
+    発話は本文を最後まで受け取れた場合だけセッションの発話ログに追記し、
+    抽出結果は窓の順にまとめて round_update で配信する。
+
+    Args:
+        session_id: セッションID
+        request: リクエスト（本文を順に読む）
+
+    Returns:
+        StreamingResponse: 進捗のNDJSON
+
+    Raises:
+        HTTPException: セッションが見つからない・本文が不正・上限を超えた場合
+    """
+    if ws_manager.draining:
+        raise HTTPException(status_code=503, detail="Server is restarting", headers={"Retry-After": "1"})
+
+    session = await _load_session(session_id)
+    ingest = TranscriptIngest(session_id, extraction_service, session.extractions)
+    # 本文の途中で不正・上限超過・切断になったら、抽出を取り消して発話も残さない
+    received = False
+    try:
+        if request.headers.get("content-type", "").startswith("application/json"):
+            data = TranscriptIngestRequest.model_validate_json(await request.body())
+            if data.text:
+                ingest.feed_text(data.text)
+            ingest.feed_utterances([(u.speaker, u.text) for u in data.utterances])
+        else:
+            async for chunk in request.stream():
+                ingest.feed_text(chunk)
+        ingest.close()
+        received = True
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        if not received:
+            ingest.cancel()
+    await _append_ingested(session, ingest.utterances)
+
+    if not ingest.utterances:
+        raise HTTPException(status_code=400, detail="No utterances in transcript")
+    logger.info(
+        f"Ingesting {len(ingest.utterances)} utterances in {ingest.windows_total} windows: {session_id}"
+    )
+    # クライアントが切断しても結果は反映する
+    applying = ws_manager.finish_ingest(session, ingest)
+
+    async def events() -> AsyncIterator[str]:
+        yield json.dumps(
+            {
+                "type": "accepted",
+                "utterances": len(ingest.utterances),
+                "windows_total": ingest.windows_total,
+            }
+        ) + "\n"
+        async for event in ingest.progress():
+            yield json.dumps(event) + "\n"
+        try:
+            updated = await asyncio.shield(applying)
+        except Exception:
+            yield json.dumps({"type": "error", "message": "Failed to apply extractions"}) + "\n"
+            return
+        yield json.dumps(
+            {
+                "type": "done",
+                "utterances": len(ingest.utterances),
+                "windows_total": ingest.windows_total,
+                "windows_failed": ingest.windows_failed,
+                "elapsed_ms": round((time.monotonic() - ingest.started_at) * 1000, 1),
+                "extractions": {key: field.model_dump(mode="json") for key, field in updated.items()},
+                "progress": get_progress(session).summary(),
+            },
+            ensure_ascii=False,
+        ) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 
 # ========================
@@ -218,53 +627,781 @@ async def update_extraction(
 class SessionWebSocketManager:
     """セッションWebSocket管理.
 
+    受信ループはメッセージをセッションごとの受信キューに積むだけにし、
+    セッション専用のワーカータスクが到着順に処理する。抽出・サジェスト生成は
+    ワーカーからさらに別タスクに切り出すため、Claude呼び出しの数秒間も
+    文字起こしのエコーやピン留め・レイヤー変更が滞らない。
+
+    送信はブロードキャストバス経由で行い、同じセッションに別ワーカーから
+    接続している画面にも届ける。自ワーカーの接続へは接続ごとの送信キューに
+    積むだけなので、遅い接続が他の接続やラウンドの処理を待たせない。
+
     Attributes:
-        connections: アクティブな接続
+        connections: アクティブな接続（接続ごとの送信キュー）
+        closed_senders: 直近に切断した接続の送信計測値
         text_buffer: テキストバッファ
+        inbound_queues: セッションごとの受信キュー（上限付き）
+        workers: セッションごとのワーカータスク
+        queue_size: 受信キューの上限
+        outbound_queue_size: 接続ごとの送信キューの上限
+        send_timeout: 1回の送信の待ち時間の上限（秒）
+        scheduler: 抽出・サジェスト処理ラウンドのスケジューラ
+        trigger_policy: バッファのフラッシュ判定ポリシー
+        buffer_stats: セッションごとのバッファ集計
+        trigger_metrics: セッションごとのフラッシュ理由の集計
+        relevance_gate: 情報量の少ないラウンドの抽出・サジェストを間引くゲート（無効ならNone）
+        timelines: セッションごとの直近のラウンドの各段階の時刻
+        interim_channel: interimの文字起こしの間引き・差分配信
+        interim_texts: 従来のクライアント向けに追跡する発話中の全文（セッション → 発話ID → 全文）
+        streams: セッションごとの送信ストリーム（連番と再送用の直近のメッセージ）
+        replay_buffer_size: 再送用に保持するメッセージ数
+        audio_pipelines: セッションごとのサーバー側の音声取り込み
+        inbound_limiters: セッションごとの受信の制限と捨てたフレーム数
+        draining: ワーカーの終了処理中か（新しい接続・セッションを受け付けない）
     """
 
-    def __init__(self) -> None:
-        """マネージャーを初期化する."""
-        self.connections: dict[str, list[WebSocket]] = {}
+    def __init__(
+        self,
+        queue_size: int = settings.SESSION_INBOUND_QUEUE_SIZE,
+        trigger_policy: Optional[TriggerPolicy] = None,
+        outbound_queue_size: int = settings.WS_OUTBOUND_QUEUE_SIZE,
+        send_timeout: float = settings.WS_SEND_TIMEOUT,
+        replay_buffer_size: int = settings.WS_REPLAY_BUFFER_SIZE,
+    ) -> None:
+        """マネージャーを初期化する.
+
+        Args:
+            queue_size: セッションごとの受信キューの上限
+            trigger_policy: フラッシュ判定ポリシー（省略時は設定値のAdaptiveTriggerPolicy）
+            outbound_queue_size: 接続ごとの送信キューの上限（超えた接続は切断）
+            send_timeout: 1回の送信の待ち時間の上限（秒、超えた接続は切断）
+            replay_buffer_size: 再送用にセッションごとに保持するメッセージ数
+        """
+        self.connections: dict[str, list[ConnectionSender]] = {}
+        self.closed_senders: dict[str, deque[dict]] = {}
+        self.outbound_queue_size = outbound_queue_size
+        self.send_timeout = send_timeout
         self.text_buffer: dict[str, list[Utterance]] = {}
-        self.buffer_duration: float = 10.0  # 10秒バッファ
-        self.min_utterances: int = 3
+        self.trigger_policy = trigger_policy or AdaptiveTriggerPolicy(
+            max_latency=settings.EXTRACTION_MAX_LATENCY,
+            max_chars=settings.EXTRACTION_MAX_CHARS,
+            min_utterances=settings.EXTRACTION_MIN_UTTERANCES,
+            min_chars=settings.EXTRACTION_MIN_CHARS,
+        )
+        self.buffer_stats: dict[str, BufferStats] = {}
+        self.trigger_metrics: dict[str, TriggerMetrics] = {}
+        self.relevance_gate = (
+            RelevanceGate(settings.RELEVANCE_GATE_MIN_SCORE, settings.RELEVANCE_GATE_MAX_DEFERRED)
+            if settings.RELEVANCE_GATE_ENABLED
+            else None
+        )
+        self.timelines: dict[str, SessionTimeline] = {}
+        self._flush_timers: dict[str, asyncio.TimerHandle] = {}
+        self.inbound_queues: dict[str, asyncio.Queue[dict]] = {}
+        self.workers: dict[str, asyncio.Task] = {}
+        self.queue_size = queue_size
+        self.scheduler = RoundScheduler(self._timed_round)
+        self.interim_channel = InterimChannel(self._broadcast_interim, settings.INTERIM_MIN_INTERVAL)
+        self.interim_texts: dict[str, dict[str, str]] = {}
+        self.streams: dict[str, ReplayBuffer] = {}
+        self.replay_buffer_size = replay_buffer_size
+        self.audio_pipelines: dict[str, AudioPipeline] = {}
+        self.inbound_limiters: dict[str, SessionInboundLimiter] = {}
+        self.draining = False
+        # create_taskの戻り値は弱参照しか持たれないため、完了まで保持する
+        self._background_tasks: set[asyncio.Task] = set()
+        broadcast_bus.bind(self._deliver_local, self._apply_remote_event)
+
+    async def connect(
+        self,
+        session_id: str,
+        websocket: WebSocket,
+        batched: bool = False,
+        last_seq: Optional[int] = None,
+        stream_id: Optional[str] = None,
+    ) -> ConnectionSender:
+        """WebSocket接続を登録し、セッションのワーカーを起動する.
 
-    async def connect(self, session_id: str, websocket: WebSocket) -> None:
-        """WebSocket接続を登録する."""
+        Args:
+            session_id: セッションID
+            websocket: 接続
+            batched: round_update を受け取るクライアントか
+            last_seq: 再接続の場合、クライアントが最後に受け取った連番
+            stream_id: 再接続の場合、その連番のストリームID
+
+        Returns:
+            ConnectionSender: 接続の送信キュー
+        """
         await websocket.accept()
-        if session_id not in self.connections:
+        first_connection = session_id not in self.connections
+        if first_connection:
             self.connections[session_id] = []
-            self.text_buffer[session_id] = []
-        self.connections[session_id].append(websocket)
+            self.text_buffer.setdefault(session_id, [])
+        sender = ConnectionSender(
+            websocket,
+            max_pending=self.outbound_queue_size,
+            send_timeout=self.send_timeout,
+            on_close=lambda ws: self.disconnect(session_id, ws),
+            batched=batched,
+        )
+        sender.start()
+        self.connections[session_id].append(sender)
+        # 登録から再送までの間にawaitを挟まないため、新しいメッセージは再送分の後に積まれる
+        self._resume(session_id, sender, last_seq, stream_id)
+        self._ensure_worker(session_id)
+        if first_connection:
+            await broadcast_bus.subscribe(session_id)
         logger.info(f"WebSocket connected: {session_id}")
+        return sender
+
+    def create_guard(self, session_id: str) -> InboundGuard:
+        """接続の受信フレームの検査を作る（セッション単位の制限は接続間で共有する）.
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            InboundGuard: 受信フレームの検査
+        """
+        limiter = self.inbound_limiters.get(session_id)
+        if limiter is None:
+            limiter = self.inbound_limiters[session_id] = SessionInboundLimiter(
+                message_rate=settings.WS_SESSION_MESSAGE_RATE,
+                message_burst=settings.WS_SESSION_MESSAGE_BURST,
+                transcript_chars_per_sec=settings.WS_SESSION_TRANSCRIPT_CHARS_PER_SEC,
+                transcript_chars_burst=settings.WS_SESSION_TRANSCRIPT_CHARS_BURST,
+            )
+        return InboundGuard(
+            limiter,
+            max_text_bytes=settings.WS_MAX_TEXT_FRAME_BYTES,
+            max_audio_bytes=settings.WS_MAX_AUDIO_FRAME_BYTES,
+            message_rate=settings.WS_CONNECTION_MESSAGE_RATE,
+            message_burst=settings.WS_CONNECTION_MESSAGE_BURST,
+            audio_bytes_per_sec=settings.WS_AUDIO_BYTES_PER_SEC,
+            max_rejections=settings.WS_MAX_REJECTIONS,
+        )
+
+    def reject_inbound(
+        self, session_id: str, sender: ConnectionSender, guard: InboundGuard, reason: str
+    ) -> None:
+        """捨てた受信フレームをクライアントに知らせ、捨て続ける接続は切断する.
+
+        通知は理由ごとに最初の1回だけ送り、捨てるたびにシリアライズしない。
+
+        Args:
+            session_id: セッションID
+            sender: 接続の送信キュー
+            guard: 接続の受信フレームの検査
+            reason: 捨てた理由
+        """
+        if guard.exhausted:
+            logger.warning(
+                f"Closing connection that keeps sending rejected frames: {session_id} "
+                f"{dict(guard.rejected)}"
+            )
+            sender.close("policy_violation")
+            return
+        if guard.rejected[reason] == 1:
+            logger.info(f"Rejected inbound frame: {session_id} ({reason})")
+            sender.offer(
+                WSMessage(
+                    type=WSMessageType.ERROR,
+                    data={"message": "Inbound message rejected", "code": reason},
+                ).model_dump_json()
+            )
 
     def disconnect(self, session_id: str, websocket: WebSocket) -> None:
-        """WebSocket接続を解除する."""
+        """WebSocket接続を解除する.
+
+        最後の接続が切れても受信キューに残ったメッセージは捨てず、
+        ワーカーが処理し終えてから停止する。送信キューが詰まって
+        切断した場合もここに来るため、2回呼ばれても問題ないようにする。
+        """
+        connections = self.connections.get(session_id)
+        sender = next((s for s in connections or [] if s.websocket is websocket), None)
+        if sender is None:
+            return
+        connections.remove(sender)
+        sender.close("disconnected")
+        self.closed_senders.setdefault(session_id, deque(maxlen=20)).append(sender.to_dict())
+        if not connections:
+            del self.connections[session_id]
+            self._spawn(self._stop_worker(session_id))
+        lifecycle.touch(session_id)
+        logger.info(f"WebSocket disconnected: {session_id} ({sender.stats.close_reason})")
+
+    def _ensure_worker(self, session_id: str) -> None:
+        """セッションのワーカータスクが動いていなければ起動する."""
+        worker = self.workers.get(session_id)
+        if worker is not None and not worker.done():
+            return
+        if session_id not in self.inbound_queues:
+            self.inbound_queues[session_id] = asyncio.Queue(maxsize=self.queue_size)
+        self.workers[session_id] = asyncio.create_task(
+            self._run_worker(session_id), name=f"session-worker-{session_id}"
+        )
+
+    async def _stop_worker(self, session_id: str) -> None:
+        """受信キューを処理し終えてからワーカーを停止する."""
+        # 取り込み中の音声の文字起こしも受信キューに積まれるため先に止める
+        await self.stop_audio(session_id)
+        queue = self.inbound_queues.get(session_id)
+        if queue is not None:
+            await queue.join()
+        # 処理待ちの間に再接続されたらワーカーを使い回す
         if session_id in self.connections:
-            self.connections[session_id].remove(websocket)
-            if not self.connections[session_id]:
-                del self.connections[session_id]
-                del self.text_buffer[session_id]
-        logger.info(f"WebSocket disconnected: {session_id}")
+            return
+        worker = self.workers.pop(session_id, None)
+        if worker is not None:
+            worker.cancel()
+        self.inbound_queues.pop(session_id, None)
+        self.text_buffer.pop(session_id, None)
+        self.buffer_stats.pop(session_id, None)
+        self._cancel_flush_timer(session_id)
+        self.scheduler.forget(session_id)
+        if self.relevance_gate is not None:
+            self.relevance_gate.forget(session_id)
+        self.interim_channel.forget(session_id)
+        self.interim_texts.pop(session_id, None)
+        if broadcast_bus.relays_remote:
+            # 購読をやめると他ワーカー発のメッセージが連番から抜けるため、
+            # 次の接続は新しいストリームにする
+            self.streams.pop(session_id, None)
+        await broadcast_bus.unsubscribe(session_id)
+
+    def feed_audio(self, session_id: str, data: bytes) -> bool:
+        """音声のバイナリフレームをセッションの取り込みパイプラインに積む.
+
+        受信ループから呼ばれ、リングバッファに書き込むだけで待たない。
+        最初のフレームでSTTへの送信タスクを開始する。
 
-    async def broadcast(self, session_id: str, message: WSMessage) -> None:
-        """セッションの全接続にメッセージを送信する."""
-        if session_id not in self.connections:
+        Args:
+            session_id: セッションID
+            data: 音声のフレーム
+
+        Returns:
+            bool: 取り込んだらTrue（サーバー側で取り込まない設定ならFalse）
+        """
+        if stt_adapter is None:
+            return False
+        pipeline = self.audio_pipelines.get(session_id)
+        if pipeline is None:
+            pipeline = self.audio_pipelines[session_id] = AudioPipeline(
+                session_id,
+                stt_adapter,
+                lambda text, speaker, is_final: self._on_audio_transcript(
+                    session_id, text, speaker, is_final
+                ),
+                buffer_bytes=settings.AUDIO_BUFFER_KB * 1024,
+            )
+            pipeline.start()
+        pipeline.feed(data)
+        return True
+
+    def end_audio(self, session_id: str) -> None:
+        """録音の停止を受けて、取り込みパイプラインをバックグラウンドで止める.
+
+        Args:
+            session_id: セッションID
+        """
+        if session_id in self.audio_pipelines:
+            self._spawn(self.stop_audio(session_id))
+
+    async def stop_audio(self, session_id: str) -> None:
+        """残りの音声をSTTに送り切り、結果を受け取ってから取り込みを止める.
+
+        Args:
+            session_id: セッションID
+        """
+        pipeline = self.audio_pipelines.pop(session_id, None)
+        if pipeline is not None:
+            await pipeline.stop()
+            logger.info(f"Audio ingest stopped: {session_id} {pipeline.to_dict()}")
+
+    async def _on_audio_transcript(
+        self, session_id: str, text: str, speaker: str, is_final: bool
+    ) -> None:
+        """STTの認識結果を、クライアントから届いた文字起こしと同じく受信キューに積む."""
+        if session_id not in self.inbound_queues:
+            return
+        await self.enqueue(
+            session_id,
+            {"type": "transcript", "text": text, "speaker": speaker, "is_final": is_final},
+        )
+
+    def is_busy(self, session_id: str) -> bool:
+        """接続・未処理のメッセージ・処理中のラウンドがあるかを返す.
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            bool: メモリから追い出してはいけない状態ならTrue
+        """
+        return (
+            session_id in self.connections
+            or session_id in self.workers
+            or bool(self.text_buffer.get(session_id))
+            or self.scheduler.is_running(session_id)
+        )
+
+    async def drain(self, timeout: float) -> None:
+        """ワーカーの終了前に、受け持っているセッションを片付けて接続を閉じる.
+
+        1. 新しい接続・セッションを受け付けない
+        2. 実行中のラウンドの完了を待つ（時間内に終わらなければ取り消す）
+        3. 受信キューを処理し終え、セッションの状態をストアに書き込む
+        4. 接続に session_status（draining）を送り、送り切ってから1012で閉じる
+           （クライアントは別のワーカーに再接続し、resume で続きを受け取る）
+
+        Args:
+            timeout: 全体の時間の上限（秒）
+
+        Raises:
+            Exception: セッションの状態をストアに書き込めなかった場合（接続は閉じてから送出する）
+        """
+        deadline = time.monotonic() + timeout
+        self.draining = True
+        session_ids = list(self.connections)
+        logger.info(f"Draining {len(session_ids)} sessions ({timeout}s)")
+
+        # 取り込み中の音声の文字起こしを受信キューに積み終える
+        await asyncio.gather(
+            *(self.stop_audio(session_id) for session_id in list(self.audio_pipelines)),
+            return_exceptions=True,
+        )
+        cancelled = await self.scheduler.drain(deadline - time.monotonic())
+        if cancelled:
+            logger.warning(f"Cancelled {cancelled} processing rounds at the drain deadline")
+        joins = [asyncio.ensure_future(queue.join()) for queue in self.inbound_queues.values()]
+        if joins:
+            _, unfinished = await asyncio.wait(joins, timeout=max(deadline - time.monotonic(), 0.0))
+            for join in unfinished:
+                join.cancel()
+
+        # 取り消したラウンドがメモリにだけ反映した抽出結果も書き込む
+        # （書き込みに失敗しても接続は閉じ、失敗は呼び出し元に送出する）
+        try:
+            for session_id in session_ids:
+                session = active_sessions.get(session_id)
+                if session is None:
+                    continue
+                await session_store.set_extractions(session_id, session.extractions)
+                await session_store.update_session_fields(session, "status", "current_layer")
+        finally:
+            notice = self.draining_notice()
+            senders: list[ConnectionSender] = []
+            for session_id, session_senders in list(self.connections.items()):
+                await self._deliver_local(session_id, notice)
+                senders.extend(session_senders)
+            remaining = max(deadline - time.monotonic(), 1.0)
+            await asyncio.gather(*(sender.drain("draining", remaining) for sender in senders))
+            # 最後の接続が閉じたセッションのワーカーの停止を待つ
+            if self._background_tasks:
+                await asyncio.wait(list(self._background_tasks), timeout=remaining)
+        logger.info(f"Drained {len(session_ids)} sessions, closed {len(senders)} connections")
+
+    @staticmethod
+    def draining_notice() -> str:
+        """終了処理中のワーカーから再接続を促すメッセージを返す.
+
+        Returns:
+            str: シリアライズ済みの session_status
+        """
+        return WSMessage(
+            type=WSMessageType.SESSION_STATUS,
+            data={"status": "draining", "reconnect": True},
+        ).model_dump_json()
+
+    def evict(self, session_id: str) -> None:
+        """メモリから追い出したセッションの付随する状態を破棄する.
+
+        Args:
+            session_id: セッションID
+        """
+        transcripts.pop(session_id, None)
+        progress_trackers.pop(session_id, None)
+        self.text_buffer.pop(session_id, None)
+        self.buffer_stats.pop(session_id, None)
+        self.trigger_metrics.pop(session_id, None)
+        self.timelines.pop(session_id, None)
+        self.closed_senders.pop(session_id, None)
+        self.interim_texts.pop(session_id, None)
+        self.streams.pop(session_id, None)
+        self.inbound_limiters.pop(session_id, None)
+        self.scheduler.forget(session_id)
+        if self.relevance_gate is not None:
+            self.relevance_gate.forget(session_id)
+
+    def _resume(
+        self,
+        session_id: str,
+        sender: ConnectionSender,
+        last_seq: Optional[int],
+        stream_id: Optional[str],
+    ) -> None:
+        """接続直後にストリーム情報を送り、再接続なら取りこぼした分を送る.
+
+        - replay: 同じストリームで取りこぼしが保持している範囲に収まれば、その分だけ再送する
+        - snapshot: ストリームが変わった・取りこぼしが多すぎる場合は、現在の状態をまとめて送る
+        - new: 初回の接続（状態はREST APIで取得する）
+
+        Args:
+            session_id: セッションID
+            sender: 接続の送信キュー
+            last_seq: クライアントが最後に受け取った連番（初回はNone）
+            stream_id: その連番のストリームID
+        """
+        stream = self._stream(session_id)
+        entries: Optional[list[tuple[int, str, Optional[str]]]] = []
+        if last_seq is None:
+            mode = "new"
+        else:
+            entries = stream.since(last_seq) if stream_id == stream.stream_id else None
+            if entries is not None and len(entries) > sender.max_pending // 2:
+                # 再送だけで送信キューを埋めて切断されないようにする
+                entries = None
+            mode = "snapshot" if entries is None else "replay"
+
+        data: dict[str, Any] = {"stream_id": stream.stream_id, "seq": stream.last_seq, "mode": mode}
+        if entries is None:
+            entries = []
+            data["snapshot"] = self._snapshot(session_id)
+        sender.offer(WSMessage(type=WSMessageType.RESUME, data=data).model_dump_json())
+        for seq, message_json, coalesce_key in entries:
+            self._offer([sender], seq, message_json, coalesce_key)
+        logger.info(
+            f"WebSocket stream {mode}: {session_id} (from seq {last_seq}, replayed {len(entries)})"
+        )
+
+    def _snapshot(self, session_id: str) -> dict:
+        """再接続したクライアントの画面を作り直すための現在の状態を返す.
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            dict: 状態・抽出情報・進捗・直近の発話
+        """
+        session = active_sessions.get(session_id)
+        if session is None:
+            return {}
+        transcript = get_transcript(session)
+        progress = get_progress(session)
+        return {
+            "status": session.status,
+            "current_layer": session.current_layer.value,
+            "extractions": {key: field.model_dump() for key, field in session.extractions.items()},
+            "progress": progress.summary(),
+            "missing_fields": progress.missing_fields(session.current_layer)[:MISSING_FIELDS_SHOWN],
+            "utterance_count": len(transcript),
+            "utterances": [u.model_dump() for u in transcript.recent(SNAPSHOT_UTTERANCES)],
+        }
+
+    def _stream(self, session_id: str) -> ReplayBuffer:
+        """セッションの送信ストリームを取得する（なければ作る）."""
+        stream = self.streams.get(session_id)
+        if stream is None:
+            stream = self.streams[session_id] = ReplayBuffer(self.replay_buffer_size)
+        return stream
+
+    def _spawn(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """バックグラウンドタスクを起動し、完了まで参照を保持する."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_done)
+        return task
+
+    def _on_background_done(self, task: asyncio.Task) -> None:
+        """バックグラウンドタスクの後始末をする（例外はログに残す）."""
+        self._background_tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Background task failed: {error!r}", exc_info=error)
+
+    async def enqueue(self, session_id: str, message: dict) -> None:
+        """受信メッセージをセッションの受信キューに積む.
+
+        interimの文字起こしは次の結果ですぐ上書きされるため、キューが
+        満杯なら捨てて受信ループを止めない。それ以外のメッセージは
+        キューが空くまで待つ（WebSocketの読み取りに背圧をかける）。
+
+        Args:
+            session_id: セッションID
+            message: 受信したメッセージ
+        """
+        queue = self.inbound_queues[session_id]
+        is_interim = message.get("type") == "transcript" and not message.get("is_final", False)
+        if is_interim and queue.full():
+            logger.debug(f"Inbound queue full, dropping interim transcript: {session_id}")
             return
+        await queue.put(message)
+
+    async def _run_worker(self, session_id: str) -> None:
+        """受信キューからメッセージを取り出して順番に処理する."""
+        queue = self.inbound_queues[session_id]
+        while True:
+            message = await queue.get()
+            try:
+                await self._dispatch(session_id, message)
+            except Exception as e:
+                # 1件の不正メッセージでセッション全体の処理を止めない
+                logger.exception(f"Failed to handle {message.get('type')} message: {e}")
+            finally:
+                queue.task_done()
+
+    async def _dispatch(self, session_id: str, message: dict) -> None:
+        """受信メッセージをタイプごとに処理する.
 
-        message_json = message.model_dump_json()
-        disconnected = []
+        Args:
+            session_id: セッションID
+            message: 受信したメッセージ
+        """
+        session = active_sessions.get(session_id)
+        if not session:
+            return
 
-        for ws in self.connections[session_id]:
+        msg_type = message.get("type")
+
+        if msg_type == "transcript":
+            # 文字起こし結果（Deepgramからのコールバック想定）
+            await self.handle_transcript(
+                session_id,
+                message.get("text", ""),
+                message.get("speaker", "customer"),
+                message.get("is_final", False),
+            )
+
+        elif msg_type == "pin_utterance":
+            # 発話をピン留め
+            utterance_id = message.get("utterance_id")
+            note = message.get("note", "")
+            u = get_transcript(session).get(utterance_id)
+            if u is not None:
+                u.is_pinned = True
+                u.pin_note = note
+                await session_store.update_utterance(session_id, u)
+
+        elif msg_type == "update_extraction":
+            # 抽出情報を手動更新
+            field_key = message.get("field_key")
+            value = message.get("value")
+            if field_key in FIELD_REGISTRY and value is not None:
+                await update_extraction(session_id, field_key, value)
+
+        elif msg_type == "set_layer":
+            # 現在のレイヤーを設定
+            layer = message.get("layer")
             try:
-                await ws.send_text(message_json)
-            except Exception:
-                disconnected.append(ws)
+                session.current_layer = InfoLayer(layer)
+            except ValueError:
+                return
+            await session_store.update_session_fields(session, "current_layer")
+            # 未取得の一覧の並び順が変わる
+            await self.broadcast(
+                session_id,
+                WSMessage(
+                    type=WSMessageType.PROGRESS_UPDATE,
+                    data=get_progress(session).delta([], session.current_layer),
+                ),
+            )
+
+    async def broadcast(self, session_id: str, message: WSMessage) -> None:
+        """セッションの全接続（他ワーカーの接続を含む）にメッセージを送信する.
+
+        Args:
+            session_id: セッションID
+            message: 送信するメッセージ
+        """
+        await broadcast_bus.publish(
+            session_id, message.model_dump_json(), self._coalesce_key(message)
+        )
+
+    @staticmethod
+    def _coalesce_key(message: WSMessage) -> Optional[str]:
+        """未送信なら新しいもので置き換えてよいメッセージの合流キーを返す.
+
+        - interimの文字起こし: 話者ごとに最新の途中経過だけ送ればよい
+        - 抽出更新: 項目ごとに最新の値だけ送ればよい
+
+        Args:
+            message: 送信するメッセージ
+
+        Returns:
+            Optional[str]: 合流キー（置き換えないメッセージはNone）
+        """
+        if message.type == WSMessageType.TRANSCRIPT and not message.data.get("is_final"):
+            return f"interim:{message.data['utterance']['speaker']}"
+        if message.type == WSMessageType.EXTRACTION_UPDATE:
+            return f"extraction:{message.data['field_key']}"
+        return None
+
+    async def _deliver_local(
+        self,
+        session_id: str,
+        message_json: str,
+        coalesce_key: Optional[str] = None,
+    ) -> None:
+        """シリアライズ済みのメッセージに連番を振り、自ワーカーの各接続の送信キューに積む.
+
+        接続がなくても連番を振って保持し、再接続したクライアントに再送する。
+
+        Args:
+            session_id: セッションID
+            message_json: シリアライズ済みのメッセージ
+            coalesce_key: 合流キー
+        """
+        seq = self._stream(session_id).append(message_json, coalesce_key)
+        legacy_frames: Optional[list[tuple[str, Optional[str]]]] = None
+        if message_json.startswith(_TRANSCRIPT_DELTA_PREFIX):
+            # 差分は途中から適用できないため、接続の種類にかかわらず全文を追跡する
+            legacy_frames = self._interim_legacy_frames(session_id, message_json)
+        senders = list(self.connections.get(session_id, []))
+        started = time.perf_counter()
+        self._offer(senders, seq, message_json, coalesce_key, legacy_frames)
+        _fanout_duration.observe(time.perf_counter() - started)
+
+    def _offer(
+        self,
+        senders: list[ConnectionSender],
+        seq: int,
+        message_json: str,
+        coalesce_key: Optional[str],
+        legacy_frames: Optional[list[tuple[str, Optional[str]]]] = None,
+    ) -> None:
+        """連番を付けたメッセージを接続の送信キューに積む.
+
+        round_update / transcript_delta に対応していない接続には、従来の
+        フレームに展開して送る（展開は1回だけ行い、展開したフレームにも同じ連番を付ける）。
+
+        Args:
+            senders: 送信先の接続
+            seq: 連番
+            message_json: シリアライズ済みのメッセージ（連番なし）
+            coalesce_key: 合流キー
+            legacy_frames: 展開済みの従来のフレーム（省略時は必要になった時点で展開する）
+        """
+        batched_only = message_json.startswith((_ROUND_UPDATE_PREFIX, _TRANSCRIPT_DELTA_PREFIX))
+        sequenced: Optional[str] = None
+        legacy_sequenced: Optional[list[tuple[str, Optional[str]]]] = None
+
+        # 送信キューが溢れた接続はofferの中で切断され、リストから外れる
+        for sender in senders:
+            if not batched_only or sender.batched:
+                if sequenced is None:
+                    sequenced = with_seq(message_json, seq)
+                sender.offer(sequenced, coalesce_key)
+                continue
+            if legacy_sequenced is None:
+                if legacy_frames is None:
+                    # 再送時のinterimの差分は全文を復元できないため送らない（確定時に届く）
+                    is_round_update = message_json.startswith(_ROUND_UPDATE_PREFIX)
+                    legacy_frames = self._legacy_frames(message_json) if is_round_update else []
+                legacy_sequenced = [(with_seq(frame, seq), key) for frame, key in legacy_frames]
+            for frame_json, frame_key in legacy_sequenced:
+                sender.offer(frame_json, frame_key)
+
+    def _legacy_frames(self, message_json: str) -> list[tuple[str, Optional[str]]]:
+        """round_update を従来の extraction_update / suggestion フレームに展開する.
+
+        Args:
+            message_json: シリアライズ済みの round_update
+
+        Returns:
+            list[tuple[str, Optional[str]]]: シリアライズ済みのフレームと合流キー
+        """
+        round_update = WSMessage.model_validate_json(message_json)
+        messages = [
+            WSMessage(
+                type=WSMessageType.EXTRACTION_UPDATE,
+                data={"field_key": field_key, "field": field},
+            )
+            for field_key, field in round_update.data["extractions"].items()
+        ]
+        messages.extend(
+            WSMessage(type=WSMessageType.SUGGESTION, data=suggestion)
+            for suggestion in round_update.data["suggestions"]
+        )
+        # 全カテゴリ・全層を載せた progress_update として送る
+        messages.append(
+            WSMessage(
+                type=WSMessageType.PROGRESS_UPDATE,
+                data={
+                    **round_update.data["progress"],
+                    "missing_fields": round_update.data["missing_fields"],
+                },
+            )
+        )
+        return [(message.model_dump_json(), self._coalesce_key(message)) for message in messages]
 
-        # 切断された接続を削除
-        for ws in disconnected:
-            self.disconnect(session_id, ws)
+    def _interim_legacy_frames(
+        self, session_id: str, message_json: str
+    ) -> list[tuple[str, Optional[str]]]:
+        """transcript_delta を適用し、従来のinterimの transcript フレームを作る.
+
+        Args:
+            session_id: セッションID
+            message_json: シリアライズ済みの transcript_delta
+
+        Returns:
+            list[tuple[str, Optional[str]]]: シリアライズ済みのフレームと合流キー
+            （途中から受け取って全文が分からない場合は空）
+        """
+        delta = json.loads(message_json)["data"]
+        texts = self.interim_texts.setdefault(session_id, {})
+        known = texts.get(delta["utterance_id"], "")
+        if delta["offset"] > len(known):
+            return []
+        text = known[: delta["offset"]] + delta["text"]
+        texts[delta["utterance_id"]] = text
+
+        message = WSMessage(
+            type=WSMessageType.TRANSCRIPT,
+            data={
+                "utterance": Utterance(
+                    id=delta["utterance_id"],
+                    session_id=session_id,
+                    timestamp=datetime.now(),
+                    speaker=delta["speaker"],
+                    text=text,
+                ).model_dump(),
+                "is_final": False,
+            },
+        )
+        return [(message.model_dump_json(), self._coalesce_key(message))]
+
+    async def _apply_remote_event(self, session_id: str, message_json: str) -> None:
+        """他ワーカー発のメッセージをローカルのセッションコピーに反映する.
+
+        同席者の画面が別ワーカーに接続した場合など、同じセッションを複数の
+        ワーカーが受け持っても、各ワーカーのコピーとREST応答を最新に保つ。
+
+        Args:
+            session_id: セッションID
+            message_json: シリアライズ済みのメッセージ
+        """
+        session = active_sessions.get(session_id)
+        if session is None:
+            return
+
+        message = WSMessage.model_validate_json(message_json)
+        if message.type == WSMessageType.TRANSCRIPT and message.data.get("is_final"):
+            utterance = Utterance.model_validate(message.data["utterance"])
+            self.interim_texts.get(session_id, {}).pop(utterance.id, None)
+            # 接続時にストアから読んだ分と重複しうるが、IDが同じなら追加されない
+            get_transcript(session).append(utterance)
+        elif message.type == WSMessageType.EXTRACTION_UPDATE:
+            field = ExtractionField.model_validate(message.data["field"])
+            get_progress(session).set(message.data["field_key"], field)
+        elif message.type == WSMessageType.ROUND_UPDATE:
+            get_progress(session).update(
+                {
+                    field_key: ExtractionField.model_validate(field)
+                    for field_key, field in message.data["extractions"].items()
+                }
+            )
 
     async def handle_transcript(
         self,
@@ -275,6 +1412,10 @@ class SessionWebSocketManager:
     ) -> None:
         """文字起こし結果を処理する.
 
+        interimは間引いて差分だけを配信し、確定した発話はinterimと同じIDで
+        送ってクライアント側の途中経過を置き換えさせる。
+        抽出・サジェスト生成は待たずにバックグラウンドで開始する。
+
         Args:
             session_id: セッションID
             text: テキスト
@@ -285,29 +1426,36 @@ class SessionWebSocketManager:
         if not session:
             return
 
-        # 発話を作成・保存
+        if not is_final:
+            await self.interim_channel.update(session_id, speaker, text)
+            return
+
+        # 発話を作成・保存（interimを送っていればそのIDを引き継ぐ）
+        utterance_id = self.interim_channel.finalize(session_id, speaker) or str(uuid4())
+        self.interim_texts.get(session_id, {}).pop(utterance_id, None)
         utterance = Utterance(
-            id=str(uuid4()),
+            id=utterance_id,
             session_id=session_id,
             timestamp=datetime.now(),
             speaker=speaker,
             text=text,
         )
 
-        if is_final:
-            session.utterances.append(utterance)
-            self.text_buffer[session_id].append(utterance)
-
-            # リフレーミング検出
-            reframe = suggestion_service.detect_reframing_opportunity(utterance)
-            if reframe:
-                await self.broadcast(
-                    session_id,
-                    WSMessage(
-                        type=WSMessageType.REFRAMING,
-                        data=reframe.model_dump(),
-                    ),
-                )
+        get_transcript(session).append(utterance)
+        self.text_buffer.setdefault(session_id, []).append(utterance)
+        stats = self.buffer_stats.setdefault(session_id, BufferStats())
+        stats.add(text, time.monotonic())
+
+        # リフレーミング検出
+        reframe = suggestion_service.detect_reframing_opportunity(utterance)
+        if reframe:
+            await self.broadcast(
+                session_id,
+                WSMessage(
+                    type=WSMessageType.REFRAMING,
+                    data=reframe.model_dump(),
+                ),
+            )
 
         # クライアントに文字起こしを送信
         await self.broadcast(
@@ -316,82 +1464,344 @@ class SessionWebSocketManager:
                 type=WSMessageType.TRANSCRIPT,
                 data={
                     "utterance": utterance.model_dump(),
-                    "is_final": is_final,
+                    "is_final": True,
                 },
             ),
         )
 
-        # バッファがたまったら抽出・サジェスト生成
-        if is_final and len(self.text_buffer[session_id]) >= self.min_utterances:
-            await self._process_buffer(session_id)
+        # エコーを優先し、共有ストアへの追記はその後に行う
+        await session_store.append_utterance(session_id, utterance)
+        # 売り手の発話の定型の事実は、ラウンドを待たずに仮の値として出す
+        if fact_extractor is not None and speaker == "customer":
+            await self._apply_provisional(session, fact_extractor.extract(utterance))
+        self._evaluate_trigger(session_id)
+
+    async def _apply_provisional(
+        self,
+        session: SessionState,
+        fields: dict[str, ExtractionField],
+    ) -> None:
+        """ルールで取り出した仮の値をセッションに反映して配信する.
+
+        抽出ラウンド・手動入力で確定した項目と、同じ値の仮の項目は上書きしない。
+
+        Args:
+            session: セッション状態
+            fields: フィールドキー → 仮の抽出フィールド
+        """
+        updated = {}
+        for field_key, field in fields.items():
+            current = session.extractions.get(field_key)
+            if current is not None and current.value:
+                if not current.provisional or current.value == field.value:
+                    continue
+            updated[field_key] = field
+        if not updated:
+            return
 
-    async def _process_buffer(self, session_id: str) -> None:
-        """バッファを処理して抽出・サジェストを生成する."""
+        progress = get_progress(session)
+        changed = progress.update(updated)
+        _provisional_filled.inc(len(updated))
+        for field_key, field in updated.items():
+            await self.broadcast(
+                session.id,
+                WSMessage(
+                    type=WSMessageType.EXTRACTION_UPDATE,
+                    data={"field_key": field_key, "field": field.model_dump()},
+                ),
+            )
+        if changed:
+            await self.broadcast(
+                session.id,
+                WSMessage(
+                    type=WSMessageType.PROGRESS_UPDATE,
+                    data=progress.delta(changed, session.current_layer),
+                ),
+            )
+        await session_store.set_extractions(session.id, updated)
+
+    async def _broadcast_interim(self, session_id: str, delta: dict) -> None:
+        """interimの差分を配信する（InterimChannelから呼ばれる）.
+
+        Args:
+            session_id: セッションID
+            delta: 発話ID・話者・差分の開始位置・差分テキスト
+        """
+        await self.broadcast(
+            session_id,
+            WSMessage(type=WSMessageType.TRANSCRIPT_DELTA, data=delta),
+        )
+
+    def _evaluate_trigger(self, session_id: str) -> None:
+        """フラッシュ判定を行い、必要なら処理ラウンドを要求する.
+
+        フラッシュしない場合は、時間経過で判定が変わる時刻にタイマーを張り直す。
+        ラウンドが実行中なら完了後にまとめて実行される。
+
+        Args:
+            session_id: セッションID
+        """
+        stats = self.buffer_stats.get(session_id)
+        if stats is None:
+            return
+
+        now = time.monotonic()
+        reason = self.trigger_policy.evaluate(stats, now)
+        if reason is not None:
+            self._cancel_flush_timer(session_id)
+            if stats.flush_reason is None:
+                stats.flush_reason = reason
+            self.scheduler.request(session_id)
+            return
+
+        deadline = self.trigger_policy.next_deadline(stats)
+        if deadline is None or deadline <= now or session_id in self._flush_timers:
+            return
+        self._flush_timers[session_id] = asyncio.get_running_loop().call_later(
+            deadline - now, self._on_flush_deadline, session_id
+        )
+
+    def _on_flush_deadline(self, session_id: str) -> None:
+        """待ち時間の上限に達したバッファを再判定する."""
+        self._flush_timers.pop(session_id, None)
+        self._evaluate_trigger(session_id)
+
+    def _cancel_flush_timer(self, session_id: str) -> None:
+        """フラッシュ判定のタイマーを取り消す."""
+        timer = self._flush_timers.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    async def _timed_round(self, session_id: str, generation: int) -> None:
+        """ラウンドを実行し、所要時間を記録する.
+
+        Args:
+            session_id: セッションID
+            generation: ラウンド開始時のスケジューラ世代番号
+        """
+        started = time.perf_counter()
+        try:
+            await self._process_buffer(session_id, generation)
+        finally:
+            _round_duration.observe(time.perf_counter() - started)
+
+    async def _process_buffer(self, session_id: str, generation: int) -> None:
+        """バッファを処理して抽出・サジェストを生成する.
+
+        スケジューラから呼ばれるため、同じセッションで同時に実行されることはない。
+
+        Args:
+            session_id: セッションID
+            generation: ラウンド開始時のスケジューラ世代番号
+        """
         session = active_sessions.get(session_id)
         buffer = self.text_buffer.get(session_id, [])
 
         if not session or not buffer:
             return
 
-        # バッファをクリア
+        # バッファをクリアし、フラッシュ理由を記録
         self.text_buffer[session_id] = []
-
-        # 並列で抽出・サジェスト生成
-        extraction_task = extraction_service.extract_from_utterances(
-            session_id,
-            buffer,
-            session.extractions,
+        self._cancel_flush_timer(session_id)
+        stats = self.buffer_stats.pop(session_id, None)
+        if stats is not None:
+            self.trigger_metrics.setdefault(session_id, TriggerMetrics()).record(
+                stats, time.monotonic()
+            )
+        timeline = self.timelines.get(session_id)
+        if timeline is None:
+            timeline = self.timelines[session_id] = SessionTimeline(settings.SESSION_TIMELINE_ROUNDS)
+        trace = timeline.begin(
+            generation,
+            stats.flush_reason.value if stats and stats.flush_reason else "unknown",
+            len(buffer),
+            stats.first_at if stats else None,
         )
 
-        missing_fields = extraction_service.get_missing_fields(
-            session.extractions, session.current_layer
+        progress = get_progress(session)
+        missing_fields = progress.missing_fields(session.current_layer)
+        recent_utterances = get_transcript(session).recent(10)
+
+        # 相槌だけのバッファは抽出を呼ばずに次のラウンドへ持ち越し、
+        # 中身のある会話・抽出情報が前回のサジェストから変わっていなければサジェストも呼ばない
+        to_extract: Optional[list[Utterance]] = buffer
+        fingerprint: Optional[int] = None
+        run_suggestions = True
+        gate = self.relevance_gate
+        if gate is not None:
+            to_extract, relevance = gate.admit_extraction(session_id, buffer)
+            if to_extract is None:
+                _extraction_skipped.inc()
+                logger.debug(f"Deferring extraction: {session_id} {relevance.to_dict()}")
+            fingerprint = gate.fingerprint(
+                recent_utterances, session.extractions, session.current_layer, session.hypotheses
+            )
+            if gate.suggestions_unchanged(session_id, fingerprint):
+                _suggestion_skipped.inc()
+                run_suggestions = False
+            if to_extract is None and not run_suggestions:
+                trace.finish("skipped")
+                return
+
+        # 並列で抽出・サジェスト生成（ゲートで止めた呼び出しは並べない）
+        calls: dict[str, Awaitable[Any]] = {}
+        if to_extract is not None:
+            calls["extraction"] = extraction_service.extract_from_utterances(
+                session_id,
+                to_extract,
+                session.extractions,
+                trace=trace.call("extraction"),
+            )
+        if run_suggestions:
+            calls["suggestion"] = suggestion_service.generate_suggestions(
+                session_id,
+                recent_utterances,
+                session.extractions,
+                missing_fields,
+                session.hypotheses,
+                trace=trace.call("suggestion"),
+            )
+        results = dict(
+            zip(calls, await asyncio.gather(*calls.values(), return_exceptions=True))
         )
+        extraction_result = results.get("extraction")
+        suggestions = results.get("suggestion")
+
+        # 抽出結果を反映
+        updated: dict[str, ExtractionField] = {}
+        if extraction_result is not None and not isinstance(extraction_result, Exception):
+            for field in extraction_result.fields:
+                # 抽出結果は FIELD_REGISTRY にある項目だけに絞られている
+                field_key = FIELD_REGISTRY.lookup(field.category, field.field).key
+                current = session.extractions.get(field_key)
+                if current is not None and current.provisional and current.value:
+                    if same_fact(current.value, field.value or ""):
+                        _provisional_confirmed.inc()
+                    else:
+                        _provisional_overridden.inc()
+                progress.set(field_key, field)
+                updated[field_key] = field
+            await session_store.set_extractions(session_id, updated)
+
+        # 処理中に届いた発話で次のラウンドが実行待ちなら、古い会話に基づくサジェストは
+        # 送らない（次のラウンドの結果を使う）。待っている発話が相槌だけなら次のラウンドで
+        # 話が進むわけではないので、このラウンドのサジェストを送る
+        if suggestions is None or isinstance(suggestions, Exception):
+            suggestions = []
+        elif (
+            suggestions
+            and self.scheduler.is_superseded(session_id, generation)
+            and (gate is None or gate.is_relevant(self.text_buffer.get(session_id, [])))
+        ):
+            logger.debug(f"Dropping stale suggestions: {session_id} (round {generation})")
+            suggestions = []
+        elif fingerprint is not None:
+            gate.record_suggestions(session_id, fingerprint)
+
+        if not updated and not suggestions:
+            trace.finish("no_update")
+            return
 
-        suggestion_task = suggestion_service.generate_suggestions(
+        # ラウンドの結果を1フレームにまとめて送信
+        # （非対応のクライアントには配信時に項目ごとのフレームへ展開する）
+        await self.broadcast(
             session_id,
-            session.utterances[-10:],
-            session.extractions,
-            missing_fields,
-            session.hypotheses,
+            WSMessage(
+                type=WSMessageType.ROUND_UPDATE,
+                data={
+                    "round": generation,
+                    "extractions": {key: field.model_dump() for key, field in updated.items()},
+                    "suggestions": [suggestion.model_dump() for suggestion in suggestions],
+                    "progress": progress.summary(),
+                    "missing_fields": progress.missing_fields(session.current_layer)[
+                        :MISSING_FIELDS_SHOWN
+                    ],
+                },
+            ),
         )
+        trace.finish("broadcast")
 
-        extraction_result, suggestions = await asyncio.gather(
-            extraction_task,
-            suggestion_task,
-            return_exceptions=True,
-        )
+    def finish_ingest(self, session: SessionState, ingest: TranscriptIngest) -> asyncio.Task:
+        """一括取り込みの抽出が終わったら結果を反映するタスクを起動する.
 
-        # 抽出結果を反映・送信
-        if not isinstance(extraction_result, Exception):
-            for field in extraction_result.fields:
-                field_key = f"{field.category.value}.{field.field}"
-                session.extractions[field_key] = field
-
-                await self.broadcast(
-                    session_id,
-                    WSMessage(
-                        type=WSMessageType.EXTRACTION_UPDATE,
-                        data={
-                            "field_key": field_key,
-                            "field": field.model_dump(),
-                        },
-                    ),
-                )
-
-        # サジェストを送信
-        if not isinstance(suggestions, Exception):
-            for suggestion in suggestions:
-                await self.broadcast(
-                    session_id,
-                    WSMessage(
-                        type=WSMessageType.SUGGESTION,
-                        data=suggestion.model_dump(),
-                    ),
-                )
+        リクエストとは別のタスクで実行するため、クライアントが切断しても反映され、
+        終了時のドレインでも完了を待つ。
+
+        Args:
+            session: セッション状態
+            ingest: 本文を受け取り終えた一括取り込み
+
+        Returns:
+            asyncio.Task: 反映したフィールド（フィールドキー → 抽出フィールド）を返すタスク
+        """
+        return self._spawn(self._apply_ingest(session, ingest))
+
+    async def _apply_ingest(
+        self,
+        session: SessionState,
+        ingest: TranscriptIngest,
+    ) -> dict[str, ExtractionField]:
+        """一括取り込みの抽出結果をセッションに反映して配信する."""
+        updated = await ingest.result()
+        if not updated:
+            return updated
+        progress = get_progress(session)
+        progress.update(updated)
+        await session_store.set_extractions(session.id, updated)
+        # 一括取り込みはスケジューラのラウンドに属さないため round は0
+        await self.broadcast(
+            session.id,
+            WSMessage(
+                type=WSMessageType.ROUND_UPDATE,
+                data={
+                    "round": 0,
+                    "extractions": {key: field.model_dump() for key, field in updated.items()},
+                    "suggestions": [],
+                    "progress": progress.summary(),
+                    "missing_fields": progress.missing_fields(session.current_layer)[
+                        :MISSING_FIELDS_SHOWN
+                    ],
+                },
+            ),
+        )
+        logger.info(f"Ingest applied {len(updated)} fields: {session.id}")
+        return updated
 
 
 ws_manager = SessionWebSocketManager()
 
+lifecycle = SessionLifecycleManager(
+    active_sessions,
+    session_store,
+    is_busy=ws_manager.is_busy,
+    on_evict=ws_manager.evict,
+    idle_ttl=settings.SESSION_IDLE_TTL,
+    completed_ttl=settings.SESSION_COMPLETED_TTL,
+    memory_budget=settings.SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+    sweep_interval=settings.SESSION_SWEEP_INTERVAL,
+)
+
+registry.gauge(
+    "tonari_active_sessions",
+    "Sessions held in worker memory",
+    lambda: len(active_sessions),
+)
+registry.gauge(
+    "tonari_websocket_connections",
+    "Open session WebSocket connections",
+    lambda: sum(len(senders) for senders in ws_manager.connections.values()),
+)
+registry.gauge(
+    "tonari_inbound_queue_depth",
+    "Messages waiting in session inbound queues",
+    lambda: sum(queue.qsize() for queue in ws_manager.inbound_queues.values()),
+)
+registry.gauge(
+    "tonari_outbound_queue_depth",
+    "Messages waiting in connection send queues",
+    lambda: sum(sender.depth for senders in ws_manager.connections.values() for sender in senders),
+)
+
 
 @router.websocket("/{session_id}/ws")
 async def websocket_endpoint(websocket: WebSocket, session_id: str) -> None:
@@ -403,53 +1813,80 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str) -> None:
     - dismiss_suggestion: サジェストを非表示
     - use_suggestion: サジェストを使用
     - update_extraction: 抽出情報を更新
+    - set_layer: 現在のレイヤーを設定
+    - transcript: 文字起こし結果
+    - heartbeat: 接続維持の通知（セッションの最終操作時刻を更新するだけ）
+    - audio_stop: 録音の停止（サーバー側の音声取り込みを止める）
+
+    受信フレームは大きさ・頻度・型を検査し、制限を超えたものは処理せずに捨てる
+    （理由ごとに最初の1回だけ error で知らせ、捨て続ける接続は1008で切断する）。
+
+    バイナリフレームは音声（audio_chunk）として扱い、STT_PROVIDER を設定した
+    場合はサーバー側で文字起こしして transcript と同じ経路で処理する。
+
+    クエリパラメータ protocol=2 で接続したクライアントには、処理ラウンドの
+    抽出更新・サジェスト・進捗を round_update の1フレームで、interimの文字起こしを
+    transcript_delta（差分）で送る。指定がなければ従来どおり extraction_update /
+    suggestion を項目ごとに、interimを全文の transcript で送る。
+
+    送信するメッセージにはセッションごとの連番（seq）を付け、接続直後に
+    resume でストリームIDと現在の連番を通知する。再接続時にクエリパラメータ
+    last_seq と stream を指定すると、取りこぼした分だけを再送する（再送できない
+    場合は resume に現在の状態のスナップショットを含める）。
+
+    ワーカーの終了処理中は session_status（draining）を送って1012で閉じ、
+    別のワーカーへの再接続を促す。
     """
+    if ws_manager.draining:
+        await websocket.accept()
+        await websocket.send_text(ws_manager.draining_notice())
+        await websocket.close(code=SERVICE_RESTART_CLOSE_CODE, reason="draining")
+        return
+
     session = active_sessions.get(session_id)
+    if session is None or (session_store.shared and session_id not in ws_manager.connections):
+        # 別ワーカーで作成・更新されたセッションは共有ストアから読み直して受け持つ
+        session = await session_store.load_session(session_id)
     if not session:
         await websocket.close(code=4004, reason="Session not found")
         return
+    if session_id not in ws_manager.connections:
+        active_sessions[session_id] = session
+    lifecycle.touch(session_id)
 
-    await ws_manager.connect(session_id, websocket)
-
+    params = websocket.query_params
+    batched = params.get("protocol") == BATCHED_PROTOCOL
+    last_seq = int(params["last_seq"]) if params.get("last_seq", "").isdigit() else None
     try:
+        # 登録後のバスの購読で失敗しても、下の切断処理で接続の登録と送信タスクを片付ける
+        sender = await ws_manager.connect(
+            session_id, websocket, batched=batched, last_seq=last_seq, stream_id=params.get("stream")
+        )
+        guard = ws_manager.create_guard(session_id)
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            msg_type = message.get("type")
-
-            if msg_type == "transcript":
-                # 文字起こし結果（Deepgramからのコールバック想定）
-                await ws_manager.handle_transcript(
-                    session_id,
-                    message.get("text", ""),
-                    message.get("speaker", "customer"),
-                    message.get("is_final", False),
-                )
-
-            elif msg_type == "pin_utterance":
-                # 発話をピン留め
-                utterance_id = message.get("utterance_id")
-                note = message.get("note", "")
-                for u in session.utterances:
-                    if u.id == utterance_id:
-                        u.is_pinned = True
-                        u.pin_note = note
-                        break
-
-            elif msg_type == "update_extraction":
-                # 抽出情報を手動更新
-                field_key = message.get("field_key")
-                value = message.get("value")
-                if field_key and value is not None:
-                    await update_extraction(session_id, field_key, value)
-
-            elif msg_type == "set_layer":
-                # 現在のレイヤーを設定
-                layer = message.get("layer")
-                try:
-                    session.current_layer = InfoLayer(layer)
-                except ValueError:
-                    pass
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            lifecycle.touch(session_id)
+            if frame.get("bytes") is not None:
+                reason = guard.admit_audio(frame["bytes"])
+                if reason is None:
+                    # 音声は受信キューを通さず、取り込みパイプラインのバッファに書き込む
+                    if not ws_manager.feed_audio(session_id, frame["bytes"]):
+                        logger.debug(f"Ignoring audio frame, server-side STT disabled: {session_id}")
+                    continue
+            else:
+                message, reason = guard.admit_text(frame["text"])
+                if reason is None:
+                    if message.type == "heartbeat":
+                        continue
+                    if message.type == "audio_stop":
+                        ws_manager.end_audio(session_id)
+                        continue
+                    # 受信ループはキューに積むだけ（処理はセッションワーカーが行う）
+                    await ws_manager.enqueue(session_id, message.model_dump())
+                    continue
+            ws_manager.reject_inbound(session_id, sender, guard, reason)
 
     except WebSocketDisconnect:
         ws_manager.disconnect(session_id, websocket)
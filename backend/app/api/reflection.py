@@ -11,11 +11,13 @@ from pydantic import BaseModel
 from anthropic import AsyncAnthropic
 
 from ..core import verify_supabase_token, settings
+from ..core.metrics import ClaudeMetrics
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["reflection"])
 
 client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+_claude_metrics = ClaudeMetrics("reflection")
 
 SYSTEM_PROMPT = """あなたは管理職のマネジメントを支援するAIです。
 1on1の会話を振り返り、建設的なフィードバックを提供してください。
@@ -85,16 +87,18 @@ async def generate_reflection(
 
         logger.info(f"[聖人君子AI] Generating reflection...")
 
-        response = await client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            system=SYSTEM_PROMPT,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"以下の1on1を振り返ってください:\n\n{request.transcript}{risk_context}"
-                }
-            ]
+        response = await _claude_metrics.call(
+            client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=500,
+                system=SYSTEM_PROMPT,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"以下の1on1を振り返ってください:\n\n{request.transcript}{risk_context}"
+                    }
+                ]
+            )
         )
 
         text = response.content[0].text
@@ -13,12 +13,21 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import httpx
 
 from .config import settings
+from .metrics import registry
 
 security = HTTPBearer(auto_error=False)
 
 # トークン検証キャッシュ: token -> (user_data, expires_at)
 _token_cache: Dict[str, tuple] = {}
 
+_token_cache_requests = registry.counter(
+    "tonari_auth_cache_requests_total",
+    "Token verification cache lookups",
+    ("result",),
+)
+_token_cache_hits = _token_cache_requests.labels("hit")
+_token_cache_misses = _token_cache_requests.labels("miss")
+
 
 def _decode_jwt_payload(token: str) -> Optional[dict]:
     """JWTのペイロードをデコード（署名検証なし）"""
@@ -85,7 +94,9 @@ async def verify_supabase_token(
     # キャッシュチェック
     cached_user = _get_cached_user(token)
     if cached_user:
+        _token_cache_hits.inc()
         return cached_user
+    _token_cache_misses.inc()
 
     # JWTデコード・基本検証
     payload = _decode_jwt_payload(token)
@@ -23,5 +23,108 @@ class Settings:
     TOKEN_CACHE_TTL: int = 300  # 5分
     TOKEN_CACHE_MAX_SIZE: int = 100
 
+    # 共有ストア（空ならプロセス内。複数ワーカーでは redis://host:port/db）
+    SESSION_STORE_URL: str = os.getenv("SESSION_STORE_URL", "")
+    # プロセス内ストアの先行書き込みジャーナル（空なら使わない。Redis利用時は不要）
+    # ワーカーごとにこの下の worker-{k} を使い、再起動したワーカーが引き継ぐ
+    SESSION_JOURNAL_DIR: str = os.getenv("SESSION_JOURNAL_DIR", ".journal")
+    SESSION_JOURNAL_SEGMENT_MB: int = int(os.getenv("SESSION_JOURNAL_SEGMENT_MB", "16"))
+    SESSION_JOURNAL_COMMIT_INTERVAL: float = float(
+        os.getenv("SESSION_JOURNAL_COMMIT_INTERVAL", "0.05")
+    )
+    # プロセス内ストアが追い出したセッションを書き出すディレクトリ（空ならメモリに持ち続ける）
+    SESSION_ARCHIVE_DIR: str = os.getenv("SESSION_ARCHIVE_DIR", ".archive")
+    # ワーカー間のブロードキャスト（未指定なら共有ストアと同じ接続先）
+    BROADCAST_BUS_URL: str = os.getenv("BROADCAST_BUS_URL", SESSION_STORE_URL)
+    # 購読の開始時に中継の接続を待つ上限（秒。超えたらそのワーカーの接続への配信だけで続ける）
+    BROADCAST_BUS_CONNECT_TIMEOUT: float = float(os.getenv("BROADCAST_BUS_CONNECT_TIMEOUT", "3.0"))
+
+    # リアルタイムセッション
+    SESSION_INBOUND_QUEUE_SIZE: int = int(os.getenv("SESSION_INBOUND_QUEUE_SIZE", "256"))
+    # 接続ごとの送信キューの上限と1回の送信の待ち時間（超えた接続は切断）
+    WS_OUTBOUND_QUEUE_SIZE: int = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", "128"))
+    WS_SEND_TIMEOUT: float = float(os.getenv("WS_SEND_TIMEOUT", "10.0"))
+    # 再接続時に再送するため、セッションごとに保持する直近の送信メッセージ数
+    WS_REPLAY_BUFFER_SIZE: int = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "512"))
+    # 受信フレームの上限（超えたフレームは捨て、捨て続ける接続は切断）
+    WS_MAX_TEXT_FRAME_BYTES: int = int(os.getenv("WS_MAX_TEXT_FRAME_BYTES", "16384"))
+    WS_MAX_AUDIO_FRAME_BYTES: int = int(os.getenv("WS_MAX_AUDIO_FRAME_BYTES", "65536"))
+    WS_CONNECTION_MESSAGE_RATE: float = float(os.getenv("WS_CONNECTION_MESSAGE_RATE", "20"))
+    WS_CONNECTION_MESSAGE_BURST: float = float(os.getenv("WS_CONNECTION_MESSAGE_BURST", "40"))
+    WS_SESSION_MESSAGE_RATE: float = float(os.getenv("WS_SESSION_MESSAGE_RATE", "40"))
+    WS_SESSION_MESSAGE_BURST: float = float(os.getenv("WS_SESSION_MESSAGE_BURST", "80"))
+    # 確定した文字起こしの文字数（会話は1人あたり毎秒10文字程度）
+    WS_SESSION_TRANSCRIPT_CHARS_PER_SEC: float = float(
+        os.getenv("WS_SESSION_TRANSCRIPT_CHARS_PER_SEC", "50")
+    )
+    WS_SESSION_TRANSCRIPT_CHARS_BURST: float = float(
+        os.getenv("WS_SESSION_TRANSCRIPT_CHARS_BURST", "4000")
+    )
+    WS_AUDIO_BYTES_PER_SEC: float = float(os.getenv("WS_AUDIO_BYTES_PER_SEC", "65536"))
+    WS_MAX_REJECTIONS: int = int(os.getenv("WS_MAX_REJECTIONS", "50"))
+    # interimの文字起こしを同じ話者へ続けて送る最小間隔（秒）
+    INTERIM_MIN_INTERVAL: float = float(os.getenv("INTERIM_MIN_INTERVAL", "0.25"))
+
+    # サーバー側の音声取り込み（deepgram / local、空ならブラウザから直接Deepgramへ送る）
+    STT_PROVIDER: str = os.getenv("STT_PROVIDER", "")
+    STT_LANGUAGE: str = os.getenv("STT_LANGUAGE", "ja")
+    # セッションごとの音声のリングバッファの大きさ（STTへの送信が詰まった間の分）
+    AUDIO_BUFFER_KB: int = int(os.getenv("AUDIO_BUFFER_KB", "1024"))
+
+    # セッションのライフサイクル（ワーカーのメモリからの追い出し）
+    SESSION_IDLE_TTL: float = float(os.getenv("SESSION_IDLE_TTL", "1800"))  # 放置されたセッション
+    SESSION_COMPLETED_TTL: float = float(os.getenv("SESSION_COMPLETED_TTL", "600"))  # 終了したセッション
+    SESSION_MEMORY_BUDGET_MB: int = int(os.getenv("SESSION_MEMORY_BUDGET_MB", "256"))
+    SESSION_SWEEP_INTERVAL: float = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+    # セッションごとに処理時間を記録しておく直近のラウンド数
+    SESSION_TIMELINE_ROUNDS: int = int(os.getenv("SESSION_TIMELINE_ROUNDS", "200"))
+
+    # ワーカーの終了時に処理中のラウンドと接続を片付ける時間の上限（gunicornの graceful_timeout より短く）
+    SHUTDOWN_DRAIN_TIMEOUT: float = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+
+    # 文字起こしの一括取り込み（窓の文字数・次の窓への重なり・ワーカー内の同時抽出数・上限）
+    BULK_INGEST_WINDOW_CHARS: int = int(os.getenv("BULK_INGEST_WINDOW_CHARS", "3000"))
+    BULK_INGEST_OVERLAP_CHARS: int = int(os.getenv("BULK_INGEST_OVERLAP_CHARS", "300"))
+    BULK_INGEST_CONCURRENCY: int = int(os.getenv("BULK_INGEST_CONCURRENCY", "8"))
+    BULK_INGEST_MAX_CHARS: int = int(os.getenv("BULK_INGEST_MAX_CHARS", "500000"))
+
+    # バックグラウンドジョブ（SQLiteのキューと、ワーカーごとの同時実行数。0ならこのワーカーでは実行しない）
+    JOB_QUEUE_PATH: str = os.getenv("JOB_QUEUE_PATH", ".jobs/jobs.sqlite3")
+    JOB_CONCURRENCY: int = int(os.getenv("JOB_CONCURRENCY", "1"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF: float = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+    # Claudeのバッチ実行（anthropic: Message Batches API / local: 通常のAPIを順に呼ぶ代替）
+    LLM_BATCH_BACKEND: str = os.getenv("LLM_BATCH_BACKEND", "anthropic")
+    LLM_BATCH_LOCAL_CONCURRENCY: int = int(os.getenv("LLM_BATCH_LOCAL_CONCURRENCY", "2"))
+    LLM_BATCH_POLL_INTERVAL: float = float(os.getenv("LLM_BATCH_POLL_INTERVAL", "60"))
+    # 見つからないバッチ（local は送ったワーカーにしかない）を送り直す上限回数。超えたらジョブを失敗にする
+    LLM_BATCH_MAX_RESUBMITS: int = int(os.getenv("LLM_BATCH_MAX_RESUBMITS", "2"))
+    # 再抽出で1つのジョブ（1つのバッチ）にまとめるセッション数
+    REEXTRACT_SESSIONS_PER_JOB: int = int(os.getenv("REEXTRACT_SESSIONS_PER_JOB", "100"))
+
+    # メトリクス（/metrics）のワーカー間の合算に使う共有ディレクトリと書き出し間隔
+    METRICS_DIR: str = os.getenv("METRICS_DIR", "")
+    METRICS_FLUSH_INTERVAL: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+    # 抽出トリガー（バッファのフラッシュ判定）
+    EXTRACTION_MAX_LATENCY: float = float(os.getenv("EXTRACTION_MAX_LATENCY", "10.0"))
+    EXTRACTION_MAX_CHARS: int = int(os.getenv("EXTRACTION_MAX_CHARS", "200"))
+    EXTRACTION_MIN_UTTERANCES: int = int(os.getenv("EXTRACTION_MIN_UTTERANCES", "3"))
+    EXTRACTION_MIN_CHARS: int = int(os.getenv("EXTRACTION_MIN_CHARS", "30"))
+
+    # 抽出プロンプト（delta: 固定の前置きをキャッシュし、取得済み・未取得の候補を予算内に要約 / full: 全項目を毎回並べる）
+    EXTRACTION_CONTEXT_MODE: str = os.getenv("EXTRACTION_CONTEXT_MODE", "delta")
+    EXTRACTION_CONTEXT_BUDGET_TOKENS: int = int(os.getenv("EXTRACTION_CONTEXT_BUDGET_TOKENS", "600"))
+    EXTRACTION_CONTEXT_SUMMARY_CHARS: int = int(os.getenv("EXTRACTION_CONTEXT_SUMMARY_CHARS", "24"))
+    # 確定した発話から定型の事実（設立年・金額・人数）をルールで仮に取り出す（抽出ラウンドで確定・上書き）
+    FACT_EXTRACTOR_ENABLED: bool = os.getenv("FACT_EXTRACTOR_ENABLED", "true").lower() == "true"
+    FACT_EXTRACTOR_CONFIDENCE: float = float(os.getenv("FACT_EXTRACTOR_CONFIDENCE", "0.5"))
+    # 相槌だけのバッファは抽出を呼ばずに次のラウンドへ持ち越し、直近の会話が変わらなければサジェストを呼ばない
+    RELEVANCE_GATE_ENABLED: bool = os.getenv("RELEVANCE_GATE_ENABLED", "true").lower() == "true"
+    RELEVANCE_GATE_MIN_SCORE: float = float(os.getenv("RELEVANCE_GATE_MIN_SCORE", "1.0"))
+    RELEVANCE_GATE_MAX_DEFERRED: int = int(os.getenv("RELEVANCE_GATE_MAX_DEFERRED", "8"))
+
 
 settings = Settings()
@@ -0,0 +1,600 @@
+"""
+メトリクス（Prometheusのテキスト形式で /metrics に出す）
+
+- 値の更新は発話ごとの処理からも呼ばれるため、ロックも確保もしない
+  （イベントループの1スレッドからしか更新しないので属性の加算だけで足りる）。
+  ラベル付きの値は呼び出し元がモジュールの読み込み時に labels() で束ねておく
+- gunicornの各ワーカーは自分の値を共有ディレクトリのファイルへ定期的に書き出し、
+  /metrics はどのワーカーが受けても全ワーカーのファイルを合算して返す
+- 終了したワーカーのカウンター・ヒストグラムは合算に残し（合計が減らないように）、
+  ゲージは動いているワーカーの分だけを合算する。終了したワーカーのファイルは
+  /metrics を受けたワーカーが retired.json に畳み込んで消す（再起動のたびに
+  ファイルが増えて、合算のたびに読む量が増え続けないように）
+"""
+import asyncio
+import bisect
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, TypeVar, Union
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Claude呼び出しの所要時間のバケット（秒）
+CLAUDE_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 30.0)
+# ラウンド（抽出・サジェスト生成）の所要時間のバケット（秒）
+ROUND_DURATION_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 30.0, 60.0)
+# イベントループ上で完結する処理（ファンアウトなど）のバケット（秒）
+LOOP_TASK_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+
+class Counter:
+    """単調増加する値."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        """0から始める."""
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """値を増やす.
+
+        Args:
+            amount: 増やす量
+        """
+        self.value += amount
+
+
+class Histogram:
+    """バケットごとの件数と合計.
+
+    Attributes:
+        bounds: バケットの上限（昇順、+Infは含まない）
+        counts: バケットごとの件数（累積ではない。最後は+Inf）
+        sum: 観測値の合計
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        """空のヒストグラムを作る.
+
+        Args:
+            bounds: バケットの上限
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """値を記録する.
+
+        Args:
+            value: 観測値
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class MetricFamily:
+    """同じ名前でラベルの値が違う計測値の集まり.
+
+    Attributes:
+        name: メトリクス名
+        help: 説明
+        kind: counter / histogram
+        labelnames: ラベル名
+        buckets: ヒストグラムのバケットの上限
+        children: ラベルの値 → 計測値
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = (),
+    ) -> None:
+        """メトリクスを定義する.
+
+        Args:
+            name: メトリクス名
+            help: 説明
+            kind: counter / histogram
+            labelnames: ラベル名
+            buckets: ヒストグラムのバケットの上限
+        """
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.children: dict[tuple[str, ...], Union[Counter, Histogram]] = {}
+
+    def labels(self, *values: str) -> Any:
+        """ラベルの値に対応する計測値を返す（なければ作る）.
+
+        ホットパスでは呼ばず、戻り値を保持して使う。
+
+        Args:
+            *values: ラベルの値（labelnamesの順）
+
+        Returns:
+            Counter | Histogram: 計測値
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self.children.get(values)
+        if child is None:
+            child = Histogram(self.buckets) if self.kind == "histogram" else Counter()
+            self.children[values] = child
+        return child
+
+
+class MetricsRegistry:
+    """このワーカーのメトリクスの登録先.
+
+    Attributes:
+        families: メトリクス名 → カウンター・ヒストグラム
+        gauges: メトリクス名 → (説明, 取得時に値を読む関数, ワーカー間の合算方法)
+    """
+
+    def __init__(self) -> None:
+        """空の登録先を作る."""
+        self.families: dict[str, MetricFamily] = {}
+        self.gauges: dict[str, tuple[str, Callable[[], float], str]] = {}
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> MetricFamily:
+        """カウンターを登録する.
+
+        Args:
+            name: メトリクス名（_total で終える）
+            help: 説明
+            labelnames: ラベル名
+
+        Returns:
+            MetricFamily: 登録したメトリクス
+        """
+        return self._register(MetricFamily(name, help, "counter", labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...],
+        labelnames: tuple[str, ...] = (),
+    ) -> MetricFamily:
+        """ヒストグラムを登録する.
+
+        Args:
+            name: メトリクス名
+            help: 説明
+            buckets: バケットの上限
+            labelnames: ラベル名
+
+        Returns:
+            MetricFamily: 登録したメトリクス
+        """
+        return self._register(MetricFamily(name, help, "histogram", labelnames, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float], aggregate: str = "sum") -> None:
+        """取得時に値を読むゲージを登録する.
+
+        Args:
+            name: メトリクス名
+            help: 説明
+            read: 現在の値を返す関数
+            aggregate: ワーカー間の合算方法（sum / max）
+        """
+        self.gauges[name] = (help, read, aggregate)
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        """メトリクスを登録する（同じ名前なら登録済みのものを返す）."""
+        return self.families.setdefault(family.name, family)
+
+    def snapshot(self) -> dict:
+        """現在の値をワーカー間で受け渡せる形にする.
+
+        Returns:
+            dict: PID・時刻・メトリクスごとの値
+        """
+        metrics: dict[str, dict] = {}
+        for family in self.families.values():
+            samples = []
+            for values, child in family.children.items():
+                if isinstance(child, Histogram):
+                    samples.append([list(values), list(child.counts), child.sum])
+                else:
+                    samples.append([list(values), child.value])
+            metrics[family.name] = {
+                "kind": family.kind,
+                "help": family.help,
+                "labelnames": list(family.labelnames),
+                "buckets": list(family.buckets),
+                "samples": samples,
+            }
+        for name, (help, read, aggregate) in self.gauges.items():
+            try:
+                value = float(read())
+            except Exception as e:
+                logger.warning(f"Failed to read gauge {name}: {e}")
+                continue
+            metrics[name] = {
+                "kind": "gauge",
+                "help": help,
+                "labelnames": [],
+                "aggregate": aggregate,
+                "samples": [[[], value]],
+            }
+        return {"pid": os.getpid(), "time": time.time(), "metrics": metrics}
+
+
+def merge_snapshots(snapshots: list[dict], live_pids: set[int]) -> dict[str, dict]:
+    """ワーカーごとの値を合算する.
+
+    Args:
+        snapshots: ワーカーごとのsnapshot()
+        live_pids: 動いているワーカーのPID（それ以外のゲージは除く）
+
+    Returns:
+        dict[str, dict]: メトリクス名 → 定義とラベルの値ごとの合計
+    """
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        alive = snapshot["pid"] in live_pids
+        for name, metric in snapshot["metrics"].items():
+            if metric["kind"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for sample in metric["samples"]:
+                key = tuple(sample[0])
+                if metric["kind"] == "histogram":
+                    counts, total = target["samples"].get(key, ([0] * len(sample[1]), 0.0))
+                    target["samples"][key] = (
+                        [a + b for a, b in zip(counts, sample[1])],
+                        total + sample[2],
+                    )
+                elif metric.get("aggregate") == "max":
+                    target["samples"][key] = max(target["samples"].get(key, sample[1]), sample[1])
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0.0) + sample[1]
+    return merged
+
+
+def render(merged: dict[str, dict]) -> str:
+    """合算した値をPrometheusのテキスト形式にする.
+
+    Args:
+        merged: merge_snapshots()の戻り値
+
+    Returns:
+        str: テキスト形式（version 0.0.4）
+    """
+    lines: list[str] = []
+    for name in sorted(merged):
+        metric = merged[name]
+        labelnames = metric["labelnames"]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key in sorted(metric["samples"]):
+            labels = [f'{label}="{_escape(value)}"' for label, value in zip(labelnames, key)]
+            if metric["kind"] == "histogram":
+                counts, total = metric["samples"][key]
+                cumulative = 0
+                for bound, count in zip([*metric["buckets"], "+Inf"], counts):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _format(bound)
+                    bucket_labels = ",".join([*labels, 'le="' + le + '"'])
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+                suffix = f"{{{','.join(labels)}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {_format(total)}")
+                lines.append(f"{name}_count{suffix} {cumulative}")
+            else:
+                suffix = f"{{{','.join(labels)}}}" if labels else ""
+                lines.append(f"{name}{suffix} {_format(metric['samples'][key])}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """ラベルの値をエスケープする."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    """数値を出力する（整数は小数点なし）."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _pid_alive(pid: int) -> bool:
+    """プロセスが動いているか."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 終了したワーカーのカウンター・ヒストグラムを畳み込んだファイルと、畳み込みのロック
+RETIRED_FILE = "retired.json"
+RETIRE_LOCK_FILE = "retire.lock"
+
+
+def _as_snapshot(merged: dict[str, dict]) -> dict:
+    """merge_snapshots() の戻り値を snapshot() の形に戻す."""
+    metrics = {}
+    for name, metric in merged.items():
+        samples = []
+        for key, value in metric["samples"].items():
+            if metric["kind"] == "histogram":
+                samples.append([list(key), value[0], value[1]])
+            else:
+                samples.append([list(key), value])
+        metrics[name] = {**metric, "samples": samples}
+    return {"pid": 0, "time": time.time(), "metrics": metrics}
+
+
+class MetricsExporter:
+    """ワーカーの値を共有ディレクトリに書き出し、全ワーカーの合計を返す.
+
+    Attributes:
+        registry: このワーカーの登録先
+        directory: ワーカーごとのファイルを置くディレクトリ
+        interval: 書き出しの間隔（秒）
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory: str, interval: float) -> None:
+        """書き出しを初期化する.
+
+        Args:
+            registry: このワーカーの登録先
+            directory: ワーカーごとのファイルを置くディレクトリ
+            interval: 書き出しの間隔（秒）
+        """
+        self.registry = registry
+        self.directory = Path(directory)
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def path(self) -> Path:
+        """このワーカーのファイル."""
+        return self.directory / f"{os.getpid()}.json"
+
+    def start(self) -> None:
+        """定期的な書き出しを開始する."""
+        if self._task is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._task = asyncio.create_task(self._run(), name="metrics-exporter")
+
+    async def stop(self) -> None:
+        """書き出しを止め、最後の値を書き出す."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            await asyncio.to_thread(self._write, self.registry.snapshot())
+
+    async def _run(self) -> None:
+        """一定間隔で書き出す."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self._write, self.registry.snapshot())
+            except OSError as e:
+                logger.warning(f"Failed to write metrics: {e}")
+
+    def _write(self, snapshot: dict) -> None:
+        """ファイルを置き換える（読み手が書きかけを読まないよう一時ファイルから移す）."""
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(snapshot), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+    def _read_others(self) -> list[dict]:
+        """他のワーカーのファイルを読み、終了したワーカーの分は退役分に畳み込む.
+
+        畳み込みはワーカー間でロックを取って1つずつ行う（同じファイルを二重に足さない）。
+
+        Returns:
+            list[dict]: 動いている他のワーカーと、退役分（あれば）のsnapshot()
+        """
+        own = os.getpid()
+        with open(self.directory / RETIRE_LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            live: list[dict] = []
+            exited: list[tuple[Path, dict]] = []
+            for path in self.directory.glob("*.json"):
+                if path.name == RETIRED_FILE or path.stem == str(own):
+                    continue
+                try:
+                    snapshot = json.loads(path.read_text(encoding="utf-8"))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping metrics file {path.name}: {e}")
+                    continue
+                if _pid_alive(snapshot["pid"]):
+                    live.append(snapshot)
+                else:
+                    exited.append((path, snapshot))
+            retired = self._retire(exited)
+        return live + ([retired] if retired is not None else [])
+
+    def _retire(self, exited: list[tuple[Path, dict]]) -> Optional[dict]:
+        """終了したワーカーのファイルを退役分に足して消す（ロックを取って呼ぶ）.
+
+        退役分には最後に足したファイルの (PID, 時刻) を残し、足してから消す前に
+        落ちた場合は次回そのファイルを足さずに消す。
+
+        Args:
+            exited: 終了したワーカーのファイルとその中身
+
+        Returns:
+            Optional[dict]: 退役分（終了したワーカーがまだなければNone）
+        """
+        path = self.directory / RETIRED_FILE
+        retired = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+        if not exited:
+            return retired
+        folded = {tuple(key) for key in retired["folded"]} if retired is not None else set()
+        new = [snapshot for _, snapshot in exited if (snapshot["pid"], snapshot["time"]) not in folded]
+        if new:
+            # 終了したワーカーとして合算するので、ゲージは落ちる
+            merged = merge_snapshots(([retired] if retired is not None else []) + new, set())
+            retired = {
+                **_as_snapshot(merged),
+                "folded": [[snapshot["pid"], snapshot["time"]] for _, snapshot in exited],
+            }
+            temporary = path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(retired), encoding="utf-8")
+            os.replace(temporary, path)
+        for exited_path, _ in exited:
+            exited_path.unlink(missing_ok=True)
+        return retired
+
+    async def collect(self) -> str:
+        """全ワーカーの合計をテキスト形式で返す.
+
+        自ワーカーの値は書き出し済みのファイルではなく現在の値を使う。
+
+        Returns:
+            str: Prometheusのテキスト形式
+        """
+        snapshots = [self.registry.snapshot()]
+        if self._task is not None:
+            snapshots.extend(await asyncio.to_thread(self._read_others))
+        # 退役分（pid 0）はゲージを持たない
+        live_pids = {s["pid"] for s in snapshots if s["pid"]}
+        return render(merge_snapshots(snapshots, live_pids))
+
+
+class ClaudeMetrics:
+    """1つの呼び出し元のClaude呼び出しの所要時間・失敗数・トークン数.
+
+    Attributes:
+        latency: 所要時間のヒストグラム
+        errors: 失敗した呼び出しの数
+        input_tokens: 入力トークン数
+        output_tokens: 出力トークン数
+        cache_read_tokens: プロンプトキャッシュから読んだ入力トークン数
+        cache_write_tokens: プロンプトキャッシュに書いた入力トークン数
+    """
+
+    __slots__ = (
+        "latency",
+        "errors",
+        "input_tokens",
+        "output_tokens",
+        "cache_read_tokens",
+        "cache_write_tokens",
+    )
+
+    def __init__(self, service: str) -> None:
+        """呼び出し元の計測値を束ねる.
+
+        Args:
+            service: 呼び出し元（service ラベルの値）
+        """
+        self.latency: Histogram = claude_latency.labels(service)
+        self.errors: Counter = claude_errors.labels(service)
+        self.input_tokens: Counter = claude_tokens.labels(service, "input")
+        self.output_tokens: Counter = claude_tokens.labels(service, "output")
+        self.cache_read_tokens: Counter = claude_tokens.labels(service, "cache_read")
+        self.cache_write_tokens: Counter = claude_tokens.labels(service, "cache_write")
+
+    async def call(self, request: Awaitable[T]) -> T:
+        """Claude呼び出しを待ち、所要時間とトークン数を記録する.
+
+        Args:
+            request: client.messages.create(...) の戻り値
+
+        Returns:
+            T: Claudeの応答
+        """
+        started = time.perf_counter()
+        try:
+            response = await request
+        except Exception:
+            self.errors.inc()
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+        self._record_usage(response)
+        return response
+
+    async def stream(self, manager: Any, trace: Optional[Any] = None) -> Any:
+        """ストリーミングでClaudeを呼び出し、最後まで受け取った応答を返す.
+
+        応答の最初のイベントが届いた時刻を記録できるよう、非ストリーミングの
+        呼び出しの代わりに使う。
+
+        Args:
+            manager: client.messages.stream(...) の戻り値
+            trace: request_sent / first_byte を記録する先（mark(stage) を持つもの）
+
+        Returns:
+            Message: 最後まで受け取った応答
+        """
+        started = time.perf_counter()
+        try:
+            if trace is not None:
+                trace.mark("request_sent")
+            async with manager as stream:
+                try:
+                    await stream.__anext__()
+                except StopAsyncIteration:
+                    pass
+                if trace is not None:
+                    trace.mark("first_byte")
+                response = await stream.get_final_message()
+        except Exception:
+            self.errors.inc()
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+        self._record_usage(response)
+        return response
+
+    def _record_usage(self, response: Any) -> None:
+        """応答のトークン数を記録する."""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.input_tokens.inc(usage.input_tokens or 0)
+            self.output_tokens.inc(usage.output_tokens or 0)
+            self.cache_read_tokens.inc(getattr(usage, "cache_read_input_tokens", None) or 0)
+            self.cache_write_tokens.inc(getattr(usage, "cache_creation_input_tokens", None) or 0)
+
+
+registry = MetricsRegistry()
+
+claude_latency = registry.histogram(
+    "tonari_claude_request_duration_seconds",
+    "Claude API request latency by calling service",
+    CLAUDE_LATENCY_BUCKETS,
+    ("service",),
+)
+claude_errors = registry.counter(
+    "tonari_claude_request_errors_total",
+    "Claude API requests that raised",
+    ("service",),
+)
+claude_tokens = registry.counter(
+    "tonari_claude_tokens_total",
+    "Claude API token usage by calling service and kind",
+    ("service", "kind"),
+)
+
+# 共有ディレクトリ（未指定ならgunicornのマスター（親プロセス）ごとの一時ディレクトリ）
+exporter = MetricsExporter(
+    registry,
+    settings.METRICS_DIR or os.path.join(tempfile.gettempdir(), f"tonari-metrics-{os.getppid()}"),
+    settings.METRICS_FLUSH_INTERVAL,
+)
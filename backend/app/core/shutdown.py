@@ -0,0 +1,119 @@
+"""
+終了時のドレイン
+再デプロイでワーカーが止められるとき、接続中のクライアントに再接続を促し、
+処理中のラウンドを終えてから接続を閉じる
+
+uvicornは終了シグナルを受けると、lifespanの終了処理より先にWebSocketを
+すべて切断する。そのためシグナルを先に受け取ってドレインを済ませてから、
+uvicornの終了処理に引き継ぐ。シグナルを横取りできない環境（メインスレッド
+以外・Windows・uvicorn以外のサーバー）ではlifespanの終了処理でドレインする。
+"""
+import asyncio
+import logging
+import signal
+from typing import Awaitable, Callable, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+HANDLED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class GracefulShutdown:
+    """終了シグナルを受けたらドレインを1回だけ実行する.
+
+    Attributes:
+        draining: ドレインを開始したか
+    """
+
+    def __init__(self) -> None:
+        """未登録の状態で作る."""
+        self.draining = False
+        self._drain: Optional[Callable[[], Awaitable[None]]] = None
+        self._drain_task: Optional[asyncio.Future] = None
+        self._signal_task: Optional[asyncio.Task] = None
+
+    def install(self, drain: Callable[[], Awaitable[None]]) -> None:
+        """ドレインを登録し、終了シグナルをサーバーより先に受け取る.
+
+        Args:
+            drain: ドレインを実行するコルーチン関数
+        """
+        self._drain = drain
+        server = _find_server()
+        if server is None:
+            return
+        loop = asyncio.get_running_loop()
+        for sig in HANDLED_SIGNALS:
+            try:
+                loop.add_signal_handler(sig, self._on_signal, sig, server)
+            except (NotImplementedError, RuntimeError, ValueError):
+                return
+
+    def _on_signal(self, sig: int, server: uvicorn.Server) -> None:
+        """ドレインを始め、終わったらサーバーの終了処理を呼ぶ（2回目は即座に呼ぶ）."""
+        if self._signal_task is not None:
+            server.handle_exit(sig, None)
+            return
+        logger.info(f"Received {signal.Signals(sig).name}, draining sessions before shutdown")
+        self._signal_task = asyncio.create_task(
+            self._drain_then(sig, server), name="graceful-shutdown"
+        )
+
+    async def _drain_then(self, sig: int, server: uvicorn.Server) -> None:
+        """ドレインの完了を待ってからサーバーの終了処理を呼ぶ.
+
+        ドレインの失敗はここでは送出せず、lifespanの終了処理の drain() から送出する。
+        """
+        drain_task = self._start_drain()
+        try:
+            if drain_task is not None:
+                await asyncio.wait([drain_task])
+        finally:
+            server.handle_exit(sig, None)
+
+    def _start_drain(self) -> Optional[asyncio.Future]:
+        """ドレインを1回だけ開始する.
+
+        Returns:
+            Optional[asyncio.Future]: 実行中・実行済みのドレイン（未登録ならNone）
+        """
+        if self._drain is None:
+            return None
+        if self._drain_task is None:
+            self.draining = True
+            self._drain_task = asyncio.ensure_future(self._drain())
+        return self._drain_task
+
+    async def drain(self) -> None:
+        """ドレインを実行する（実行済み・実行中なら完了を待つだけ）.
+
+        Raises:
+            Exception: ドレインが失敗した場合（lifespanの終了処理を失敗させる）
+        """
+        drain_task = self._start_drain()
+        if drain_task is not None:
+            await asyncio.shield(drain_task)
+
+def _find_server() -> Optional[uvicorn.Server]:
+    """実行中のuvicornのサーバーを探す.
+
+    uvicorn（gunicornのUvicornWorkerを含む）はサーバーの serve() を待つタスクの中で
+    lifespanを起動するので、実行中のタスクの待ち合わせを辿ってサーバーを見つける。
+
+    Returns:
+        Optional[uvicorn.Server]: 見つからなければNone
+    """
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        while coro is not None:
+            frame = getattr(coro, "cr_frame", None)
+            owner = frame.f_locals.get("self") if frame is not None else None
+            if isinstance(owner, uvicorn.Server):
+                return owner
+            coro = getattr(coro, "cr_await", None)
+    return None
+
+
+graceful_shutdown = GracefulShutdown()
@@ -4,14 +4,22 @@ M&Aアドバイザーの隣にいる、最高の相棒
 """
 import logging
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
-from .api import mna_session, mna_project
+from .api import mna_admin, mna_session, mna_project
 from .core import settings
+from .core.metrics import exporter, registry
+from .core.shutdown import graceful_shutdown
+from .services.audio_ingest import stt_adapter
+from .services.broadcast_bus import broadcast_bus
+from .services.job_queue import job_queue, job_runner
+from .services.runtime_monitor import current_rss_bytes, loop_monitor
+from .services.session_store import session_store
 
 # ロギング設定
 logging.basicConfig(
@@ -26,10 +34,38 @@ if settings.ANTHROPIC_API_KEY:
 else:
     logger.error("ANTHROPIC_API_KEY is NOT set!")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時にセッションを復元して定期見直しを開始し、終了時にセッションを片付けて止める."""
+    await mna_session.restore_sessions(await session_store.recover())
+    mna_session.lifecycle.start()
+    loop_monitor.start()
+    exporter.start()
+    job_runner.start()
+    graceful_shutdown.install(
+        lambda: mna_session.ws_manager.drain(settings.SHUTDOWN_DRAIN_TIMEOUT)
+    )
+    yield
+    try:
+        # シグナルで実行済みなら完了を待つだけ（失敗は残りを止めてからlifespanの失敗として送出する）
+        await graceful_shutdown.drain()
+    finally:
+        # 実行中のジョブはキューに戻し、次に起動したワーカーが続きから実行する
+        await job_runner.stop()
+        await job_queue.close()
+        await exporter.stop()
+        await loop_monitor.stop()
+        await mna_session.lifecycle.stop()
+        await broadcast_bus.close()
+        await session_store.close()
+
+
 app = FastAPI(
     title="TONARI for M&A API",
     description="M&Aアドバイザーの隣にいる、最高の相棒。水野メソッドでヒアリングを支援し、IM作成を自動化。",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS設定（本番ではFRONTEND_URL環境変数で制限推奨）
@@ -47,6 +83,7 @@ app.add_middleware(
 # TONARI for M&A ルーター
 app.include_router(mna_session.router)
 app.include_router(mna_project.router)
+app.include_router(mna_admin.router)
 
 
 @app.get("/")
@@ -62,13 +99,38 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """ヘルスチェック."""
+    """ヘルスチェック（終了処理中は503を返し、ロードバランサーの振り分けから外す）."""
+    if graceful_shutdown.draining:
+        return JSONResponse(status_code=503, content={"status": "draining"})
     return {"status": "healthy"}
 
 
+registry.gauge(
+    "tonari_event_loop_lag_max_seconds",
+    "Largest recent event loop lag",
+    lambda: loop_monitor.report()["window_max_ms"] / 1000,
+    aggregate="max",
+)
+registry.gauge(
+    "tonari_process_resident_memory_bytes",
+    "Worker resident memory",
+    current_rss_bytes,
+)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """全ワーカーのメトリクスをPrometheusのテキスト形式で返す."""
+    return PlainTextResponse(await exporter.collect(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/config")
 async def get_config():
     """設定情報を返す（認証必須に変更推奨）."""
+    if stt_adapter is not None:
+        # サーバー側で文字起こしする場合、ブラウザにキーを渡さない
+        return {"deepgram_api_key": "", "server_audio": True}
     return {
         "deepgram_api_key": settings.DEEPGRAM_API_KEY,
+        "server_audio": False,
     }
@@ -4,8 +4,9 @@ M&Aヒアリング情報抽出・分析のためのデータモデル
 """
 from datetime import datetime
 from enum import Enum
-from typing import Optional
-from pydantic import BaseModel, Field
+from types import MappingProxyType
+from typing import Annotated, Iterator, Literal, Mapping, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ExtractionCategory(str, Enum):
@@ -83,6 +84,7 @@ class ExtractionField(BaseModel):
     confidence: float = 0.0
     source_utterance_id: Optional[str] = None
     layer: InfoLayer = InfoLayer.SURFACE
+    provisional: bool = False  # 発話からルールで取り出した仮の値（抽出ラウンドで確定・上書きする）
 
 
 class ExtractionResult(BaseModel):
@@ -155,6 +157,145 @@ IM_EXTRACTION_FIELDS: dict[ExtractionCategory, list[dict]] = {
     ],
 }
 
+# 情報の層の順（表層→構造→本質→出口）。未取得項目の優先度に使う
+LAYER_ORDER: dict[InfoLayer, int] = {
+    InfoLayer.SURFACE: 0,
+    InfoLayer.STRUCTURE: 1,
+    InfoLayer.ESSENCE: 2,
+    InfoLayer.EXIT: 3,
+}
+
+
+class FieldDefinition(BaseModel):
+    """IM抽出項目の定義（FieldRegistry が作る。変更不可）."""
+
+    model_config = ConfigDict(frozen=True)
+
+    key: str  # category.field 形式
+    category: ExtractionCategory
+    field: str
+    label: str
+    layer: InfoLayer
+    index: int  # IM_EXTRACTION_FIELDS 上の順番
+
+
+class FieldRegistry:
+    """IM抽出項目の索引.
+
+    IM_EXTRACTION_FIELDS から起動時に1度だけ作り、キー・カテゴリ・層での
+    引き当てと、層の優先順の並びを前もって持っておく（抽出のたびに
+    全項目をなめたり category.field のキーを組み立て直したりしないため）。
+
+    Attributes:
+        definitions: 全項目の定義（IM_EXTRACTION_FIELDS の順）
+        keys: 全項目のキー（IM_EXTRACTION_FIELDS の順）
+        by_category: カテゴリ → 項目の定義
+        by_layer: 層 → 項目の定義
+    """
+
+    __slots__ = ("definitions", "keys", "by_category", "by_layer", "_by_key", "_by_pair", "_ordered")
+
+    def __init__(self, fields: Mapping[ExtractionCategory, list[dict]]) -> None:
+        """項目の定義から索引を作る.
+
+        Args:
+            fields: カテゴリ → 項目の定義（field / label / layer）
+
+        Raises:
+            ValueError: キーが重複している場合
+        """
+        definitions: list[FieldDefinition] = []
+        for category in ExtractionCategory:
+            for field_def in fields.get(category, []):
+                definitions.append(
+                    FieldDefinition(
+                        key=f"{category.value}.{field_def['field']}",
+                        category=category,
+                        field=field_def["field"],
+                        label=field_def["label"],
+                        layer=field_def.get("layer", InfoLayer.SURFACE),
+                        index=len(definitions),
+                    )
+                )
+
+        self.definitions: tuple[FieldDefinition, ...] = tuple(definitions)
+        self.keys: tuple[str, ...] = tuple(d.key for d in definitions)
+        if len(set(self.keys)) != len(self.keys):
+            raise ValueError("Duplicate field keys in IM_EXTRACTION_FIELDS")
+        self._by_key: Mapping[str, FieldDefinition] = MappingProxyType({d.key: d for d in definitions})
+        self._by_pair: Mapping[tuple[str, str], FieldDefinition] = MappingProxyType(
+            {(d.category.value, d.field): d for d in definitions}
+        )
+        self.by_category: Mapping[ExtractionCategory, tuple[FieldDefinition, ...]] = MappingProxyType(
+            {c: tuple(d for d in definitions if d.category == c) for c in ExtractionCategory}
+        )
+        self.by_layer: Mapping[InfoLayer, tuple[FieldDefinition, ...]] = MappingProxyType(
+            {layer: tuple(d for d in definitions if d.layer == layer) for layer in InfoLayer}
+        )
+
+        # 層の優先順の並び（None: 表層→構造→本質→出口 / 層: その層を先頭に）
+        ordered = sorted(definitions, key=lambda d: (LAYER_ORDER[d.layer], d.index))
+        self._ordered: Mapping[Optional[InfoLayer], tuple[FieldDefinition, ...]] = MappingProxyType(
+            {
+                None: tuple(ordered),
+                **{
+                    layer: tuple(sorted(ordered, key=lambda d: d.layer != layer))
+                    for layer in InfoLayer
+                },
+            }
+        )
+
+    def __len__(self) -> int:
+        """項目数を返す."""
+        return len(self.definitions)
+
+    def __iter__(self) -> Iterator[FieldDefinition]:
+        """項目の定義を IM_EXTRACTION_FIELDS の順に返す."""
+        return iter(self.definitions)
+
+    def __contains__(self, key: object) -> bool:
+        """キー（category.field）が定義されているかを返す."""
+        return key in self._by_key
+
+    def get(self, key: str) -> Optional[FieldDefinition]:
+        """キーから項目の定義を引く.
+
+        Args:
+            key: category.field 形式のキー
+
+        Returns:
+            Optional[FieldDefinition]: 項目の定義（未定義ならNone）
+        """
+        return self._by_key.get(key)
+
+    def lookup(self, category: str, field: str) -> Optional[FieldDefinition]:
+        """カテゴリとフィールド名から項目の定義を引く.
+
+        Args:
+            category: カテゴリ（ExtractionCategory またはその値）
+            field: フィールド名
+
+        Returns:
+            Optional[FieldDefinition]: 項目の定義（未定義ならNone）
+        """
+        if isinstance(category, ExtractionCategory):
+            category = category.value
+        return self._by_pair.get((category, field))
+
+    def ordered(self, priority_layer: Optional[InfoLayer] = None) -> tuple[FieldDefinition, ...]:
+        """層の優先順に並べた項目の定義を返す.
+
+        Args:
+            priority_layer: 最優先にする層（None なら表層→構造→本質→出口）
+
+        Returns:
+            tuple[FieldDefinition, ...]: 項目の定義（同じ層の中は IM_EXTRACTION_FIELDS の順）
+        """
+        return self._ordered[priority_layer]
+
+
+FIELD_REGISTRY = FieldRegistry(IM_EXTRACTION_FIELDS)
+
 
 # ========================
 # 分析関連
@@ -344,15 +485,20 @@ class WSMessageType(str, Enum):
     DISMISS_SUGGESTION = "dismiss_suggestion"
     USE_SUGGESTION = "use_suggestion"
     UPDATE_EXTRACTION = "update_extraction"
+    AUDIO_STOP = "audio_stop"  # 録音の停止（音声はバイナリフレームで送る）
 
     # サーバー → クライアント
     TRANSCRIPT = "transcript"
+    TRANSCRIPT_DELTA = "transcript_delta"  # 発話中のinterimの差分
     EXTRACTION_UPDATE = "extraction_update"
     ANALYSIS_UPDATE = "analysis_update"
     SUGGESTION = "suggestion"
+    ROUND_UPDATE = "round_update"  # 1ラウンドの抽出更新・サジェスト・進捗をまとめたもの
+    PROGRESS_UPDATE = "progress_update"  # 抽出の進捗の差分（変わったカテゴリ・層と未取得の先頭）
     REFRAMING = "reframing"
     ERROR = "error"
     SESSION_STATUS = "session_status"
+    RESUME = "resume"  # 接続直後のストリーム情報（再接続時は再送方法とスナップショット）
 
 
 class WSMessage(BaseModel):
@@ -361,3 +507,65 @@ class WSMessage(BaseModel):
     type: WSMessageType
     data: dict
     timestamp: datetime = Field(default_factory=datetime.now)
+
+
+# クライアント → サーバーのメッセージ（受信時に型と大きさを検証する）
+# 文字起こし1件の上限は、話し続けた1分ほどの発話が収まる長さ
+
+
+class WSInboundTranscript(BaseModel):
+    """文字起こし結果."""
+
+    type: Literal["transcript"]
+    text: str = Field(max_length=2000)
+    speaker: Literal["user", "customer"] = "customer"
+    is_final: bool = False
+
+
+class WSInboundPinUtterance(BaseModel):
+    """発話のピン留め."""
+
+    type: Literal["pin_utterance"]
+    utterance_id: str = Field(max_length=64)
+    note: str = Field(default="", max_length=500)
+
+
+class WSInboundSuggestionAction(BaseModel):
+    """サジェストの使用・非表示."""
+
+    type: Literal["dismiss_suggestion", "use_suggestion"]
+    suggestion_id: str = Field(max_length=64)
+
+
+class WSInboundUpdateExtraction(BaseModel):
+    """抽出情報の手動更新."""
+
+    type: Literal["update_extraction"]
+    field_key: str = Field(max_length=100)
+    value: str = Field(max_length=1000)
+
+
+class WSInboundSetLayer(BaseModel):
+    """現在のレイヤーの設定."""
+
+    type: Literal["set_layer"]
+    layer: InfoLayer
+
+
+class WSInboundControl(BaseModel):
+    """本文のない制御メッセージ."""
+
+    type: Literal["heartbeat", "audio_stop"]
+
+
+WSInboundMessage = Annotated[
+    Union[
+        WSInboundTranscript,
+        WSInboundPinUtterance,
+        WSInboundSuggestionAction,
+        WSInboundUpdateExtraction,
+        WSInboundSetLayer,
+        WSInboundControl,
+    ],
+    Field(discriminator="type"),
+]
@@ -7,8 +7,12 @@ import logging
 from typing import Any, Dict, List, Optional
 from anthropic import AsyncAnthropic
 
+from ..core.metrics import ClaudeMetrics
+
 logger = logging.getLogger(__name__)
 
+_claude_metrics = ClaudeMetrics("agent")
+
 
 # 面接官支援特化システムプロンプト（チェックリスト検知モード）
 INTERVIEW_SYSTEM_PROMPT = """あなたは面接官の「隣にいる相棒」。
@@ -271,19 +275,23 @@ class InterviewAgent:
                 logger.info(f"Transcript content: {transcript[:500]}")
                 # ツールがない場合はツールなしで呼び出し
                 if tools:
-                    response = await self.client.messages.create(
-                        model="claude-sonnet-4-20250514",
-                        max_tokens=500,
-                        system=system,
-                        messages=messages,
-                        tools=tools
+                    response = await _claude_metrics.call(
+                        self.client.messages.create(
+                            model="claude-sonnet-4-20250514",
+                            max_tokens=500,
+                            system=system,
+                            messages=messages,
+                            tools=tools
+                        )
                     )
                 else:
-                    response = await self.client.messages.create(
-                        model="claude-sonnet-4-20250514",
-                        max_tokens=500,
-                        system=system,
-                        messages=messages
+                    response = await _claude_metrics.call(
+                        self.client.messages.create(
+                            model="claude-sonnet-4-20250514",
+                            max_tokens=500,
+                            system=system,
+                            messages=messages
+                        )
                     )
                 logger.info(f"Claude API response: stop_reason={response.stop_reason}")
             except Exception as e:
@@ -0,0 +1,507 @@
+"""
+TONARI for M&A - サーバー側の音声取り込み
+ブラウザからセッションのWebSocketにバイナリフレームで届いた音声を
+ストリーミング音声認識（STT）に流し、文字起こしをサーバー内で受け取る
+
+- 受信ループは音声をセッションごとのリングバッファに書き込むだけで、STTへの
+  送信は送信タスクが行う（STTが詰まっても受信ループは止まらない）
+- リングバッファは確保済みの領域に1回コピーするだけで、STTへはその領域の
+  memoryviewをそのまま渡す
+- STTの接続が切れたら、バッファに残った音声を捨てずに再接続して送り直す
+- STTはアダプタとして差し替えられる（Deepgram / テスト用のローカル実装）
+"""
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlencode
+
+from websockets.exceptions import ConnectionClosedOK, WebSocketException
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (text, speaker, is_final) を受け取るコルーチン関数
+TranscriptFn = Callable[[str, str, bool], Awaitable[None]]
+
+DEEPGRAM_WS_URL = "wss://api.deepgram.com/v1/listen"
+
+
+class SttError(Exception):
+    """STTの接続が使えなくなった."""
+
+
+class AudioRingBuffer:
+    """確保済みの領域を使い回す音声のリングバッファ.
+
+    書き込み側は空いている領域にだけ書くため、peekで渡した領域は
+    consumeするまで上書きされない。
+
+    Attributes:
+        capacity: 容量（バイト）
+        written_bytes: 書き込んだバイト数の累計
+        dropped_bytes: 空きが足りず捨てたバイト数の累計
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """バッファを確保する.
+
+        Args:
+            capacity: 容量（バイト）
+        """
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._size = 0
+        self.written_bytes = 0
+        self.dropped_bytes = 0
+
+    def __len__(self) -> int:
+        """未送信のバイト数を返す."""
+        return self._size
+
+    def write(self, data: bytes) -> bool:
+        """フレームを書き込む.
+
+        フレームの途中で切ると音声のコンテナが壊れるため、空きが足りなければ
+        フレームごと捨てる。
+
+        Args:
+            data: 音声のフレーム
+
+        Returns:
+            bool: 書き込めたらTrue
+        """
+        size = len(data)
+        if size > self.capacity - self._size:
+            self.dropped_bytes += size
+            return False
+        end = (self._start + self._size) % self.capacity
+        first = min(size, self.capacity - end)
+        source = memoryview(data)
+        self._view[end : end + first] = source[:first]
+        if first < size:
+            self._view[: size - first] = source[first:]
+        self._size += size
+        self.written_bytes += size
+        return True
+
+    def peek(self, limit: int) -> memoryview:
+        """先頭から連続した未送信の領域を返す（コピーしない）.
+
+        Args:
+            limit: 最大バイト数
+
+        Returns:
+            memoryview: 未送信の領域（末尾で折り返す場合は折り返しの手前まで）
+        """
+        size = min(self._size, self.capacity - self._start, limit)
+        return self._view[self._start : self._start + size]
+
+    def consume(self, size: int) -> None:
+        """送信済みの領域を解放する.
+
+        Args:
+            size: 解放するバイト数
+        """
+        self._size -= size
+        self._start = 0 if self._size == 0 else (self._start + size) % self.capacity
+
+
+class SttStream(ABC):
+    """1本のストリーミング認識の接続（アダプタのconnectで作る）."""
+
+    @abstractmethod
+    async def send(self, chunk: memoryview) -> None:
+        """音声を送る.
+
+        送信後に呼び出し側がchunkの領域を再利用するため、戻るまでに
+        内容をコピーまたは送信し終えること。
+
+        Args:
+            chunk: 音声
+
+        Raises:
+            SttError: 接続が切れている場合
+        """
+
+    @abstractmethod
+    async def finish(self) -> None:
+        """送った音声の結果を出し切ってから接続を閉じる."""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """結果を待たずに接続を閉じる."""
+
+
+class SttAdapter(ABC):
+    """ストリーミング認識サービスのアダプタ."""
+
+    name = "base"
+
+    @abstractmethod
+    async def connect(self, session_id: str, on_transcript: TranscriptFn) -> SttStream:
+        """認識の接続を開く.
+
+        Args:
+            session_id: セッションID
+            on_transcript: 認識結果を受け取るコルーチン関数
+
+        Returns:
+            SttStream: 接続
+        """
+
+
+class DeepgramSttStream(SttStream):
+    """Deepgramのストリーミング認識の接続."""
+
+    # 無音が続くとDeepgramは約10秒で切断するため、送信がなければKeepAliveを送る
+    KEEPALIVE_INTERVAL = 5.0
+    FINISH_TIMEOUT = 5.0
+
+    def __init__(self, websocket, on_transcript: TranscriptFn) -> None:
+        """受信タスクとKeepAliveタスクを開始する.
+
+        Args:
+            websocket: Deepgramへの接続
+            on_transcript: 認識結果を受け取るコルーチン関数
+        """
+        self.websocket = websocket
+        self.on_transcript = on_transcript
+        self._error: Optional[BaseException] = None
+        self._last_sent_at = time.monotonic()
+        self._receiver = asyncio.create_task(self._receive(), name="deepgram-receive")
+        self._keepalive = asyncio.create_task(self._send_keepalive(), name="deepgram-keepalive")
+
+    async def send(self, chunk: memoryview) -> None:
+        """音声を送る（クライアントのフレームはマスク時にコピーされる）."""
+        if self._error is not None:
+            raise SttError(f"Deepgram stream closed: {self._error!r}")
+        try:
+            await self.websocket.send(chunk)
+        except (WebSocketException, OSError) as e:
+            self._error = e
+            raise SttError(f"Deepgram send failed: {e!r}") from e
+        self._last_sent_at = time.monotonic()
+
+    async def finish(self) -> None:
+        """CloseStreamを送り、残りの結果を受け取ってから閉じる."""
+        self._keepalive.cancel()
+        try:
+            await self.websocket.send(json.dumps({"type": "CloseStream"}))
+            await asyncio.wait_for(asyncio.shield(self._receiver), self.FINISH_TIMEOUT)
+        except (WebSocketException, OSError, asyncio.TimeoutError) as e:
+            logger.info(f"Deepgram stream did not finish cleanly: {e!r}")
+        await self.close()
+
+    async def close(self) -> None:
+        """接続を閉じる."""
+        self._keepalive.cancel()
+        self._receiver.cancel()
+        try:
+            await self.websocket.close()
+        except (WebSocketException, OSError) as e:
+            self._error = self._error or e
+            logger.warning(f"Deepgram stream close failed: {e!r}")
+
+    async def _receive(self) -> None:
+        """認識結果を受け取って渡す（受け取り側の例外は接続の失敗として扱わない）."""
+        while True:
+            try:
+                data = json.loads(await self.websocket.recv())
+            except ConnectionClosedOK:
+                self._error = SttError("closed by Deepgram")
+                return
+            except (WebSocketException, OSError, ValueError) as e:
+                self._error = e
+                logger.warning(f"Deepgram stream receive failed: {e!r}")
+                return
+            if data.get("type") != "Results":
+                continue
+            alternatives = data.get("channel", {}).get("alternatives") or [{}]
+            text = alternatives[0].get("transcript", "")
+            if not text:
+                continue
+            words = alternatives[0].get("words") or [{}]
+            # ブラウザでの文字起こしと同じく、話者0をアドバイザーとみなす
+            speaker = "user" if words[0].get("speaker") == 0 else "customer"
+            await self.on_transcript(text, speaker, bool(data.get("is_final")))
+
+    async def _send_keepalive(self) -> None:
+        """音声の送信が途切れている間、接続を維持する."""
+        while True:
+            await asyncio.sleep(self.KEEPALIVE_INTERVAL)
+            if time.monotonic() - self._last_sent_at < self.KEEPALIVE_INTERVAL:
+                continue
+            try:
+                await self.websocket.send(json.dumps({"type": "KeepAlive"}))
+            except (WebSocketException, OSError) as e:
+                self._error = e
+                logger.warning(f"Deepgram keepalive failed: {e!r}")
+                return
+
+
+class DeepgramSttAdapter(SttAdapter):
+    """Deepgramのストリーミング認識（ブラウザから送っていたときと同じパラメータ）.
+
+    Attributes:
+        api_key: DeepgramのAPIキー
+        language: 認識する言語
+    """
+
+    name = "deepgram"
+
+    def __init__(self, api_key: str, language: str) -> None:
+        """アダプタを初期化する.
+
+        Args:
+            api_key: DeepgramのAPIキー
+            language: 認識する言語
+        """
+        self.api_key = api_key
+        self.language = language
+
+    async def connect(self, session_id: str, on_transcript: TranscriptFn) -> SttStream:
+        """Deepgramに接続する."""
+        import websockets
+
+        params = urlencode(
+            {
+                "model": "nova-2",
+                "language": self.language,
+                "punctuate": "true",
+                "interim_results": "true",
+                "utterance_end_ms": "1000",
+                "vad_events": "true",
+                "smart_format": "true",
+                "diarize": "true",
+            }
+        )
+        websocket = await websockets.connect(
+            f"{DEEPGRAM_WS_URL}?{params}",
+            extra_headers={"Authorization": f"Token {self.api_key}"},
+        )
+        return DeepgramSttStream(websocket, on_transcript)
+
+
+class LocalSttStream(SttStream):
+    """音声の代わりにUTF-8のテキストを受け取る決定的な認識の接続.
+
+    改行までを確定した発話、改行前の途中までをinterimとして返す。
+    行頭に "user:" / "customer:" を付けると話者を指定できる（省略時は customer）。
+    """
+
+    def __init__(self, on_transcript: TranscriptFn) -> None:
+        """接続を初期化する.
+
+        Args:
+            on_transcript: 認識結果を受け取るコルーチン関数
+        """
+        self.on_transcript = on_transcript
+        self._pending = bytearray()
+        self._closed = False
+
+    async def send(self, chunk: memoryview) -> None:
+        """受け取った分を認識結果にする."""
+        if self._closed:
+            raise SttError("Local stream closed")
+        self._pending += chunk
+        while (end := self._pending.find(b"\n")) >= 0:
+            line = bytes(self._pending[:end])
+            del self._pending[: end + 1]
+            await self._emit(line, is_final=True)
+        if self._pending:
+            await self._emit(bytes(self._pending), is_final=False)
+
+    async def finish(self) -> None:
+        """改行のない残りを確定した発話にする."""
+        if self._pending and not self._closed:
+            await self._emit(bytes(self._pending), is_final=True)
+        await self.close()
+
+    async def close(self) -> None:
+        """接続を閉じる."""
+        self._pending.clear()
+        self._closed = True
+
+    async def _emit(self, line: bytes, is_final: bool) -> None:
+        """1行を話者とテキストに分けて渡す."""
+        text = line.decode("utf-8", errors="ignore").strip()
+        speaker = "customer"
+        head, sep, rest = text.partition(":")
+        if sep and head in ("user", "customer"):
+            speaker, text = head, rest.strip()
+        if text:
+            await self.on_transcript(text, speaker, is_final)
+
+
+class LocalSttAdapter(SttAdapter):
+    """テスト・ローカル確認用の認識（外部サービスに接続しない）."""
+
+    name = "local"
+
+    async def connect(self, session_id: str, on_transcript: TranscriptFn) -> SttStream:
+        """ローカルの接続を作る."""
+        return LocalSttStream(on_transcript)
+
+
+class AudioPipeline:
+    """1セッションの音声のリングバッファとSTTへの送信タスク.
+
+    Attributes:
+        session_id: セッションID
+        adapter: STTアダプタ
+        buffer: 未送信の音声
+        reconnects: STTに再接続した回数
+        sent_bytes: STTに送ったバイト数
+    """
+
+    CHUNK_BYTES = 16 * 1024
+    RECONNECT_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 10.0
+
+    def __init__(
+        self,
+        session_id: str,
+        adapter: SttAdapter,
+        on_transcript: TranscriptFn,
+        buffer_bytes: int,
+    ) -> None:
+        """パイプラインを初期化する（送信タスクはstartで開始する）.
+
+        Args:
+            session_id: セッションID
+            adapter: STTアダプタ
+            on_transcript: 認識結果を受け取るコルーチン関数
+            buffer_bytes: リングバッファの容量（バイト）
+        """
+        self.session_id = session_id
+        self.adapter = adapter
+        self.on_transcript = on_transcript
+        self.buffer = AudioRingBuffer(buffer_bytes)
+        self.reconnects = 0
+        self.sent_bytes = 0
+        # MediaRecorderの最初のフレームはコンテナのヘッダーで、再接続時に先頭へ送り直す
+        self._header: Optional[bytes] = None
+        self._stream: Optional[SttStream] = None
+        self._ready = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """送信タスクを開始する."""
+        self._task = asyncio.create_task(self._run(), name=f"audio-{self.session_id}")
+
+    def feed(self, data: bytes) -> None:
+        """受信した音声のフレームをバッファに積む（待たない）.
+
+        Args:
+            data: 音声のフレーム
+        """
+        if self._stopping:
+            return
+        if self._header is None:
+            self._header = bytes(data)
+        if not self.buffer.write(data):
+            logger.warning(f"Audio buffer full, dropped {len(data)} bytes: {self.session_id}")
+            return
+        self._ready.set()
+
+    async def stop(self) -> None:
+        """バッファに残った音声を送り切り、STTの結果を出し切ってから止める."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._ready.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        """バッファの音声を古い順にSTTへ送る."""
+        delay = self.RECONNECT_DELAY
+        while True:
+            if not self.buffer:
+                if self._stopping:
+                    break
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            if self._stream is None:
+                try:
+                    await self._connect()
+                except Exception as e:
+                    if self._stopping:
+                        logger.warning(f"STT unavailable, discarding audio: {self.session_id}: {e!r}")
+                        return
+                    logger.warning(f"STT connect failed, retrying in {delay}s: {e!r}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+                    continue
+
+            chunk = self.buffer.peek(self.CHUNK_BYTES)
+            try:
+                await self._stream.send(chunk)
+            except Exception as e:
+                # 送れなかった分はバッファに残し、再接続後に送り直す
+                logger.warning(f"STT stream failed, reconnecting: {self.session_id}: {e!r}")
+                await self._stream.close()
+                self._stream = None
+                continue
+            self.buffer.consume(len(chunk))
+            self.sent_bytes += len(chunk)
+            delay = self.RECONNECT_DELAY
+
+        if self._stream is not None:
+            await self._stream.finish()
+            self._stream = None
+
+    async def _connect(self) -> None:
+        """STTに接続する（再接続ならヘッダーを先に送る）."""
+        stream = await self.adapter.connect(self.session_id, self.on_transcript)
+        if self.sent_bytes:
+            self.reconnects += 1
+            if self._header is not None:
+                await stream.send(memoryview(self._header))
+        self._stream = stream
+
+    def to_dict(self) -> dict:
+        """APIレスポンス用の辞書に変換する.
+
+        Returns:
+            dict: 取り込みの計測値
+        """
+        return {
+            "adapter": self.adapter.name,
+            "received_bytes": self.buffer.written_bytes,
+            "sent_bytes": self.sent_bytes,
+            "buffered_bytes": len(self.buffer),
+            "dropped_bytes": self.buffer.dropped_bytes,
+            "reconnects": self.reconnects,
+        }
+
+
+def create_stt_adapter() -> Optional[SttAdapter]:
+    """設定に応じたSTTアダプタを作る.
+
+    Returns:
+        Optional[SttAdapter]: アダプタ（サーバー側で取り込まない場合はNone）
+    """
+    provider = settings.STT_PROVIDER.lower()
+    if provider == "local":
+        return LocalSttAdapter()
+    if provider == "deepgram":
+        if not settings.DEEPGRAM_API_KEY:
+            logger.warning("STT_PROVIDER=deepgram but DEEPGRAM_API_KEY is not set, audio ingest disabled")
+            return None
+        return DeepgramSttAdapter(settings.DEEPGRAM_API_KEY, settings.STT_LANGUAGE)
+    if provider:
+        logger.warning(f"Unknown STT_PROVIDER {provider!r}, audio ingest disabled")
+    return None
+
+
+stt_adapter = create_stt_adapter()
@@ -0,0 +1,334 @@
+"""
+TONARI for M&A - セッションチャンネルのブロードキャストバス
+別々のワーカーに接続した画面（アドバイザーのPCと同席者のモニターなど）に
+同じメッセージを届ける
+
+- InProcessBroadcastBus: 単一プロセス用（ローカル配信のみ）
+- RespBroadcastBus: Redisプロトコルの PUBLISH / SUBSCRIBE で他ワーカーへ中継
+
+メッセージは送信元で1回だけJSONにシリアライズし、各ワーカーはその文字列を
+自分が持つ接続へそのまま配る。中継の接続がない間は自ワーカーの接続への配信だけを
+続け、他ワーカーへの中継は再接続後に再開する（届かなかった分は再送で補う）。
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+from ..core.config import settings
+from ..core.metrics import registry
+from .session_store import RespClient, encode_command, read_reply
+
+logger = logging.getLogger(__name__)
+
+_bus_errors = registry.counter(
+    "tonari_broadcast_bus_errors_total",
+    "Broadcast bus failures (publish: relay skipped or failed / deliver: a relayed message failed "
+    "/ subscriber: relay task died and was restarted / connect: subscribe fell back to local delivery)",
+    ("stage",),
+)
+_publish_errors = _bus_errors.labels("publish")
+_deliver_errors = _bus_errors.labels("deliver")
+_subscriber_errors = _bus_errors.labels("subscriber")
+_connect_timeouts = _bus_errors.labels("connect")
+
+# (session_id, message_json, coalesce_key) を受け取るローカル配信関数
+DeliverFn = Callable[[str, str, Optional[str]], Awaitable[None]]
+# (session_id, message_json) を受け取る他ワーカー発メッセージの処理関数
+RemoteFn = Callable[[str, str], Awaitable[None]]
+
+
+class BroadcastBus(ABC):
+    """ブロードキャストバスの基底クラス.
+
+    Attributes:
+        deliver: 自ワーカーの接続へ配信する関数
+        on_remote: 他ワーカーから届いたメッセージを受け取る関数（状態同期用）
+        relays_remote: 他ワーカー発のメッセージを購読中のセッションにだけ届けるか
+            （Trueなら購読していない間のメッセージはこのワーカーに届かない）
+    """
+
+    relays_remote = False
+
+    def __init__(self) -> None:
+        """バスを初期化する."""
+        self.deliver: Optional[DeliverFn] = None
+        self.on_remote: Optional[RemoteFn] = None
+
+    def bind(self, deliver: DeliverFn, on_remote: Optional[RemoteFn] = None) -> None:
+        """ローカル配信関数を登録する.
+
+        Args:
+            deliver: 自ワーカーの接続へ配信する関数
+            on_remote: 他ワーカー発のメッセージを受け取る関数
+        """
+        self.deliver = deliver
+        self.on_remote = on_remote
+
+    @abstractmethod
+    async def publish(
+        self,
+        session_id: str,
+        message_json: str,
+        coalesce_key: Optional[str] = None,
+    ) -> None:
+        """セッションチャンネルにメッセージを送る.
+
+        Args:
+            session_id: セッションID
+            message_json: シリアライズ済みのメッセージ
+            coalesce_key: 未送信なら新しいもので置き換えてよいメッセージの合流キー
+        """
+
+    @abstractmethod
+    async def subscribe(self, session_id: str) -> None:
+        """セッションチャンネルの購読を始める（自ワーカーに接続ができたとき）.
+
+        Args:
+            session_id: セッションID
+        """
+
+    @abstractmethod
+    async def unsubscribe(self, session_id: str) -> None:
+        """セッションチャンネルの購読をやめる（自ワーカーの接続がなくなったとき）.
+
+        Args:
+            session_id: セッションID
+        """
+
+    async def close(self) -> None:
+        """バスを閉じる."""
+
+
+class InProcessBroadcastBus(BroadcastBus):
+    """プロセス内だけで配信するバス."""
+
+    async def publish(
+        self,
+        session_id: str,
+        message_json: str,
+        coalesce_key: Optional[str] = None,
+    ) -> None:
+        """自ワーカーの接続へ配信する."""
+        await self.deliver(session_id, message_json, coalesce_key)
+
+    async def subscribe(self, session_id: str) -> None:
+        """プロセス内では購読管理は不要."""
+
+    async def unsubscribe(self, session_id: str) -> None:
+        """プロセス内では購読管理は不要."""
+
+
+class RespBroadcastBus(BroadcastBus):
+    """Redisプロトコルの PUBLISH / SUBSCRIBE で他ワーカーへ中継するバス.
+
+    自ワーカーの接続には PUBLISH を待たずに直接配信し、購読で戻ってくる
+    自分発のメッセージは送信元IDで読み飛ばす。購読はこのワーカーが接続を
+    持つセッションのチャンネルだけに限る。
+
+    Attributes:
+        client: PUBLISH用のRESPクライアント
+        prefix: チャンネル名の接頭辞
+        connect_timeout: 購読の開始時に中継の接続を待つ上限（秒）
+        instance_id: このワーカーの送信元ID
+        channels: 購読中のセッションID
+    """
+
+    relays_remote = True
+
+    def __init__(
+        self,
+        client: RespClient,
+        prefix: str = "tonari",
+        connect_timeout: float = 3.0,
+    ) -> None:
+        """バスを初期化する.
+
+        Args:
+            client: PUBLISH用のRESPクライアント（購読用の接続は別に張る）
+            prefix: チャンネル名の接頭辞
+            connect_timeout: 購読の開始時に中継の接続を待つ上限（秒）
+        """
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.connect_timeout = connect_timeout
+        self.instance_id = uuid4().hex[:12]
+        self.channels: set[str] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._closed = False
+
+    def _channel(self, session_id: str) -> str:
+        """セッションのチャンネル名を作る."""
+        return f"{self.prefix}:channel:{session_id}"
+
+    async def publish(
+        self,
+        session_id: str,
+        message_json: str,
+        coalesce_key: Optional[str] = None,
+    ) -> None:
+        """自ワーカーへ配信し、他ワーカーへ中継する.
+
+        中継するペイロードは "送信元ID|合流キー|メッセージ" の形式。
+        中継の接続がない間は自ワーカーへの配信だけを行う。
+        """
+        await self.deliver(session_id, message_json, coalesce_key)
+        if not self._connected.is_set():
+            _publish_errors.inc()
+            return
+        try:
+            await self.client.execute(
+                "PUBLISH",
+                self._channel(session_id),
+                f"{self.instance_id}|{coalesce_key or ''}|{message_json}",
+            )
+        except (ConnectionError, OSError) as e:
+            _publish_errors.inc()
+            logger.warning(f"Broadcast relay failed, delivered on this worker only: {session_id} ({e})")
+
+    async def subscribe(self, session_id: str) -> None:
+        """セッションチャンネルの購読を始める.
+
+        connect_timeout 秒以内に中継の接続が張れなければ、自ワーカーの接続への
+        配信だけで続ける（チャンネルは残し、接続できた時点でまとめて購読する）。
+        """
+        if session_id in self.channels:
+            return
+        self.channels.add(session_id)
+        if self._reader_task is None:
+            self._start_subscriber()
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            _connect_timeouts.inc()
+            logger.error(
+                f"Broadcast bus not connected within {self.connect_timeout}s, "
+                f"serving {session_id} on this worker only until it reconnects"
+            )
+            return
+        await self._send("SUBSCRIBE", self._channel(session_id))
+
+    async def unsubscribe(self, session_id: str) -> None:
+        """セッションチャンネルの購読をやめる."""
+        if session_id not in self.channels:
+            return
+        self.channels.discard(session_id)
+        if self._connected.is_set():
+            await self._send("UNSUBSCRIBE", self._channel(session_id))
+
+    async def close(self) -> None:
+        """購読を止めて接続を閉じる."""
+        self._closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+        await self.client.close()
+
+    async def _send(self, *args: str) -> None:
+        """購読用の接続にコマンドを書き込む（応答は受信タスクが読む）."""
+        self._writer.write(encode_command(args))
+        await self._writer.drain()
+
+    def _start_subscriber(self) -> None:
+        """購読用の接続を維持するタスクを起動する."""
+        self._reader_task = asyncio.create_task(self._run_subscriber(), name="broadcast-bus")
+        self._reader_task.add_done_callback(self._on_subscriber_done)
+
+    def _on_subscriber_done(self, task: asyncio.Task) -> None:
+        """購読のタスクが想定外の例外で終わったら記録して起動し直す."""
+        if task.cancelled() or self._closed:
+            return
+        self._connected.clear()
+        if self._writer is not None:
+            self._writer.close()
+        _subscriber_errors.inc()
+        logger.error("Broadcast bus subscriber died, restarting", exc_info=task.exception())
+        self._start_subscriber()
+
+    async def _run_subscriber(self) -> None:
+        """購読用の接続を維持し、届いたメッセージを配信する.
+
+        切断されたら少し待って張り直し、購読中のチャンネルを再登録する。
+        切断中に流れたメッセージは再接続後の再送（シーケンス番号）で補う。
+        """
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(
+                    self.client.host, self.client.port
+                )
+                if self.client.password:
+                    self._writer.write(encode_command(("AUTH", self.client.password)))
+                if self.channels:
+                    channels = [self._channel(session_id) for session_id in self.channels]
+                    self._writer.write(encode_command(("SUBSCRIBE", *channels)))
+                await self._writer.drain()
+                self._connected.set()
+                await self._read_messages(reader)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                logger.warning(f"Broadcast bus connection lost, reconnecting: {e}")
+            self._connected.clear()
+            if self._writer is not None:
+                self._writer.close()
+            await asyncio.sleep(1.0)
+
+    async def _read_messages(self, reader: asyncio.StreamReader) -> None:
+        """購読用の接続から届くメッセージを読み続ける."""
+        channel_prefix = f"{self.prefix}:channel:"
+        while True:
+            reply = await read_reply(reader)
+            if not isinstance(reply, list) or len(reply) != 3 or reply[0] != "message":
+                continue  # subscribe / unsubscribe の確認応答
+            payload = reply[2].split("|", 2)
+            if len(payload) != 3:
+                _deliver_errors.inc()
+                logger.error(f"Dropping malformed broadcast payload on {reply[1]}")
+                continue
+            origin, coalesce_key, message_json = payload
+            if origin == self.instance_id:
+                continue
+            session_id = reply[1][len(channel_prefix):]
+            # 1件の失敗で中継全体を止めない（配信と状態同期も互いに独立させる）
+            try:
+                await self.deliver(session_id, message_json, coalesce_key or None)
+            except Exception:
+                _deliver_errors.inc()
+                logger.exception(f"Failed to deliver relayed message: {session_id}")
+            if self.on_remote is None:
+                continue
+            try:
+                await self.on_remote(session_id, message_json)
+            except Exception:
+                _deliver_errors.inc()
+                logger.exception(f"Failed to apply relayed message: {session_id}")
+
+
+def create_broadcast_bus(url: str) -> BroadcastBus:
+    """設定URLに応じたブロードキャストバスを作る.
+
+    Args:
+        url: 空文字または memory:// ならプロセス内、redis:// ならRESPのpub/sub
+
+    Returns:
+        BroadcastBus: ブロードキャストバス
+
+    Raises:
+        ValueError: 未対応のスキームの場合
+    """
+    scheme = urlsplit(url).scheme if url else "memory"
+    if scheme == "memory":
+        return InProcessBroadcastBus()
+    if scheme in ("redis", "resp"):
+        return RespBroadcastBus(
+            RespClient.from_url(url), connect_timeout=settings.BROADCAST_BUS_CONNECT_TIMEOUT
+        )
+    raise ValueError(f"Unsupported BROADCAST_BUS_URL scheme: {scheme}")
+
+
+broadcast_bus = create_broadcast_bus(settings.BROADCAST_BUS_URL)
@@ -0,0 +1,290 @@
+"""
+TONARI for M&A - 抽出プロンプトの差分コンテキスト
+抽出のたびに全項目を並べ直す代わりに、変わらない部分と変わる部分を分けて
+入力トークンを抑える
+
+- 固定の前置き（役割・項目の一覧・出力のしかた）は FIELD_REGISTRY から
+  1度だけ作り、system にキャッシュ指定付きで置く（ツール定義と合わせて
+  プロンプトキャッシュから読まれる）
+- 呼び出しごとに変わる部分（取得済みの項目・仮の値・未取得の候補・新しい会話）は user に置く
+  - 取得済みの項目はキーと値の先頭だけ（同じ項目を出し直さないための目印）
+  - 発話からルールで取り出した仮の値は、確かめさせるため値をそのまま載せる
+  - 未取得の項目はキーだけを層の優先順に並べ、予算に収まる分だけ載せる
+"""
+from typing import Optional
+
+from ..models.mna_schemas import (
+    FIELD_REGISTRY,
+    ExtractionCategory,
+    ExtractionField,
+    InfoLayer,
+    Utterance,
+)
+
+CATEGORY_LABELS: dict[ExtractionCategory, str] = {
+    ExtractionCategory.BASIC_INFO: "基本情報",
+    ExtractionCategory.FINANCIAL: "財務情報",
+    ExtractionCategory.BUSINESS: "事業情報",
+    ExtractionCategory.ORGANIZATION: "組織情報",
+    ExtractionCategory.TRANSFER: "譲渡情報",
+}
+
+LAYER_LABELS: dict[InfoLayer, str] = {
+    InfoLayer.SURFACE: "表層",
+    InfoLayer.STRUCTURE: "構造",
+    InfoLayer.ESSENCE: "本質",
+    InfoLayer.EXIT: "出口",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """文字列のトークン数を見積もる.
+
+    日本語は1文字≒1トークン、英数字・記号は4文字≒1トークンとして数える
+    （トークナイザーを呼ばずに毎回の呼び出しで数えるための概算）。
+
+    Args:
+        text: 文字列
+
+    Returns:
+        int: 見積もったトークン数
+    """
+    ascii_chars = sum(1 for char in text if char < "\x80")
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def format_utterances(utterances: list[Utterance]) -> str:
+    """発話を話者ラベル付きの行にする.
+
+    Args:
+        utterances: 発話リスト
+
+    Returns:
+        str: 1発話1行の文字列
+    """
+    lines = []
+    for u in utterances:
+        speaker_label = "アドバイザー" if u.speaker == "user" else "売り手"
+        lines.append(f"[{speaker_label}] {u.text}")
+    return "\n".join(lines)
+
+
+class ExtractionContext:
+    """1回の抽出の user メッセージと、その大きさ.
+
+    Attributes:
+        text: user メッセージ
+        tokens: user メッセージの見積もりトークン数
+        filled: 載せた取得済みの項目数
+        provisional: 載せた仮の値の項目数
+        candidates: 載せた未取得の候補数
+        omitted: 予算に収まらず載せなかった未取得の項目数
+        summary_chars: 取得済みの項目に載せた値の文字数（None ならキーだけ）
+        conversation_tokens: 新しい会話の欄の見積もりトークン数
+    """
+
+    __slots__ = (
+        "text",
+        "tokens",
+        "filled",
+        "provisional",
+        "candidates",
+        "omitted",
+        "summary_chars",
+        "conversation_tokens",
+    )
+
+    def __init__(
+        self,
+        text: str,
+        filled: int,
+        provisional: int,
+        candidates: int,
+        omitted: int,
+        summary_chars: Optional[int],
+        conversation_tokens: int,
+    ) -> None:
+        """user メッセージを包む.
+
+        Args:
+            text: user メッセージ
+            filled: 載せた取得済みの項目数
+            provisional: 載せた仮の値の項目数
+            candidates: 載せた未取得の候補数
+            omitted: 載せなかった未取得の項目数
+            summary_chars: 取得済みの項目に載せた値の文字数
+            conversation_tokens: 新しい会話の欄の見積もりトークン数
+        """
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.filled = filled
+        self.provisional = provisional
+        self.candidates = candidates
+        self.omitted = omitted
+        self.summary_chars = summary_chars
+        self.conversation_tokens = conversation_tokens
+
+
+class ExtractionContextBuilder:
+    """抽出プロンプトの固定の前置きと、呼び出しごとの差分を作る.
+
+    Attributes:
+        budget_tokens: 取得済み・未取得の候補の欄に使うトークン数の上限（会話は含まない）
+        summary_chars: 取得済みの項目に載せる値の先頭の文字数
+        static_prefix: 固定の前置き（system に置く）
+        static_tokens: 固定の前置きの見積もりトークン数
+    """
+
+    def __init__(self, budget_tokens: int, summary_chars: int) -> None:
+        """FIELD_REGISTRY から固定の前置きを作る.
+
+        Args:
+            budget_tokens: 取得済み・未取得の候補の欄に使うトークン数の上限
+            summary_chars: 取得済みの項目に載せる値の先頭の文字数
+        """
+        self.budget_tokens = budget_tokens
+        self.summary_chars = summary_chars
+        self.static_prefix = self._build_static_prefix()
+        self.static_tokens = estimate_tokens(self.static_prefix)
+
+    def _build_static_prefix(self) -> str:
+        """固定の前置きを作る（呼び出しごとに同じ文字列になるよう、現在の状態は含めない）."""
+        catalog_lines = []
+        for category in ExtractionCategory:
+            catalog_lines.append(f"### {CATEGORY_LABELS[category]}（{category.value}）")
+            for definition in FIELD_REGISTRY.by_category[category]:
+                catalog_lines.append(
+                    f"- {definition.key}: {definition.label}（{LAYER_LABELS[definition.layer]}）"
+                )
+        catalog = "\n".join(catalog_lines)
+
+        return f"""あなたはM&Aアドバイザーのアシスタントです。
+売り手企業へのヒアリングの会話から、M&A検討に必要な情報を抽出してください。
+
+## 抽出項目
+キーは「カテゴリ.フィールド」、括弧内は情報の層（表層→構造→本質→出口）です。
+
+{catalog}
+
+## 入力
+ユーザーのメッセージには次の欄が入ります。
+- 取得済み: 既に取得した項目のキーと値の先頭（「…」以降は省略）
+- 仮の値: 会話からルールで機械的に取り出した値（未確認）
+- 未取得の候補: まだ取得していない項目（優先して探す項目。全件とは限らない）
+- 新しい会話: 今回抽出する会話
+キーだけを並べる欄は「カテゴリ: フィールド, フィールド」の形でカテゴリごとにまとめます。
+
+## 出力のしかた
+extract_mna_info の key には、上のキーをそのまま使ってください。
+
+注意事項：
+- 新しい会話から新しく抽出できた情報のみを出力
+- 明確に言及された情報のみを抽出
+- 推測は避け、確信度を0-1で示す
+- 既に取得済みの情報は出力しない
+- 仮の値の項目は、会話から確認できれば同じ値でも出力し、誤っていれば正しい値を出力する
+- 未取得の候補にない項目も、抽出項目にあり会話で明確に言及されていれば出力してよい
+- 具体的な数値や固有名詞を正確に抽出
+"""
+
+    def build(
+        self,
+        new_utterances: list[Utterance],
+        current_extractions: dict[str, ExtractionField],
+    ) -> ExtractionContext:
+        """呼び出しごとの user メッセージを作る.
+
+        取得済みの欄と未取得の候補の欄を合わせて budget_tokens に収める。
+        未取得の候補は予算に収まる分だけ層の優先順に載せ、取得済みの欄は
+        残りの予算を超える場合に値を短くし、それでも超えればキーだけにする。
+
+        Args:
+            new_utterances: 新しい発話リスト
+            current_extractions: 現在の抽出情報
+
+        Returns:
+            ExtractionContext: user メッセージとその大きさ
+        """
+        filled: dict[str, str] = {}
+        provisional: dict[str, str] = {}
+        for definition in FIELD_REGISTRY:
+            extraction = current_extractions.get(definition.key)
+            if extraction and extraction.value:
+                if extraction.provisional:
+                    provisional[definition.key] = extraction.value
+                else:
+                    filled[definition.key] = extraction.value
+        missing = [
+            definition.key
+            for definition in FIELD_REGISTRY.ordered()
+            if definition.key not in filled and definition.key not in provisional
+        ]
+
+        # 未取得の候補（キーだけで短い）を先に載せ、残りの予算で取得済みの値を要約する
+        remaining = self.budget_tokens
+        candidates: list[str] = []
+        for key in missing:
+            # 「, 」の区切りを含めて数える
+            cost = estimate_tokens(key) + 1
+            if cost > remaining:
+                break
+            candidates.append(key)
+            remaining -= cost
+        omitted = len(missing) - len(candidates)
+
+        # キーだけにしても超える場合はそのまま載せる（出し直しを防ぐ目印なので省かない）
+        for summary_chars in (self.summary_chars, self.summary_chars // 3, None):
+            filled_section = self._filled_section(filled, summary_chars)
+            if estimate_tokens(filled_section) <= remaining:
+                break
+
+        candidate_section = self._group_keys(candidates) or "（なし）"
+        if omitted:
+            candidate_section += f"\n（ほか{omitted}項目）"
+
+        # 仮の値は数件の短い値なので予算に数えない
+        provisional_section = "\n".join(f"- {key}: {value}" for key, value in provisional.items())
+        conversation = format_utterances(new_utterances)
+
+        text = f"""## 取得済み
+{filled_section or "（なし）"}
+
+## 仮の値
+{provisional_section or "（なし）"}
+
+## 未取得の候補
+{candidate_section}
+
+## 新しい会話
+{conversation}
+"""
+        return ExtractionContext(
+            text,
+            len(filled),
+            len(provisional),
+            len(candidates),
+            omitted,
+            summary_chars,
+            estimate_tokens(conversation),
+        )
+
+    def _filled_section(self, filled: dict[str, str], summary_chars: Optional[int]) -> str:
+        """取得済みの欄を作る（summary_chars が None ならキーだけ）."""
+        if not summary_chars:
+            return self._group_keys(list(filled))
+        lines = []
+        for key, value in filled.items():
+            summary = " ".join(value.split())
+            if len(summary) > summary_chars:
+                summary = summary[:summary_chars] + "…"
+            lines.append(f"- {key}: {summary}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _group_keys(keys: list[str]) -> str:
+        """キーをカテゴリごとに1行にまとめる（category: field, field）."""
+        grouped: dict[str, list[str]] = {}
+        for key in keys:
+            category, field = key.split(".", 1)
+            grouped.setdefault(category, []).append(field)
+        return "\n".join(f"- {category}: {', '.join(fields)}" for category, fields in grouped.items())
@@ -0,0 +1,191 @@
+"""
+TONARI for M&A - セッションの抽出の進捗
+項目が埋まる・空になるたびに取得済みの数（全体・カテゴリ別・層別）を
+増減させ、進捗の取得や未取得項目の一覧で毎回全項目を数え直さないようにする
+
+抽出情報の辞書は SessionState.extractions と共有し、書き込みは set() を通す。
+"""
+from typing import Iterable, Optional
+
+from ..models.mna_schemas import (
+    FIELD_REGISTRY,
+    ExtractionCategory,
+    ExtractionField,
+    FieldDefinition,
+    InfoLayer,
+)
+
+# 画面に出す未取得の項目数（REST・スナップショット・ラウンドの更新で共通）
+MISSING_FIELDS_SHOWN = 10
+
+
+def _summary(total: int, filled: int) -> dict:
+    """件数と割合をまとめる."""
+    return {
+        "total": total,
+        "filled": filled,
+        "percentage": round(filled / total * 100, 1) if total > 0 else 0,
+    }
+
+
+class ExtractionProgress:
+    """1セッションの抽出の進捗.
+
+    Attributes:
+        extractions: 抽出情報（SessionState.extractions と共有）
+        filled: 取得済みの項目数
+    """
+
+    __slots__ = (
+        "extractions",
+        "filled",
+        "_filled",
+        "_filled_by_category",
+        "_filled_by_layer",
+        "_summary",
+        "_missing",
+    )
+
+    def __init__(self, extractions: dict[str, ExtractionField]) -> None:
+        """既存の抽出情報から進捗を数える.
+
+        Args:
+            extractions: 抽出情報（この辞書に書き込んでいく）
+        """
+        self.extractions = extractions
+        self.filled = 0
+        # FieldDefinition.index → 取得済みか
+        self._filled = [False] * len(FIELD_REGISTRY)
+        self._filled_by_category = dict.fromkeys(ExtractionCategory, 0)
+        self._filled_by_layer = dict.fromkeys(InfoLayer, 0)
+        self._summary: Optional[dict] = None
+        self._missing: dict[Optional[InfoLayer], list[dict]] = {}
+        for key, field in extractions.items():
+            self._count(key, field)
+
+    def set(self, field_key: str, field: ExtractionField) -> Optional[FieldDefinition]:
+        """項目を書き込み、取得済みの数を更新する.
+
+        値をその場で書き換えた項目は、書き換えた後に同じオブジェクトを渡す。
+
+        Args:
+            field_key: フィールドキー（category.field形式）
+            field: 抽出フィールド
+
+        Returns:
+            Optional[FieldDefinition]: 取得済み・未取得が切り替わった項目の定義（変わらなければNone）
+        """
+        self.extractions[field_key] = field
+        return self._count(field_key, field)
+
+    def update(self, fields: dict[str, ExtractionField]) -> list[FieldDefinition]:
+        """複数の項目を書き込む.
+
+        Args:
+            fields: フィールドキー → 抽出フィールド
+
+        Returns:
+            list[FieldDefinition]: 取得済み・未取得が切り替わった項目の定義
+        """
+        changed = []
+        for field_key, field in fields.items():
+            definition = self.set(field_key, field)
+            if definition is not None:
+                changed.append(definition)
+        return changed
+
+    def _count(self, field_key: str, field: ExtractionField) -> Optional[FieldDefinition]:
+        """項目の取得済み・未取得の切り替わりを数える."""
+        definition = FIELD_REGISTRY.get(field_key)
+        if definition is None:
+            return None
+        filled = bool(field.value)
+        if self._filled[definition.index] == filled:
+            return None
+        self._filled[definition.index] = filled
+        step = 1 if filled else -1
+        self.filled += step
+        self._filled_by_category[definition.category] += step
+        self._filled_by_layer[definition.layer] += step
+        self._summary = None
+        self._missing.clear()
+        return definition
+
+    def summary(self) -> dict:
+        """進捗を返す（変わるまでは前回の結果を使い回す）.
+
+        Returns:
+            dict: 全体・カテゴリ別・層別の件数と割合
+        """
+        if self._summary is None:
+            self._summary = {
+                **_summary(len(FIELD_REGISTRY), self.filled),
+                "by_category": {
+                    category.value: self._category_summary(category) for category in ExtractionCategory
+                },
+                "by_layer": {layer.value: self._layer_summary(layer) for layer in InfoLayer},
+            }
+        return self._summary
+
+    def missing_fields(self, priority_layer: Optional[InfoLayer] = None) -> list[dict]:
+        """未取得の項目を優先度順に返す（変わるまでは前回の結果を使い回す）.
+
+        Args:
+            priority_layer: 優先するレイヤー
+
+        Returns:
+            list[dict]: 未取得フィールドリスト
+        """
+        missing = self._missing.get(priority_layer)
+        if missing is None:
+            missing = self._missing[priority_layer] = [
+                {
+                    "category": definition.category.value,
+                    "field": definition.field,
+                    "label": definition.label,
+                    "layer": definition.layer,
+                }
+                for definition in FIELD_REGISTRY.ordered(priority_layer)
+                if not self._filled[definition.index]
+            ]
+        return missing
+
+    def delta(
+        self,
+        changed: Iterable[FieldDefinition],
+        priority_layer: Optional[InfoLayer] = None,
+    ) -> dict:
+        """切り替わった項目の分だけの進捗（progress_update の data）を作る.
+
+        全体の件数は常に、カテゴリ別・層別は変わったものだけを載せる。
+        未取得の一覧は画面に出す先頭の MISSING_FIELDS_SHOWN 件を載せる
+        （埋まった項目の次の候補が繰り上がるため、差分ではなく置き換える）。
+
+        Args:
+            changed: 取得済み・未取得が切り替わった項目の定義
+            priority_layer: 未取得の一覧を並べる際に優先するレイヤー
+
+        Returns:
+            dict: progress_update の data
+        """
+        changed = list(changed)
+        return {
+            **_summary(len(FIELD_REGISTRY), self.filled),
+            "by_category": {
+                category.value: self._category_summary(category)
+                for category in {definition.category for definition in changed}
+            },
+            "by_layer": {
+                layer.value: self._layer_summary(layer)
+                for layer in {definition.layer for definition in changed}
+            },
+            "missing_fields": self.missing_fields(priority_layer)[:MISSING_FIELDS_SHOWN],
+        }
+
+    def _category_summary(self, category: ExtractionCategory) -> dict:
+        """カテゴリの件数と割合."""
+        return _summary(len(FIELD_REGISTRY.by_category[category]), self._filled_by_category[category])
+
+    def _layer_summary(self, layer: InfoLayer) -> dict:
+        """層の件数と割合."""
+        return _summary(len(FIELD_REGISTRY.by_layer[layer]), self._filled_by_layer[layer])
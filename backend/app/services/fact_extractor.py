@@ -0,0 +1,338 @@
+"""
+TONARI for M&A - 定型の事実のルール抽出
+設立年・資本金・従業員数・売上高・利益・借入金のような定型の事実は、
+確定した発話ごとにその場で正規表現で取り出し、仮の値（provisional）として
+Claudeの抽出ラウンドより先に画面に出す。ラウンドが同じ項目を返せば、
+その値で確定・上書きする。
+
+- 項目の手がかりの語は名前付きグループで1本の正規表現にまとめ、1パスで探す
+- 値は手がかりの後ろの、同じ文で次の手がかりより前から読む。読めなければ
+  手がかりの前から読む（設立年は同じ文、金額・人数は同じ節の中だけ）
+- 数値は全角数字・漢数字・億/万/千の位取り・和暦を正規化する
+"""
+import re
+from datetime import datetime
+from typing import Callable, Optional
+
+from ..models.mna_schemas import FIELD_REGISTRY, ExtractionField, Utterance
+
+_ZENKAKU = str.maketrans("０１２３４５６７８９，．", "0123456789,.")
+_KANJI_DIGITS = {
+    "〇": 0, "零": 0, "一": 1, "二": 2, "三": 3, "四": 4,
+    "五": 5, "六": 6, "七": 7, "八": 8, "九": 9,
+}
+_SMALL_UNITS = {"十": 10, "百": 100, "千": 1000}
+_LARGE_UNITS = {"万": 10**4, "億": 10**8, "兆": 10**12}
+
+# 和暦の元年の西暦
+ERAS = {"明治": 1868, "大正": 1912, "昭和": 1926, "平成": 1989, "令和": 2019}
+
+_NUMERAL = r"[0-9０-９〇零一二三四五六七八九十百千万億兆,，.．]*[0-9０-９〇零一二三四五六七八九十百千万億兆]"
+
+# 手がかりの語 → 項目のフィールド名（グループ名）
+_KEYWORDS = re.compile(
+    r"(?P<established_year>設立|創業|創立)"
+    r"|(?P<capital>資本金)"
+    r"|(?P<employee_count>従業員|社員数|社員)"
+    r"|(?P<revenue_latest>(?:売上高|売り?上げ?|年商)(?!総利益|原価))"
+    r"|(?P<operating_profit>営業利益)"
+    r"|(?P<ordinary_profit>経常利益)"
+    r"|(?P<debt>借入金|借り?入れ?|借金|有利子負債)"
+)
+
+_AMOUNT = re.compile(
+    rf"(?P<approx>約|およそ|ほぼ|大体|だいたい)?\s*(?P<number>{_NUMERAL})\s*(?P<yen>円)?"
+    r"(?P<suffix>くらい|ぐらい|程度|ほど|前後|弱|強)?"
+)
+_COUNT = re.compile(
+    rf"(?P<approx>約|およそ|ほぼ|大体|だいたい)?\s*(?P<number>{_NUMERAL})\s*(?:名|人)"
+    r"(?P<suffix>くらい|ぐらい|程度|ほど|前後|弱|強)?"
+)
+_YEAR = re.compile(
+    r"(?P<era>明治|大正|昭和|平成|令和)?\s*(?P<number>[0-9０-９〇一二三四五六七八九十百千]+|元)\s*年(?!間|前|目|度|後)"
+)
+
+# 値を読む範囲を区切る文末
+_SENTENCE_END = re.compile(r"[。！？!?\n]")
+# 手がかりの前を読む範囲を区切る節の切れ目（「売上10億、借入はありません」の10億を借入に取らない）
+_CLAUSE_END = re.compile(r"[、，,。！？!?\n]")
+# 手がかりから値までの最大文字数
+WINDOW_CHARS = 40
+# 値の後ろにあれば金額ではない（率・倍率・期数など）
+_NOT_AMOUNT_AFTER = ("%", "％", "倍", "期", "年", "割", "名", "人", "社", "店")
+# 値の前にあれば赤字の金額（符号を取り違えないよう、ルールでは読まない）
+_NEGATIVE_WORDS = ("赤字", "マイナス", "損失", "▲", "△")
+
+
+def parse_number(text: str) -> Optional[float]:
+    """算用数字・漢数字・位取りの混ざった数を読む.
+
+    例: 「12億5千万」→ 1250000000、「三十五」→ 35、「1,200」→ 1200、
+    「1.5億」→ 150000000、「二〇二三」→ 2023
+
+    Args:
+        text: 数の文字列
+
+    Returns:
+        Optional[float]: 数（読めなければNone）
+    """
+    text = text.translate(_ZENKAKU).replace(",", "")
+    total = 0.0  # 万・億・兆で区切った上位の合計
+    section = 0.0  # 万未満の位の合計
+    current: Optional[float] = None  # 読みかけの数字
+    seen_digit = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char.isdigit() or char == ".":
+            start = i
+            while i < len(text) and (text[i].isdigit() or text[i] == "."):
+                i += 1
+            try:
+                current = float(text[start:i])
+            except ValueError:
+                return None
+            seen_digit = True
+            continue
+        if char in _KANJI_DIGITS:
+            # 「二〇二三」のように位取りなしで続く漢数字は桁として読む
+            current = (current or 0) * 10 + _KANJI_DIGITS[char]
+            seen_digit = True
+        elif char in _SMALL_UNITS:
+            section += (current if current is not None else 1) * _SMALL_UNITS[char]
+            current = None
+            seen_digit = True
+        elif char in _LARGE_UNITS:
+            section += current or 0
+            if section == 0:
+                return None
+            total += section * _LARGE_UNITS[char]
+            section = 0
+            current = None
+        else:
+            return None
+        i += 1
+    if not seen_digit:
+        return None
+    return total + section + (current or 0)
+
+
+def to_western_year(era: Optional[str], year_text: str) -> Optional[int]:
+    """年（和暦を含む）を西暦にする.
+
+    Args:
+        era: 元号（西暦ならNone）
+        year_text: 年の数字（「元」を含む）
+
+    Returns:
+        Optional[int]: 西暦（あり得ない年ならNone）
+    """
+    year = 1 if year_text == "元" else parse_number(year_text)
+    if year is None or year != int(year):
+        return None
+    year = int(year)
+    if era is not None:
+        year = ERAS[era] + year - 1
+    if not 1800 <= year <= datetime.now().year:
+        return None
+    return year
+
+
+def format_yen(amount: float) -> str:
+    """金額を「12億5,000万円」の形にする.
+
+    Args:
+        amount: 金額（円）
+
+    Returns:
+        str: 表示用の金額
+    """
+    amount = int(round(amount))
+    parts = []
+    for unit, label in ((10**12, "兆"), (10**8, "億"), (10**4, "万")):
+        if amount >= unit:
+            parts.append(f"{amount // unit:,}{label}")
+            amount %= unit
+    if amount or not parts:
+        parts.append(f"{amount:,}")
+    return "".join(parts) + "円"
+
+
+def _approx(match: re.Match) -> str:
+    """「約」を付けるか."""
+    return "約" if match.group("approx") or match.group("suffix") else ""
+
+
+def _read_amount(window: str) -> Optional[str]:
+    """範囲の最初の金額を読む（位か「円」の付いた数のみ）."""
+    for match in _AMOUNT.finditer(window):
+        number = match.group("number")
+        rest = window[match.end("number"):].lstrip()
+        if rest.startswith(_NOT_AMOUNT_AFTER):
+            continue
+        if not match.group("yen") and not any(unit in number for unit in "千万億兆"):
+            continue
+        if any(word in window[: match.start()] for word in _NEGATIVE_WORDS):
+            return None
+        amount = parse_number(number)
+        if amount is None or amount <= 0:
+            continue
+        return _approx(match) + format_yen(amount)
+    return None
+
+
+def _read_count(window: str) -> Optional[str]:
+    """範囲の最初の人数を読む."""
+    match = _COUNT.search(window)
+    if match is None:
+        return None
+    count = parse_number(match.group("number"))
+    if count is None or count <= 0 or count != int(count):
+        return None
+    return f"{_approx(match)}{int(count):,}名"
+
+
+def _read_year(window: str) -> Optional[str]:
+    """範囲の最初の年を西暦で読む."""
+    for match in _YEAR.finditer(window):
+        year = to_western_year(match.group("era"), match.group("number"))
+        if year is not None:
+            return f"{year}年"
+    return None
+
+
+# フィールド名 → (値を読む関数, 手がかりの前を読む範囲の区切り)
+_READERS: dict[str, tuple[Callable[[str], Optional[str]], re.Pattern]] = {
+    "established_year": (_read_year, _SENTENCE_END),
+    "capital": (_read_amount, _CLAUSE_END),
+    "employee_count": (_read_count, _CLAUSE_END),
+    "revenue_latest": (_read_amount, _CLAUSE_END),
+    "operating_profit": (_read_amount, _CLAUSE_END),
+    "ordinary_profit": (_read_amount, _CLAUSE_END),
+    "debt": (_read_amount, _CLAUSE_END),
+}
+
+# フィールド名 → 項目の定義
+_DEFINITIONS = {
+    name: definition
+    for name in _READERS
+    for definition in FIELD_REGISTRY
+    if definition.field == name
+}
+
+
+def find_facts(text: str) -> dict[str, str]:
+    """発話から定型の事実を取り出す.
+
+    Args:
+        text: 発話テキスト
+
+    Returns:
+        dict[str, str]: フィールドキー → 値（同じ項目は最初に読めたもの）
+    """
+    keywords = list(_KEYWORDS.finditer(text))
+    facts: dict[str, str] = {}
+    for i, keyword in enumerate(keywords):
+        name = keyword.lastgroup
+        key = _DEFINITIONS[name].key
+        if key in facts:
+            continue
+        read, boundary = _READERS[name]
+
+        # 後ろ: 次の手がかり・文末・WINDOW_CHARS のうち近いところまで
+        end = min(len(text), keyword.end() + WINDOW_CHARS)
+        if i + 1 < len(keywords):
+            end = min(end, keywords[i + 1].start())
+        sentence_end = _SENTENCE_END.search(text, keyword.end(), end)
+        if sentence_end is not None:
+            end = sentence_end.start()
+        value = read(text[keyword.end():end])
+
+        if value is None:
+            # 前: 「1985年に設立」「昭和60年創業」「2億の借入があります」
+            start = max(0, keyword.start() - WINDOW_CHARS)
+            if i > 0:
+                start = max(start, keywords[i - 1].end())
+            for separator in boundary.finditer(text, start, keyword.start()):
+                start = separator.end()
+            value = read(text[start:keyword.start()])
+
+        if value is not None:
+            facts[key] = value
+    return facts
+
+
+def fact_number(value: str) -> Optional[float]:
+    """値に含まれる最初の金額・人数・年を数にする（ルールとClaudeの値の突き合わせ用）.
+
+    Args:
+        value: 抽出した値
+
+    Returns:
+        Optional[float]: 数（読めなければNone）
+    """
+    year = _YEAR.search(value)
+    if year is not None and (year.group("era") or not _AMOUNT.search(value[: year.start()])):
+        western = to_western_year(year.group("era"), year.group("number"))
+        if western is not None:
+            return float(western)
+    for match in _AMOUNT.finditer(value):
+        number = parse_number(match.group("number"))
+        if number is not None:
+            return number
+    return None
+
+
+def same_fact(provisional: str, confirmed: str) -> bool:
+    """仮の値とClaudeの値が同じ事実を指すかを返す.
+
+    Args:
+        provisional: ルールで取り出した値
+        confirmed: Claudeが抽出した値
+
+    Returns:
+        bool: 数が一致すればTrue（数が読めなければ文字列の一致）
+    """
+    a, b = fact_number(provisional), fact_number(confirmed)
+    if a is None or b is None:
+        return provisional == confirmed
+    return a == b
+
+
+class FactExtractor:
+    """確定した発話から仮の抽出フィールドを作る.
+
+    Attributes:
+        confidence: 仮の値の確信度
+    """
+
+    def __init__(self, confidence: float) -> None:
+        """抽出器を作る.
+
+        Args:
+            confidence: 仮の値の確信度
+        """
+        self.confidence = confidence
+
+    def extract(self, utterance: Utterance) -> dict[str, ExtractionField]:
+        """発話から仮の抽出フィールドを作る.
+
+        Args:
+            utterance: 確定した発話
+
+        Returns:
+            dict[str, ExtractionField]: フィールドキー → 仮の抽出フィールド
+        """
+        fields = {}
+        for key, value in find_facts(utterance.text).items():
+            definition = FIELD_REGISTRY.get(key)
+            fields[key] = ExtractionField(
+                category=definition.category,
+                field=definition.field,
+                value=value,
+                confidence=self.confidence,
+                source_utterance_id=utterance.id,
+                layer=definition.layer,
+                provisional=True,
+            )
+        return fields
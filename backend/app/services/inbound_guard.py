@@ -0,0 +1,191 @@
+"""
+TONARI for M&A - WebSocketの受信フレームの制限
+不具合のあるクライアント（文字起こし全文を transcript で送り続けるなど）が
+イベントループを占有したり、Claude呼び出しを際限なく起こしたりしないよう、
+受信ループの段階で安く捨てる
+
+- 大きさの上限を超えたフレームはJSONとして読む前に捨てる
+- 接続ごとと、セッションごと（このワーカーの全接続の合計）のトークンバケットで
+  メッセージ数を制限し、確定した文字起こしは文字数でも制限する
+- 型と各項目の長さを検証し、通ったメッセージだけを受信キューに積む
+- 捨てるたびに理由ごとに数え、捨て続ける接続は切断する
+"""
+import time
+from collections import Counter
+from typing import Optional, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from ..models.mna_schemas import WSInboundMessage, WSInboundTranscript
+
+_inbound_adapter: TypeAdapter = TypeAdapter(WSInboundMessage)
+
+
+class TokenBucket:
+    """トークンバケット.
+
+    Attributes:
+        rate: 1秒あたりに補充するトークン数
+        burst: 貯められるトークン数の上限
+        tokens: 現在のトークン数
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """満杯のバケットを作る.
+
+        Args:
+            rate: 1秒あたりに補充するトークン数
+            burst: 貯められるトークン数の上限
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = time.monotonic()
+
+    def take(self, cost: float = 1.0, now: Optional[float] = None) -> bool:
+        """トークンを取り出す.
+
+        Args:
+            cost: 取り出すトークン数
+            now: 現在時刻（monotonic秒、省略時は取得する）
+
+        Returns:
+            bool: 取り出せたらTrue（足りなければ取り出さない）
+        """
+        if now is None:
+            now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+class SessionInboundLimiter:
+    """セッション単位の受信の制限（このワーカーの全接続で共有）.
+
+    Attributes:
+        messages: メッセージ数のバケット
+        transcript_chars: 確定した文字起こしの文字数のバケット
+        rejected: 理由ごとの捨てたフレーム数
+    """
+
+    def __init__(
+        self,
+        message_rate: float,
+        message_burst: float,
+        transcript_chars_per_sec: float,
+        transcript_chars_burst: float,
+    ) -> None:
+        """制限を初期化する.
+
+        Args:
+            message_rate: 1秒あたりのメッセージ数
+            message_burst: 連続して受け付けるメッセージ数
+            transcript_chars_per_sec: 1秒あたりの確定した文字起こしの文字数
+            transcript_chars_burst: 連続して受け付ける確定した文字起こしの文字数
+        """
+        self.messages = TokenBucket(message_rate, message_burst)
+        self.transcript_chars = TokenBucket(transcript_chars_per_sec, transcript_chars_burst)
+        self.rejected: Counter[str] = Counter()
+
+
+class InboundGuard:
+    """1接続の受信フレームの検査.
+
+    Attributes:
+        session: セッション単位の制限
+        max_text_bytes: テキストフレームの上限（文字数）
+        max_audio_bytes: バイナリフレームの上限（バイト）
+        messages: この接続のメッセージ数のバケット
+        audio_bytes: この接続の音声のバイト数のバケット
+        strikes: 捨てたフレームのバケット（尽きたら切断する）
+        rejected: 理由ごとの捨てたフレーム数
+    """
+
+    def __init__(
+        self,
+        session: SessionInboundLimiter,
+        max_text_bytes: int,
+        max_audio_bytes: int,
+        message_rate: float,
+        message_burst: float,
+        audio_bytes_per_sec: float,
+        max_rejections: int,
+    ) -> None:
+        """検査を初期化する.
+
+        Args:
+            session: セッション単位の制限
+            max_text_bytes: テキストフレームの上限（文字数）
+            max_audio_bytes: バイナリフレームの上限（バイト）
+            message_rate: この接続の1秒あたりのメッセージ数
+            message_burst: この接続で連続して受け付けるメッセージ数
+            audio_bytes_per_sec: この接続の1秒あたりの音声のバイト数
+            max_rejections: 続けて捨てたら切断するフレーム数（1秒に1件ずつ回復する）
+        """
+        self.session = session
+        self.max_text_bytes = max_text_bytes
+        self.max_audio_bytes = max_audio_bytes
+        self.messages = TokenBucket(message_rate, message_burst)
+        self.audio_bytes = TokenBucket(audio_bytes_per_sec, audio_bytes_per_sec * 4)
+        self.strikes = TokenBucket(1.0, max_rejections)
+        self.rejected: Counter[str] = Counter()
+
+    @property
+    def exhausted(self) -> bool:
+        """捨て続けていて切断すべきか."""
+        return self.strikes.tokens < 1
+
+    def admit_text(self, text: str) -> tuple[Optional[WSInboundMessage], Optional[str]]:
+        """テキストフレームを検査する.
+
+        Args:
+            text: 受信したテキストフレーム
+
+        Returns:
+            tuple[Optional[WSInboundMessage], Optional[str]]: 受け付けたメッセージと、
+            捨てた場合はその理由
+        """
+        if len(text) > self.max_text_bytes:
+            return None, self._reject("too_large")
+        now = time.monotonic()
+        if not self.messages.take(now=now):
+            return None, self._reject("rate_limited")
+        if not self.session.messages.take(now=now):
+            return None, self._reject("session_rate_limited")
+        try:
+            message = _inbound_adapter.validate_json(text)
+        except ValidationError:
+            return None, self._reject("invalid")
+        # 確定した文字起こしは抽出・サジェストのラウンドを起こすため文字数でも制限する
+        if (
+            isinstance(message, WSInboundTranscript)
+            and message.is_final
+            and not self.session.transcript_chars.take(len(message.text), now=now)
+        ):
+            return None, self._reject("transcript_rate_limited")
+        return message, None
+
+    def admit_audio(self, data: Union[bytes, bytearray]) -> Optional[str]:
+        """バイナリフレーム（音声）を検査する.
+
+        Args:
+            data: 受信したバイナリフレーム
+
+        Returns:
+            Optional[str]: 捨てた場合はその理由
+        """
+        if len(data) > self.max_audio_bytes:
+            return self._reject("too_large")
+        if not self.audio_bytes.take(len(data)):
+            return self._reject("audio_rate_limited")
+        return None
+
+    def _reject(self, reason: str) -> str:
+        """捨てたフレームを数える."""
+        self.rejected[reason] += 1
+        self.session.rejected[reason] += 1
+        self.strikes.take()
+        return reason
@@ -0,0 +1,153 @@
+"""
+TONARI for M&A - interim（途中経過）の文字起こしの配信制御
+Deepgramのinterim結果は話者ごとに毎秒5〜10回届くため、そのまま全画面へ
+配ると送信とフロントエンドの再描画が膨らむ
+
+- 発話中の1つの発話には同じIDを振り、確定（final）時もそのIDを引き継ぐ
+- 話者ごとに一定間隔より速くは送らず、間引いた分は最新の内容だけを後で送る
+- 前回送った内容との差分（共通の先頭部分より後ろ）だけを送る
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# (session_id, 差分データ) を受け取って配信するコルーチン関数
+SendDeltaFn = Callable[[str, dict], Awaitable[None]]
+
+
+class InterimState:
+    """話者ごとの発話中のinterimの状態.
+
+    Attributes:
+        utterance_id: 発話のID（確定時もこのIDを使う）
+        sent_text: 最後に送った全文
+        pending_text: 間引いて未送信の最新の全文（なければNone）
+        last_sent_at: 最後に送った時刻（monotonic秒）
+        timer: 間引いた分を送るタイマー
+    """
+
+    def __init__(self) -> None:
+        """新しい発話の状態を作る."""
+        self.utterance_id = str(uuid4())
+        self.sent_text = ""
+        self.pending_text: Optional[str] = None
+        self.last_sent_at = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class InterimChannel:
+    """interimの文字起こしを間引き、差分にして配信する.
+
+    Attributes:
+        send: 差分を配信するコルーチン関数
+        min_interval: 同じ話者へ続けて送る最小間隔（秒）
+    """
+
+    def __init__(self, send: SendDeltaFn, min_interval: float) -> None:
+        """チャンネルを初期化する.
+
+        Args:
+            send: 差分を配信するコルーチン関数
+            min_interval: 同じ話者へ続けて送る最小間隔（秒）
+        """
+        self.send = send
+        self.min_interval = min_interval
+        self._states: dict[tuple[str, str], InterimState] = {}
+        # create_taskの戻り値は弱参照しか持たれないため、完了まで保持する
+        self._tasks: set[asyncio.Task] = set()
+
+    async def update(self, session_id: str, speaker: str, text: str) -> None:
+        """interimの文字起こしを受け取る.
+
+        前回の送信から最小間隔が経っていればすぐに送り、経っていなければ
+        最新の内容を保持して間隔が空いた時点で送る。
+
+        Args:
+            session_id: セッションID
+            speaker: 話者
+            text: 発話中の全文
+        """
+        key = (session_id, speaker)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = InterimState()
+
+        wait = state.last_sent_at + self.min_interval - time.monotonic()
+        if wait <= 0:
+            await self._send(session_id, speaker, state, text)
+            return
+
+        state.pending_text = text
+        if state.timer is None:
+            state.timer = asyncio.get_running_loop().call_later(
+                wait, self._on_timer, session_id, speaker
+            )
+
+    def finalize(self, session_id: str, speaker: str) -> Optional[str]:
+        """発話の確定時に呼び、未送信のinterimを破棄する.
+
+        Args:
+            session_id: セッションID
+            speaker: 話者
+
+        Returns:
+            Optional[str]: 確定した発話に引き継ぐID（interimがなかった場合はNone）
+        """
+        state = self._states.pop((session_id, speaker), None)
+        if state is None:
+            return None
+        if state.timer is not None:
+            state.timer.cancel()
+        return state.utterance_id
+
+    def forget(self, session_id: str) -> None:
+        """セッションの発話中の状態をすべて破棄する.
+
+        Args:
+            session_id: セッションID
+        """
+        for key in [key for key in self._states if key[0] == session_id]:
+            self.finalize(*key)
+
+    async def _send(self, session_id: str, speaker: str, state: InterimState, text: str) -> None:
+        """前回送った内容との差分を配信する."""
+        if self._states.get((session_id, speaker)) is not state:
+            return  # 送信待ちの間に確定した
+        state.pending_text = None
+        state.last_sent_at = time.monotonic()
+        offset = len(os.path.commonprefix([state.sent_text, text]))
+        if offset == len(text) == len(state.sent_text):
+            return
+        state.sent_text = text
+        await self.send(
+            session_id,
+            {
+                "utterance_id": state.utterance_id,
+                "speaker": speaker,
+                "offset": offset,
+                "text": text[offset:],
+            },
+        )
+
+    def _on_timer(self, session_id: str, speaker: str) -> None:
+        """間引いていた最新のinterimを送る."""
+        state = self._states.get((session_id, speaker))
+        if state is None:
+            return
+        state.timer = None
+        if state.pending_text is None:
+            return
+        task = asyncio.create_task(self._send(session_id, speaker, state, state.pending_text))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        """送信タスクの後始末をする（例外はログに残す）."""
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Interim send failed: {task.exception()!r}")
@@ -0,0 +1,567 @@
+"""
+TONARI for M&A - バックグラウンドジョブ
+終了したセッションの再抽出のような、面談とは関係なく時間のかかる処理を
+SQLiteに永続化したキューで実行する
+
+- 同じ冪等キーのジョブは1件しか登録されない
+- 失敗したジョブは間隔を空けて再実行し、上限回数で failed にする
+- 実行中のジョブはリースを延長し続ける。ワーカーが落ちてリースが切れたジョブは
+  他のワーカー（再起動後を含む）が引き取る
+- ハンドラーは JobPending で「後でもう一度」を返せる（バッチの完了待ちなど。
+  実行回数には数えない）
+
+gunicornの各ワーカーが同じファイルを使い、ワーカーごとの同時実行数は
+JOB_CONCURRENCY で制限する（面談の処理とイベントループを取り合わないよう小さく）。
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+from uuid import uuid4
+
+from ..core.config import settings
+from ..core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    lease_owner TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+"""
+
+_job_outcomes = registry.counter(
+    "tonari_jobs_total",
+    "Background job executions by kind and outcome",
+    ("kind", "outcome"),
+)
+
+
+class JobPending(Exception):
+    """ジョブを終えずに後でもう一度実行させる（実行回数には数えない）.
+
+    ハンドラーが job.state に書いた内容は保存され、次の実行で読める。
+
+    Attributes:
+        delay: 次に実行するまでの秒数
+    """
+
+    def __init__(self, delay: float) -> None:
+        """例外を作る.
+
+        Args:
+            delay: 次に実行するまでの秒数
+        """
+        super().__init__(f"Job pending for {delay}s")
+        self.delay = delay
+
+
+class Job:
+    """ジョブ.
+
+    Attributes:
+        id: ジョブID
+        kind: 種類（ハンドラーの登録名）
+        idempotency_key: 冪等キー
+        payload: 登録時の入力
+        state: 実行をまたいで持ち越す途中経過（ハンドラーが書き換える）
+        status: queued / running / succeeded / failed / cancelled
+        attempts: 実行した回数
+        max_attempts: 失敗とするまでの実行回数
+        run_after: この時刻以降に実行する（UNIX秒）
+        result: 成功したときの結果
+        error: 最後の失敗の内容
+        created_at: 登録した時刻（UNIX秒）
+        updated_at: 最後に更新した時刻（UNIX秒）
+    """
+
+    __slots__ = (
+        "id",
+        "kind",
+        "idempotency_key",
+        "payload",
+        "state",
+        "status",
+        "attempts",
+        "max_attempts",
+        "run_after",
+        "result",
+        "error",
+        "created_at",
+        "updated_at",
+    )
+
+    def __init__(self, row: sqlite3.Row) -> None:
+        """テーブルの行からジョブを作る.
+
+        Args:
+            row: jobsテーブルの行
+        """
+        self.id: str = row["id"]
+        self.kind: str = row["kind"]
+        self.idempotency_key: Optional[str] = row["idempotency_key"]
+        self.payload: dict = json.loads(row["payload"])
+        self.state: dict = json.loads(row["state"])
+        self.status: str = row["status"]
+        self.attempts: int = row["attempts"]
+        self.max_attempts: int = row["max_attempts"]
+        self.run_after: float = row["run_after"]
+        self.result: Optional[dict] = json.loads(row["result"]) if row["result"] else None
+        self.error: Optional[str] = row["error"]
+        self.created_at: float = row["created_at"]
+        self.updated_at: float = row["updated_at"]
+
+    def to_dict(self) -> dict:
+        """APIレスポンス用の辞書に変換する.
+
+        Returns:
+            dict: ジョブの内容
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class JobQueue:
+    """SQLiteに永続化したジョブキュー.
+
+    SQLiteの呼び出しはスレッドで実行し、イベントループを止めない。
+    """
+
+    def __init__(self, path: str) -> None:
+        """キューを作る（ファイルは最初に使うときに開く）.
+
+        Args:
+            path: SQLiteのファイルパス
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        idempotency_key: Optional[str] = None,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        delay: float = 0.0,
+    ) -> tuple[Job, bool]:
+        """ジョブを登録する.
+
+        Args:
+            kind: 種類
+            payload: 入力（JSONにできる値）
+            idempotency_key: 冪等キー（同じキーのジョブがあればそれを返す）
+            max_attempts: 失敗とするまでの実行回数
+            delay: 実行を始めるまでの秒数
+
+        Returns:
+            tuple[Job, bool]: ジョブと、新しく登録したか
+        """
+        now = time.time()
+        job_id = str(uuid4())
+
+        def insert(conn: sqlite3.Connection) -> tuple[Job, bool]:
+            cursor = conn.execute(
+                "INSERT INTO jobs (id, kind, idempotency_key, payload, status, max_attempts,"
+                " run_after, created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?, ?)"
+                " ON CONFLICT (idempotency_key) DO NOTHING",
+                (job_id, kind, idempotency_key, json.dumps(payload, ensure_ascii=False),
+                 max_attempts, now + delay, now, now),
+            )
+            created = cursor.rowcount == 1
+            if created:
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()
+            return Job(row), created
+
+        return await self._call(insert)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """ジョブを取得する.
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            Optional[Job]: ジョブ（存在しなければNone）
+        """
+        row = await self._call(
+            lambda conn: conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        )
+        return Job(row) if row is not None else None
+
+    async def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> list[Job]:
+        """ジョブを新しい順に取得する.
+
+        Args:
+            status: 状態で絞り込む
+            limit: 最大件数
+
+        Returns:
+            list[Job]: ジョブ
+        """
+        if status is None:
+            query, args = "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        else:
+            query = "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?"
+            args = (status, limit)
+        rows = await self._call(lambda conn: conn.execute(query, args).fetchall())
+        return [Job(row) for row in rows]
+
+    async def counts(self) -> dict[str, int]:
+        """状態ごとのジョブ数を返す.
+
+        Returns:
+            dict[str, int]: 状態 → 件数
+        """
+        rows = await self._call(
+            lambda conn: conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        )
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    async def claim(self, owner: str, kinds: list[str], lease: float) -> Optional[Job]:
+        """実行できるジョブを1件取り出し、リースを取る.
+
+        Args:
+            owner: 取り出すワーカーの識別子
+            kinds: 実行できる種類
+            lease: リースの長さ（秒）
+
+        Returns:
+            Optional[Job]: 取り出したジョブ（なければNone）
+        """
+        if not kinds:
+            return None
+        now = time.time()
+        placeholders = ", ".join("?" for _ in kinds)
+        query = (
+            "UPDATE jobs SET status = 'running', lease_owner = ?, lease_until = ?,"
+            " attempts = attempts + 1, updated_at = ?"
+            " WHERE id = (SELECT id FROM jobs WHERE kind IN (" + placeholders + ")"
+            " AND ((status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?))"
+            " ORDER BY run_after, created_at LIMIT 1)"
+            " RETURNING *"
+        )
+        row = await self._call(
+            lambda conn: conn.execute(query, (owner, now + lease, now, *kinds, now, now)).fetchone()
+        )
+        return Job(row) if row is not None else None
+
+    async def renew(self, job: Job, owner: str, lease: float) -> bool:
+        """リースを延長する.
+
+        Args:
+            job: 実行中のジョブ
+            owner: リースを持つワーカーの識別子
+            lease: 延長後のリースの長さ（秒）
+
+        Returns:
+            bool: 延長できたか（取り消された・他のワーカーに引き取られた場合はFalse）
+        """
+        now = time.time()
+        return await self._update(
+            "UPDATE jobs SET lease_until = ?, updated_at = ?"
+            " WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (now + lease, now, job.id, owner),
+        )
+
+    async def complete(self, job: Job, owner: str, result: Optional[dict]) -> bool:
+        """ジョブを成功にする.
+
+        Args:
+            job: 実行中のジョブ
+            owner: リースを持つワーカーの識別子
+            result: 結果（JSONにできる値）
+
+        Returns:
+            bool: 反映できたか
+        """
+        return await self._finish(
+            job, owner, "status = 'succeeded', result = ?, error = NULL",
+            (json.dumps(result, ensure_ascii=False) if result is not None else None,),
+        )
+
+    async def defer(self, job: Job, owner: str, delay: float) -> bool:
+        """ジョブを待ちに戻す（実行回数には数えず、job.state を保存する）.
+
+        Args:
+            job: 実行中のジョブ
+            owner: リースを持つワーカーの識別子
+            delay: 次に実行するまでの秒数
+
+        Returns:
+            bool: 反映できたか
+        """
+        return await self._finish(
+            job, owner, "status = 'queued', attempts = attempts - 1, run_after = ?, state = ?",
+            (time.time() + delay, json.dumps(job.state, ensure_ascii=False)),
+        )
+
+    async def fail(self, job: Job, owner: str, error: str) -> bool:
+        """失敗を記録し、上限回数までは間隔を空けて再実行する.
+
+        Args:
+            job: 実行中のジョブ
+            owner: リースを持つワーカーの識別子
+            error: 失敗の内容
+
+        Returns:
+            bool: 反映できたか
+        """
+        if job.attempts >= job.max_attempts:
+            return await self._finish(
+                job, owner, "status = 'failed', error = ?, state = ?",
+                (error, json.dumps(job.state, ensure_ascii=False)),
+            )
+        backoff = min(settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1), 3600.0)
+        return await self._finish(
+            job, owner, "status = 'queued', error = ?, run_after = ?, state = ?",
+            (error, time.time() + backoff, json.dumps(job.state, ensure_ascii=False)),
+        )
+
+    async def release(self, job: Job, owner: str) -> bool:
+        """ワーカーの停止で中断したジョブをすぐ実行できる状態に戻す.
+
+        Args:
+            job: 実行中のジョブ
+            owner: リースを持つワーカーの識別子
+
+        Returns:
+            bool: 反映できたか
+        """
+        return await self._finish(
+            job, owner, "status = 'queued', attempts = attempts - 1, run_after = ?, state = ?",
+            (time.time(), json.dumps(job.state, ensure_ascii=False)),
+        )
+
+    async def cancel(self, job_id: str) -> bool:
+        """ジョブを取り消す（実行中ならリースの延長時に止まる）.
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            bool: 取り消したか（終了済みならFalse）
+        """
+        now = time.time()
+        return await self._update(
+            "UPDATE jobs SET status = 'cancelled', lease_owner = NULL, lease_until = NULL,"
+            " updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+            (now, job_id),
+        )
+
+    async def close(self) -> None:
+        """ファイルを閉じる."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _finish(self, job: Job, owner: str, assignments: str, args: tuple) -> bool:
+        """リースを持っている場合だけ実行中のジョブを更新してリースを外す."""
+        return await self._update(
+            "UPDATE jobs SET " + assignments + ", lease_owner = NULL, lease_until = NULL,"
+            " updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (*args, time.time(), job.id, owner),
+        )
+
+    async def _update(self, query: str, args: tuple) -> bool:
+        """更新を実行し、行が更新されたかを返す."""
+        return await self._call(lambda conn: conn.execute(query, args).rowcount == 1)
+
+    async def _call(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """SQLiteの呼び出しをスレッドで実行する."""
+
+        def run() -> Any:
+            with self._lock:
+                return fn(self._connect())
+
+        return await asyncio.to_thread(run)
+
+    def _connect(self) -> sqlite3.Connection:
+        """接続を開く（初回はテーブルを作る）."""
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # 複数のワーカープロセスから同じファイルを使う
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA busy_timeout = 5000")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+
+JobHandler = Callable[[Job], Awaitable[Optional[dict]]]
+
+
+class JobRunner:
+    """キューからジョブを取り出して実行する（ワーカーごとに1つ）.
+
+    Attributes:
+        queue: ジョブキュー
+        concurrency: 同時に実行するジョブ数（0なら実行しない）
+        poll_interval: 実行できるジョブがないときの確認間隔（秒）
+        lease: リースの長さ（秒、この1/3ごとに延長する）
+        owner: リースに記録するワーカーの識別子
+        handlers: 種類 → ハンドラー
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int, poll_interval: float, lease: float) -> None:
+        """ランナーを作る.
+
+        Args:
+            queue: ジョブキュー
+            concurrency: 同時に実行するジョブ数
+            poll_interval: ジョブの確認間隔（秒）
+            lease: リースの長さ（秒）
+        """
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.owner = f"{os.getpid()}-{uuid4().hex[:8]}"
+        self.handlers: dict[str, JobHandler] = {}
+        self._running: dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """ジョブの種類にハンドラーを登録する.
+
+        Args:
+            kind: 種類
+            handler: ジョブを受け取り、結果（JSONにできる値）を返すコルーチン関数
+        """
+        self.handlers[kind] = handler
+
+    def notify(self) -> None:
+        """ジョブを登録したことを知らせ、確認間隔を待たずに取り出させる."""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        """ジョブの取り出しを開始する."""
+        if self._task is None and self.concurrency > 0:
+            self._task = asyncio.create_task(self._run(), name="job-runner")
+
+    async def stop(self) -> None:
+        """取り出しを止め、実行中のジョブを中断してキューに戻す."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def report(self) -> dict:
+        """実行状況を返す.
+
+        Returns:
+            dict: ワーカーの識別子・同時実行数・実行中のジョブID
+        """
+        return {
+            "owner": self.owner,
+            "concurrency": self.concurrency,
+            "running": list(self._running),
+            "kinds": list(self.handlers),
+        }
+
+    async def _run(self) -> None:
+        """空きがあればジョブを取り出して実行する."""
+        while True:
+            try:
+                while len(self._running) < self.concurrency:
+                    job = await self.queue.claim(self.owner, list(self.handlers), self.lease)
+                    if job is None:
+                        break
+                    task = asyncio.create_task(self._execute(job), name=f"job:{job.kind}:{job.id}")
+                    self._running[job.id] = task
+                    task.add_done_callback(lambda _, job_id=job.id: self._on_done(job_id))
+            except Exception as e:
+                logger.exception(f"Failed to claim jobs: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_done(self, job_id: str) -> None:
+        """実行を終えたジョブを外し、次のジョブを取り出させる."""
+        self._running.pop(job_id, None)
+        self._wakeup.set()
+
+    async def _execute(self, job: Job) -> None:
+        """ジョブを実行し、結果をキューに記録する."""
+        heartbeat = asyncio.create_task(self._heartbeat(job, asyncio.current_task()))
+        outcome = "failed"
+        try:
+            result = await self.handlers[job.kind](job)
+            outcome = "succeeded"
+            await self.queue.complete(job, self.owner, result)
+            logger.info(f"Job succeeded: {job.kind} {job.id}")
+        except JobPending as pending:
+            outcome = "pending"
+            await self.queue.defer(job, self.owner, pending.delay)
+        except asyncio.CancelledError:
+            outcome = "interrupted"
+            # 取り消し・他のワーカーへの引き渡しでなければキューに戻す
+            await asyncio.shield(self.queue.release(job, self.owner))
+            raise
+        except Exception as e:
+            logger.warning(f"Job failed: {job.kind} {job.id} (attempt {job.attempts}): {e!r}")
+            await self.queue.fail(job, self.owner, repr(e))
+        finally:
+            heartbeat.cancel()
+            _job_outcomes.labels(job.kind, outcome).inc()
+
+    async def _heartbeat(self, job: Job, task: Optional[asyncio.Task]) -> None:
+        """リースを延長し続け、延長できなくなったら（取り消し）ジョブを止める."""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                renewed = await self.queue.renew(job, self.owner, self.lease)
+            except Exception as e:
+                logger.warning(f"Failed to renew job lease {job.id}: {e!r}")
+                continue
+            if not renewed:
+                logger.info(f"Job lease lost, stopping: {job.kind} {job.id}")
+                if task is not None:
+                    task.cancel()
+                return
+
+
+job_queue = JobQueue(settings.JOB_QUEUE_PATH)
+job_runner = JobRunner(
+    job_queue,
+    concurrency=settings.JOB_CONCURRENCY,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+    lease=settings.JOB_LEASE_SECONDS,
+)
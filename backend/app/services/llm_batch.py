@@ -0,0 +1,229 @@
+"""
+TONARI for M&A - Claudeのバッチ実行
+大量のリクエストをMessage Batches APIでまとめて実行する（料金が半分で、
+面談のリアルタイム処理とレート制限を取り合わない）
+
+- AnthropicBatchBackend: Message Batches API
+- LocalBatchBackend: 通常のMessages APIを同時実行数を絞って呼ぶ代替
+  （開発環境・scripts/fake_anthropic.py 向け。結果は送ったワーカーのプロセス内にだけ保持する）
+
+リクエストは Message Batches API と同じ {"custom_id": ..., "params": {...}} の形で渡し、
+結果は custom_id ごとの BatchResult（応答か、失敗の内容）で受け取る。
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+from uuid import uuid4
+
+from anthropic import AsyncAnthropic, NotFoundError
+from anthropic.types import Message
+
+from ..core.config import settings
+from ..core.metrics import ClaudeMetrics
+
+logger = logging.getLogger(__name__)
+
+_claude_metrics = ClaudeMetrics("batch")
+
+
+class BatchNotFound(LookupError):
+    """バッチが見つからない（ローカルの代替でプロセスが再起動した・結果の保持期限切れ）."""
+
+
+class BatchResult:
+    """バッチの1リクエストの結果.
+
+    Attributes:
+        message: 応答（失敗したらNone）
+        error: 失敗の内容（成功したらNone）
+    """
+
+    __slots__ = ("message", "error")
+
+    def __init__(self, message: Optional[Message] = None, error: Optional[str] = None) -> None:
+        """結果を作る.
+
+        Args:
+            message: 応答
+            error: 失敗の内容
+        """
+        self.message = message
+        self.error = error
+
+
+class BatchBackend(ABC):
+    """バッチ実行の基底クラス.
+
+    Attributes:
+        name: バックエンドの名前（ジョブの途中経過に記録する）
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    async def submit(self, requests: list[dict]) -> str:
+        """リクエストをまとめて送る.
+
+        Args:
+            requests: {"custom_id": ..., "params": messages.create の引数}
+
+        Returns:
+            str: バッチID
+        """
+
+    @abstractmethod
+    async def is_ended(self, batch_id: str) -> bool:
+        """バッチの処理が終わったかを返す.
+
+        Args:
+            batch_id: バッチID
+
+        Returns:
+            bool: すべてのリクエストの処理が終わっていればTrue
+
+        Raises:
+            BatchNotFound: バッチが見つからない場合
+        """
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> dict[str, BatchResult]:
+        """バッチの結果を取得する.
+
+        Args:
+            batch_id: バッチID
+
+        Returns:
+            dict[str, BatchResult]: custom_id → 結果（失敗・取り消し・期限切れは error に内容）
+
+        Raises:
+            BatchNotFound: バッチが見つからない場合
+        """
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """Message Batches APIで実行する."""
+
+    name = "anthropic"
+
+    def __init__(self, client: AsyncAnthropic) -> None:
+        """バックエンドを作る.
+
+        Args:
+            client: Anthropic APIクライアント
+        """
+        self.client = client
+
+    async def submit(self, requests: list[dict]) -> str:
+        """リクエストをまとめて送る."""
+        batch = await self.client.messages.batches.create(requests=requests)
+        logger.info(f"Submitted message batch {batch.id} ({len(requests)} requests)")
+        return batch.id
+
+    async def is_ended(self, batch_id: str) -> bool:
+        """バッチの処理が終わったかを返す."""
+        try:
+            batch = await self.client.messages.batches.retrieve(batch_id)
+        except NotFoundError as e:
+            raise BatchNotFound(batch_id) from e
+        return batch.processing_status == "ended"
+
+    async def results(self, batch_id: str) -> dict[str, BatchResult]:
+        """バッチの結果を取得する."""
+        try:
+            decoder = await self.client.messages.batches.results(batch_id)
+        except NotFoundError as e:
+            raise BatchNotFound(batch_id) from e
+        results: dict[str, BatchResult] = {}
+        async for item in decoder:
+            if item.result.type == "succeeded":
+                results[item.custom_id] = BatchResult(message=item.result.message)
+            elif item.result.type == "errored":
+                error = item.result.error.error
+                results[item.custom_id] = BatchResult(error=f"{error.type}: {error.message}")
+            else:
+                results[item.custom_id] = BatchResult(error=item.result.type)
+        return results
+
+
+class LocalBatchBackend(BatchBackend):
+    """通常のMessages APIを同時実行数を絞って呼ぶ代替.
+
+    バッチは送ったワーカーのプロセス内にだけあるため、他のワーカーや再起動後の
+    ワーカーからは BatchNotFound になる。
+    """
+
+    name = "local"
+
+    def __init__(self, client: AsyncAnthropic, concurrency: int) -> None:
+        """バックエンドを作る.
+
+        Args:
+            client: Anthropic APIクライアント
+            concurrency: 同時に実行するリクエスト数
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self._batches: dict[str, asyncio.Task] = {}
+
+    async def submit(self, requests: list[dict]) -> str:
+        """リクエストの実行をバックグラウンドで始める."""
+        batch_id = f"local_{uuid4().hex}"
+        self._batches[batch_id] = asyncio.create_task(self._run(requests), name=f"batch:{batch_id}")
+        return batch_id
+
+    async def is_ended(self, batch_id: str) -> bool:
+        """バッチの処理が終わったかを返す."""
+        return self._task(batch_id).done()
+
+    async def results(self, batch_id: str) -> dict[str, BatchResult]:
+        """バッチの結果を取得する（取得したバッチは破棄する）."""
+        results = await self._task(batch_id)
+        del self._batches[batch_id]
+        return results
+
+    def _task(self, batch_id: str) -> asyncio.Task:
+        """バッチの実行タスクを返す."""
+        task = self._batches.get(batch_id)
+        if task is None:
+            raise BatchNotFound(batch_id)
+        return task
+
+    async def _run(self, requests: list[dict]) -> dict[str, BatchResult]:
+        """リクエストを順に実行する（失敗したリクエストは Message Batches API と同じく errored にする）."""
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def call(request: dict) -> Message:
+            async with slots:
+                return await _claude_metrics.call(self.client.messages.create(**request["params"]))
+
+        outcomes = await asyncio.gather(
+            *(call(request) for request in requests), return_exceptions=True
+        )
+        results: dict[str, BatchResult] = {}
+        for request, outcome in zip(requests, outcomes):
+            if isinstance(outcome, BaseException):
+                results[request["custom_id"]] = BatchResult(error=repr(outcome))
+            else:
+                results[request["custom_id"]] = BatchResult(message=outcome)
+        return results
+
+
+def create_batch_backend(name: str) -> BatchBackend:
+    """設定に応じたバッチ実行のバックエンドを作る.
+
+    Args:
+        name: anthropic / local
+
+    Returns:
+        BatchBackend: バックエンド
+
+    Raises:
+        ValueError: 未対応の名前の場合
+    """
+    client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+    if name == "anthropic":
+        return AnthropicBatchBackend(client)
+    if name == "local":
+        return LocalBatchBackend(client, settings.LLM_BATCH_LOCAL_CONCURRENCY)
+    raise ValueError(f"Unsupported LLM_BATCH_BACKEND: {name}")
@@ -8,19 +8,47 @@ from datetime import datetime
 from typing import Optional
 
 from anthropic import AsyncAnthropic
+from anthropic.types import Message
 
 from ..core.config import settings
+from ..core.metrics import ClaudeMetrics, registry
 from ..models.mna_schemas import (
-    ExtractionCategory,
+    FIELD_REGISTRY,
     ExtractionField,
     ExtractionResult,
-    InfoLayer,
-    IM_EXTRACTION_FIELDS,
     Utterance,
 )
+from .extraction_context import ExtractionContextBuilder, estimate_tokens, format_utterances
+from .session_timeline import CallTrace
 
 logger = logging.getLogger(__name__)
 
+_claude_metrics = ClaudeMetrics("extraction")
+
+# 1回の抽出の user メッセージの見積もりトークン数のバケット
+PROMPT_TOKEN_BUCKETS = (100, 200, 400, 600, 800, 1200, 1600, 2400, 3200, 6400)
+
+_prompt_tokens = registry.histogram(
+    "tonari_extraction_prompt_tokens",
+    "Estimated per-call (uncached) input tokens of extraction prompts",
+    PROMPT_TOKEN_BUCKETS,
+).labels()
+_prompt_tokens_saved = registry.counter(
+    "tonari_extraction_prompt_tokens_saved_total",
+    "Estimated per-call input tokens saved by the delta context against the full prompt",
+).labels()
+_unknown_fields = registry.counter(
+    "tonari_extraction_unknown_fields_total",
+    "Extracted items dropped because their field key is not in the field registry",
+).labels()
+
+
+# 全項目を並べたプロンプトで、未取得の項目と仮の値に付ける表記
+UNFILLED_MARK = "(未取得)"
+PROVISIONAL_MARK = "（仮・要確認）"
+_UNFILLED_TOKENS = estimate_tokens(UNFILLED_MARK)
+_PROVISIONAL_TOKENS = estimate_tokens(PROVISIONAL_MARK)
+
 
 class MnAExtractionService:
     """M&A情報抽出サービス.
@@ -28,18 +56,31 @@ class MnAExtractionService:
     Attributes:
         client: Anthropic APIクライアント
         model: 使用するモデル名
+        context_builder: 差分コンテキストのプロンプトを作るもの（EXTRACTION_CONTEXT_MODE=full なら None）
     """
 
     def __init__(self) -> None:
         """サービスを初期化する."""
         self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
         self.model = "claude-sonnet-4-20250514"
+        self.context_builder: Optional[ExtractionContextBuilder] = (
+            ExtractionContextBuilder(
+                settings.EXTRACTION_CONTEXT_BUDGET_TOKENS,
+                settings.EXTRACTION_CONTEXT_SUMMARY_CHARS,
+            )
+            if settings.EXTRACTION_CONTEXT_MODE == "delta"
+            else None
+        )
+        # 全項目が未取得で会話のない全文プロンプトの大きさ（減らせたトークン数の見積もりの基準）
+        self._full_base_tokens = estimate_tokens(self._build_extraction_prompt([], {}))
+        self._extraction_schema = self._build_extraction_schema()
 
     async def extract_from_utterances(
         self,
         session_id: str,
         new_utterances: list[Utterance],
         current_extractions: dict[str, ExtractionField],
+        trace: Optional[CallTrace] = None,
     ) -> ExtractionResult:
         """発話から情報を抽出する.
 
@@ -47,40 +88,20 @@ class MnAExtractionService:
             session_id: セッションID
             new_utterances: 新しい発話リスト
             current_extractions: 現在の抽出情報
+            trace: 各段階の時刻の記録先
 
         Returns:
             ExtractionResult: 抽出結果
         """
-        prompt = self._build_extraction_prompt(new_utterances, current_extractions)
-        schema = self._build_extraction_schema()
+        params = self.build_request(new_utterances, current_extractions)
+        if trace is not None:
+            trace.mark("prompt_built")
 
         try:
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                messages=[{"role": "user", "content": prompt}],
-                tools=[
-                    {
-                        "name": "extract_mna_info",
-                        "description": "M&Aヒアリングから情報を抽出する",
-                        "input_schema": schema,
-                    }
-                ],
-                tool_choice={"type": "tool", "name": "extract_mna_info"},
-            )
-
-            # ツール使用結果を解析
-            tool_use = next(
-                (block for block in response.content if block.type == "tool_use"),
-                None,
-            )
-
-            if tool_use is None:
-                logger.warning("No tool use in response")
-                return ExtractionResult(session_id=session_id, fields=[])
-
-            extracted_data = tool_use.input
-            fields = self._parse_extraction_response(extracted_data)
+            response = await _claude_metrics.stream(self.client.messages.stream(**params), trace)
+            fields = self.parse_message(response)
+            if trace is not None:
+                trace.mark("parsed")
 
             return ExtractionResult(
                 session_id=session_id,
@@ -92,12 +113,109 @@ class MnAExtractionService:
             logger.error(f"Extraction failed: {e}")
             return ExtractionResult(session_id=session_id, fields=[])
 
+    def build_request(
+        self,
+        new_utterances: list[Utterance],
+        current_extractions: dict[str, ExtractionField],
+    ) -> dict:
+        """抽出のMessages APIリクエストを組み立てる（バッチ処理でも使う）.
+
+        Args:
+            new_utterances: 新しい発話リスト
+            current_extractions: 現在の抽出情報
+
+        Returns:
+            dict: messages.create / messages.stream の引数
+        """
+        params: dict = {
+            "model": self.model,
+            "max_tokens": 4096,
+            "tools": [
+                {
+                    "name": "extract_mna_info",
+                    "description": "M&Aヒアリングから情報を抽出する",
+                    "input_schema": self._extraction_schema,
+                }
+            ],
+            "tool_choice": {"type": "tool", "name": "extract_mna_info"},
+        }
+
+        if self.context_builder is None:
+            full_prompt = self._build_extraction_prompt(new_utterances, current_extractions)
+            params["messages"] = [{"role": "user", "content": full_prompt}]
+            _prompt_tokens.observe(estimate_tokens(full_prompt))
+            return params
+
+        # ツール定義と system は呼び出しごとに同じなので、キャッシュから読まれる
+        context = self.context_builder.build(new_utterances, current_extractions)
+        params["system"] = [
+            {
+                "type": "text",
+                "text": self.context_builder.static_prefix,
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+        params["messages"] = [{"role": "user", "content": context.text}]
+        _prompt_tokens.observe(context.tokens)
+        full_tokens = self._estimate_full_tokens(current_extractions, context.conversation_tokens)
+        _prompt_tokens_saved.inc(max(full_tokens - context.tokens, 0))
+        return params
+
+    def _estimate_full_tokens(
+        self,
+        current_extractions: dict[str, ExtractionField],
+        conversation_tokens: int,
+    ) -> int:
+        """全項目を並べたプロンプトの見積もりトークン数を、組み立てずに求める.
+
+        全項目が未取得で会話のないプロンプトの大きさに、取得済みの値と会話の分を足す。
+
+        Args:
+            current_extractions: 現在の抽出情報
+            conversation_tokens: 新しい会話の見積もりトークン数
+
+        Returns:
+            int: 見積もったトークン数
+        """
+        tokens = self._full_base_tokens + conversation_tokens
+        for key, extraction in current_extractions.items():
+            if not extraction.value or key not in FIELD_REGISTRY:
+                continue
+            tokens += estimate_tokens(extraction.value) - _UNFILLED_TOKENS
+            if extraction.provisional:
+                tokens += _PROVISIONAL_TOKENS
+        return tokens
+
+    def parse_message(self, message: Message) -> list[ExtractionField]:
+        """抽出のレスポンスからフィールドを取り出す.
+
+        Args:
+            message: Messages APIのレスポンス
+
+        Returns:
+            list[ExtractionField]: 抽出フィールドリスト（ツール使用がなければ空）
+        """
+        # ツール使用結果を解析
+        tool_use = next(
+            (block for block in message.content if block.type == "tool_use"),
+            None,
+        )
+
+        if tool_use is None:
+            logger.warning("No tool use in response")
+            return []
+
+        return self._parse_extraction_response(tool_use.input)
+
     def _build_extraction_prompt(
         self,
         new_utterances: list[Utterance],
         current_extractions: dict[str, ExtractionField],
     ) -> str:
-        """抽出プロンプトを構築する.
+        """全項目を並べた抽出プロンプトを構築する.
+
+        EXTRACTION_CONTEXT_MODE=full で使う（差分コンテキストで減らせたトークン数の
+        見積もりでは、全項目が未取得のときの大きさを基準にする）。
 
         Args:
             new_utterances: 新しい発話リスト
@@ -108,26 +226,19 @@ class MnAExtractionService:
         """
         # 現在の抽出情報をフォーマット
         current_info_lines = []
-        for category in ExtractionCategory:
-            category_fields = IM_EXTRACTION_FIELDS.get(category, [])
-            for field_def in category_fields:
-                field_key = f"{category.value}.{field_def['field']}"
-                extraction = current_extractions.get(field_key)
-                if extraction and extraction.value:
-                    current_info_lines.append(
-                        f"- {field_def['label']}: {extraction.value}"
-                    )
-                else:
-                    current_info_lines.append(f"- {field_def['label']}: (未取得)")
+        for definition in FIELD_REGISTRY:
+            extraction = current_extractions.get(definition.key)
+            if extraction and extraction.value and extraction.provisional:
+                current_info_lines.append(f"- {definition.label}: {extraction.value}{PROVISIONAL_MARK}")
+            elif extraction and extraction.value:
+                current_info_lines.append(f"- {definition.label}: {extraction.value}")
+            else:
+                current_info_lines.append(f"- {definition.label}: {UNFILLED_MARK}")
 
         current_info = "\n".join(current_info_lines)
 
         # 新しい発話をフォーマット
-        utterance_lines = []
-        for u in new_utterances:
-            speaker_label = "アドバイザー" if u.speaker == "user" else "売り手"
-            utterance_lines.append(f"[{speaker_label}] {u.text}")
-        new_conversation = "\n".join(utterance_lines)
+        new_conversation = format_utterances(new_utterances)
 
         return f"""あなたはM&Aアドバイザーのアシスタントです。
 以下の会話から、M&A検討に必要な情報を抽出してください。
@@ -160,11 +271,12 @@ class MnAExtractionService:
 - 明確に言及された情報のみを抽出
 - 推測は避け、確信度を0-1で示す
 - 既に取得済みの情報は出力しない
+- （仮・要確認）の項目は、会話から確認できれば同じ値でも出力し、誤っていれば正しい値を出力する
 - 具体的な数値や固有名詞を正確に抽出
 """
 
     def _build_extraction_schema(self) -> dict:
-        """抽出スキーマを構築する.
+        """抽出スキーマを構築する（項目のキーは FIELD_REGISTRY の列挙に限る）.
 
         Returns:
             dict: JSON Schema
@@ -177,14 +289,10 @@ class MnAExtractionService:
                     "items": {
                         "type": "object",
                         "properties": {
-                            "category": {
-                                "type": "string",
-                                "enum": [c.value for c in ExtractionCategory],
-                                "description": "抽出カテゴリ",
-                            },
-                            "field": {
+                            "key": {
                                 "type": "string",
-                                "description": "フィールド名（英語）",
+                                "enum": list(FIELD_REGISTRY.keys),
+                                "description": "項目のキー（category.field）",
                             },
                             "value": {
                                 "type": "string",
@@ -197,7 +305,7 @@ class MnAExtractionService:
                                 "description": "確信度（0-1）",
                             },
                         },
-                        "required": ["category", "field", "value", "confidence"],
+                        "required": ["key", "value", "confidence"],
                     },
                 },
             },
@@ -207,6 +315,9 @@ class MnAExtractionService:
     def _parse_extraction_response(self, data: dict) -> list[ExtractionField]:
         """抽出レスポンスをパースする.
 
+        FIELD_REGISTRY にない項目は捨てる。スキーマを変える前に送ったバッチの
+        結果を読めるよう、key の代わりに category と field がある形も受け付ける。
+
         Args:
             data: APIレスポンスデータ
 
@@ -218,145 +329,30 @@ class MnAExtractionService:
 
         for item in extractions:
             try:
-                category = ExtractionCategory(item["category"])
-                field_name = item["field"]
-
-                # フィールド定義からレイヤーを取得
-                layer = InfoLayer.SURFACE
-                category_fields = IM_EXTRACTION_FIELDS.get(category, [])
-                for field_def in category_fields:
-                    if field_def["field"] == field_name:
-                        layer = field_def.get("layer", InfoLayer.SURFACE)
-                        break
+                key = item.get("key")
+                definition = (
+                    FIELD_REGISTRY.get(key)
+                    if key is not None
+                    else FIELD_REGISTRY.lookup(item["category"], item["field"])
+                )
+                if definition is None:
+                    _unknown_fields.inc()
+                    logger.warning(
+                        f"Unknown extraction field: {key or (item['category'], item['field'])}"
+                    )
+                    continue
 
                 fields.append(
                     ExtractionField(
-                        category=category,
-                        field=field_name,
+                        category=definition.category,
+                        field=definition.field,
                         value=item["value"],
                         confidence=item["confidence"],
-                        layer=layer,
+                        layer=definition.layer,
                     )
                 )
-            except (ValueError, KeyError) as e:
+            except (ValueError, KeyError, TypeError) as e:
                 logger.warning(f"Failed to parse extraction: {e}")
                 continue
 
         return fields
-
-    def get_missing_fields(
-        self,
-        current_extractions: dict[str, ExtractionField],
-        priority_layer: Optional[InfoLayer] = None,
-    ) -> list[dict]:
-        """未取得フィールドを取得する.
-
-        Args:
-            current_extractions: 現在の抽出情報
-            priority_layer: 優先するレイヤー（指定時はそのレイヤーを優先）
-
-        Returns:
-            list[dict]: 未取得フィールドリスト（優先度順）
-        """
-        missing = []
-
-        for category in ExtractionCategory:
-            category_fields = IM_EXTRACTION_FIELDS.get(category, [])
-            for field_def in category_fields:
-                field_key = f"{category.value}.{field_def['field']}"
-                extraction = current_extractions.get(field_key)
-
-                if extraction is None or extraction.value is None:
-                    missing.append(
-                        {
-                            "category": category.value,
-                            "field": field_def["field"],
-                            "label": field_def["label"],
-                            "layer": field_def.get("layer", InfoLayer.SURFACE),
-                        }
-                    )
-
-        # レイヤー優先度でソート（表層→構造→本質→出口）
-        layer_priority = {
-            InfoLayer.SURFACE: 0,
-            InfoLayer.STRUCTURE: 1,
-            InfoLayer.ESSENCE: 2,
-            InfoLayer.EXIT: 3,
-        }
-
-        if priority_layer:
-            # 指定レイヤーを最優先
-            missing.sort(
-                key=lambda x: (
-                    0 if x["layer"] == priority_layer else 1,
-                    layer_priority.get(x["layer"], 99),
-                )
-            )
-        else:
-            missing.sort(key=lambda x: layer_priority.get(x["layer"], 99))
-
-        return missing
-
-    def calculate_extraction_progress(
-        self,
-        current_extractions: dict[str, ExtractionField],
-    ) -> dict:
-        """抽出進捗を計算する.
-
-        Args:
-            current_extractions: 現在の抽出情報
-
-        Returns:
-            dict: 進捗情報
-        """
-        total = 0
-        filled = 0
-        by_category = {}
-        by_layer = {layer: {"total": 0, "filled": 0} for layer in InfoLayer}
-
-        for category in ExtractionCategory:
-            category_fields = IM_EXTRACTION_FIELDS.get(category, [])
-            category_total = len(category_fields)
-            category_filled = 0
-
-            for field_def in category_fields:
-                field_key = f"{category.value}.{field_def['field']}"
-                extraction = current_extractions.get(field_key)
-                layer = field_def.get("layer", InfoLayer.SURFACE)
-
-                total += 1
-                by_layer[layer]["total"] += 1
-
-                if extraction and extraction.value:
-                    filled += 1
-                    category_filled += 1
-                    by_layer[layer]["filled"] += 1
-
-            by_category[category.value] = {
-                "total": category_total,
-                "filled": category_filled,
-                "percentage": (
-                    round(category_filled / category_total * 100, 1)
-                    if category_total > 0
-                    else 0
-                ),
-            }
-
-        return {
-            "total": total,
-            "filled": filled,
-            "percentage": round(filled / total * 100, 1) if total > 0 else 0,
-            "by_category": by_category,
-            "by_layer": {
-                layer.value: {
-                    "total": data["total"],
-                    "filled": data["filled"],
-                    "percentage": (
-                        round(data["filled"] / data["total"] * 100, 1)
-                        if data["total"] > 0
-                        else 0
-                    ),
-                }
-                for layer, data in by_layer.items()
-            },
-        }
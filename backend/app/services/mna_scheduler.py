@@ -0,0 +1,363 @@
+"""
+TONARI for M&A - 抽出・サジェスト処理のスケジューリング
+- バッファをいつ処理に回すか（フラッシュ判定）
+- セッションごとに処理ラウンドの同時実行を1つに制限し、要求をまとめる
+"""
+import asyncio
+import logging
+import re
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FlushReason(str, Enum):
+    """バッファをフラッシュした理由."""
+
+    MAX_LATENCY = "max_latency"  # 最古の発話から一定時間経過
+    CHAR_THRESHOLD = "char_threshold"  # 文字数が上限に到達
+    HIGH_VALUE_SIGNAL = "high_value_signal"  # 金額・社名・譲渡キーワード等を検出
+    UTTERANCE_COUNT = "utterance_count"  # 発話数が規定数に到達
+
+
+# 抽出を急ぐべき発話のシグナル。1パスで判定できるよう名前付きグループで1本にまとめる
+HIGH_VALUE_SIGNAL = re.compile(
+    r"(?P<amount>[0-9０-９一二三四五六七八九十百千]+(?:\.[0-9]+)?\s*(?:億|千万|百万|万|円))"
+    r"|(?P<number>[0-9０-９]+)"
+    r"|(?P<company>株式会社|有限会社|合同会社|（株）|\(株\)|ホールディングス)"
+    r"|(?P<transfer>譲渡|後継|承継|売却|引退|M&A|Ｍ＆Ａ)"
+)
+
+
+class BufferStats:
+    """フラッシュ判定用にバッファの状態を逐次集計する.
+
+    発話が追加されるたびに新しい発話だけを走査するため、判定コストは
+    バッファの長さに依存しない。
+
+    Attributes:
+        utterance_count: バッファ内の発話数
+        char_count: バッファ内の総文字数
+        first_at: 最古の発話を受け取った時刻（monotonic秒）
+        signals: 検出したシグナル名
+        flush_reason: 最初にフラッシュを要求した理由（未要求ならNone）
+    """
+
+    def __init__(self) -> None:
+        """空のバッファ状態を作る."""
+        self.utterance_count = 0
+        self.char_count = 0
+        self.first_at: Optional[float] = None
+        self.signals: set[str] = set()
+        self.flush_reason: Optional[FlushReason] = None
+
+    def add(self, text: str, now: float) -> None:
+        """発話を集計に加える.
+
+        Args:
+            text: 発話テキスト
+            now: 受信時刻（monotonic秒）
+        """
+        if self.first_at is None:
+            self.first_at = now
+        self.utterance_count += 1
+        self.char_count += len(text)
+        for match in HIGH_VALUE_SIGNAL.finditer(text):
+            self.signals.add(match.lastgroup)
+
+
+class TriggerPolicy(ABC):
+    """バッファのフラッシュ判定ポリシーの基底クラス.
+
+    SessionWebSocketManager に別の判定（会議の種類ごとの閾値など）を差し込めるよう
+    判定の入口だけを定める。
+    """
+
+    @abstractmethod
+    def evaluate(self, stats: BufferStats, now: float) -> Optional[FlushReason]:
+        """バッファをフラッシュすべきか判定する.
+
+        Args:
+            stats: バッファの集計
+            now: 現在時刻（monotonic秒）
+
+        Returns:
+            Optional[FlushReason]: フラッシュすべきならその理由
+        """
+
+    def next_deadline(self, stats: BufferStats) -> Optional[float]:
+        """時間経過で判定が変わりうる次の時刻を返す.
+
+        Args:
+            stats: バッファの集計
+
+        Returns:
+            Optional[float]: 再判定すべき時刻（monotonic秒）。不要ならNone
+        """
+        return None
+
+
+class AdaptiveTriggerPolicy(TriggerPolicy):
+    """時間・文字数・内容を組み合わせたフラッシュ判定ポリシー.
+
+    - 金額・社名・譲渡関連のシグナルがあれば即座にフラッシュ（単なる数字では急がない。
+      「2つ」「3回目」のような数字は話の途中に頻繁に出るため、毎回フラッシュすると
+      ラウンドが細切れになり、続く発話でサジェストが置き換えられ続ける）
+    - 文字数が上限に達したらフラッシュ（長い独白を待たせない）
+    - 発話数が規定数に達しても、短い相槌ばかりならフラッシュしない
+    - 最古の発話から max_latency 秒経てばフラッシュ（相槌だけなら待つ）
+
+    Attributes:
+        max_latency: 最古の発話からフラッシュまでの最大待ち時間（秒）
+        max_chars: 即座にフラッシュする文字数
+        min_utterances: 発話数でフラッシュする規定数
+        min_chars: 発話数・時間でフラッシュするのに必要な最低文字数
+        early_signals: 即座にフラッシュするシグナル名
+    """
+
+    def __init__(
+        self,
+        max_latency: float = 10.0,
+        max_chars: int = 200,
+        min_utterances: int = 3,
+        min_chars: int = 30,
+        early_signals: frozenset[str] = frozenset({"amount", "company", "transfer"}),
+    ) -> None:
+        """ポリシーを初期化する.
+
+        Args:
+            max_latency: 最大待ち時間（秒）
+            max_chars: 即座にフラッシュする文字数
+            min_utterances: 発話数でフラッシュする規定数
+            min_chars: 発話数・時間でフラッシュするのに必要な最低文字数
+            early_signals: 即座にフラッシュするシグナル名
+        """
+        self.max_latency = max_latency
+        self.max_chars = max_chars
+        self.min_utterances = min_utterances
+        self.min_chars = min_chars
+        self.early_signals = early_signals
+
+    def evaluate(self, stats: BufferStats, now: float) -> Optional[FlushReason]:
+        """バッファをフラッシュすべきか判定する.
+
+        Args:
+            stats: バッファの集計
+            now: 現在時刻（monotonic秒）
+
+        Returns:
+            Optional[FlushReason]: フラッシュすべきならその理由
+        """
+        if stats.utterance_count == 0:
+            return None
+        if stats.signals & self.early_signals:
+            return FlushReason.HIGH_VALUE_SIGNAL
+        if stats.char_count >= self.max_chars:
+            return FlushReason.CHAR_THRESHOLD
+        if stats.char_count < self.min_chars:
+            return None
+        if stats.utterance_count >= self.min_utterances:
+            return FlushReason.UTTERANCE_COUNT
+        if now - stats.first_at >= self.max_latency:
+            return FlushReason.MAX_LATENCY
+        return None
+
+    def next_deadline(self, stats: BufferStats) -> Optional[float]:
+        """最古の発話の待ち時間が上限に達する時刻を返す.
+
+        Args:
+            stats: バッファの集計
+
+        Returns:
+            Optional[float]: 再判定すべき時刻（monotonic秒）
+        """
+        if stats.first_at is None or stats.char_count < self.min_chars:
+            return None
+        return stats.first_at + self.max_latency
+
+
+class TriggerMetrics:
+    """セッションごとのフラッシュ理由の集計.
+
+    Attributes:
+        counts: 理由ごとのフラッシュ回数
+        recent: 直近のフラッシュ記録（上限付き）
+    """
+
+    def __init__(self, history_size: int = 50) -> None:
+        """集計を初期化する.
+
+        Args:
+            history_size: 保持する直近の記録数
+        """
+        self.counts: dict[str, int] = {reason.value: 0 for reason in FlushReason}
+        self.recent: deque[dict] = deque(maxlen=history_size)
+
+    def record(self, stats: BufferStats, now: float) -> None:
+        """フラッシュを記録する.
+
+        Args:
+            stats: フラッシュしたバッファの集計
+            now: フラッシュ時刻（monotonic秒）
+        """
+        reason = stats.flush_reason.value if stats.flush_reason else "unknown"
+        self.counts[reason] = self.counts.get(reason, 0) + 1
+        self.recent.append(
+            {
+                "reason": reason,
+                "utterances": stats.utterance_count,
+                "chars": stats.char_count,
+                "signals": sorted(stats.signals),
+                "waited_seconds": round(now - stats.first_at, 3) if stats.first_at else 0.0,
+                "flushed_at": datetime.now().isoformat(),
+            }
+        )
+
+    def to_dict(self) -> dict:
+        """APIレスポンス用の辞書に変換する.
+
+        Returns:
+            dict: 理由ごとの回数と直近の記録
+        """
+        return {
+            "total": sum(self.counts.values()),
+            "counts": dict(self.counts),
+            "recent": list(self.recent),
+        }
+
+
+class RoundScheduler:
+    """セッション単位のシングルフライト・スケジューラ.
+
+    1セッションにつき実行中の処理ラウンドは常に高々1つ。実行中に届いた
+    要求は1つにまとめ、実行中のラウンドが終わった直後に1回だけ次の
+    ラウンドを実行する。その間に届いた発話はバッファに溜まり続けるため、
+    次のラウンドでまとめて処理される。
+
+    要求のたびに世代番号を進めるので、ラウンドは完了時に `is_superseded` で
+    次のラウンドが実行待ちかを確認し、古い入力に基づく結果（サジェストなど）を
+    破棄できる。run_roundは最初のawaitより前に入力（バッファ）を取り出すこと。
+
+    Attributes:
+        run_round: 1ラウンドを実行するコルーチン関数（session_id, 世代番号）
+    """
+
+    def __init__(self, run_round: Callable[[str, int], Awaitable[None]]) -> None:
+        """スケジューラを初期化する.
+
+        Args:
+            run_round: 1ラウンドを実行するコルーチン関数
+        """
+        self.run_round = run_round
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._pending: set[str] = set()
+        self._generation: dict[str, int] = {}
+        self._closed = False
+
+    def request(self, session_id: str) -> None:
+        """処理ラウンドを要求する.
+
+        実行中のラウンドがなければ即座に開始し、あれば完了後の
+        再実行を予約する（予約は何回要求されても1回にまとめる）。
+
+        Args:
+            session_id: セッションID
+        """
+        self._generation[session_id] = self._generation.get(session_id, 0) + 1
+        if self._closed:
+            return
+        if session_id in self._in_flight:
+            self._pending.add(session_id)
+            return
+        self._start(session_id)
+
+    def is_superseded(self, session_id: str, generation: int) -> bool:
+        """ラウンドの結果が、実行待ちの次のラウンドで置き換えられるかを返す.
+
+        世代番号が進んでいても、次のラウンドが実行待ちでなければ（終了処理中で
+        予約を受け付けないなど）結果を置き換えるラウンドは来ないためFalse。
+
+        Args:
+            session_id: セッションID
+            generation: ラウンド開始時の世代番号
+
+        Returns:
+            bool: より新しいラウンドが実行待ちならTrue
+        """
+        return session_id in self._pending and self._generation.get(session_id, 0) != generation
+
+    def is_running(self, session_id: str) -> bool:
+        """ラウンドが実行中かを返す.
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            bool: 実行中ならTrue
+        """
+        return session_id in self._in_flight
+
+    def forget(self, session_id: str) -> None:
+        """セッションの予約と世代番号を破棄する（実行中のラウンドは止めない）.
+
+        Args:
+            session_id: セッションID
+        """
+        self._pending.discard(session_id)
+        if session_id not in self._in_flight:
+            self._generation.pop(session_id, None)
+
+    async def drain(self, timeout: float) -> int:
+        """新しいラウンドを始めないようにし、実行中のラウンドの完了を待つ.
+
+        予約済みのラウンドは実行しない。時間内に終わらなかったラウンドは取り消す。
+
+        Args:
+            timeout: 待つ時間の上限（秒）
+
+        Returns:
+            int: 取り消したラウンド数
+        """
+        self._closed = True
+        self._pending.clear()
+        tasks = list(self._in_flight.values())
+        if not tasks:
+            return 0
+        _, unfinished = await asyncio.wait(tasks, timeout=max(timeout, 0.0))
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.wait(unfinished)
+        return len(unfinished)
+
+    def _start(self, session_id: str) -> None:
+        """ラウンドを開始する."""
+        task = asyncio.create_task(self._run(session_id), name=f"round-{session_id}")
+        self._in_flight[session_id] = task
+        task.add_done_callback(self._on_round_done)
+
+    async def _run(self, session_id: str) -> None:
+        """ラウンドを実行し、予約があれば続けて次のラウンドを開始する."""
+        # タスクが動き出すまでに届いた要求はこのラウンドの入力に含まれるため、
+        # 世代番号は開始時ではなく実行開始時点のものを使い、予約も取り消す
+        generation = self._generation[session_id]
+        self._pending.discard(session_id)
+        try:
+            await self.run_round(session_id, generation)
+        finally:
+            del self._in_flight[session_id]
+            if session_id in self._pending:
+                self._pending.discard(session_id)
+                self._start(session_id)
+
+    def _on_round_done(self, task: asyncio.Task) -> None:
+        """ラウンドの例外をログに残す（次のラウンドは_runで開始済み）."""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Processing round failed: {error!r}", exc_info=error)
@@ -11,6 +11,7 @@ from uuid import uuid4
 from anthropic import AsyncAnthropic
 
 from ..core.config import settings
+from ..core.metrics import ClaudeMetrics
 from ..models.mna_schemas import (
     ExtractionField,
     Hypothesis,
@@ -21,9 +22,13 @@ from ..models.mna_schemas import (
     SuggestionType,
     Utterance,
 )
+from .session_timeline import CallTrace
 
 logger = logging.getLogger(__name__)
 
+_suggestion_metrics = ClaudeMetrics("suggestion")
+_reframing_metrics = ClaudeMetrics("reframing")
+
 
 # ネガティブワードパターン（リフレーミング対象）
 NEGATIVE_PATTERNS: dict[str, dict] = {
@@ -92,6 +97,7 @@ class MnASuggestionService:
         current_extractions: dict[str, ExtractionField],
         missing_fields: list[dict],
         hypotheses: list[Hypothesis],
+        trace: Optional[CallTrace] = None,
     ) -> list[Suggestion]:
         """サジェストを生成する.
 
@@ -101,6 +107,7 @@ class MnASuggestionService:
             current_extractions: 現在の抽出情報
             missing_fields: 未取得フィールドリスト
             hypotheses: 現在の仮説リスト
+            trace: 各段階の時刻の記録先
 
         Returns:
             list[Suggestion]: サジェストリスト
@@ -111,20 +118,25 @@ class MnASuggestionService:
             missing_fields,
             hypotheses,
         )
+        if trace is not None:
+            trace.mark("prompt_built")
 
         try:
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=2048,
-                messages=[{"role": "user", "content": prompt}],
-                tools=[
-                    {
-                        "name": "suggest_questions",
-                        "description": "次に聞くべき質問を提案する",
-                        "input_schema": self._build_suggestion_schema(),
-                    }
-                ],
-                tool_choice={"type": "tool", "name": "suggest_questions"},
+            response = await _suggestion_metrics.stream(
+                self.client.messages.stream(
+                    model=self.model,
+                    max_tokens=2048,
+                    messages=[{"role": "user", "content": prompt}],
+                    tools=[
+                        {
+                            "name": "suggest_questions",
+                            "description": "次に聞くべき質問を提案する",
+                            "input_schema": self._build_suggestion_schema(),
+                        }
+                    ],
+                    tool_choice={"type": "tool", "name": "suggest_questions"},
+                ),
+                trace,
             )
 
             tool_use = next(
@@ -155,6 +167,9 @@ class MnASuggestionService:
                     logger.warning(f"Failed to parse suggestion: {e}")
                     continue
 
+            if trace is not None:
+                trace.mark("parsed")
+
             # 優先度でソート
             suggestions.sort(key=lambda x: x.priority, reverse=True)
             return suggestions[:5]  # 上位5件
@@ -222,43 +237,45 @@ M&Aの観点からポジティブに解釈できる可能性を提示してく
 """
 
         try:
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                messages=[{"role": "user", "content": prompt}],
-                tools=[
-                    {
-                        "name": "reframe",
-                        "description": "リフレーミング提案を出力",
-                        "input_schema": {
-                            "type": "object",
-                            "properties": {
-                                "has_negative": {
-                                    "type": "boolean",
-                                    "description": "ネガティブ要素があるか",
-                                },
-                                "negative_word": {
-                                    "type": "string",
-                                    "description": "ネガティブワード",
-                                },
-                                "positive_interpretation": {
-                                    "type": "string",
-                                    "description": "ポジティブな解釈",
-                                },
-                                "follow_up_question": {
-                                    "type": "string",
-                                    "description": "確認すべき質問",
-                                },
-                                "reframe_conditions": {
-                                    "type": "string",
-                                    "description": "ポジティブに転換できる条件",
+            response = await _reframing_metrics.call(
+                self.client.messages.create(
+                    model=self.model,
+                    max_tokens=1024,
+                    messages=[{"role": "user", "content": prompt}],
+                    tools=[
+                        {
+                            "name": "reframe",
+                            "description": "リフレーミング提案を出力",
+                            "input_schema": {
+                                "type": "object",
+                                "properties": {
+                                    "has_negative": {
+                                        "type": "boolean",
+                                        "description": "ネガティブ要素があるか",
+                                    },
+                                    "negative_word": {
+                                        "type": "string",
+                                        "description": "ネガティブワード",
+                                    },
+                                    "positive_interpretation": {
+                                        "type": "string",
+                                        "description": "ポジティブな解釈",
+                                    },
+                                    "follow_up_question": {
+                                        "type": "string",
+                                        "description": "確認すべき質問",
+                                    },
+                                    "reframe_conditions": {
+                                        "type": "string",
+                                        "description": "ポジティブに転換できる条件",
+                                    },
                                 },
+                                "required": ["has_negative"],
                             },
-                            "required": ["has_negative"],
-                        },
-                    }
-                ],
-                tool_choice={"type": "tool", "name": "reframe"},
+                        }
+                    ],
+                    tool_choice={"type": "tool", "name": "reframe"},
+                )
             )
 
             tool_use = next(
@@ -0,0 +1,196 @@
+"""
+TONARI for M&A - 終了したセッションの再抽出
+抽出プロンプトや IM_EXTRACTION_FIELDS を変えたあと、終了したセッションの
+発話ログから抽出をやり直す（バックグラウンドジョブ）
+
+1回目の実行で全セッションの窓（一括取り込みと同じ区切り方）をバッチに
+まとめて送り、完了するまで JobPending で待つ。完了したら窓の順に結果を
+まとめてストアに書き込む。手動で入力した項目（確信度1）は上書きしない。
+
+ローカルの代替のバッチは送ったワーカーにしかないため、別のワーカーが
+ジョブを取り出したり送ったワーカーが再起動したりすると見つからない。
+そのときは max_resubmits 回まで送り直し、それを超えたらジョブを失敗にする
+（送り直すたびにClaudeを呼び直すため、際限なく繰り返さない）。
+"""
+import logging
+from collections import defaultdict
+from typing import Callable, Optional
+
+from ..core.config import settings
+from ..models.mna_schemas import ExtractionField
+from .job_queue import Job, JobPending
+from .llm_batch import BatchBackend, BatchNotFound, BatchResult
+from .mna_extraction import MnAExtractionService
+from .session_store import SessionStore
+from .transcript_ingest import WindowBuilder, merge_window_fields
+
+logger = logging.getLogger(__name__)
+
+REEXTRACT_JOB = "reextract_sessions"
+
+# 手動で入力した項目の確信度（update_extraction と同じ）
+MANUAL_CONFIDENCE = 1.0
+
+
+class ReextractionHandler:
+    """再抽出ジョブのハンドラー.
+
+    ジョブの入力は {"session_ids": [...]}。途中経過（job.state）にバッチIDを記録する。
+
+    Attributes:
+        store: 共有セッションストア
+        extraction_service: 抽出サービス（リクエストの組み立てと応答の解析）
+        backend: バッチ実行のバックエンド
+        poll_interval: バッチの完了を確認する間隔（秒）
+        max_resubmits: 見つからないバッチを送り直す上限回数
+        on_updated: 書き込んだ抽出情報をワーカーのメモリ上のセッションにも反映する関数
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        extraction_service: MnAExtractionService,
+        backend: BatchBackend,
+        poll_interval: float,
+        max_resubmits: int,
+        on_updated: Optional[Callable[[str, dict[str, ExtractionField]], None]] = None,
+    ) -> None:
+        """ハンドラーを作る.
+
+        Args:
+            store: 共有セッションストア
+            extraction_service: 抽出サービス
+            backend: バッチ実行のバックエンド
+            poll_interval: バッチの完了を確認する間隔（秒）
+            max_resubmits: 見つからないバッチを送り直す上限回数
+            on_updated: セッションIDと書き込んだ抽出情報を受け取る関数
+        """
+        self.store = store
+        self.extraction_service = extraction_service
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.max_resubmits = max_resubmits
+        self.on_updated = on_updated
+
+    async def __call__(self, job: Job) -> dict:
+        """ジョブを1段階進める.
+
+        Args:
+            job: 再抽出ジョブ
+
+        Returns:
+            dict: 更新したセッション・フィールド数と、対象外・失敗したセッション・失敗した窓
+
+        Raises:
+            JobPending: バッチを送った・まだ処理中の場合
+            BatchNotFound: バッチが見つからず、送り直しの上限に達した場合
+        """
+        batch_id = job.state.get("batch_id")
+        resubmits = job.state.get("resubmits", 0)
+        if batch_id is None:
+            requests, skipped = await self._build_requests(job.payload["session_ids"])
+            if not requests:
+                return {"sessions": 0, "fields": 0, "skipped": skipped, "failed": [], "errors": {}}
+            job.state = {
+                "batch_id": await self.backend.submit(requests),
+                "backend": self.backend.name,
+                "requests": len(requests),
+                "skipped": skipped,
+                "resubmits": resubmits,
+            }
+            raise JobPending(self.poll_interval)
+
+        try:
+            if not await self.backend.is_ended(batch_id):
+                raise JobPending(self.poll_interval)
+            results = await self.backend.results(batch_id)
+        except BatchNotFound:
+            if resubmits >= self.max_resubmits:
+                raise
+            logger.warning(
+                f"Batch {batch_id} not found, resubmitting job {job.id} "
+                f"({resubmits + 1}/{self.max_resubmits})"
+            )
+            job.state = {"resubmits": resubmits + 1}
+            raise JobPending(0)
+        return await self._apply(results, job.state.get("skipped", []))
+
+    async def _build_requests(self, session_ids: list[str]) -> tuple[list[dict], list[str]]:
+        """終了したセッションの窓ごとのリクエストを組み立てる.
+
+        Returns:
+            tuple[list[dict], list[str]]: バッチのリクエストと、対象外のセッションID
+        """
+        requests: list[dict] = []
+        skipped: list[str] = []
+        for session_id in session_ids:
+            session = await self.store.load_session(session_id)
+            # 進行中のセッションはライブのラウンドと書き込みが競合するため対象外
+            if session is None or session.status != "completed" or not session.utterances:
+                skipped.append(session_id)
+                continue
+            builder = WindowBuilder(settings.BULK_INGEST_WINDOW_CHARS, settings.BULK_INGEST_OVERLAP_CHARS)
+            windows = [window for window in map(builder.add, session.utterances) if window is not None]
+            last = builder.close()
+            if last is not None:
+                windows.append(last)
+            for window in windows:
+                requests.append(
+                    {
+                        "custom_id": f"{session_id}-{window.index}",
+                        "params": self.extraction_service.build_request(window.utterances, {}),
+                    }
+                )
+        return requests, skipped
+
+    async def _apply(self, results: dict[str, BatchResult], skipped: list[str]) -> dict:
+        """窓の結果をセッションごとにまとめて書き込む.
+
+        1つでも窓が失敗したセッションは書き込まず、failed として返す
+        （一部の窓だけの結果で上書きしないため。ジョブを登録し直せばやり直せる）。
+        失敗した窓は custom_id ごとの失敗の内容を errors として返す。
+        """
+        windows: dict[str, dict[int, Optional[list[ExtractionField]]]] = defaultdict(dict)
+        errors: dict[str, str] = {}
+        for custom_id, result in results.items():
+            session_id, index = custom_id.rsplit("-", 1)
+            if result.error is not None:
+                errors[custom_id] = result.error
+                windows[session_id][int(index)] = None
+            else:
+                windows[session_id][int(index)] = self.extraction_service.parse_message(result.message)
+
+        failed: list[str] = []
+        updated_sessions = 0
+        updated_fields = 0
+        for session_id, session_windows in windows.items():
+            ordered = [session_windows[index] for index in sorted(session_windows)]
+            if any(fields is None for fields in ordered):
+                failed.append(session_id)
+                continue
+            session = await self.store.load_session(session_id)
+            if session is None:
+                failed.append(session_id)
+                continue
+            updated = {
+                key: field
+                for key, field in merge_window_fields(ordered).items()
+                if key not in session.extractions
+                or session.extractions[key].confidence < MANUAL_CONFIDENCE
+            }
+            await self.store.set_extractions(session_id, updated)
+            if self.on_updated is not None:
+                self.on_updated(session_id, updated)
+            updated_sessions += 1
+            updated_fields += len(updated)
+        logger.info(
+            f"Re-extracted {updated_sessions} sessions ({updated_fields} fields, {len(failed)} failed, "
+            f"{len(errors)} windows errored)"
+        )
+        return {
+            "sessions": updated_sessions,
+            "fields": updated_fields,
+            "skipped": skipped,
+            "failed": failed,
+            "errors": errors,
+        }
@@ -0,0 +1,272 @@
+"""
+TONARI for M&A - 処理ラウンドの情報量による呼び出しの間引き
+「はい」「そうですね」「なるほど」のような相槌だけのバッファや、直近の会話が
+前回から変わっていないラウンドでは、Claudeの抽出・サジェストを呼ばずに済ませる
+
+- 抽出: バッファの情報量を手元で採点し、足りなければ呼ばずに発話を次の
+  ラウンドへ持ち越す（持ち越した発話は次のバッファの先頭に付けて抽出する）
+- サジェスト: 直近の会話のうち中身のある発話・抽出情報・レイヤー・仮説の
+  フィンガープリントが前回サジェストを出したときと同じなら呼ばない
+
+採点（1パスの正規表現のみで、トークナイザーや形態素解析は使わない）:
+    content_chars  相槌・記号を除いた文字数（CHARS_PER_POINT 文字で1点）
+    signals        金額・数字・社名・譲渡関連のシグナル（HIGH_VALUE_SIGNAL、1種類1点）
+    fields         抽出項目の手がかりの語（FIELD_REGISTRY の名称と言い換え、1項目1点）
+    entities       カタカナ・英字の固有名詞らしい語（1語 ENTITY_POINT 点）
+"""
+import re
+from typing import Iterable, Optional
+
+from ..models.mna_schemas import FIELD_REGISTRY, ExtractionField, Hypothesis, InfoLayer, Utterance
+from .mna_scheduler import HIGH_VALUE_SIGNAL
+
+# 相槌・つなぎの言葉（これだけの発話は情報量0として扱う）
+_FILLERS = re.compile(
+    r"はい|ええと|えーと|えっと|ええ|えー|あー|あの|うーん|うん|まあ|そうですね|そうですか|そうです|"
+    r"なるほど|確かに|たしかに|はあ|へえ|ほう|わかりました|分かりました|承知しました|了解です|"
+    r"ありがとうございます|よろしくお願いします|お願いします|すみません"
+)
+# 文字数に数えない記号・空白
+_NOISE = re.compile(r"[\s、。，．,.!?！？…・「」『』（）()ー〜~]")
+# カタカナ3文字以上・英字2文字以上の語（社名・製品名・人名のカタカナ表記など）
+_ENTITY = re.compile(r"[ァ-ヴ][ァ-ヴー]{2,}|[A-Za-zＡ-Ｚａ-ｚ][A-Za-z0-9Ａ-Ｚａ-ｚ０-９&＆\-]+")
+
+# 抽出項目の名称のほかに、会話で使われる言い方（フィールドキー → 語）
+FIELD_ALIASES: dict[str, tuple[str, ...]] = {
+    "basic_info.company_name": ("社名", "屋号"),
+    "basic_info.location": ("本社", "拠点", "工場", "営業所"),
+    "basic_info.established_year": ("設立", "創業", "創立"),
+    "basic_info.employee_count": ("従業員", "社員", "パート", "人員"),
+    "basic_info.representative": ("社長", "代表", "会長"),
+    "basic_info.history": ("歴史", "先代", "二代目", "三代目"),
+    "financial.revenue_latest": ("売上", "売り上げ", "年商"),
+    "financial.revenue_trend": ("増収", "減収", "前期"),
+    "financial.operating_profit": ("利益", "黒字", "赤字", "利益率"),
+    "financial.ordinary_profit": ("経常",),
+    "financial.net_assets": ("自己資本", "債務超過"),
+    "financial.debt": ("借入", "借り入れ", "借金", "融資", "負債", "保証"),
+    "financial.main_kpis": ("単価", "稼働率", "粗利", "客数"),
+    "business.business_description": ("事業", "業務", "仕事"),
+    "business.main_products_services": ("製品", "商品", "サービス"),
+    "business.main_clients": ("取引先", "得意先", "元請", "仕入"),
+    "business.client_composition": ("顧客", "お客様", "依存"),
+    "business.competitive_advantage": ("優位", "特許", "技術", "ノウハウ"),
+    "business.industry_trends": ("業界", "市場", "需要"),
+    "business.market_position": ("シェア", "競合", "同業"),
+    "organization.org_structure": ("組織", "部長", "課長", "部署"),
+    "organization.key_persons": ("右腕", "番頭", "幹部"),
+    "organization.successor_status": ("後継", "跡継ぎ", "息子", "娘"),
+    "organization.employee_treatment": ("雇用", "給与", "待遇", "退職金"),
+    "organization.executive_retention": ("役員", "残る", "残留"),
+    "transfer.transfer_scheme": ("株式", "事業譲渡", "スキーム"),
+    "transfer.transfer_reason": ("引退", "理由", "体調"),
+    "transfer.desired_price": ("価格", "金額", "評価額", "いくら"),
+    "transfer.desired_timing": ("時期", "いつまで", "来年", "年内"),
+    "transfer.desired_conditions": ("条件", "希望"),
+    "transfer.dd_notes": ("訴訟", "未払い", "簿外", "リスク"),
+}
+
+# 1点になる中身の文字数
+CHARS_PER_POINT = 20
+# カタカナ・英字の語1つの点数
+ENTITY_POINT = 0.5
+
+
+def _label_terms(label: str) -> list[str]:
+    """項目の名称を手がかりの語に分ける（括弧内・「有無」「推移」は除く）."""
+    label = re.sub(r"（[^）]*）|\([^)]*\)", "", label)
+    label = re.sub(r"有無|推移|の処遇|の残留意向", "", label)
+    return [term for term in re.split(r"[/／・]", label) if len(term) >= 2]
+
+
+def _build_field_terms() -> dict[str, str]:
+    """抽出項目の手がかりの語 → フィールドキー（同じ語は先の項目）."""
+    terms: dict[str, str] = {}
+    for definition in FIELD_REGISTRY:
+        for term in _label_terms(definition.label) + list(FIELD_ALIASES.get(definition.key, ())):
+            terms.setdefault(term, definition.key)
+    return terms
+
+
+# 抽出項目の手がかりの語 → フィールドキー
+FIELD_TERMS = _build_field_terms()
+# 手がかりの語を1パスで探す（長い語を先に試し、「事業譲渡」を「事業」より優先する）
+FIELD_KEYWORDS = re.compile("|".join(map(re.escape, sorted(FIELD_TERMS, key=len, reverse=True))))
+
+
+class RelevanceScore:
+    """発話の情報量の採点.
+
+    Attributes:
+        content_chars: 相槌・記号を除いた文字数
+        signals: 検出したシグナル名（HIGH_VALUE_SIGNAL のグループ名）
+        fields: 手がかりの語があった抽出項目のフィールドキー
+        entities: カタカナ・英字の語の数
+        score: 合計点
+    """
+
+    __slots__ = ("content_chars", "signals", "fields", "entities", "score")
+
+    def __init__(self, utterances: Iterable[Utterance]) -> None:
+        """発話をまとめて採点する.
+
+        Args:
+            utterances: 発話リスト
+        """
+        self.content_chars = 0
+        self.signals: set[str] = set()
+        self.fields: set[str] = set()
+        self.entities = 0
+        for utterance in utterances:
+            text = utterance.text
+            self.content_chars += len(_NOISE.sub("", _FILLERS.sub("", text)))
+            for match in HIGH_VALUE_SIGNAL.finditer(text):
+                self.signals.add(match.lastgroup)
+            for match in FIELD_KEYWORDS.finditer(text):
+                self.fields.add(FIELD_TERMS[match.group()])
+            self.entities += len(_ENTITY.findall(text))
+        self.score = (
+            self.content_chars / CHARS_PER_POINT
+            + len(self.signals)
+            + len(self.fields)
+            + self.entities * ENTITY_POINT
+        )
+
+    def to_dict(self) -> dict:
+        """ログ・APIレスポンス用の辞書に変換する.
+
+        Returns:
+            dict: 採点の内訳
+        """
+        return {
+            "score": round(self.score, 2),
+            "content_chars": self.content_chars,
+            "signals": sorted(self.signals),
+            "fields": sorted(self.fields),
+            "entities": self.entities,
+        }
+
+
+class RelevanceGate:
+    """ラウンドごとに抽出・サジェストを呼ぶかを決める.
+
+    持ち越した発話と前回のフィンガープリントをセッションごとに保持する
+    （ワーカーのメモリ内のみ。セッションを手放したら forget で破棄する）。
+
+    Attributes:
+        min_score: 抽出を呼ぶのに必要な点数
+        max_deferred: 次のラウンドへ持ち越す発話数の上限（古いものから捨てる）
+    """
+
+    def __init__(self, min_score: float = 1.0, max_deferred: int = 8) -> None:
+        """ゲートを初期化する.
+
+        Args:
+            min_score: 抽出を呼ぶのに必要な点数
+            max_deferred: 次のラウンドへ持ち越す発話数の上限
+        """
+        self.min_score = min_score
+        self.max_deferred = max_deferred
+        self._deferred: dict[str, list[Utterance]] = {}
+        self._fingerprints: dict[str, int] = {}
+
+    def is_relevant(self, utterances: list[Utterance]) -> bool:
+        """発話に抽出・サジェストを呼ぶだけの情報量があるかを返す.
+
+        Args:
+            utterances: 発話リスト
+
+        Returns:
+            bool: 点数が min_score 以上ならTrue
+        """
+        return RelevanceScore(utterances).score >= self.min_score
+
+    def admit_extraction(
+        self,
+        session_id: str,
+        buffer: list[Utterance],
+    ) -> tuple[Optional[list[Utterance]], RelevanceScore]:
+        """バッファの情報量から抽出を呼ぶかを決める.
+
+        前のラウンドから持ち越した発話を先頭に付けて採点し、足りなければ
+        まとめて次のラウンドへ持ち越す。
+
+        Args:
+            session_id: セッションID
+            buffer: ラウンドで処理する発話
+
+        Returns:
+            tuple[Optional[list[Utterance]], RelevanceScore]:
+                抽出する発話（呼ばないならNone）と採点
+        """
+        utterances = self._deferred.pop(session_id, []) + buffer
+        score = RelevanceScore(utterances)
+        if score.score >= self.min_score:
+            return utterances, score
+        if self.max_deferred > 0:
+            self._deferred[session_id] = utterances[-self.max_deferred:]
+        return None, score
+
+    @staticmethod
+    def fingerprint(
+        recent_utterances: list[Utterance],
+        extractions: dict[str, ExtractionField],
+        layer: InfoLayer,
+        hypotheses: list[Hypothesis],
+    ) -> int:
+        """サジェストの入力のうち、結果を変えうる部分のフィンガープリントを作る.
+
+        直近の会話は中身のある発話（相槌だけの発話を除く）のIDだけを使うため、
+        相槌が増えただけではフィンガープリントは変わらない。
+
+        Args:
+            recent_utterances: 直近の発話リスト
+            extractions: 現在の抽出情報
+            layer: 現在のレイヤー
+            hypotheses: 現在の仮説リスト
+
+        Returns:
+            int: フィンガープリント
+        """
+        informative = tuple(
+            utterance.id
+            for utterance in recent_utterances
+            if RelevanceScore((utterance,)).score > 0
+        )
+        filled = tuple(
+            (key, field.value) for key, field in sorted(extractions.items()) if field.value
+        )
+        beliefs = tuple(
+            (hypothesis.id, hypothesis.content, hypothesis.confidence) for hypothesis in hypotheses
+        )
+        return hash((informative, filled, layer, beliefs))
+
+    def suggestions_unchanged(self, session_id: str, fingerprint: int) -> bool:
+        """前回サジェストを出したときから入力が変わっていないかを返す.
+
+        Args:
+            session_id: セッションID
+            fingerprint: 今回の入力のフィンガープリント
+
+        Returns:
+            bool: 変わっていなければTrue
+        """
+        return self._fingerprints.get(session_id) == fingerprint
+
+    def record_suggestions(self, session_id: str, fingerprint: int) -> None:
+        """サジェストを出したときの入力のフィンガープリントを記録する.
+
+        Args:
+            session_id: セッションID
+            fingerprint: 入力のフィンガープリント
+        """
+        self._fingerprints[session_id] = fingerprint
+
+    def forget(self, session_id: str) -> None:
+        """セッションの持ち越した発話とフィンガープリントを破棄する.
+
+        Args:
+            session_id: セッションID
+        """
+        self._deferred.pop(session_id, None)
+        self._fingerprints.pop(session_id, None)
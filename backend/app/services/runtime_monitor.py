@@ -0,0 +1,100 @@
+"""
+TONARI for M&A - ワーカーの実行状況の計測
+イベントループの遅延（同期処理がループを占有している時間）とメモリ使用量を測り、
+1ワーカーで何件の面談を同時に受け持てるかの判断材料にする
+"""
+import asyncio
+import logging
+import math
+import os
+import resource
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss_bytes() -> int:
+    """プロセスの現在の常駐メモリ（RSS）を返す.
+
+    Returns:
+        int: RSS（バイト、/procがない環境ではピーク値）
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Linux以外: ru_maxrssはピーク値（macOSはバイト、それ以外はKB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class EventLoopMonitor:
+    """一定間隔でスリープし、予定より遅れて起きた時間をループの遅延として記録する.
+
+    Attributes:
+        interval: 計測の間隔（秒）
+        samples: 直近の遅延（秒）
+        max_lag: 起動以降の最大の遅延（秒）
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 600) -> None:
+        """モニターを初期化する.
+
+        Args:
+            interval: 計測の間隔（秒）
+            window: 保持する直近の計測数
+        """
+        self.interval = interval
+        self.samples: deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """計測を開始する."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="event-loop-monitor")
+
+    async def stop(self) -> None:
+        """計測を止める."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        """スリープの遅れを記録し続ける."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag > 0.5:
+                logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms")
+
+    def report(self) -> dict:
+        """直近の遅延の分布を返す.
+
+        Returns:
+            dict: 直近の遅延の p50 / p95 / p99 / 最大（ミリ秒、最近順位法）と起動以降の最大
+        """
+        samples = sorted(self.samples)
+
+        def percentile(q: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[max(0, math.ceil(q * len(samples)) - 1)] * 1000, 2)
+
+        return {
+            "samples": len(samples),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "window_max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+            "max_ms": round(self.max_lag * 1000, 2),
+        }
+
+
+loop_monitor = EventLoopMonitor()
@@ -0,0 +1,324 @@
+"""
+TONARI for M&A - セッションの先行書き込みジャーナル
+プロセス内ストアの更新を1件ずつローカルファイルに追記し、デプロイや
+OOMでプロセスが落ちても再起動時に面談の状態を復元できるようにする
+
+- 追記はメモリ上のバッファに積むだけで、イベントループは待たない
+- 書き込みタスクがバッファをまとめて取り出し、別スレッドで書き込んで
+  1回だけfsyncする（グループコミット）
+- セグメントが一定サイズを超えたらストア全体のスナップショットを書き、
+  それより古いセグメントを削除する。イベントループ上ではストアの
+  コピーオンライトのビューを取るだけで、シリアライズは別スレッドで行う
+- 書き込みに失敗したら書き込みタスクを止め、以後の追記と close でその
+  エラーを呼び出し側に返す（書けなかったレコードを黙って捨てない）
+- 読み込みで壊れたレコードを読み飛ばすのは、書き込み途中で落ちた最後の
+  1行だけ。それ以外の壊れたレコードは JournalError にする
+- gunicornの各ワーカーは SESSION_JOURNAL_DIR の下のスロットを1つずつ使う。
+  ロックの空いている一番小さい番号のスロットを取るため、再起動したワーカーは
+  落ちたワーカーのスロットを引き継いで復元する
+- 起動時に他にロックの空いているスロット（ワーカー数を減らした場合など）や
+  スロットに分ける前の構成のジャーナルがあれば、それも読み込んで引き取り、
+  自分のスロットにスナップショットを書いた後で削除する
+
+ディレクトリ構成:
+    worker-{k}/LOCK               スロットを使っているプロセスが持つロック
+    worker-{k}/snapshot-{n}.json  セグメントn以降を適用する前の状態
+    worker-{k}/segment-{n}.log    1行1レコードのJSON
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+from itertools import count
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JournalError(Exception):
+    """ジャーナルに書き込めない、または壊れていて読めない."""
+
+
+class SessionJournal:
+    """セグメント分割された追記専用ジャーナル.
+
+    レコードとスナップショットの中身は呼び出し側（ストア）が決める。
+
+    Attributes:
+        root: 全ワーカーのジャーナルを置くディレクトリ
+        directory: このプロセスのスロットのディレクトリ（openで決まる）
+        segment_bytes: スナップショットを取ってセグメントを切り替えるサイズ
+        commit_interval: グループコミットでレコードを待ち合わせる時間（秒）
+        enabled: 書き込み可能か（openの前はFalse）
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, commit_interval: float) -> None:
+        """ジャーナルを初期化する（ファイルはopenで開く）.
+
+        Args:
+            directory: 全ワーカーのジャーナルを置くディレクトリ
+            segment_bytes: セグメントを切り替えるサイズ（バイト）
+            commit_interval: グループコミットの待ち合わせ時間（秒）
+        """
+        self.root = Path(directory)
+        self.directory = self.root
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.enabled = False
+        self._lock_file: Optional[Any] = None
+        # 引き取る他のジャーナルのディレクトリとロック
+        self._adopted: list[tuple[Path, Any]] = []
+        self._segment_no = 0
+        self._segment: Optional[Any] = None
+        self._segment_size = 0
+        self._pending: list[str] = []
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+        self._snapshot_fn: Optional[Callable[[], dict]] = None
+        self._release_fn: Optional[Callable[[], None]] = None
+
+    def open(self) -> None:
+        """ロックの空いているスロットを取り、引き取るジャーナルのロックも取る.
+
+        Raises:
+            OSError: ディレクトリを作れない場合
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        for slot in count():
+            directory = self.root / f"worker-{slot}"
+            directory.mkdir(exist_ok=True)
+            lock_file = _try_lock(directory)
+            if lock_file is not None:
+                break
+        self.directory = directory
+        self._lock_file = lock_file
+        self.enabled = True
+
+        # スロットに分ける前の構成では SESSION_JOURNAL_DIR の直下にファイルがある
+        orphans = [self.root] if _files(self.root, "segment", ".log") else []
+        orphans += [path for path in sorted(self.root.glob("worker-*")) if path != directory]
+        for path in orphans:
+            orphan_lock = _try_lock(path)
+            if orphan_lock is not None:
+                self._adopted.append((path, orphan_lock))
+        logger.info(
+            f"Session journal slot {directory}"
+            + (f", adopting {[str(path) for path, _ in self._adopted]}" if self._adopted else "")
+        )
+
+    def load(self) -> list[tuple[Optional[dict], Iterator[dict]]]:
+        """自分のスロットと引き取るジャーナルの、最新のスナップショットとその後のレコードを読む.
+
+        書き込み途中で落ちた最後の行は読み飛ばす。
+
+        Returns:
+            list[tuple[Optional[dict], Iterator[dict]]]: ジャーナルごとのスナップショット
+            （なければNone）とレコード（壊れたレコードに当たると JournalError を送出する）
+        """
+        return [
+            self._load_directory(directory)
+            for directory in [self.directory, *(path for path, _ in self._adopted)]
+        ]
+
+    def _load_directory(self, directory: Path) -> tuple[Optional[dict], Iterator[dict]]:
+        """1つのジャーナルの最新のスナップショットと、その後のレコードを読む."""
+        snapshot, start = None, 0
+        for number, path in reversed(_files(directory, "snapshot", ".json")):
+            try:
+                snapshot = json.loads(path.read_text(encoding="utf-8"))
+                start = number
+                break
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable journal snapshot {path}: {e}")
+        segments = [path for number, path in _files(directory, "segment", ".log") if number >= start]
+        return snapshot, self._read_records(segments)
+
+    def _read_records(self, segments: list[Path]) -> Iterator[dict]:
+        """セグメントのレコードを順に読む（最後のセグメントの最後の行だけは途中で切れていてよい）."""
+        for index, path in enumerate(segments):
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()
+            for line_no, line in enumerate(lines, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    if index == len(segments) - 1 and line_no == len(lines):
+                        logger.warning(f"Skipping torn journal record {path.name}:{line_no}")
+                        return
+                    raise JournalError(f"Corrupt journal record {path}:{line_no}") from e
+                yield record
+
+    def start(self, snapshot_fn: Callable[[], dict], release_fn: Callable[[], None]) -> None:
+        """復元後の状態をスナップショットにして、書き込みタスクを開始する.
+
+        Args:
+            snapshot_fn: ストア全体の状態のビューを返す関数。イベントループ上で
+                呼ばれ、戻り値は別スレッドで書き込むため release_fn を呼ぶまで変更されないこと
+            release_fn: スナップショットを書き終えたときに呼ぶ関数
+        """
+        if not self.enabled:
+            return
+        self._snapshot_fn = snapshot_fn
+        self._release_fn = release_fn
+        numbers = [number for number, _ in _files(self.directory, "segment", ".log")]
+        numbers += [number for number, _ in _files(self.directory, "snapshot", ".json")]
+        self._segment_no = max(numbers, default=0)
+        # 起動時に1回まとめておくと、次回の復元はスナップショットから始められる
+        self._rotate(snapshot_fn())
+        release_fn()
+        # 引き取ったジャーナルの内容は今のスナップショットに含まれたので消す
+        for path, lock_file in self._adopted:
+            if path == self.root:
+                for prefix, suffix in (("segment", ".log"), ("snapshot", ".json")):
+                    for _, old_path in _files(path, prefix, suffix):
+                        old_path.unlink(missing_ok=True)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+            lock_file.close()
+        self._adopted = []
+        self._writer = asyncio.create_task(self._run(), name="session-journal")
+
+    def append(self, record: dict) -> None:
+        """レコードを追記する（書き込みは待たない）.
+
+        Args:
+            record: JSONにできるレコード
+
+        Raises:
+            JournalError: 書き込みタスクが書き込みに失敗して止まっている場合
+        """
+        if self._writer is None:
+            return
+        if self._writer.done():
+            raise JournalError("Session journal writer stopped") from self._writer.exception()
+        self._pending.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self._wakeup.set()
+
+    async def close(self) -> None:
+        """残りのレコードを書き込んでファイルを閉じる.
+
+        Raises:
+            OSError: レコードを書き込めなかった場合（ファイルは閉じる）
+        """
+        try:
+            if self._writer is not None:
+                self._closing = True
+                self._wakeup.set()
+                writer, self._writer = self._writer, None
+                await writer
+        finally:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    async def _run(self) -> None:
+        """レコードが積まれるたびに、まとめて書き込む.
+
+        書き込みに失敗したらタスクごと止まる（途中まで書いたセグメントに
+        書き直すとレコードが重複するため、再試行しない）。
+        """
+        while True:
+            await self._wakeup.wait()
+            if not self._closing:
+                # 少し待って同時期のレコードを1回の書き込み・fsyncにまとめる
+                await asyncio.sleep(self.commit_interval)
+            self._wakeup.clear()
+            await self._commit()
+            if self._closing:
+                return
+
+    async def _commit(self) -> None:
+        """溜まったレコードを書き込む.
+
+        バッファの取り出しとスナップショットのビューの作成は同じ同期区間で
+        行うため、スナップショットにはちょうど書き込んだレコードまでが含まれる。
+        """
+        lines, self._pending = self._pending, []
+        if not lines:
+            return
+        snapshot = None
+        if self._segment_size + sum(len(line) for line in lines) >= self.segment_bytes:
+            snapshot = self._snapshot_fn()
+        try:
+            await asyncio.to_thread(self._write, lines, snapshot)
+        finally:
+            if snapshot is not None:
+                self._release_fn()
+
+    def _write(self, lines: list[str], snapshot: Optional[dict]) -> None:
+        """レコードを書き込んでfsyncし、必要ならセグメントを切り替える（別スレッド）."""
+        data = "".join(lines).encode("utf-8")
+        self._segment.write(data)
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._segment_size += len(data)
+        if snapshot is not None:
+            self._rotate(snapshot)
+
+    def _rotate(self, snapshot: dict) -> None:
+        """スナップショットを書いて新しいセグメントに切り替え、古いファイルを消す."""
+        number = self._segment_no + 1
+        path = self.directory / f"snapshot-{number:08d}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        if self._segment is not None:
+            self._segment.close()
+        self._segment = open(self.directory / f"segment-{number:08d}.log", "ab")
+        self._segment_no = number
+        self._segment_size = 0
+        self._fsync_directory()
+
+        for prefix, suffix in (("segment", ".log"), ("snapshot", ".json")):
+            for old_number, old_path in _files(self.directory, prefix, suffix):
+                if old_number < number:
+                    old_path.unlink(missing_ok=True)
+
+    def _fsync_directory(self) -> None:
+        """ファイルの作成・リネームをディレクトリごと永続化する."""
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+
+def _try_lock(directory: Path) -> Optional[Any]:
+    """ジャーナルのディレクトリのロックを取る.
+
+    Args:
+        directory: ジャーナルのディレクトリ
+
+    Returns:
+        Optional[Any]: ロックを持つファイル（他のプロセスが使っていればNone）
+    """
+    lock_file = open(directory / "LOCK", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _files(directory: Path, prefix: str, suffix: str) -> list[tuple[int, Path]]:
+    """ディレクトリの番号付きのファイルを番号順に返す."""
+    files = []
+    for path in directory.glob(f"{prefix}-*{suffix}"):
+        try:
+            files.append((int(path.stem.split("-", 1)[1]), path))
+        except ValueError:
+            continue
+    return sorted(files)
@@ -0,0 +1,240 @@
+"""
+TONARI for M&A - セッションのライフサイクル管理
+ワーカーのメモリに載せているセッション（active_sessions）を定期的に見直し、
+不要になったものを追い出す
+
+- 終了したセッション: 共有ストアへの保存を確認してから一定時間後に追い出す
+- 放置されたセッション（ブラウザを閉じて /end されなかったものなど）:
+  接続がなく、最後の操作から一定時間経ったら追い出す
+- メモリの見積もりが上限を超えたら、接続のないセッションを最後の操作が
+  古い順に追い出す（見積もりにはプロセス内ストアが保持している分も含める）
+
+追い出したセッションは共有ストアに残るため、REST APIで参照されれば
+ストアから読み直す。プロセス内ストアの場合はストアの保持からも外して
+ファイルに書き出す（SessionStore.offload）。
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+from ..models.mna_schemas import SessionState
+from .session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+# メモリ見積もりの定数（CPythonのオブジェクトの大きさのおおよその値）
+UTTERANCE_OVERHEAD_BYTES = 700  # Utteranceモデル1件（ID・日時などの文字列を含む）
+FIELD_OVERHEAD_BYTES = 900  # ExtractionFieldモデル1件と辞書のエントリ
+SESSION_OVERHEAD_BYTES = 4000  # SessionState本体
+CHAR_BYTES = 2  # 日本語の文字列は1文字2バイト（UCS-2）で持たれる
+
+
+def estimate_session_bytes(session: SessionState) -> int:
+    """セッションのメモリ使用量を見積もる.
+
+    Args:
+        session: セッション状態
+
+    Returns:
+        int: 見積もりバイト数
+    """
+    utterance_chars = sum(len(u.text) + len(u.pin_note or "") for u in session.utterances)
+    field_chars = sum(len(f.value or "") for f in session.extractions.values())
+    return (
+        SESSION_OVERHEAD_BYTES
+        + len(session.utterances) * UTTERANCE_OVERHEAD_BYTES
+        + len(session.extractions) * FIELD_OVERHEAD_BYTES
+        + (utterance_chars + field_chars) * CHAR_BYTES
+    )
+
+
+class SessionLifecycleManager:
+    """ワーカーが保持するセッションの追い出しを管理する.
+
+    Attributes:
+        sessions: 管理対象のセッション（active_sessions）
+        store: 共有セッションストア
+        idle_ttl: 接続のないセッションを追い出すまでの無操作時間（秒）
+        completed_ttl: 終了したセッションを追い出すまでの時間（秒）
+        memory_budget: セッションのメモリ見積もりの上限（バイト）
+        sweep_interval: 見直しの間隔（秒）
+        last_activity: セッションごとの最後の操作時刻（monotonic秒）
+        evictions: 理由ごとの追い出し回数
+    """
+
+    def __init__(
+        self,
+        sessions: dict[str, SessionState],
+        store: SessionStore,
+        is_busy: Callable[[str], bool],
+        on_evict: Callable[[str], None],
+        idle_ttl: float,
+        completed_ttl: float,
+        memory_budget: int,
+        sweep_interval: float,
+    ) -> None:
+        """マネージャーを初期化する.
+
+        Args:
+            sessions: 管理対象のセッション
+            store: 共有セッションストア
+            is_busy: 接続や処理中のラウンドがあるセッションならTrueを返す関数
+            on_evict: 追い出したセッションのワーカー側の状態を破棄する関数
+            idle_ttl: 接続のないセッションを追い出すまでの無操作時間（秒）
+            completed_ttl: 終了したセッションを追い出すまでの時間（秒）
+            memory_budget: メモリ見積もりの上限（バイト）
+            sweep_interval: 見直しの間隔（秒）
+        """
+        self.sessions = sessions
+        self.store = store
+        self.is_busy = is_busy
+        self.on_evict = on_evict
+        self.idle_ttl = idle_ttl
+        self.completed_ttl = completed_ttl
+        self.memory_budget = memory_budget
+        self.sweep_interval = sweep_interval
+        self.last_activity: dict[str, float] = {}
+        self.evictions: dict[str, int] = {"completed": 0, "idle": 0, "memory": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def touch(self, session_id: str) -> None:
+        """セッションの操作（メッセージ受信・ハートビート・API参照）を記録する.
+
+        Args:
+            session_id: セッションID
+        """
+        self.last_activity[session_id] = time.monotonic()
+
+    def start(self) -> None:
+        """定期的な見直しを開始する."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="session-lifecycle")
+
+    async def stop(self) -> None:
+        """定期的な見直しを止める."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        """一定間隔で見直しを行う."""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.exception(f"Session sweep failed: {e}")
+
+    async def sweep(self) -> list[tuple[str, str]]:
+        """追い出すべきセッションを選んで追い出す.
+
+        Returns:
+            list[tuple[str, str]]: 追い出したセッションIDと理由
+        """
+        now = time.monotonic()
+        evicted: list[tuple[str, str]] = []
+
+        for session_id, session in list(self.sessions.items()):
+            if self.is_busy(session_id):
+                continue
+            idle = now - self.last_activity.setdefault(session_id, now)
+            if session.status == "completed" and idle >= self.completed_ttl:
+                reason = "completed"
+            elif idle >= self.idle_ttl:
+                reason = "idle"
+            else:
+                continue
+            if await self._evict(session_id, reason) is not None:
+                evicted.append((session_id, reason))
+
+        # メモリの上限を超えていれば、最後の操作が古い順に追い出す
+        sizes = {session_id: estimate_session_bytes(s) for session_id, s in self.sessions.items()}
+        total = sum(sizes.values()) + self.store.memory_bytes()
+        if total > self.memory_budget:
+            candidates = sorted(
+                (session_id for session_id in sizes if not self.is_busy(session_id)),
+                key=lambda session_id: self.last_activity.get(session_id, 0.0),
+            )
+            for session_id in candidates:
+                if total <= self.memory_budget:
+                    break
+                freed = await self._evict(session_id, "memory")
+                if freed is not None:
+                    total -= sizes[session_id] + freed
+                    evicted.append((session_id, "memory"))
+            if total > self.memory_budget:
+                logger.warning(
+                    f"Session memory estimate {total} bytes exceeds budget "
+                    f"{self.memory_budget} with only live sessions left"
+                )
+
+        return evicted
+
+    async def _evict(self, session_id: str, reason: str) -> Optional[int]:
+        """セッションを共有ストアに保存済みにしてから追い出す.
+
+        プロセス内ストアの場合は、ストアの保持からも外してファイルに書き出す。
+
+        Args:
+            session_id: セッションID
+            reason: 追い出す理由
+
+        Returns:
+            Optional[int]: 追い出したならストアの保持から解放したバイト数（追い出さなければNone）
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        try:
+            if not await self.store.session_exists(session_id):
+                await self.store.create_session(session)
+        except Exception as e:
+            logger.warning(f"Failed to archive session {session_id}, keeping it in memory: {e}")
+            return None
+        # 保存を待つ間に接続されたら追い出さない
+        if self.is_busy(session_id):
+            return None
+
+        self.sessions.pop(session_id, None)
+        self.last_activity.pop(session_id, None)
+        self.on_evict(session_id)
+        self.evictions[reason] += 1
+        freed = await self.store.offload(session_id)
+        logger.info(f"Session evicted from memory: {session_id} ({reason}, store freed {freed} bytes)")
+        return freed
+
+    def report(self, connection_counts: dict[str, int]) -> dict:
+        """セッションごとのメモリ見積もりと状態を返す.
+
+        Args:
+            connection_counts: セッションごとのこのワーカーの接続数
+
+        Returns:
+            dict: セッションごとの状態と合計
+        """
+        now = time.monotonic()
+        sessions = []
+        for session_id, session in self.sessions.items():
+            last = self.last_activity.get(session_id)
+            sessions.append(
+                {
+                    "session_id": session_id,
+                    "project_id": session.project_id,
+                    "status": session.status,
+                    "connections": connection_counts.get(session_id, 0),
+                    "idle_seconds": round(now - last, 1) if last is not None else None,
+                    "utterances": len(session.utterances),
+                    "extractions": len(session.extractions),
+                    "estimated_bytes": estimate_session_bytes(session),
+                }
+            )
+        sessions.sort(key=lambda s: s["estimated_bytes"], reverse=True)
+        return {
+            "total_sessions": len(sessions),
+            "total_estimated_bytes": sum(s["estimated_bytes"] for s in sessions),
+            "store_bytes": self.store.memory_bytes(),
+            "memory_budget_bytes": self.memory_budget,
+            "evictions": dict(self.evictions),
+            "sessions": sessions,
+        }
@@ -0,0 +1,1158 @@
+"""
+TONARI for M&A - 共有セッションストア
+gunicornの複数ワーカー間でセッション・プロジェクトの状態を共有する
+
+- InMemorySessionStore: 単一プロセス用（開発・テスト）
+- JournaledSessionStore: 更新をローカルのジャーナルに記録し、再起動時に復元する
+  プロセス内ストア
+- RespSessionStore: Redisプロトコル（RESP2）で話すサーバー用
+
+プロセス内ストアは、ワーカーのメモリから追い出したセッションを圧縮して
+アーカイブのディレクトリに書き出し、プロセス内の保持からも外す（offload）。
+書き出したセッションは読むときはファイルから組み立て、書き込むときは先に
+プロセス内に戻す。
+
+どちらも同じキー構造（メタ情報のハッシュ、抽出情報のハッシュ、発話のリスト、
+発話の更新のハッシュ）を持ち、発話は追記のみ、抽出情報はフィールド単位で更新する。
+セッション全体を書き戻さないため、ワーカーをまたいでも更新が互いを上書きしない。
+ピン留めなどの発話の更新はリスト上の位置ではなく発話IDで記録し、読み込み時に
+重ねる（他ワーカーの追記や読み直しで位置がずれても別の発話を書き換えない）。
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Iterable, Optional, Sequence
+from urllib.parse import urlsplit
+
+from ..core.config import settings
+from ..models.mna_schemas import ExtractionField, SessionState, Utterance
+from .session_journal import JournalError, SessionJournal
+
+logger = logging.getLogger(__name__)
+
+# ハッシュで保持するセッションのメタ情報（発話・抽出情報は別キー）
+SESSION_META_FIELDS = (
+    "id",
+    "project_id",
+    "status",
+    "started_at",
+    "ended_at",
+    "current_layer",
+    "hypotheses",
+)
+
+
+def _dump_meta(session: SessionState, fields: Sequence[str]) -> dict[str, str]:
+    """セッションのメタ情報をフィールドごとのJSON文字列にする."""
+    data = session.model_dump(mode="json", include=set(fields))
+    return {name: json.dumps(data[name], ensure_ascii=False) for name in fields}
+
+
+def _build_session(
+    meta: dict[str, str],
+    extractions: dict[str, str],
+    utterances: list[str],
+    utterance_updates: dict[str, str],
+) -> SessionState:
+    """ストアの生データからSessionStateを組み立てる（発話の更新はIDで重ねる）."""
+    data: dict[str, Any] = {name: json.loads(value) for name, value in meta.items()}
+    data["extractions"] = {
+        key: ExtractionField.model_validate_json(value) for key, value in extractions.items()
+    }
+    parsed = [Utterance.model_validate_json(value) for value in utterances]
+    if utterance_updates:
+        parsed = [
+            Utterance.model_validate_json(utterance_updates[u.id]) if u.id in utterance_updates else u
+            for u in parsed
+        ]
+    data["utterances"] = parsed
+    return SessionState.model_validate(data)
+
+
+# アーカイブのファイル名に使えるセッションID（パスの区切りなどを含むIDは書き出さない）
+_ARCHIVE_ID = re.compile(r"[0-9A-Za-z_-]+")
+
+
+def _write_archive(path: Path, payload: dict) -> None:
+    """セッションの生データを圧縮して書き出す（別スレッドで実行）."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_archive(path: Path) -> dict:
+    """書き出したセッションの生データを読む（別スレッドで実行）."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _payload_bytes(payload: dict) -> int:
+    """セッションの生データ（シリアライズ済みの文字列）が占めるメモリのバイト数."""
+    return (
+        sum(sys.getsizeof(value) for value in payload["meta"].values())
+        + sum(sys.getsizeof(value) for value in payload["extractions"].values())
+        + sum(sys.getsizeof(value) for value in payload["utterances"])
+        + sum(sys.getsizeof(value) for value in payload["utterance_updates"].values())
+    )
+
+
+class SessionStore(ABC):
+    """共有セッションストアの基底クラス.
+
+    セッション本体に加えて、プロジェクト・成果物などの小さなドキュメントを
+    名前空間ごとに保存する。
+
+    Attributes:
+        shared: 他プロセスと状態を共有しているか（Falseならプロセス内で完結）
+    """
+
+    shared: bool = False
+
+    async def recover(self) -> list[str]:
+        """起動時に永続化済みの状態を復元する.
+
+        Returns:
+            list[str]: 復元した進行中（active）のセッションID
+        """
+        return []
+
+    async def close(self) -> None:
+        """接続・ファイルを閉じる."""
+
+    async def offload(self, session_id: str) -> int:
+        """ワーカーのメモリから追い出したセッションを、ストアのプロセス内の保持からも外す.
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            int: 解放したバイト数（プロセス外に保持するストアは0）
+        """
+        return 0
+
+    def memory_bytes(self) -> int:
+        """ストアがプロセス内に保持しているデータのバイト数を返す.
+
+        Returns:
+            int: バイト数（プロセス外に保持するストアは0）
+        """
+        return 0
+
+    @abstractmethod
+    async def create_session(self, session: SessionState) -> None:
+        """セッションを新規保存する.
+
+        Args:
+            session: セッション状態
+        """
+
+    @abstractmethod
+    async def load_session(self, session_id: str) -> Optional[SessionState]:
+        """セッションを読み込む.
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            Optional[SessionState]: セッション状態（存在しなければNone）
+        """
+
+    @abstractmethod
+    async def session_exists(self, session_id: str) -> bool:
+        """セッションが存在するかを返す.
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            bool: 存在すればTrue
+        """
+
+    @abstractmethod
+    async def update_session_fields(self, session: SessionState, *fields: str) -> None:
+        """セッションのメタ情報を指定フィールドだけ書き込む.
+
+        Args:
+            session: 更新後のセッション状態
+            *fields: 書き込むフィールド名（SESSION_META_FIELDSのいずれか）
+        """
+
+    @abstractmethod
+    async def set_extractions(
+        self,
+        session_id: str,
+        extractions: dict[str, ExtractionField],
+    ) -> None:
+        """抽出情報をフィールド単位で書き込む.
+
+        Args:
+            session_id: セッションID
+            extractions: フィールドキー → 抽出フィールド
+        """
+
+    @abstractmethod
+    async def append_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """発話を末尾に追記する.
+
+        Args:
+            session_id: セッションID
+            utterance: 発話
+        """
+
+    async def append_utterances(self, session_id: str, utterances: list[Utterance]) -> None:
+        """複数の発話をまとめて末尾に追記する（一括取り込み用）.
+
+        Args:
+            session_id: セッションID
+            utterances: 発話
+        """
+        for utterance in utterances:
+            await self.append_utterance(session_id, utterance)
+
+    @abstractmethod
+    async def update_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """既存の発話を発話IDで置き換える（ピン留めなど）.
+
+        Args:
+            session_id: セッションID
+            utterance: 更新後の発話
+        """
+
+    @abstractmethod
+    async def delete_session(self, session_id: str) -> None:
+        """セッションを削除する.
+
+        Args:
+            session_id: セッションID
+        """
+
+    @abstractmethod
+    async def save_document(self, namespace: str, doc_id: str, data: str) -> None:
+        """ドキュメントを保存する.
+
+        Args:
+            namespace: 名前空間（"project" など）
+            doc_id: ドキュメントID
+            data: JSON文字列
+        """
+
+    @abstractmethod
+    async def load_document(self, namespace: str, doc_id: str) -> Optional[str]:
+        """ドキュメントを読み込む.
+
+        Args:
+            namespace: 名前空間
+            doc_id: ドキュメントID
+
+        Returns:
+            Optional[str]: JSON文字列（存在しなければNone）
+        """
+
+    @abstractmethod
+    async def list_documents(self, namespace: str) -> list[str]:
+        """名前空間のドキュメントをすべて読み込む.
+
+        Args:
+            namespace: 名前空間
+
+        Returns:
+            list[str]: JSON文字列のリスト
+        """
+
+    @abstractmethod
+    async def delete_documents(self, namespace: str, *doc_ids: str) -> None:
+        """ドキュメントを削除する.
+
+        Args:
+            namespace: 名前空間
+            *doc_ids: ドキュメントID
+        """
+
+
+class InMemorySessionStore(SessionStore):
+    """プロセス内のセッションストア.
+
+    Redis実装と同じくシリアライズした状態で保持するため、呼び出し側が
+    SessionStateを書き換えても明示的に書き込むまでストアは変わらない。
+    保持しているバイト数は書き込み・削除・offloadのたびに差分で数え直す
+    （memory_bytes のたびに全データを数えない）。
+
+    Attributes:
+        archive_dir: offloadしたセッションの書き出し先（Noneならプロセス内に持ち続ける）
+    """
+
+    shared = False
+
+    def __init__(self, archive_dir: Optional[str] = None) -> None:
+        """空のストアを作る.
+
+        Args:
+            archive_dir: offloadしたセッションの書き出し先（Noneならoffloadしない）
+        """
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self._meta: dict[str, dict[str, str]] = {}
+        self._extractions: dict[str, dict[str, str]] = {}
+        self._utterances: dict[str, list[str]] = {}
+        # セッションID → 発話ID → 更新後の発話
+        self._utterance_updates: dict[str, dict[str, str]] = {}
+        self._documents: dict[str, dict[str, str]] = {}
+        # プロセス内に保持しているシリアライズ済みのデータのバイト数
+        self._bytes = 0
+
+    async def create_session(self, session: SessionState) -> None:
+        """セッションを新規保存する."""
+        self._set_session(
+            session.id,
+            {
+                "meta": _dump_meta(session, SESSION_META_FIELDS),
+                "extractions": {
+                    key: field.model_dump_json() for key, field in session.extractions.items()
+                },
+                "utterances": [u.model_dump_json() for u in session.utterances],
+                "utterance_updates": {},
+            },
+        )
+
+    async def load_session(self, session_id: str) -> Optional[SessionState]:
+        """セッションを読み込む（offloadしたセッションはアーカイブから組み立てる）."""
+        if session_id in self._meta:
+            payload = self._resident(session_id)
+        else:
+            path = self._archive_path(session_id)
+            if path is None or not path.exists():
+                return None
+            payload = await asyncio.to_thread(_read_archive, path)
+        return _build_session(
+            payload["meta"],
+            payload["extractions"],
+            payload["utterances"],
+            payload["utterance_updates"],
+        )
+
+    async def session_exists(self, session_id: str) -> bool:
+        """セッションが存在するかを返す."""
+        if session_id in self._meta:
+            return True
+        path = self._archive_path(session_id)
+        return path is not None and path.exists()
+
+    async def offload(self, session_id: str) -> int:
+        """セッションを圧縮してアーカイブに書き出し、プロセス内の保持から外す.
+
+        書き出す間に更新・削除されたら外さない（次の見直しで書き出し直す）。
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            int: 解放したバイト数（書き出さなかった場合は0）
+        """
+        path = self._archive_path(session_id)
+        if path is None or session_id not in self._meta:
+            return 0
+        payload = self._resident(session_id)
+        await asyncio.to_thread(_write_archive, path, payload)
+        if session_id not in self._meta:
+            path.unlink(missing_ok=True)
+            return 0
+        if self._resident(session_id) != payload:
+            return 0
+        self._drop_resident(session_id)
+        return _payload_bytes(payload)
+
+    def memory_bytes(self) -> int:
+        """プロセス内に保持しているシリアライズ済みのデータのバイト数を返す."""
+        return self._bytes
+
+    def _measure(self) -> int:
+        """プロセス内に保持しているデータのバイト数を全部数える（まとめて読み込んだとき用）."""
+        total = sum(_payload_bytes(self._stored(session_id)) for session_id in self._meta)
+        return total + sum(
+            sys.getsizeof(data) for documents in self._documents.values() for data in documents.values()
+        )
+
+    def _write_values(self, values: dict[str, str], updates: dict[str, str]) -> None:
+        """シリアライズ済みの値を書き込み、保持しているバイト数を合わせる."""
+        for key, value in updates.items():
+            old = values.get(key)
+            self._bytes += sys.getsizeof(value) - (sys.getsizeof(old) if old is not None else 0)
+            values[key] = value
+
+    def _append_values(self, values: list[str], added: Iterable[str]) -> None:
+        """シリアライズ済みの値を末尾に追加し、保持しているバイト数を合わせる."""
+        for value in added:
+            self._bytes += sys.getsizeof(value)
+            values.append(value)
+
+    def _remove_values(self, values: dict[str, str], keys: Iterable[str]) -> None:
+        """シリアライズ済みの値を取り除き、保持しているバイト数を合わせる."""
+        for key in keys:
+            old = values.pop(key, None)
+            if old is not None:
+                self._bytes -= sys.getsizeof(old)
+
+    def _archive_path(self, session_id: str) -> Optional[Path]:
+        """セッションのアーカイブのパスを返す（書き出さない設定・IDならNone）."""
+        if self.archive_dir is None or not _ARCHIVE_ID.fullmatch(session_id):
+            return None
+        return self.archive_dir / f"{session_id}.json.gz"
+
+    def _resident(self, session_id: str) -> dict:
+        """プロセス内に保持しているセッションの生データのコピーを返す."""
+        return {
+            "meta": dict(self._meta.get(session_id, {})),
+            "extractions": dict(self._extractions.get(session_id, {})),
+            "utterances": list(self._utterances.get(session_id, [])),
+            "utterance_updates": dict(self._utterance_updates.get(session_id, {})),
+        }
+
+    def _stored(self, session_id: str) -> dict:
+        """プロセス内に保持しているセッションの生データを返す（コピーしない。読むだけに使う）."""
+        return {
+            "meta": self._meta.get(session_id, {}),
+            "extractions": self._extractions.get(session_id, {}),
+            "utterances": self._utterances.get(session_id, []),
+            "utterance_updates": self._utterance_updates.get(session_id, {}),
+        }
+
+    def _set_session(self, session_id: str, payload: dict) -> None:
+        """セッションの生データをプロセス内の保持に置く（既にあれば置き換える）."""
+        self._pop_session(session_id)
+        self._meta[session_id] = payload["meta"]
+        self._extractions[session_id] = payload["extractions"]
+        self._utterances[session_id] = payload["utterances"]
+        self._utterance_updates[session_id] = payload["utterance_updates"]
+        self._bytes += _payload_bytes(payload)
+
+    def _pop_session(self, session_id: str) -> None:
+        """セッションの生データをプロセス内の保持から外す."""
+        self._bytes -= _payload_bytes(self._stored(session_id))
+        self._meta.pop(session_id, None)
+        self._extractions.pop(session_id, None)
+        self._utterances.pop(session_id, None)
+        self._utterance_updates.pop(session_id, None)
+
+    def _drop_resident(self, session_id: str) -> None:
+        """書き出したセッションをプロセス内の保持から外す."""
+        self._pop_session(session_id)
+
+    def _put_resident(self, session_id: str, payload: dict) -> None:
+        """アーカイブから読んだセッションをプロセス内の保持に戻す."""
+        self._set_session(session_id, payload)
+
+    async def _restore(self, session_id: str) -> None:
+        """offloadしたセッションに書き込む前に、プロセス内の保持に戻す."""
+        if session_id in self._meta:
+            return
+        path = self._archive_path(session_id)
+        if path is None or not path.exists():
+            return
+        payload = await asyncio.to_thread(_read_archive, path)
+        # 読む間に他の書き込みが戻していれば、そちらを使う
+        if session_id not in self._meta:
+            self._put_resident(session_id, payload)
+
+    async def update_session_fields(self, session: SessionState, *fields: str) -> None:
+        """セッションのメタ情報を指定フィールドだけ書き込む."""
+        await self._restore(session.id)
+        self._write_values(self._meta.setdefault(session.id, {}), _dump_meta(session, fields))
+
+    async def set_extractions(
+        self,
+        session_id: str,
+        extractions: dict[str, ExtractionField],
+    ) -> None:
+        """抽出情報をフィールド単位で書き込む."""
+        await self._restore(session_id)
+        self._write_values(
+            self._extractions.setdefault(session_id, {}),
+            {key: field.model_dump_json() for key, field in extractions.items()},
+        )
+
+    async def append_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """発話を末尾に追記する."""
+        await self._restore(session_id)
+        self._append_values(self._utterances.setdefault(session_id, []), [utterance.model_dump_json()])
+
+    async def append_utterances(self, session_id: str, utterances: list[Utterance]) -> None:
+        """複数の発話をまとめて末尾に追記する."""
+        await self._restore(session_id)
+        self._append_values(
+            self._utterances.setdefault(session_id, []), (u.model_dump_json() for u in utterances)
+        )
+
+    async def update_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """既存の発話を発話IDで置き換える."""
+        await self._restore(session_id)
+        self._write_values(
+            self._utterance_updates.setdefault(session_id, {}),
+            {utterance.id: utterance.model_dump_json()},
+        )
+
+    async def delete_session(self, session_id: str) -> None:
+        """セッションを削除する."""
+        self._pop_session(session_id)
+        self._delete_archive(session_id)
+
+    def _delete_archive(self, session_id: str) -> None:
+        """セッションのアーカイブを削除する."""
+        path = self._archive_path(session_id)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+    async def save_document(self, namespace: str, doc_id: str, data: str) -> None:
+        """ドキュメントを保存する."""
+        self._write_values(self._documents.setdefault(namespace, {}), {doc_id: data})
+
+    async def load_document(self, namespace: str, doc_id: str) -> Optional[str]:
+        """ドキュメントを読み込む."""
+        return self._documents.get(namespace, {}).get(doc_id)
+
+    async def list_documents(self, namespace: str) -> list[str]:
+        """名前空間のドキュメントをすべて読み込む."""
+        return list(self._documents.get(namespace, {}).values())
+
+    async def delete_documents(self, namespace: str, *doc_ids: str) -> None:
+        """ドキュメントを削除する."""
+        self._remove_values(self._documents.get(namespace, {}), doc_ids)
+
+
+class JournaledSessionStore(InMemorySessionStore):
+    """更新をジャーナルに先行書き込みするプロセス内ストア.
+
+    更新はシリアライズ済みの値を持つレコードにしてから自身に適用し、
+    同じレコードをジャーナルに追記する。再起動時はスナップショットと
+    その後のレコードを同じ手順で適用して状態を復元する。offloadと
+    プロセス内への戻しもレコードにするため、書き出したセッションは
+    スナップショットに含まれない。
+
+    スナップショットはセッションごとの値を共有するビューで、書き終えるまでに
+    更新する値は先にコピーする（コピーオンライト）。イベントループ上では
+    セッション数に比例する浅いコピーだけで済み、シリアライズは別スレッドで行う。
+
+    Attributes:
+        journal: ジャーナル
+    """
+
+    def __init__(self, journal: SessionJournal, archive_dir: Optional[str] = None) -> None:
+        """ストアを作る（復元はrecoverで行う）.
+
+        Args:
+            journal: ジャーナル
+            archive_dir: offloadしたセッションの書き出し先
+        """
+        super().__init__(archive_dir)
+        self.journal = journal
+        # 書き込み中のスナップショット（release_snapshot までセッションごとの値を共有する）
+        self._frozen: Optional[dict[str, dict]] = None
+
+    async def recover(self) -> list[str]:
+        """ジャーナルから状態を復元し、書き込みを開始する."""
+        self.journal.open()
+        replayed = await asyncio.to_thread(self._replay)
+        self.journal.start(self.snapshot, self.release_snapshot)
+
+        recovered = [
+            session_id
+            for session_id, meta in self._meta.items()
+            if json.loads(meta.get("status", "null")) == "active"
+        ]
+        logger.info(
+            f"Session journal replayed {replayed} records, "
+            f"{len(self._meta)} sessions ({len(recovered)} active)"
+        )
+        # 進行中でないセッションはワーカーのメモリに戻さないため、ストアからも書き出す
+        for session_id in [sid for sid in self._meta if sid not in recovered]:
+            await self.offload(session_id)
+        return recovered
+
+    def _replay(self) -> int:
+        """スナップショットとレコードを適用する（起動時に別スレッドで実行）.
+
+        引き取った他のワーカーのジャーナルも同じ手順で重ねる（セッションIDは
+        ワーカーをまたいで重ならないため、セッション単位でそのまま合わせてよい）。
+
+        Raises:
+            JournalError: 読めない・適用できないレコードがある場合（途中で切れた最後の行を除く）
+        """
+        replayed = 0
+        for snapshot, records in self.journal.load():
+            if snapshot is not None:
+                self._meta.update(snapshot["meta"])
+                self._extractions.update(snapshot["extractions"])
+                self._utterances.update(snapshot["utterances"])
+                self._utterance_updates.update(snapshot.get("utterance_updates", {}))
+                for namespace, documents in snapshot["documents"].items():
+                    self._documents.setdefault(namespace, {}).update(documents)
+                # スナップショットはまとめて読み込んだので数え直す（以後のレコードは差分で数える）
+                self._bytes = self._measure()
+            for record in records:
+                try:
+                    self._apply(record["op"], record["args"])
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    raise JournalError(f"Invalid journal record {record.get('op')}: {e!r}") from e
+                replayed += 1
+        return replayed
+
+    def snapshot(self) -> dict:
+        """ストア全体の状態のビューを返す.
+
+        セッション・名前空間ごとの値は共有し、release_snapshot までの更新は
+        _writable で先にコピーするため、ビューの中身は変わらない。
+
+        Returns:
+            dict: スナップショット
+        """
+        self._frozen = {
+            "meta": dict(self._meta),
+            "extractions": dict(self._extractions),
+            "utterances": dict(self._utterances),
+            "utterance_updates": dict(self._utterance_updates),
+            "documents": dict(self._documents),
+        }
+        return self._frozen
+
+    def release_snapshot(self) -> None:
+        """スナップショットを書き終えたら、値の共有をやめる."""
+        self._frozen = None
+
+    def _writable(self, table: str, key: str) -> Any:
+        """更新する値を返す（書き込み中のスナップショットと共有していればコピーに差し替える）.
+
+        Args:
+            table: スナップショットの表の名前（meta, extractions など）
+            key: セッションIDまたは名前空間
+
+        Returns:
+            Any: 更新してよい dict または list
+        """
+        values = getattr(self, f"_{table}")
+        value = values.get(key)
+        if value is None:
+            value = values[key] = [] if table == "utterances" else {}
+        elif self._frozen is not None and self._frozen[table].get(key) is value:
+            value = values[key] = value.copy()
+        return value
+
+    async def close(self) -> None:
+        """ジャーナルの残りを書き込んで閉じる."""
+        await self.journal.close()
+
+    def _record(self, op: str, *args: Any) -> None:
+        """レコードを適用してジャーナルに追記する."""
+        self._apply(op, args)
+        self.journal.append({"op": op, "args": list(args)})
+
+    def _apply(self, op: str, args: Sequence[Any]) -> None:
+        """レコードを適用する（通常の更新と復元で共通）."""
+        if op == "create_session":
+            session_id, meta, extractions, utterances = args
+            self._set_session(
+                session_id,
+                {
+                    "meta": meta,
+                    "extractions": extractions,
+                    "utterances": utterances,
+                    "utterance_updates": {},
+                },
+            )
+        elif op == "offload_session":
+            (session_id,) = args
+            self._pop_session(session_id)
+        elif op == "restore_session":
+            session_id, payload = args
+            self._set_session(session_id, payload)
+        elif op == "update_meta":
+            session_id, values = args
+            self._write_values(self._writable("meta", session_id), values)
+        elif op == "set_extractions":
+            session_id, values = args
+            self._write_values(self._writable("extractions", session_id), values)
+        elif op == "append_utterance":
+            session_id, *values = args
+            self._append_values(self._writable("utterances", session_id), values)
+        elif op == "update_utterance":
+            session_id, key, value = args
+            if isinstance(key, int):
+                # 発話IDで記録する前のジャーナルのレコード（位置で記録していた）
+                stored = self._writable("utterances", session_id)
+                self._bytes += sys.getsizeof(value) - sys.getsizeof(stored[key])
+                stored[key] = value
+            else:
+                self._write_values(self._writable("utterance_updates", session_id), {key: value})
+        elif op == "delete_session":
+            (session_id,) = args
+            self._pop_session(session_id)
+        elif op == "save_document":
+            namespace, doc_id, data = args
+            self._write_values(self._writable("documents", namespace), {doc_id: data})
+        elif op == "delete_documents":
+            namespace, *doc_ids = args
+            if namespace in self._documents:
+                self._remove_values(self._writable("documents", namespace), doc_ids)
+        else:
+            raise ValueError(f"Unknown journal op: {op}")
+
+    async def create_session(self, session: SessionState) -> None:
+        """セッションを新規保存する."""
+        self._record(
+            "create_session",
+            session.id,
+            _dump_meta(session, SESSION_META_FIELDS),
+            {key: field.model_dump_json() for key, field in session.extractions.items()},
+            [u.model_dump_json() for u in session.utterances],
+        )
+
+    def _drop_resident(self, session_id: str) -> None:
+        """書き出したセッションをプロセス内の保持から外す（ジャーナルに記録する）."""
+        self._record("offload_session", session_id)
+
+    def _put_resident(self, session_id: str, payload: dict) -> None:
+        """アーカイブから読んだセッションをプロセス内の保持に戻す（ジャーナルに記録する）."""
+        self._record("restore_session", session_id, payload)
+
+    async def update_session_fields(self, session: SessionState, *fields: str) -> None:
+        """セッションのメタ情報を指定フィールドだけ書き込む."""
+        await self._restore(session.id)
+        self._record("update_meta", session.id, _dump_meta(session, fields))
+
+    async def set_extractions(
+        self,
+        session_id: str,
+        extractions: dict[str, ExtractionField],
+    ) -> None:
+        """抽出情報をフィールド単位で書き込む."""
+        if not extractions:
+            return
+        await self._restore(session_id)
+        values = {key: field.model_dump_json() for key, field in extractions.items()}
+        self._record("set_extractions", session_id, values)
+
+    async def append_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """発話を末尾に追記する."""
+        await self._restore(session_id)
+        self._record("append_utterance", session_id, utterance.model_dump_json())
+
+    async def append_utterances(self, session_id: str, utterances: list[Utterance]) -> None:
+        """複数の発話をまとめて末尾に追記する（1レコードで記録する）."""
+        if utterances:
+            await self._restore(session_id)
+            self._record(
+                "append_utterance", session_id, *(u.model_dump_json() for u in utterances)
+            )
+
+    async def update_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """既存の発話を発話IDで置き換える."""
+        await self._restore(session_id)
+        self._record("update_utterance", session_id, utterance.id, utterance.model_dump_json())
+
+    async def delete_session(self, session_id: str) -> None:
+        """セッションを削除する."""
+        self._record("delete_session", session_id)
+        self._delete_archive(session_id)
+
+    async def save_document(self, namespace: str, doc_id: str, data: str) -> None:
+        """ドキュメントを保存する."""
+        self._record("save_document", namespace, doc_id, data)
+
+    async def delete_documents(self, namespace: str, *doc_ids: str) -> None:
+        """ドキュメントを削除する."""
+        if doc_ids:
+            self._record("delete_documents", namespace, *doc_ids)
+
+
+class RespError(Exception):
+    """Redisプロトコルのエラー応答."""
+
+
+class RespClient:
+    """最小限のRedisプロトコル（RESP2）クライアント.
+
+    必要なコマンドを送るだけなのでredisパッケージには依存しない。
+    1接続をロックで直列化し、複数コマンドはパイプラインで1往復にまとめる。
+    接続は最初のコマンド送信時に張る。
+
+    Attributes:
+        host: ホスト名
+        port: ポート番号
+        db: データベース番号
+        password: パスワード（なければNone）
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+    ) -> None:
+        """クライアントを初期化する.
+
+        Args:
+            host: ホスト名
+            port: ポート番号
+            db: データベース番号
+            password: パスワード
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RespClient":
+        """redis://[:password@]host[:port][/db] 形式のURLからクライアントを作る.
+
+        Args:
+            url: 接続URL
+
+        Returns:
+            RespClient: クライアント
+        """
+        parts = urlsplit(url)
+        db_path = parts.path.lstrip("/")
+        return cls(
+            host=parts.hostname or "localhost",
+            port=parts.port or 6379,
+            db=int(db_path) if db_path else 0,
+            password=parts.password,
+        )
+
+    async def execute(self, *args: Any) -> Any:
+        """コマンドを1つ実行する.
+
+        Args:
+            *args: コマンド名と引数
+
+        Returns:
+            Any: 応答
+
+        Raises:
+            RespError: サーバーがエラーを返した場合
+        """
+        replies = await self.pipeline([args])
+        return replies[0]
+
+    async def pipeline(self, commands: Sequence[Sequence[Any]]) -> list[Any]:
+        """複数のコマンドを1往復で実行する.
+
+        Args:
+            commands: コマンドのリスト
+
+        Returns:
+            list[Any]: コマンドごとの応答
+
+        Raises:
+            RespError: いずれかのコマンドがエラーを返した場合
+        """
+        async with self._lock:
+            if self._writer is None:
+                await self._open()
+            completed = False
+            try:
+                replies = await self._roundtrip(commands)
+                completed = True
+            finally:
+                # 途中でキャンセル・切断されると応答の対応がずれるので接続を捨てる
+                if not completed:
+                    self._drop()
+        errors = [reply for reply in replies if isinstance(reply, RespError)]
+        if errors:
+            raise errors[0]
+        return replies
+
+    async def close(self) -> None:
+        """接続を閉じる."""
+        async with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                await self._writer.wait_closed()
+            self._reader = None
+            self._writer = None
+
+    async def _open(self) -> None:
+        """接続を張り、認証とDB選択を行う."""
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        setup: list[tuple] = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in await self._roundtrip(setup):
+                if isinstance(reply, RespError):
+                    self._drop()
+                    raise reply
+
+    def _drop(self) -> None:
+        """接続を破棄する（次のコマンドで張り直す）."""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+    async def _roundtrip(self, commands: Sequence[Sequence[Any]]) -> list[Any]:
+        """コマンドを書き込み、同じ数の応答を読む."""
+        self._writer.write(b"".join(encode_command(command) for command in commands))
+        await self._writer.drain()
+        return [await read_reply(self._reader) for _ in commands]
+
+
+def encode_command(args: Sequence[Any]) -> bytes:
+    """コマンドをRESPの配列にエンコードする.
+
+    Args:
+        args: コマンド名と引数
+
+    Returns:
+        bytes: エンコード済みのコマンド
+    """
+    chunks = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        chunks.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(chunks)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """RESPの応答を1つ読む.
+
+    エラー応答は例外にせずRespErrorとして返す（パイプラインの残りの応答を
+    読み切ってから呼び出し側で送出するため）。
+
+    Args:
+        reader: ストリーム
+
+    Returns:
+        Any: 文字列・整数・None・リスト・RespErrorのいずれか
+
+    Raises:
+        ConnectionError: 接続が閉じられた場合
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("RESP connection closed")
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b"+":
+        return payload.decode()
+    if prefix == b"-":
+        return RespError(payload.decode())
+    if prefix == b":":
+        return int(payload)
+    if prefix == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2].decode()
+    if prefix == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ConnectionError(f"Unknown RESP reply type: {prefix!r}")
+
+
+def _pairs_to_dict(values: list[str]) -> dict[str, str]:
+    """HGETALLのフラットな応答を辞書にする."""
+    return dict(zip(values[::2], values[1::2]))
+
+
+class RespSessionStore(SessionStore):
+    """Redisプロトコルで話すサーバーを使うセッションストア.
+
+    キー構造:
+        {prefix}:session:{id}              ハッシュ（メタ情報、値はJSON）
+        {prefix}:session:{id}:extractions  ハッシュ（フィールドキー → JSON）
+        {prefix}:session:{id}:utterances   リスト（発話JSON、追記のみ）
+        {prefix}:session:{id}:utterance_updates  ハッシュ（発話ID → 更新後の発話JSON）
+        {prefix}:doc:{namespace}           ハッシュ（ドキュメントID → JSON）
+
+    Attributes:
+        client: RESPクライアント
+        prefix: キーの接頭辞
+    """
+
+    shared = True
+
+    def __init__(self, client: RespClient, prefix: str = "tonari") -> None:
+        """ストアを初期化する.
+
+        Args:
+            client: RESPクライアント
+            prefix: キーの接頭辞
+        """
+        self.client = client
+        self.prefix = prefix
+
+    async def close(self) -> None:
+        """接続を閉じる."""
+        await self.client.close()
+
+    def _session_key(self, session_id: str, suffix: str = "") -> str:
+        """セッションのキーを作る."""
+        return f"{self.prefix}:session:{session_id}{suffix}"
+
+    async def create_session(self, session: SessionState) -> None:
+        """セッションを新規保存する."""
+        meta = _dump_meta(session, SESSION_META_FIELDS)
+        extractions_key = self._session_key(session.id, ":extractions")
+        utterances_key = self._session_key(session.id, ":utterances")
+        updates_key = self._session_key(session.id, ":utterance_updates")
+        commands: list[tuple] = [
+            ("DEL", extractions_key, utterances_key, updates_key),
+            ("HSET", self._session_key(session.id), *_flatten(meta)),
+        ]
+        if session.extractions:
+            extractions = {
+                key: field.model_dump_json() for key, field in session.extractions.items()
+            }
+            commands.append(("HSET", extractions_key, *_flatten(extractions)))
+        if session.utterances:
+            commands.append(
+                ("RPUSH", utterances_key, *(u.model_dump_json() for u in session.utterances))
+            )
+        await self.client.pipeline(commands)
+
+    async def load_session(self, session_id: str) -> Optional[SessionState]:
+        """セッションを読み込む."""
+        meta, extractions, utterances, updates = await self.client.pipeline(
+            [
+                ("HGETALL", self._session_key(session_id)),
+                ("HGETALL", self._session_key(session_id, ":extractions")),
+                ("LRANGE", self._session_key(session_id, ":utterances"), 0, -1),
+                ("HGETALL", self._session_key(session_id, ":utterance_updates")),
+            ]
+        )
+        if not meta:
+            return None
+        return _build_session(
+            _pairs_to_dict(meta), _pairs_to_dict(extractions), utterances, _pairs_to_dict(updates)
+        )
+
+    async def session_exists(self, session_id: str) -> bool:
+        """セッションが存在するかを返す."""
+        return bool(await self.client.execute("EXISTS", self._session_key(session_id)))
+
+    async def update_session_fields(self, session: SessionState, *fields: str) -> None:
+        """セッションのメタ情報を指定フィールドだけ書き込む."""
+        meta = _dump_meta(session, fields)
+        await self.client.execute("HSET", self._session_key(session.id), *_flatten(meta))
+
+    async def set_extractions(
+        self,
+        session_id: str,
+        extractions: dict[str, ExtractionField],
+    ) -> None:
+        """抽出情報をフィールド単位で書き込む."""
+        if not extractions:
+            return
+        values = {key: field.model_dump_json() for key, field in extractions.items()}
+        await self.client.execute(
+            "HSET", self._session_key(session_id, ":extractions"), *_flatten(values)
+        )
+
+    async def append_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """発話を末尾に追記する."""
+        await self.client.execute(
+            "RPUSH", self._session_key(session_id, ":utterances"), utterance.model_dump_json()
+        )
+
+    async def append_utterances(self, session_id: str, utterances: list[Utterance]) -> None:
+        """複数の発話をまとめて末尾に追記する（1回のRPUSH）."""
+        if utterances:
+            await self.client.execute(
+                "RPUSH",
+                self._session_key(session_id, ":utterances"),
+                *(u.model_dump_json() for u in utterances),
+            )
+
+    async def update_utterance(self, session_id: str, utterance: Utterance) -> None:
+        """既存の発話を発話IDで置き換える（リスト上の位置は使わない）."""
+        await self.client.execute(
+            "HSET",
+            self._session_key(session_id, ":utterance_updates"),
+            utterance.id,
+            utterance.model_dump_json(),
+        )
+
+    async def delete_session(self, session_id: str) -> None:
+        """セッションを削除する."""
+        await self.client.execute(
+            "DEL",
+            self._session_key(session_id),
+            self._session_key(session_id, ":extractions"),
+            self._session_key(session_id, ":utterances"),
+            self._session_key(session_id, ":utterance_updates"),
+        )
+
+    async def save_document(self, namespace: str, doc_id: str, data: str) -> None:
+        """ドキュメントを保存する."""
+        await self.client.execute("HSET", f"{self.prefix}:doc:{namespace}", doc_id, data)
+
+    async def load_document(self, namespace: str, doc_id: str) -> Optional[str]:
+        """ドキュメントを読み込む."""
+        return await self.client.execute("HGET", f"{self.prefix}:doc:{namespace}", doc_id)
+
+    async def list_documents(self, namespace: str) -> list[str]:
+        """名前空間のドキュメントをすべて読み込む."""
+        values = await self.client.execute("HGETALL", f"{self.prefix}:doc:{namespace}")
+        return values[1::2]
+
+    async def delete_documents(self, namespace: str, *doc_ids: str) -> None:
+        """ドキュメントを削除する."""
+        if doc_ids:
+            await self.client.execute("HDEL", f"{self.prefix}:doc:{namespace}", *doc_ids)
+
+
+def _flatten(values: dict[str, str]) -> list[str]:
+    """辞書をHSET用のフラットな引数列にする."""
+    return [item for pair in values.items() for item in pair]
+
+
+def create_session_store(url: str) -> SessionStore:
+    """設定URLに応じたセッションストアを作る.
+
+    プロセス内ストアは SESSION_JOURNAL_DIR が設定されていればジャーナル付きにし、
+    追い出したセッションは SESSION_ARCHIVE_DIR に書き出す。
+
+    Args:
+        url: 空文字または memory:// ならプロセス内ストア、redis:// ならRESPストア
+
+    Returns:
+        SessionStore: セッションストア
+
+    Raises:
+        ValueError: 未対応のスキームの場合
+    """
+    scheme = urlsplit(url).scheme if url else "memory"
+    if scheme == "memory":
+        if not settings.SESSION_JOURNAL_DIR:
+            return InMemorySessionStore(settings.SESSION_ARCHIVE_DIR)
+        return JournaledSessionStore(
+            SessionJournal(
+                settings.SESSION_JOURNAL_DIR,
+                segment_bytes=settings.SESSION_JOURNAL_SEGMENT_MB * 1024 * 1024,
+                commit_interval=settings.SESSION_JOURNAL_COMMIT_INTERVAL,
+            ),
+            settings.SESSION_ARCHIVE_DIR,
+        )
+    if scheme in ("redis", "resp"):
+        return RespSessionStore(RespClient.from_url(url))
+    raise ValueError(f"Unsupported SESSION_STORE_URL scheme: {scheme}")
+
+
+session_store = create_session_store(settings.SESSION_STORE_URL)
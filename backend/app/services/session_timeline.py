@@ -0,0 +1,249 @@
+"""
+TONARI for M&A - セッションの処理時間の記録
+「サジェストが遅い」と言われたときに、どの段階で時間がかかったかを後から
+追えるよう、ラウンドごとに各段階の時刻を記録する
+
+段階:
+    received      ラウンドで処理する最も古い発話を受け取った
+    flushed       バッファをフラッシュしてラウンドを始めた
+    prompt_built  プロンプトを組み立てた（抽出・サジェストそれぞれ）
+    request_sent  Claudeにリクエストを送った
+    first_byte    Claudeの応答の最初のイベントを受け取った
+    parsed        ツールの入力を解析した
+    broadcast     round_update を送信した
+
+直近のラウンドだけを上限付きで保持するため、長い面談でも使用量は一定。
+"""
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+# ラウンドの段階の内訳（名前, 開始の段階, 終了の段階）
+ROUND_SPANS: tuple[tuple[str, str, str], ...] = (
+    ("buffer_wait", "received", "flushed"),
+    ("total", "received", "broadcast"),
+    ("round", "flushed", "broadcast"),
+)
+# Claude呼び出しごとの段階の内訳
+CALL_SPANS: tuple[tuple[str, str, str], ...] = (
+    ("prompt_build", "flushed", "prompt_built"),
+    ("ttfb", "request_sent", "first_byte"),
+    ("generation", "first_byte", "parsed"),
+    ("call", "request_sent", "parsed"),
+)
+
+
+class CallTrace:
+    """1回のClaude呼び出しの各段階の時刻.
+
+    Attributes:
+        marks: 段階 → 時刻（monotonic秒）
+    """
+
+    __slots__ = ("marks",)
+
+    def __init__(self) -> None:
+        """空の記録を作る."""
+        self.marks: dict[str, float] = {}
+
+    def mark(self, stage: str) -> None:
+        """段階の時刻を記録する.
+
+        Args:
+            stage: 段階名
+        """
+        self.marks[stage] = time.monotonic()
+
+
+class RoundTrace:
+    """1ラウンドの各段階の時刻.
+
+    Attributes:
+        round: スケジューラの世代番号
+        reason: フラッシュの理由
+        utterances: 処理した発話数
+        started_at: ラウンドを始めた日時
+        marks: ラウンドの段階 → 時刻（monotonic秒）
+        calls: 呼び出し（extraction / suggestion）→ 各段階の時刻
+        outcome: 結果（broadcast / no_update / skipped / failed）
+    """
+
+    __slots__ = ("round", "reason", "utterances", "started_at", "marks", "calls", "outcome")
+
+    def __init__(
+        self,
+        round: int,
+        reason: str,
+        utterances: int,
+        received_at: Optional[float],
+    ) -> None:
+        """ラウンドの記録を始める.
+
+        Args:
+            round: スケジューラの世代番号
+            reason: フラッシュの理由
+            utterances: 処理する発話数
+            received_at: 最も古い発話を受け取った時刻（monotonic秒）
+        """
+        now = time.monotonic()
+        self.round = round
+        self.reason = reason
+        self.utterances = utterances
+        self.started_at = datetime.now()
+        self.marks: dict[str, float] = {"received": received_at or now, "flushed": now}
+        self.calls: dict[str, CallTrace] = {}
+        self.outcome = "failed"
+
+    def call(self, name: str) -> CallTrace:
+        """Claude呼び出しの記録を作る.
+
+        Args:
+            name: 呼び出しの名前（extraction / suggestion）
+
+        Returns:
+            CallTrace: 呼び出しの記録（サービスに渡す）
+        """
+        trace = CallTrace()
+        self.calls[name] = trace
+        return trace
+
+    def finish(self, outcome: str) -> None:
+        """ラウンドの結果を記録する.
+
+        Args:
+            outcome: broadcast / no_update / skipped（ゲートで抽出・サジェストとも呼ばなかった）
+        """
+        self.outcome = outcome
+        if outcome == "broadcast":
+            self.marks["broadcast"] = time.monotonic()
+
+    def spans(self) -> dict[str, float]:
+        """段階の所要時間を返す.
+
+        Returns:
+            dict[str, float]: 内訳の名前 → 所要時間（秒、記録がない段階は含まない）
+        """
+        spans: dict[str, float] = {}
+        for name, start, end in ROUND_SPANS:
+            if start in self.marks and end in self.marks:
+                spans[name] = self.marks[end] - self.marks[start]
+        flushed = self.marks["flushed"]
+        for call_name, call in self.calls.items():
+            marks = {"flushed": flushed, **call.marks}
+            for name, start, end in CALL_SPANS:
+                if start in marks and end in marks:
+                    spans[f"{call_name}.{name}"] = marks[end] - marks[start]
+        return spans
+
+    def to_dict(self) -> dict:
+        """APIレスポンス用の辞書に変換する.
+
+        Returns:
+            dict: ラウンドの概要、最も古い発話からの各段階の経過時間と内訳（ミリ秒）
+        """
+        origin = self.marks["received"]
+        return {
+            "round": self.round,
+            "reason": self.reason,
+            "utterances": self.utterances,
+            "started_at": self.started_at.isoformat(),
+            "outcome": self.outcome,
+            "stages_ms": {
+                stage: round((at - origin) * 1000, 1) for stage, at in self.marks.items()
+            },
+            "calls_ms": {
+                name: {stage: round((at - origin) * 1000, 1) for stage, at in call.marks.items()}
+                for name, call in self.calls.items()
+            },
+            "spans_ms": {name: round(value * 1000, 1) for name, value in self.spans().items()},
+        }
+
+
+class SessionTimeline:
+    """セッションの直近のラウンドの記録（上限付き）.
+
+    Attributes:
+        rounds: 直近のラウンドの記録
+        total_rounds: 記録したラウンドの総数
+    """
+
+    def __init__(self, max_rounds: int) -> None:
+        """空の記録を作る.
+
+        Args:
+            max_rounds: 保持するラウンド数
+        """
+        self.rounds: deque[RoundTrace] = deque(maxlen=max_rounds)
+        self.total_rounds = 0
+
+    def begin(
+        self,
+        round: int,
+        reason: str,
+        utterances: int,
+        received_at: Optional[float],
+    ) -> RoundTrace:
+        """ラウンドの記録を始める.
+
+        Args:
+            round: スケジューラの世代番号
+            reason: フラッシュの理由
+            utterances: 処理する発話数
+            received_at: 最も古い発話を受け取った時刻（monotonic秒）
+
+        Returns:
+            RoundTrace: ラウンドの記録
+        """
+        trace = RoundTrace(round, reason, utterances, received_at)
+        self.rounds.append(trace)
+        self.total_rounds += 1
+        return trace
+
+    def to_dict(self, limit: int) -> dict:
+        """段階ごとの分布と直近のラウンドを返す.
+
+        Args:
+            limit: 返す直近のラウンド数
+
+        Returns:
+            dict: 段階ごとの p50 / p95 / p99 / 最大（ミリ秒）と直近のラウンド
+        """
+        samples: dict[str, list[float]] = {}
+        for trace in self.rounds:
+            for name, value in trace.spans().items():
+                samples.setdefault(name, []).append(value)
+        outcomes: dict[str, int] = {}
+        for trace in self.rounds:
+            outcomes[trace.outcome] = outcomes.get(trace.outcome, 0) + 1
+        recent = list(self.rounds)[-limit:] if limit > 0 else []
+        return {
+            "total_rounds": self.total_rounds,
+            "retained_rounds": len(self.rounds),
+            "outcomes": outcomes,
+            "breakdown": {name: percentiles(values) for name, values in sorted(samples.items())},
+            "recent": [trace.to_dict() for trace in reversed(recent)],
+        }
+
+
+def percentiles(values: list[float]) -> dict:
+    """所要時間の分布を返す.
+
+    Args:
+        values: 所要時間（秒）
+
+    Returns:
+        dict: 件数と p50 / p95 / p99 / 最大（ミリ秒）
+    """
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
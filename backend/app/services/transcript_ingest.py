@@ -0,0 +1,406 @@
+"""
+TONARI for M&A - 文字起こしの一括取り込み
+録音の文字起こしや議事録をまとめて受け取り、重なりのある窓に分けて並列に
+抽出する（ライブの面談のように話す速さで流す必要はない）
+
+窓の結果は完了した順ではなく窓の順に反映するため、同じ文字起こしからは
+並列度によらず同じ抽出結果になる。抽出に失敗した窓は除いてまとめ、
+失敗した窓の番号を進捗と完了の通知で返す。
+"""
+import asyncio
+import codecs
+import logging
+import re
+import time
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from ..core.config import settings
+from ..models.mna_schemas import FIELD_REGISTRY, ExtractionField, Utterance
+from .mna_extraction import MnAExtractionService
+
+logger = logging.getLogger(__name__)
+
+# 話者の表記 → Utterance.speaker
+SPEAKER_LABELS: dict[str, str] = {
+    "アドバイザー": "user",
+    "advisor": "user",
+    "user": "user",
+    "売り手": "customer",
+    "seller": "customer",
+    "customer": "customer",
+}
+# 「[売り手] 」「アドバイザー：」のような行頭の話者の表記
+_SPEAKER_PATTERN = re.compile(
+    r"^(?:\[(?P<bracket>[^\]]{1,20})\]|(?P<colon>[^:：\s]{1,20})\s*[:：])\s*(?P<text>.*)$"
+)
+# 見出し・箇条書き・引用・番号の記号
+_MARKUP_PATTERN = re.compile(r"^(?:#+|>|[-*+]|\d+[.)])\s+")
+# 表の区切り行と区切り線
+_RULE_PATTERN = re.compile(r"^(?:\|?\s*:?-{3,}:?\s*)+\|?$")
+
+# ワーカー内の一括取り込み全体で同時に実行する抽出の数
+_window_slots = asyncio.Semaphore(settings.BULK_INGEST_CONCURRENCY)
+
+
+class TranscriptParser:
+    """議事録・文字起こしのテキストを発話に分ける.
+
+    1行を1発話とし、行頭に話者の表記（SPEAKER_LABELS）があればそれに従う。
+    表記のない行は直前の話者の発話とする。Markdownの見出し・箇条書きの記号と
+    強調は取り除き、区切り線は読み飛ばす。チャンクに分かれて届くテキストも
+    順に渡せば行の途中で切れていても扱える。
+    """
+
+    def __init__(self, default_speaker: str = "customer") -> None:
+        """パーサーを作る.
+
+        Args:
+            default_speaker: 話者の表記が出てくるまでの話者
+        """
+        self.speaker = default_speaker
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+
+    def feed(self, chunk: bytes | str) -> list[tuple[str, str]]:
+        """テキストの続きを渡し、行が揃った分の発話を返す.
+
+        Args:
+            chunk: テキストの続き（バイト列ならUTF-8として読む）
+
+        Returns:
+            list[tuple[str, str]]: (話者, テキスト)
+        """
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        return [item for item in map(self._parse_line, lines) if item is not None]
+
+    def close(self) -> list[tuple[str, str]]:
+        """残りのテキストを発話にする.
+
+        Returns:
+            list[tuple[str, str]]: (話者, テキスト)
+        """
+        rest = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        item = self._parse_line(rest)
+        return [item] if item is not None else []
+
+    def _parse_line(self, line: str) -> Optional[tuple[str, str]]:
+        """1行を発話にする（空行・区切り線はNone）."""
+        line = line.strip()
+        if not line or _RULE_PATTERN.match(line):
+            return None
+        match = _SPEAKER_PATTERN.match(line)
+        if match:
+            label = (match.group("bracket") or match.group("colon")).strip()
+            speaker = SPEAKER_LABELS.get(label.lower())
+            if speaker is not None:
+                self.speaker = speaker
+                line = match.group("text")
+        if line.startswith("|"):
+            line = " ".join(cell.strip() for cell in line.strip("|").split("|"))
+        line = _MARKUP_PATTERN.sub("", line).replace("**", "").strip()
+        if not line:
+            return None
+        return self.speaker, line
+
+
+class TranscriptWindow:
+    """抽出の単位（連続する発話）.
+
+    Attributes:
+        index: 窓の番号（0始まり）
+        start: 最初の発話の取り込み内での位置
+        utterances: 窓の発話（前の窓との重なりを含む）
+    """
+
+    __slots__ = ("index", "start", "utterances")
+
+    def __init__(self, index: int, start: int, utterances: list[Utterance]) -> None:
+        """窓を作る.
+
+        Args:
+            index: 窓の番号
+            start: 最初の発話の位置
+            utterances: 窓の発話
+        """
+        self.index = index
+        self.start = start
+        self.utterances = utterances
+
+
+class WindowBuilder:
+    """発話を順に受け取り、重なりのある窓に区切る.
+
+    窓の文字数が上限に達したら窓を閉じ、末尾の発話を重なりの文字数まで
+    次の窓の先頭に持ち越す（窓の境目で途切れた話の文脈を残すため）。
+    """
+
+    def __init__(self, max_chars: int, overlap_chars: int) -> None:
+        """空の状態で作る.
+
+        Args:
+            max_chars: 1つの窓の文字数の目安
+            overlap_chars: 次の窓に持ち越す文字数の上限
+        """
+        self.max_chars = max_chars
+        self.overlap_chars = overlap_chars
+        self.count = 0
+        self._pending: list[Utterance] = []
+        self._start = 0
+        self._chars = 0
+        self._carried = 0
+
+    def add(self, utterance: Utterance) -> Optional[TranscriptWindow]:
+        """発話を追加し、窓が埋まったら返す.
+
+        Args:
+            utterance: 発話
+
+        Returns:
+            Optional[TranscriptWindow]: 閉じた窓（まだ埋まっていなければNone）
+        """
+        self._pending.append(utterance)
+        self._chars += len(utterance.text)
+        if self._chars < self.max_chars:
+            return None
+        window = self._emit()
+        carry: list[Utterance] = []
+        chars = 0
+        for previous in reversed(window.utterances):
+            if chars + len(previous.text) > self.overlap_chars:
+                break
+            chars += len(previous.text)
+            carry.insert(0, previous)
+        self._start = window.start + len(window.utterances) - len(carry)
+        self._pending = carry
+        self._chars = chars
+        self._carried = len(carry)
+        return window
+
+    def close(self) -> Optional[TranscriptWindow]:
+        """残りの発話で最後の窓を閉じる.
+
+        Returns:
+            Optional[TranscriptWindow]: 最後の窓（持ち越した発話しかなければNone）
+        """
+        if len(self._pending) <= self._carried:
+            return None
+        return self._emit()
+
+    def _emit(self) -> TranscriptWindow:
+        """保留中の発話で窓を作る."""
+        window = TranscriptWindow(self.count, self._start, self._pending)
+        self.count += 1
+        return window
+
+
+def merge_window_fields(results: list[list[ExtractionField]]) -> dict[str, ExtractionField]:
+    """窓ごとの抽出結果を1つにまとめる.
+
+    ライブのラウンドと同じく、会話の後ろで述べられた値で上書きする
+    （窓の順、窓の中では出力の順）。
+
+    Args:
+        results: 窓の順に並べた抽出結果
+
+    Returns:
+        dict[str, ExtractionField]: フィールドキー → 抽出フィールド
+    """
+    merged: dict[str, ExtractionField] = {}
+    for fields in results:
+        for field in fields:
+            merged[FIELD_REGISTRY.lookup(field.category, field.field).key] = field
+    return merged
+
+
+class TranscriptIngest:
+    """1回の一括取り込み.
+
+    テキストを受け取りながら窓に区切り、埋まった窓から順に抽出を始める
+    （アップロードと抽出が重なる）。
+
+    Attributes:
+        session_id: セッションID
+        utterances: 取り込んだ発話
+        windows_done: 抽出を終えた窓の数
+        fields_found: 窓ごとに抽出されたフィールド数の合計
+        started_at: 取り込みを始めた時刻（monotonic秒）
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        extraction_service: MnAExtractionService,
+        known: dict[str, ExtractionField],
+    ) -> None:
+        """取り込みを始める.
+
+        Args:
+            session_id: セッションID
+            extraction_service: 抽出サービス
+            known: 取り込み前の抽出情報（各窓のプロンプトで取得済みとして扱う）
+        """
+        self.session_id = session_id
+        self.extraction_service = extraction_service
+        self.known = dict(known)
+        self.utterances: list[Utterance] = []
+        self.windows_done = 0
+        self.fields_found = 0
+        self.started_at = time.monotonic()
+        self._parser = TranscriptParser()
+        self._builder = WindowBuilder(
+            settings.BULK_INGEST_WINDOW_CHARS, settings.BULK_INGEST_OVERLAP_CHARS
+        )
+        self._chars = 0
+        self._closed = False
+        self._tasks: list[asyncio.Task] = []
+        self._results: dict[int, list[ExtractionField]] = {}
+        self._completed: asyncio.Queue[int] = asyncio.Queue()
+
+    @property
+    def windows_total(self) -> Optional[int]:
+        """窓の総数（テキストを受け取り終えるまではNone）."""
+        return self._builder.count if self._closed else None
+
+    def feed_text(self, chunk: bytes | str) -> list[Utterance]:
+        """テキストの続きを取り込む.
+
+        Args:
+            chunk: テキストの続き
+
+        Returns:
+            list[Utterance]: 新しく確定した発話
+
+        Raises:
+            ValueError: 取り込める文字数の上限を超えた場合
+        """
+        return self._add(self._parser.feed(chunk))
+
+    def feed_utterances(self, items: list[tuple[str, str]]) -> list[Utterance]:
+        """話者付きの発話を取り込む.
+
+        Args:
+            items: (話者, テキスト)
+
+        Returns:
+            list[Utterance]: 新しく確定した発話
+
+        Raises:
+            ValueError: 取り込める文字数の上限を超えた場合
+        """
+        return self._add([(speaker, text.strip()) for speaker, text in items if text.strip()])
+
+    def close(self) -> list[Utterance]:
+        """テキストの終わりを伝え、最後の窓の抽出を始める.
+
+        Returns:
+            list[Utterance]: 残りのテキストから確定した発話
+        """
+        added = self._add(self._parser.close())
+        window = self._builder.close()
+        if window is not None:
+            self._start(window)
+        self._closed = True
+        return added
+
+    async def progress(self) -> AsyncIterator[dict]:
+        """窓の抽出が終わるたびに進捗を返す（close()の後、全窓が終わるまで）.
+
+        Yields:
+            dict: 終えた窓の番号と成否・終えた窓の数・失敗した窓の数・総数・発話数・
+                抽出されたフィールド数
+        """
+        reported = 0
+        while reported < (self.windows_total or 0):
+            index = await self._completed.get()
+            reported += 1
+            yield {
+                "type": "progress",
+                "window": index,
+                "failed": index not in self._results,
+                "windows_done": self.windows_done,
+                "windows_failed": len(self.windows_failed),
+                "windows_total": self.windows_total,
+                "utterances": len(self.utterances),
+                "fields": self.fields_found,
+            }
+
+    @property
+    def windows_failed(self) -> list[int]:
+        """抽出に失敗した窓の番号（終えた窓のうち結果のないもの）."""
+        return [
+            index
+            for index, task in enumerate(self._tasks)
+            if task.done() and index not in self._results
+        ]
+
+    async def result(self) -> dict[str, ExtractionField]:
+        """全窓の抽出を待ち、成功した窓の結果を窓の順にまとめて返す.
+
+        失敗した窓は windows_failed で分かる。
+
+        Returns:
+            dict[str, ExtractionField]: フィールドキー → 抽出フィールド
+        """
+        outcomes = await asyncio.gather(*self._tasks, return_exceptions=True)
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Ingest window {index} failed: {self.session_id} ({outcome!r})")
+        return merge_window_fields([self._results[index] for index in sorted(self._results)])
+
+    def cancel(self) -> None:
+        """実行中の抽出を取り消す."""
+        for task in self._tasks:
+            task.cancel()
+
+    def _add(self, items: list[tuple[str, str]]) -> list[Utterance]:
+        """発話を作り、埋まった窓の抽出を始める."""
+        added: list[Utterance] = []
+        for speaker, text in items:
+            self._chars += len(text)
+            if self._chars > settings.BULK_INGEST_MAX_CHARS:
+                raise ValueError(
+                    f"Transcript exceeds {settings.BULK_INGEST_MAX_CHARS} characters"
+                )
+            utterance = Utterance(
+                id=str(uuid4()),
+                session_id=self.session_id,
+                timestamp=datetime.now(),
+                speaker=speaker,
+                text=text,
+            )
+            added.append(utterance)
+            window = self._builder.add(utterance)
+            if window is not None:
+                self._start(window)
+        self.utterances.extend(added)
+        return added
+
+    def _start(self, window: TranscriptWindow) -> None:
+        """窓の抽出をバックグラウンドで始める."""
+        self._tasks.append(
+            asyncio.create_task(
+                self._extract(window), name=f"ingest:{self.session_id}:{window.index}"
+            )
+        )
+
+    async def _extract(self, window: TranscriptWindow) -> None:
+        """窓から抽出する（同時実行数はワーカー全体で制限する）.
+
+        失敗したらタスクごと失敗させ、結果を残さない（windows_failed に数える）。
+        """
+        try:
+            async with _window_slots:
+                result = await self.extraction_service.extract_from_utterances(
+                    self.session_id, window.utterances, self.known
+                )
+            self._results[window.index] = result.fields
+            self.fields_found += len(result.fields)
+        finally:
+            self.windows_done += 1
+            self._completed.put_nowait(window.index)
@@ -0,0 +1,153 @@
+"""
+TONARI for M&A - セッションの発話ログ
+追記専用の発話リストに、ID・話者・時刻の索引とシーケンス番号を持たせる
+
+2〜3時間の面談では発話が数千件になるため、ピン留めのID検索や
+直近の発話の取り出しで毎回リスト全体を走査しないようにする。
+"""
+import bisect
+from datetime import datetime
+from typing import Iterator, Optional
+
+from ..models.mna_schemas import Utterance
+
+
+class TranscriptStore:
+    """1セッションの発話ログ.
+
+    発話はリストの末尾にだけ追加し、リスト上の位置をシーケンス番号として
+    使う（0始まり、単調増加）。リストは SessionState.utterances と同じ
+    オブジェクトを共有するため、セッションのシリアライズはそのまま使える。
+
+    Attributes:
+        utterances: 発話のリスト（SessionState.utterances と共有）
+    """
+
+    def __init__(self, utterances: list[Utterance]) -> None:
+        """既存の発話リストから索引を作る.
+
+        Args:
+            utterances: 発話のリスト（このリストに追記していく）
+        """
+        self.utterances = utterances
+        self._by_id: dict[str, int] = {}
+        self._by_speaker: dict[str, list[int]] = {}
+        # (時刻, シーケンス番号) の昇順。他ワーカー発の発話は前後しうるため別に持つ
+        self._by_time: list[tuple[datetime, int]] = []
+        for seq, utterance in enumerate(utterances):
+            self._index(seq, utterance)
+
+    def __len__(self) -> int:
+        """発話数を返す."""
+        return len(self.utterances)
+
+    def __iter__(self) -> Iterator[Utterance]:
+        """発話を古い順に返す."""
+        return iter(self.utterances)
+
+    def __contains__(self, utterance_id: object) -> bool:
+        """発話IDが記録済みかを返す."""
+        return utterance_id in self._by_id
+
+    def append(self, utterance: Utterance) -> Optional[int]:
+        """発話を追加する.
+
+        Args:
+            utterance: 発話
+
+        Returns:
+            Optional[int]: 追加した発話のシーケンス番号（同じIDが記録済みならNone）
+        """
+        if utterance.id in self._by_id:
+            return None
+        seq = len(self.utterances)
+        self.utterances.append(utterance)
+        self._index(seq, utterance)
+        return seq
+
+    def get(self, utterance_id: str) -> Optional[Utterance]:
+        """IDで発話を取得する.
+
+        Args:
+            utterance_id: 発話ID
+
+        Returns:
+            Optional[Utterance]: 発話（なければNone）
+        """
+        seq = self._by_id.get(utterance_id)
+        return None if seq is None else self.utterances[seq]
+
+    def seq_of(self, utterance_id: str) -> Optional[int]:
+        """発話のシーケンス番号を取得する.
+
+        Args:
+            utterance_id: 発話ID
+
+        Returns:
+            Optional[int]: シーケンス番号（なければNone）
+        """
+        return self._by_id.get(utterance_id)
+
+    def recent(self, count: int) -> list[Utterance]:
+        """直近の発話を取得する.
+
+        Args:
+            count: 件数
+
+        Returns:
+            list[Utterance]: 直近の発話（古い順）
+        """
+        if count <= 0:
+            return []
+        return self.utterances[-count:]
+
+    def window(self, start_seq: int, end_seq: Optional[int] = None) -> list[Utterance]:
+        """シーケンス番号の範囲の発話を取得する.
+
+        Args:
+            start_seq: 開始シーケンス番号（含む）
+            end_seq: 終了シーケンス番号（含まない、省略時は末尾まで）
+
+        Returns:
+            list[Utterance]: 範囲内の発話（古い順）
+        """
+        return self.utterances[max(start_seq, 0) : end_seq]
+
+    def by_speaker(self, speaker: str, limit: Optional[int] = None) -> list[Utterance]:
+        """話者の発話を取得する.
+
+        Args:
+            speaker: 話者
+            limit: 直近から数えた最大件数（省略時はすべて）
+
+        Returns:
+            list[Utterance]: 話者の発話（古い順）
+        """
+        seqs = self._by_speaker.get(speaker, [])
+        if limit is not None:
+            seqs = seqs[-limit:] if limit > 0 else []
+        return [self.utterances[seq] for seq in seqs]
+
+    def between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> list[Utterance]:
+        """時刻の範囲の発話を取得する.
+
+        Args:
+            start: 開始時刻（含む、省略時は最初から）
+            end: 終了時刻（含まない、省略時は最後まで）
+
+        Returns:
+            list[Utterance]: 範囲内の発話（時刻順）
+        """
+        low = 0 if start is None else bisect.bisect_left(self._by_time, (start, -1))
+        high = len(self._by_time) if end is None else bisect.bisect_left(self._by_time, (end, -1))
+        return [self.utterances[seq] for _, seq in self._by_time[low:high]]
+
+    def _index(self, seq: int, utterance: Utterance) -> None:
+        """発話を索引に登録する."""
+        self._by_id[utterance.id] = seq
+        self._by_speaker.setdefault(utterance.speaker, []).append(seq)
+        entry = (utterance.timestamp, seq)
+        if not self._by_time or self._by_time[-1] <= entry:
+            self._by_time.append(entry)
+        else:
+            bisect.insort(self._by_time, entry)
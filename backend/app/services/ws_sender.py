@@ -0,0 +1,330 @@
+"""
+TONARI for M&A - WebSocket接続ごとの送信キュー
+接続ごとに上限付きの送信キューと送信タスクを持ち、遅い接続（ホテルの
+Wi-Fiなど）が同じセッションの他の画面への送信を遅らせないようにする
+
+- 同じ合流キーのメッセージ（interimの文字起こし、同じ項目の抽出更新）は
+  未送信のものを捨てて最新のものだけを送る
+- キューが上限に達した接続や、1回の送信が長時間終わらない接続は切断する
+- セッションの送信メッセージには連番（seq）を振って直近の分を保持し、
+  再接続したクライアントに取りこぼした分だけを再送できるようにする
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import count
+from typing import Callable, Optional
+from uuid import uuid4
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+# 遅い接続を切断するときのクローズコード（Try Again Later）
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# 受信の制限を超え続けた接続を切断するときのクローズコード（Policy Violation）
+POLICY_VIOLATION_CLOSE_CODE = 1008
+# 終了するワーカーの接続を閉じるときのクローズコード（Service Restart、再接続してよい）
+SERVICE_RESTART_CLOSE_CODE = 1012
+# 切断理由 → クローズコード（ほかの理由は SLOW_CONSUMER_CLOSE_CODE）
+_CLOSE_CODES = {
+    "policy_violation": POLICY_VIOLATION_CLOSE_CODE,
+    "draining": SERVICE_RESTART_CLOSE_CODE,
+}
+
+
+def with_seq(message_json: str, seq: int) -> str:
+    """シリアライズ済みのメッセージに連番を付け加える.
+
+    Args:
+        message_json: シリアライズ済みのメッセージ（JSONオブジェクト）
+        seq: 連番
+
+    Returns:
+        str: 末尾に "seq" を加えたメッセージ（"type" は先頭のまま）
+    """
+    return f'{message_json[:-1]},"seq":{seq}}}'
+
+
+class ReplayBuffer:
+    """1セッションの送信ストリームの連番と直近のメッセージ.
+
+    連番はワーカーごとに振るため、ストリームIDが同じ場合に限り比較できる。
+    別ワーカーへの再接続やワーカーの再起動ではストリームIDが変わる。
+
+    Attributes:
+        stream_id: ストリームID
+        last_seq: 最後に振った連番（まだなければ0）
+    """
+
+    def __init__(self, size: int) -> None:
+        """空のストリームを作る.
+
+        Args:
+            size: 保持するメッセージ数の上限
+        """
+        self.stream_id = uuid4().hex[:12]
+        self.last_seq = 0
+        self._entries: deque[tuple[int, str, Optional[str]]] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        """保持しているメッセージ数を返す."""
+        return len(self._entries)
+
+    def append(self, message_json: str, coalesce_key: Optional[str] = None) -> int:
+        """メッセージに連番を振って保持する.
+
+        Args:
+            message_json: シリアライズ済みのメッセージ（連番なし）
+            coalesce_key: 合流キー
+
+        Returns:
+            int: 振った連番
+        """
+        self.last_seq += 1
+        self._entries.append((self.last_seq, message_json, coalesce_key))
+        return self.last_seq
+
+    def since(self, last_seq: int) -> Optional[list[tuple[int, str, Optional[str]]]]:
+        """指定した連番より後のメッセージを返す.
+
+        Args:
+            last_seq: クライアントが最後に受け取った連番
+
+        Returns:
+            Optional[list[tuple[int, str, Optional[str]]]]: 連番・メッセージ・合流キー
+            （古いメッセージが押し出されていて取りこぼしを埋められない場合はNone）
+        """
+        if last_seq > self.last_seq:
+            return None
+        oldest = self._entries[0][0] if self._entries else self.last_seq + 1
+        if last_seq < oldest - 1:
+            return None
+        return [entry for entry in self._entries if entry[0] > last_seq]
+
+
+class SendStats:
+    """接続ごとの送信の計測値.
+
+    Attributes:
+        enqueued: キューに積んだメッセージ数
+        sent: 送信したメッセージ数
+        sent_bytes: 送信した文字数
+        coalesced: 未送信の同じキーのメッセージを置き換えた回数
+        max_depth: キューの最大滞留数
+        send_seconds_total: 送信にかかった時間の合計（秒）
+        send_seconds_max: 1回の送信にかかった最大時間（秒）
+        close_reason: 切断理由（接続中ならNone）
+    """
+
+    def __init__(self) -> None:
+        """計測値を初期化する."""
+        self.enqueued = 0
+        self.sent = 0
+        self.sent_bytes = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.send_seconds_total = 0.0
+        self.send_seconds_max = 0.0
+        self.close_reason: Optional[str] = None
+
+    def record_send(self, size: int, elapsed: float) -> None:
+        """1回の送信を記録する.
+
+        Args:
+            size: 送信した文字数
+            elapsed: 送信にかかった時間（秒）
+        """
+        self.sent += 1
+        self.sent_bytes += size
+        self.send_seconds_total += elapsed
+        self.send_seconds_max = max(self.send_seconds_max, elapsed)
+
+    def to_dict(self) -> dict:
+        """APIレスポンス用の辞書に変換する.
+
+        Returns:
+            dict: 計測値
+        """
+        return {
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "sent_bytes": self.sent_bytes,
+            "coalesced": self.coalesced,
+            "max_depth": self.max_depth,
+            "send_ms_avg": round(self.send_seconds_total / self.sent * 1000, 2) if self.sent else 0.0,
+            "send_ms_max": round(self.send_seconds_max * 1000, 2),
+            "close_reason": self.close_reason,
+        }
+
+
+class ConnectionSender:
+    """1つのWebSocket接続の送信キューと送信タスク.
+
+    offerはキューに積むだけで送信を待たないため、呼び出し側（ブロード
+    キャスト）は接続数や接続の速さに関係なくすぐに戻る。
+
+    Attributes:
+        websocket: 送信先の接続
+        max_pending: キューの上限（超えたら切断）
+        send_timeout: 1回の送信の待ち時間の上限（秒、超えたら切断）
+        batched: ラウンドの結果をまとめたフレーム（round_update）を受け取るか
+        stats: 送信の計測値
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_pending: int,
+        send_timeout: float,
+        on_close: Callable[[WebSocket], None],
+        batched: bool = False,
+    ) -> None:
+        """送信キューを作る（送信タスクはstartで開始する）.
+
+        Args:
+            websocket: 送信先の接続
+            max_pending: キューの上限
+            send_timeout: 1回の送信の待ち時間の上限（秒）
+            on_close: 遅い接続・送信エラーで切断したときに呼ぶ関数
+            batched: round_update を受け取るか（Falseなら項目ごとのフレームに展開して送る）
+        """
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.batched = batched
+        self.stats = SendStats()
+        self._on_close = on_close
+        self._pending: OrderedDict[object, str] = OrderedDict()
+        self._sequence = count()
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+        self.connected_at = datetime.now()
+
+    @property
+    def depth(self) -> int:
+        """未送信のメッセージ数."""
+        return len(self._pending)
+
+    @property
+    def closed(self) -> bool:
+        """切断済みかどうか."""
+        return self.stats.close_reason is not None
+
+    def start(self) -> None:
+        """送信タスクを開始する."""
+        self._task = asyncio.create_task(self._run(), name="ws-sender")
+
+    def offer(self, message_json: str, coalesce_key: Optional[str] = None) -> None:
+        """メッセージを送信キューに積む.
+
+        合流キーが同じ未送信のメッセージがあれば取り除き、最新のものを末尾に
+        積み直す（先に積まれた他のメッセージより前に出さない）。
+
+        Args:
+            message_json: シリアライズ済みのメッセージ
+            coalesce_key: 合流キー（Noneなら置き換えない）
+        """
+        if self.closed:
+            return
+        self.stats.enqueued += 1
+        if coalesce_key is not None and coalesce_key in self._pending:
+            del self._pending[coalesce_key]
+            self._pending[coalesce_key] = message_json
+            self.stats.coalesced += 1
+            self._idle.clear()
+            return
+        if len(self._pending) >= self.max_pending:
+            logger.warning(f"Outbound queue full ({self.max_pending}), closing slow connection")
+            self.close("slow_consumer")
+            return
+        key = coalesce_key if coalesce_key is not None else next(self._sequence)
+        self._pending[key] = message_json
+        self.stats.max_depth = max(self.stats.max_depth, len(self._pending))
+        self._idle.clear()
+        self._ready.set()
+
+    def close(self, reason: str) -> None:
+        """送信を止める.
+
+        接続側の問題（遅い・送信エラー・受信の制限超過）による場合は接続を閉じ、
+        マネージャーに登録解除を依頼する。
+
+        Args:
+            reason: 切断理由（"disconnected" はクライアント側からの切断）
+        """
+        if self.closed:
+            return
+        self.stats.close_reason = reason
+        self._pending.clear()
+        self._idle.set()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        if reason != "disconnected":
+            self._close_task = asyncio.create_task(self._close_websocket(reason))
+            self._on_close(self.websocket)
+
+    async def _close_websocket(self, reason: str) -> None:
+        """接続を閉じる（クライアント側がすでに閉じていれば記録だけする）."""
+        code = _CLOSE_CODES.get(reason, SLOW_CONSUMER_CLOSE_CODE)
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except (RuntimeError, WebSocketDisconnect) as e:
+            logger.debug(f"WebSocket already closed ({reason}): {e!r}")
+
+    async def drain(self, reason: str, timeout: float) -> None:
+        """キューに積まれたメッセージを送り切ってから接続を閉じる.
+
+        Args:
+            reason: 切断理由
+            timeout: 送り切るまで待つ時間の上限（秒、過ぎたら残りを捨てて閉じる）
+        """
+        if self.closed:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Closing connection with {self.depth} unsent messages ({reason})")
+        self.close(reason)
+        if self._close_task is not None:
+            await self._close_task
+
+    async def _run(self) -> None:
+        """キューのメッセージを古い順に送信する."""
+        while not self.closed:
+            if not self._pending:
+                self._idle.set()
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            _, message_json = self._pending.popitem(last=False)
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message_json), self.send_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"WebSocket send exceeded {self.send_timeout}s, closing connection")
+                self.close("send_timeout")
+                return
+            except Exception as e:
+                logger.info(f"WebSocket send failed: {e}")
+                self.close("send_error")
+                return
+            self.stats.record_send(len(message_json), time.perf_counter() - started)
+
+    def to_dict(self) -> dict:
+        """APIレスポンス用の辞書に変換する.
+
+        Returns:
+            dict: 接続の状態と計測値
+        """
+        return {
+            "connected_at": self.connected_at.isoformat(),
+            "batched": self.batched,
+            "depth": self.depth,
+            **self.stats.to_dict(),
+        }
@@ -0,0 +1,82 @@
+"""
+テスト共通の設定
+バックエンドは `app` パッケージとして backend/ から import するため、リポジトリの
+ルートから pytest を実行しても解決できるよう backend/ を import パスに加える。
+共有ストア・ブロードキャストバスのテストは scripts/resp_standin.py をプロセス内で
+立てて使う（Redis本体は不要）。
+"""
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from app.models.mna_schemas import Utterance  # noqa: E402
+from resp_standin import RespStandIn  # noqa: E402
+
+
+class FakeWebSocket:
+    """送信内容と切断を記録するWebSocketの代わり."""
+
+    def __init__(self, send_delay: float = 0.0, closed: bool = False) -> None:
+        self.sent: list[str] = []
+        self.close_codes: list[int] = []
+        self.send_delay = send_delay
+        self.closed = closed
+
+    async def accept(self) -> None:
+        """接続を受け入れる（何もしない）."""
+
+    async def send_text(self, data: str) -> None:
+        """送信内容を記録する（send_delay 秒かかる）."""
+        await asyncio.sleep(self.send_delay)
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None) -> None:
+        """切断を記録する（すでに閉じていればASGIサーバーと同じく RuntimeError）."""
+        if self.closed:
+            raise RuntimeError("Unexpected ASGI message 'websocket.close'")
+        self.closed = True
+        self.close_codes.append(code)
+
+
+@asynccontextmanager
+async def resp_standin() -> AsyncIterator[str]:
+    """RESPの代替サーバーを空いているポートで立てる.
+
+    Yields:
+        str: 接続URL（redis://127.0.0.1:<port>/0）
+    """
+    standin = RespStandIn()
+    server = await asyncio.start_server(standin.handle_client, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        yield f"redis://127.0.0.1:{port}/0"
+
+
+@pytest.fixture
+def make_utterance() -> Callable[..., Utterance]:
+    """発話を作る関数を返す.
+
+    Returns:
+        Callable[..., Utterance]: テキスト・話者・IDから発話を作る関数
+    """
+    counter = iter(range(1_000_000))
+
+    def make(text: str, speaker: str = "customer", utterance_id: str = "") -> Utterance:
+        return Utterance(
+            id=utterance_id or f"u{next(counter)}",
+            session_id="s1",
+            timestamp=datetime(2024, 1, 1),
+            speaker=speaker,
+            text=text,
+        )
+
+    return make
@@ -0,0 +1,193 @@
+"""音声のリングバッファ・STTの接続・取り込みパイプラインのテスト."""
+import asyncio
+import json
+
+import pytest
+from websockets.exceptions import ConnectionClosedError, ConnectionClosedOK
+
+from app.services.audio_ingest import (
+    AudioPipeline,
+    AudioRingBuffer,
+    DeepgramSttStream,
+    LocalSttAdapter,
+    LocalSttStream,
+    SttError,
+    SttStream,
+    TranscriptFn,
+)
+
+
+class FlakySttAdapter(LocalSttAdapter):
+    """最初の接続だけ failing_send 回目の送信で切れるローカル認識."""
+
+    def __init__(self, failing_send: int) -> None:
+        self.failing_send = failing_send
+        self.connects = 0
+
+    async def connect(self, session_id: str, on_transcript: TranscriptFn) -> SttStream:
+        """接続を作る（最初の接続だけ途中で切れる）."""
+        self.connects += 1
+        stream = LocalSttStream(on_transcript)
+        if self.connects > 1:
+            return stream
+        sends = 0
+        send = stream.send
+
+        async def flaky_send(chunk: memoryview) -> None:
+            nonlocal sends
+            sends += 1
+            if sends == self.failing_send:
+                raise SttError("connection reset")
+            await send(chunk)
+
+        stream.send = flaky_send
+        return stream
+
+
+class FakeDeepgramSocket:
+    """受信メッセージを順に返し、最後に close_error を送出するDeepgram接続の代わり."""
+
+    def __init__(self, messages: list[dict], close_error: Exception) -> None:
+        self.messages = [json.dumps(message) for message in messages]
+        self.close_error = close_error
+        self.sent: list = []
+
+    async def recv(self) -> str:
+        """次のメッセージを返す（なければ close_error を送出する）."""
+        await asyncio.sleep(0)
+        if not self.messages:
+            raise self.close_error
+        return self.messages.pop(0)
+
+    async def send(self, data) -> None:
+        """送信内容を記録する."""
+        self.sent.append(data)
+
+    async def close(self) -> None:
+        """切断済みなら close_error を送出する."""
+        if not self.messages:
+            raise self.close_error
+
+
+def _result(text: str, speaker: int, is_final: bool) -> dict:
+    return {
+        "type": "Results",
+        "is_final": is_final,
+        "channel": {"alternatives": [{"transcript": text, "words": [{"speaker": speaker}]}]},
+    }
+
+
+def test_ring_buffer_wraps_around_without_losing_order() -> None:
+    # A ring buffer should return the wrapped tail after the head so frames stay in order
+    buffer = AudioRingBuffer(8)
+    assert buffer.write(b"abcdef")
+    buffer.consume(len(buffer.peek(4)))
+    assert buffer.write(b"ghij")
+
+    assert bytes(buffer.peek(16)) == b"efgh"
+    buffer.consume(4)
+    assert bytes(buffer.peek(16)) == b"ij"
+    buffer.consume(2)
+    assert len(buffer) == 0
+    assert buffer.written_bytes == 10
+
+
+def test_ring_buffer_drops_whole_frame_when_full() -> None:
+    # A ring buffer must drop a frame that does not fit instead of writing part of it
+    buffer = AudioRingBuffer(8)
+    assert buffer.write(b"abcdef")
+    assert not buffer.write(b"ghi")
+
+    assert bytes(buffer.peek(16)) == b"abcdef"
+    assert buffer.dropped_bytes == 3
+    assert buffer.written_bytes == 6
+
+
+def test_pipeline_transcribes_buffered_audio_before_stopping() -> None:
+    # A pipeline should send all buffered audio and flush the last partial line on stop
+    async def scenario() -> tuple[list[tuple[str, str, bool]], dict]:
+        transcripts: list[tuple[str, str, bool]] = []
+
+        async def on_transcript(text: str, speaker: str, is_final: bool) -> None:
+            transcripts.append((text, speaker, is_final))
+
+        pipeline = AudioPipeline("s1", LocalSttAdapter(), on_transcript, buffer_bytes=1024)
+        pipeline.start()
+        pipeline.feed("user:売上は10億です\n".encode())
+        pipeline.feed("customer:借入は".encode())
+        await pipeline.stop()
+        return transcripts, pipeline.to_dict()
+
+    transcripts, stats = asyncio.run(scenario())
+    assert transcripts == [
+        ("売上は10億です", "user", True),
+        ("借入は", "customer", False),
+        ("借入は", "customer", True),
+    ]
+    assert stats["buffered_bytes"] == 0
+    assert stats["sent_bytes"] == stats["received_bytes"]
+    assert stats["reconnects"] == 0
+
+
+def test_pipeline_reconnects_and_resends_unsent_audio() -> None:
+    # A pipeline must keep unsent audio across a dropped STT stream and resend the header first
+    async def scenario() -> tuple[list[str], AudioPipeline]:
+        finals: list[str] = []
+
+        async def on_transcript(text: str, speaker: str, is_final: bool) -> None:
+            if is_final:
+                finals.append(text)
+
+        pipeline = AudioPipeline("s1", FlakySttAdapter(failing_send=2), on_transcript, buffer_bytes=64)
+        pipeline.CHUNK_BYTES = 4
+        pipeline.start()
+        for frame in (b"hdr\n", b"one\n", b"two\n"):
+            pipeline.feed(frame)
+        await pipeline.stop()
+        return finals, pipeline
+
+    finals, pipeline = asyncio.run(scenario())
+    assert finals == ["hdr", "hdr", "one", "two"]
+    assert pipeline.reconnects == 1
+    assert pipeline.adapter.connects == 2
+    assert pipeline.sent_bytes == 12
+
+
+def test_deepgram_stream_reports_close_by_server() -> None:
+    # A Deepgram stream should pass results through and fail the next send once the server closes
+    async def scenario() -> tuple[list[tuple[str, str, bool]], DeepgramSttStream]:
+        transcripts: list[tuple[str, str, bool]] = []
+
+        async def on_transcript(text: str, speaker: str, is_final: bool) -> None:
+            transcripts.append((text, speaker, is_final))
+
+        socket = FakeDeepgramSocket(
+            [_result("こんにちは", 0, True), {"type": "Metadata"}, _result("どうも", 1, False)],
+            ConnectionClosedOK(None, None),
+        )
+        stream = DeepgramSttStream(socket, on_transcript)
+        await stream._receiver
+        with pytest.raises(SttError):
+            await stream.send(memoryview(b"audio"))
+        await stream.close()
+        return transcripts, stream
+
+    transcripts, stream = asyncio.run(scenario())
+    assert transcripts == [("こんにちは", "user", True), ("どうも", "customer", False)]
+    assert isinstance(stream._error, SttError)
+
+
+def test_deepgram_stream_records_close_failure() -> None:
+    # A Deepgram stream must record a failed close so the pipeline reconnects instead of reusing it
+    async def scenario() -> DeepgramSttStream:
+        async def on_transcript(text: str, speaker: str, is_final: bool) -> None:
+            pass
+
+        socket = FakeDeepgramSocket([], ConnectionClosedError(None, None))
+        stream = DeepgramSttStream(socket, on_transcript)
+        stream._receiver.cancel()
+        await stream.close()
+        return stream
+
+    stream = asyncio.run(scenario())
+    assert isinstance(stream._error, ConnectionClosedError)
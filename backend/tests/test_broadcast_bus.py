@@ -0,0 +1,138 @@
+"""ブロードキャストバスのテスト."""
+import asyncio
+import socket
+from typing import Awaitable, Callable, Optional
+
+import pytest
+
+from app.services.broadcast_bus import BroadcastBus, RespBroadcastBus
+from app.services.session_store import RespClient
+from conftest import resp_standin
+
+Received = list[tuple[str, str, Optional[str]]]
+
+
+def _bus(url: str, received: Received, connect_timeout: float = 3.0) -> RespBroadcastBus:
+    bus = RespBroadcastBus(RespClient.from_url(url), connect_timeout=connect_timeout)
+
+    async def deliver(session_id: str, message_json: str, coalesce_key: Optional[str]) -> None:
+        received.append((session_id, message_json, coalesce_key))
+
+    bus.bind(deliver)
+    return bus
+
+
+async def _until(condition: Callable[[], bool], timeout: float = 2.0) -> None:
+    """条件が満たされるまで待つ（タイムアウトしたら失敗させる）."""
+    async def poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def _two_buses(
+    scenario: Callable[[RespBroadcastBus, RespBroadcastBus, Received, Received], Awaitable[None]],
+) -> None:
+    """同じサーバーに2ワーカー分のバスをつなぎ、両方が s1 を購読した状態で実行する."""
+    async with resp_standin() as url:
+        local: Received = []
+        remote: Received = []
+        sender, listener = _bus(url, local), _bus(url, remote)
+        await sender.subscribe("s1")
+        await listener.subscribe("s1")
+        await scenario(sender, listener, local, remote)
+        await sender.close()
+        await listener.close()
+
+
+def _closed_port_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def test_publish_relays_to_other_workers_once() -> None:
+    # A published message should reach this worker directly and the other worker through the relay
+    async def scenario(
+        sender: RespBroadcastBus, listener: RespBroadcastBus, local: Received, remote: Received
+    ) -> None:
+        await sender.publish("s1", '{"type": "a"}', "progress")
+        await _until(lambda: bool(remote))
+        await asyncio.sleep(0.05)
+        assert local == [("s1", '{"type": "a"}', "progress")]
+        assert remote == [("s1", '{"type": "a"}', "progress")]
+
+    asyncio.run(_two_buses(scenario))
+
+
+def test_failed_delivery_does_not_stop_relay() -> None:
+    # A relayed message that fails to deliver should not stop later messages
+    async def scenario(
+        sender: RespBroadcastBus, listener: RespBroadcastBus, local: Received, remote: Received
+    ) -> None:
+        async def deliver(session_id: str, message_json: str, coalesce_key: Optional[str]) -> None:
+            if message_json == "bad":
+                raise ValueError("broken connection state")
+            remote.append((session_id, message_json, coalesce_key))
+
+        listener.bind(deliver)
+        await sender.publish("s1", "bad")
+        await sender.publish("s1", "good")
+        await _until(lambda: bool(remote))
+        assert [message for _, message, _ in remote] == ["good"]
+
+    asyncio.run(_two_buses(scenario))
+
+
+def test_subscriber_restarts_after_crash() -> None:
+    # A subscriber task that dies should be restarted and keep relaying
+    async def scenario() -> list[str]:
+        async with resp_standin() as url:
+            local: Received = []
+            remote: Received = []
+            sender, listener = _bus(url, local), _bus(url, remote)
+            read_messages = listener._read_messages
+            crashed = []
+
+            async def crash_once(reader: asyncio.StreamReader) -> None:
+                if not crashed:
+                    crashed.append(True)
+                    raise RuntimeError("unexpected reply")
+                await read_messages(reader)
+
+            listener._read_messages = crash_once
+            await sender.subscribe("s1")
+            await listener.subscribe("s1")
+            await _until(lambda: bool(crashed) and listener._connected.is_set())
+            await asyncio.sleep(0.05)
+            await sender.publish("s1", "after-restart")
+            await _until(lambda: bool(remote))
+            await sender.close()
+            await listener.close()
+            return [message for _, message, _ in remote]
+
+    assert asyncio.run(scenario()) == ["after-restart"]
+
+
+def test_subscribe_falls_back_to_local_delivery_when_relay_is_down() -> None:
+    # A worker should not block a connection forever when the relay server is unreachable
+    async def scenario() -> tuple[Received, set[str]]:
+        received: Received = []
+        bus = _bus(_closed_port_url(), received, connect_timeout=0.1)
+        await asyncio.wait_for(bus.subscribe("s1"), 1.0)
+        await bus.publish("s1", "local-only")
+        channels = set(bus.channels)
+        await bus.close()
+        return received, channels
+
+    received, channels = asyncio.run(scenario())
+    assert received == [("s1", "local-only", None)]
+    assert channels == {"s1"}
+
+
+def test_broadcast_bus_is_abstract() -> None:
+    # A broadcast bus must not be instantiable without publish / subscribe / unsubscribe
+    with pytest.raises(TypeError):
+        BroadcastBus()
@@ -0,0 +1,91 @@
+"""抽出プロンプトの差分コンテキストのテスト."""
+from typing import Callable
+
+from app.models.mna_schemas import FIELD_REGISTRY, ExtractionField, Utterance
+from app.services.extraction_context import (
+    ExtractionContextBuilder,
+    estimate_tokens,
+    format_utterances,
+)
+from app.services.mna_extraction import MnAExtractionService
+
+
+def _field(key: str, value: str, provisional: bool = False) -> ExtractionField:
+    definition = FIELD_REGISTRY.get(key)
+    return ExtractionField(
+        category=definition.category,
+        field=definition.field,
+        value=value,
+        confidence=0.9,
+        layer=definition.layer,
+        provisional=provisional,
+    )
+
+
+def test_estimate_tokens_counts_japanese_per_char_and_ascii_per_four() -> None:
+    # A token estimate should count each Japanese character as one token and ASCII in groups of four
+    assert estimate_tokens("売上高") == 3
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("売上12億") == 4
+
+
+def test_static_prefix_lists_every_field_key() -> None:
+    # A static prefix must list every registry key so the model can use them as-is
+    builder = ExtractionContextBuilder(budget_tokens=600, summary_chars=24)
+    assert all(f"- {key}:" in builder.static_prefix for key in FIELD_REGISTRY.keys)
+    assert builder.static_prefix == ExtractionContextBuilder(600, 24).static_prefix
+
+
+def test_context_separates_filled_provisional_and_missing(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A context should list filled fields, provisional values and the remaining fields as candidates
+    builder = ExtractionContextBuilder(budget_tokens=600, summary_chars=24)
+    utterances = [make_utterance("借入は2億です")]
+    context = builder.build(
+        utterances,
+        {
+            "financial.revenue_latest": _field("financial.revenue_latest", "約12億円"),
+            "financial.debt": _field("financial.debt", "2億", provisional=True),
+        },
+    )
+    assert "- financial.revenue_latest: 約12億円" in context.text
+    assert "- financial.debt: 2億" in context.text
+    assert (context.filled, context.provisional) == (1, 1)
+    assert context.candidates + context.omitted == len(FIELD_REGISTRY) - 2
+    assert context.text.endswith(format_utterances(utterances) + "\n")
+    assert context.conversation_tokens == estimate_tokens(format_utterances(utterances))
+
+
+def test_context_fits_candidates_and_filled_values_in_budget(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A context must drop candidates beyond the budget and shorten filled values before listing keys only
+    builder = ExtractionContextBuilder(budget_tokens=30, summary_chars=24)
+    long_value = "創業から六十年以上続く地域密着の老舗で、主に公共工事を請け負っている"
+    context = builder.build(
+        [make_utterance("はい")],
+        {"basic_info.history": _field("basic_info.history", long_value)},
+    )
+    assert context.omitted > 0
+    assert context.summary_chars is None
+    assert long_value[:8] not in context.text
+    assert f"（ほか{context.omitted}項目）" in context.text
+
+
+def test_saved_tokens_are_estimated_without_rendering_full_prompt(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # An estimate of the full prompt should stay within a few tokens of rendering it
+    service = MnAExtractionService()
+    utterances = [make_utterance("売上は12億で、借入は2億です"), make_utterance("はい", "user")]
+    extractions = {
+        "financial.revenue_latest": _field("financial.revenue_latest", "約12億円"),
+        "financial.debt": _field("financial.debt", "2億円（メインバンク）", provisional=True),
+        "basic_info.company_name": _field("basic_info.company_name", "ABC Industries"),
+    }
+    rendered = estimate_tokens(service._build_extraction_prompt(utterances, extractions))
+    estimated = service._estimate_full_tokens(
+        extractions, estimate_tokens(format_utterances(utterances))
+    )
+    assert abs(rendered - estimated) <= len(extractions) + 1
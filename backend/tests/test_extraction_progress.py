@@ -0,0 +1,76 @@
+"""セッションの抽出の進捗のテスト."""
+from typing import Optional
+
+from app.models.mna_schemas import FIELD_REGISTRY, ExtractionField, InfoLayer
+from app.services.extraction_progress import MISSING_FIELDS_SHOWN, ExtractionProgress
+
+
+def _field(key: str, value: Optional[str]) -> ExtractionField:
+    definition = FIELD_REGISTRY.get(key)
+    return ExtractionField(
+        category=definition.category,
+        field=definition.field,
+        value=value,
+        layer=definition.layer,
+    )
+
+
+def test_counts_existing_extractions() -> None:
+    # A progress should count only registered fields with a value
+    extractions = {
+        "financial.revenue_latest": _field("financial.revenue_latest", "約12億円"),
+        "financial.debt": _field("financial.debt", None),
+        "financial.unknown": ExtractionField(category="financial", field="unknown", value="?"),
+    }
+    summary = ExtractionProgress(extractions).summary()
+    assert summary["filled"] == 1
+    assert summary["total"] == len(FIELD_REGISTRY)
+    assert summary["by_category"]["financial"]["filled"] == 1
+    assert sum(layer["filled"] for layer in summary["by_layer"].values()) == 1
+
+
+def test_set_reports_only_filled_state_changes() -> None:
+    # A progress should return the definition only when a field switches between filled and missing
+    extractions: dict[str, ExtractionField] = {}
+    progress = ExtractionProgress(extractions)
+    definition = FIELD_REGISTRY.get("financial.debt")
+
+    assert progress.set("financial.debt", _field("financial.debt", "2億")) is definition
+    assert progress.set("financial.debt", _field("financial.debt", "3億")) is None
+    assert progress.filled == 1
+    assert progress.set("financial.debt", _field("financial.debt", "")) is definition
+    assert progress.filled == 0
+    assert extractions["financial.debt"].value == ""
+
+
+def test_summary_and_missing_fields_follow_updates() -> None:
+    # A progress must not serve a cached summary or missing list after a field is filled
+    progress = ExtractionProgress({})
+    before = progress.summary()
+    missing_before = progress.missing_fields()
+    progress.update({"financial.revenue_latest": _field("financial.revenue_latest", "約12億円")})
+
+    assert progress.summary() is not before
+    assert progress.summary()["filled"] == 1
+    assert len(progress.missing_fields()) == len(missing_before) - 1
+    assert "revenue_latest" not in {item["field"] for item in progress.missing_fields()}
+
+
+def test_missing_fields_put_priority_layer_first() -> None:
+    # A progress should list missing fields of the priority layer before the others
+    missing = ExtractionProgress({}).missing_fields(InfoLayer.EXIT)
+    count = len(FIELD_REGISTRY.by_layer[InfoLayer.EXIT])
+    assert {item["layer"] for item in missing[:count]} == {InfoLayer.EXIT}
+
+
+def test_delta_includes_only_changed_groups() -> None:
+    # A delta should carry the totals, the changed category and layer, and the shown missing fields
+    progress = ExtractionProgress({})
+    changed = progress.update({"financial.debt": _field("financial.debt", "2億")})
+    delta = progress.delta(changed)
+
+    definition = FIELD_REGISTRY.get("financial.debt")
+    assert delta["filled"] == 1
+    assert list(delta["by_category"]) == ["financial"]
+    assert list(delta["by_layer"]) == [definition.layer.value]
+    assert len(delta["missing_fields"]) == MISSING_FIELDS_SHOWN
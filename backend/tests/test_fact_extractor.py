@@ -0,0 +1,82 @@
+"""定型の事実のルール抽出のテスト."""
+from typing import Callable
+
+from app.models.mna_schemas import Utterance
+from app.services.fact_extractor import (
+    FactExtractor,
+    find_facts,
+    format_yen,
+    parse_number,
+    same_fact,
+    to_western_year,
+)
+
+
+def test_parse_number_reads_mixed_numerals() -> None:
+    # A parser should read Arabic and kanji numerals with place units and full-width digits
+    assert parse_number("12億5千万") == 1_250_000_000
+    assert parse_number("三十五") == 35
+    assert parse_number("１，２００") == 1200
+    assert parse_number("1.5億") == 150_000_000
+    assert parse_number("二〇二三") == 2023
+    assert parse_number("億") is None
+
+
+def test_to_western_year_converts_eras() -> None:
+    # A year converter should map Japanese eras to Western years and reject impossible years
+    assert to_western_year("昭和", "60") == 1985
+    assert to_western_year("令和", "元") == 2019
+    assert to_western_year(None, "1985") == 1985
+    assert to_western_year(None, "3000") is None
+
+
+def test_format_yen_groups_large_units() -> None:
+    # A formatter should group amounts by 兆/億/万 with thousands separators
+    assert format_yen(1_250_000_000) == "12億5,000万円"
+    assert format_yen(50_000_000) == "5,000万円"
+    assert format_yen(800) == "800円"
+
+
+def test_find_facts_reads_value_after_keyword() -> None:
+    # A reader should take each value after its keyword and stop at the next keyword
+    facts = find_facts("売上は約12億で、借入は2億くらい、従業員は45名です")
+    assert facts == {
+        "financial.revenue_latest": "約12億円",
+        "financial.debt": "約2億円",
+        "basic_info.employee_count": "45名",
+    }
+
+
+def test_find_facts_reads_value_before_keyword_within_clause() -> None:
+    # A reader should take an amount or count just before its keyword when nothing follows it
+    assert find_facts("2億の借入があります") == {"financial.debt": "2億円"}
+    assert find_facts("120名の社員がいます") == {"basic_info.employee_count": "120名"}
+    assert find_facts("昭和60年に設立しました") == {"basic_info.established_year": "1985年"}
+
+
+def test_find_facts_does_not_read_across_clauses_backward() -> None:
+    # A reader must not take the previous clause's amount for a keyword without a value
+    assert find_facts("売上10億、借入はありません") == {"financial.revenue_latest": "10億円"}
+
+
+def test_find_facts_skips_rates_and_losses() -> None:
+    # A reader must not read rates as amounts or losses as positive profits
+    assert find_facts("営業利益率は5%です") == {}
+    assert find_facts("経常利益は赤字で3千万") == {}
+
+
+def test_same_fact_compares_numbers() -> None:
+    # A comparison should treat differently written values with the same number as the same fact
+    assert same_fact("2億円", "約2億円（メインバンク）")
+    assert same_fact("1985年", "昭和60年")
+    assert not same_fact("2億円", "3億円")
+
+
+def test_extractor_marks_fields_provisional(make_utterance: Callable[..., Utterance]) -> None:
+    # An extractor must mark every rule-based field as provisional with its source utterance
+    utterance = make_utterance("資本金は5000万円です")
+    fields = FactExtractor(confidence=0.6).extract(utterance)
+    assert list(fields) == ["basic_info.capital"]
+    field = fields["basic_info.capital"]
+    assert (field.value, field.confidence, field.provisional) == ("5,000万円", 0.6, True)
+    assert field.source_utterance_id == utterance.id
@@ -0,0 +1,69 @@
+"""IM抽出項目の索引のテスト."""
+import pytest
+
+from app.models.mna_schemas import (
+    FIELD_REGISTRY,
+    IM_EXTRACTION_FIELDS,
+    LAYER_ORDER,
+    ExtractionCategory,
+    FieldRegistry,
+    InfoLayer,
+)
+from app.services.mna_extraction import MnAExtractionService
+
+
+def test_registry_indexes_every_field_by_key_and_pair() -> None:
+    # A registry should find each field by its key and by its category and field name
+    assert len(FIELD_REGISTRY) == sum(len(fields) for fields in IM_EXTRACTION_FIELDS.values())
+    for definition in FIELD_REGISTRY:
+        assert definition.key in FIELD_REGISTRY
+        assert FIELD_REGISTRY.get(definition.key) is definition
+        assert FIELD_REGISTRY.lookup(definition.category, definition.field) is definition
+        assert FIELD_REGISTRY.lookup(definition.category.value, definition.field) is definition
+    assert FIELD_REGISTRY.get("financial.unknown") is None
+    assert "financial.unknown" not in FIELD_REGISTRY
+
+
+def test_registry_groups_fields_by_category_and_layer() -> None:
+    # A registry must place each field in exactly one category group and one layer group
+    by_category = [d for category in ExtractionCategory for d in FIELD_REGISTRY.by_category[category]]
+    by_layer = [d for layer in InfoLayer for d in FIELD_REGISTRY.by_layer[layer]]
+    assert sorted(d.key for d in by_category) == sorted(FIELD_REGISTRY.keys)
+    assert sorted(d.key for d in by_layer) == sorted(FIELD_REGISTRY.keys)
+
+
+def test_ordered_puts_priority_layer_first() -> None:
+    # A registry should order fields by layer and move the priority layer to the front
+    default = FIELD_REGISTRY.ordered()
+    assert [LAYER_ORDER[d.layer] for d in default] == sorted(LAYER_ORDER[d.layer] for d in default)
+    essence_first = FIELD_REGISTRY.ordered(InfoLayer.ESSENCE)
+    count = len(FIELD_REGISTRY.by_layer[InfoLayer.ESSENCE])
+    assert {d.layer for d in essence_first[:count]} == {InfoLayer.ESSENCE}
+    assert len(essence_first) == len(FIELD_REGISTRY)
+
+
+def test_registry_rejects_duplicate_keys() -> None:
+    # A registry must refuse definitions that would give two fields the same key
+    fields = {ExtractionCategory.FINANCIAL: [{"field": "debt", "label": "借入金"}] * 2}
+    with pytest.raises(ValueError):
+        FieldRegistry(fields)
+
+
+def test_extraction_response_accepts_keys_and_legacy_pairs() -> None:
+    # A parser should resolve both registry keys and legacy category/field pairs and drop unknown keys
+    service = MnAExtractionService()
+    fields = service._parse_extraction_response(
+        {
+            "extractions": [
+                {"key": "financial.debt", "value": "2億", "confidence": 0.9},
+                {"category": "basic_info", "field": "company_name", "value": "ABC", "confidence": 0.8},
+                {"key": "financial.unknown", "value": "?", "confidence": 0.5},
+                {"key": "financial.revenue_latest", "value": "12億"},
+            ]
+        }
+    )
+    assert [(f.category, f.field, f.value) for f in fields] == [
+        (ExtractionCategory.FINANCIAL, "debt", "2億"),
+        (ExtractionCategory.BASIC_INFO, "company_name", "ABC"),
+    ]
+    assert fields[0].layer == FIELD_REGISTRY.get("financial.debt").layer
@@ -0,0 +1,102 @@
+"""WebSocketの受信フレームの制限のテスト."""
+import json
+
+from app.models.mna_schemas import WSInboundTranscript
+from app.services.inbound_guard import InboundGuard, SessionInboundLimiter, TokenBucket
+
+
+def _guard(session: SessionInboundLimiter, message_burst: float = 10, max_rejections: int = 5) -> InboundGuard:
+    return InboundGuard(
+        session,
+        max_text_bytes=200,
+        max_audio_bytes=64,
+        message_rate=0.001,
+        message_burst=message_burst,
+        audio_bytes_per_sec=16,
+        max_rejections=max_rejections,
+    )
+
+
+def _session(message_burst: float = 100, transcript_chars_burst: float = 1000) -> SessionInboundLimiter:
+    return SessionInboundLimiter(0.001, message_burst, 0.001, transcript_chars_burst)
+
+
+def _transcript(text: str, is_final: bool = True) -> str:
+    return json.dumps({"type": "transcript", "text": text, "is_final": is_final})
+
+
+def test_token_bucket_refills_up_to_burst() -> None:
+    # A token bucket should refill at its rate and never hold more than its burst
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    bucket._updated = 0.0
+    assert bucket.take(3.0, now=0.0)
+    assert not bucket.take(1.0, now=0.25)
+    assert bucket.take(1.0, now=0.5)
+    assert bucket.take(3.0, now=100.0)
+    assert not bucket.take(0.5, now=100.0)
+
+
+def test_token_bucket_does_not_take_partial_cost() -> None:
+    # A token bucket must leave its tokens untouched when the cost is more than it holds
+    bucket = TokenBucket(rate=0.0, burst=2.0)
+    assert not bucket.take(3.0)
+    assert bucket.tokens == 2.0
+
+
+def test_admits_valid_message() -> None:
+    # A guard should parse a valid frame into its inbound message
+    guard = _guard(_session())
+    message, reason = guard.admit_text(_transcript("売上は10億です"))
+    assert isinstance(message, WSInboundTranscript)
+    assert message.text == "売上は10億です"
+    assert reason is None
+
+
+def test_rejects_oversized_and_invalid_frames() -> None:
+    # A guard must reject oversized frames before parsing and count each rejection by reason
+    session = _session()
+    guard = _guard(session)
+    assert guard.admit_text("x" * 201) == (None, "too_large")
+    assert guard.admit_text('{"type": "unknown"}') == (None, "invalid")
+    assert guard.admit_text("not json") == (None, "invalid")
+    assert guard.admit_audio(b"\0" * 65) == "too_large"
+    assert guard.rejected == {"too_large": 2, "invalid": 2}
+    assert session.rejected == guard.rejected
+
+
+def test_connection_and_session_message_limits() -> None:
+    # A guard must enforce both its own message bucket and the bucket shared by the session
+    session = _session(message_burst=3)
+    first, second = _guard(session, message_burst=2), _guard(session, message_burst=2)
+    heartbeat = json.dumps({"type": "heartbeat"})
+    assert first.admit_text(heartbeat)[1] is None
+    assert first.admit_text(heartbeat)[1] is None
+    assert first.admit_text(heartbeat) == (None, "rate_limited")
+    assert second.admit_text(heartbeat)[1] is None
+    assert second.admit_text(heartbeat) == (None, "session_rate_limited")
+    assert session.rejected == {"rate_limited": 1, "session_rate_limited": 1}
+
+
+def test_final_transcripts_are_limited_by_characters() -> None:
+    # A guard should charge final transcripts by length and let interim transcripts through
+    guard = _guard(_session(transcript_chars_burst=10))
+    assert guard.admit_text(_transcript("あ" * 8))[1] is None
+    assert guard.admit_text(_transcript("い" * 8, is_final=False))[1] is None
+    assert guard.admit_text(_transcript("う" * 8)) == (None, "transcript_rate_limited")
+
+
+def test_audio_is_limited_by_bytes() -> None:
+    # A guard must drop audio beyond its byte rate (four seconds of burst)
+    guard = _guard(_session())
+    assert guard.admit_audio(b"\0" * 64) is None
+    assert guard.admit_audio(b"\0" * 1) == "audio_rate_limited"
+
+
+def test_repeated_rejections_exhaust_connection() -> None:
+    # A guard should mark the connection exhausted once it rejects max_rejections frames in a row
+    guard = _guard(_session(), max_rejections=3)
+    for _ in range(2):
+        guard.admit_text("not json")
+    assert not guard.exhausted
+    guard.admit_text("not json")
+    assert guard.exhausted
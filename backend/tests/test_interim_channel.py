@@ -0,0 +1,80 @@
+"""interimの文字起こしの配信制御のテスト."""
+import asyncio
+
+from app.services.interim_channel import InterimChannel
+
+
+def _channel(sent: list[tuple[str, dict]], min_interval: float) -> InterimChannel:
+    async def send(session_id: str, delta: dict) -> None:
+        sent.append((session_id, delta))
+
+    return InterimChannel(send, min_interval)
+
+
+def test_interim_is_sent_as_delta_from_common_prefix() -> None:
+    # A channel should send only the text after the prefix shared with the previous send
+    async def scenario() -> list[tuple[str, dict]]:
+        sent: list[tuple[str, dict]] = []
+        channel = _channel(sent, min_interval=0.0)
+        await channel.update("s1", "customer", "売上は")
+        await channel.update("s1", "customer", "売上は12億")
+        await channel.update("s1", "customer", "売上は10億")
+        return sent
+
+    deltas = [delta for _, delta in asyncio.run(scenario())]
+    assert [(d["offset"], d["text"]) for d in deltas] == [(0, "売上は"), (3, "12億"), (4, "0億")]
+    assert len({d["utterance_id"] for d in deltas}) == 1
+
+
+def test_unchanged_interim_is_not_resent() -> None:
+    # A channel should not send an interim whose text did not change
+    async def scenario() -> int:
+        sent: list[tuple[str, dict]] = []
+        channel = _channel(sent, min_interval=0.0)
+        await channel.update("s1", "customer", "売上は")
+        await channel.update("s1", "customer", "売上は")
+        return len(sent)
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_throttled_interims_send_only_the_latest() -> None:
+    # A channel should hold interims arriving within the interval and send only the latest one
+    async def scenario() -> list[str]:
+        sent: list[tuple[str, dict]] = []
+        channel = _channel(sent, min_interval=0.05)
+        for text in ("売", "売上", "売上は", "売上は12億"):
+            await channel.update("s1", "customer", text)
+        await asyncio.sleep(0.1)
+        return [delta["text"] for _, delta in sent]
+
+    assert asyncio.run(scenario()) == ["売", "上は12億"]
+
+
+def test_finalize_hands_over_the_id_and_drops_pending() -> None:
+    # A finalized utterance should keep the interim id and must not send the held interim afterwards
+    async def scenario() -> tuple[str, str, int]:
+        sent: list[tuple[str, dict]] = []
+        channel = _channel(sent, min_interval=0.05)
+        await channel.update("s1", "customer", "売上は")
+        await channel.update("s1", "customer", "売上は12億")
+        utterance_id = channel.finalize("s1", "customer")
+        await asyncio.sleep(0.1)
+        return utterance_id, sent[0][1]["utterance_id"], len(sent)
+
+    utterance_id, interim_id, sent_count = asyncio.run(scenario())
+    assert utterance_id == interim_id
+    assert sent_count == 1
+
+
+def test_speakers_are_throttled_independently() -> None:
+    # A channel should not delay one speaker's interim because another speaker just sent one
+    async def scenario() -> list[str]:
+        sent: list[tuple[str, dict]] = []
+        channel = _channel(sent, min_interval=10.0)
+        await channel.update("s1", "customer", "はい")
+        await channel.update("s1", "advisor", "売上は")
+        channel.forget("s1")
+        return [delta["speaker"] for _, delta in sent]
+
+    assert asyncio.run(scenario()) == ["customer", "advisor"]
@@ -0,0 +1,224 @@
+"""バックグラウンドジョブのキューとバッチ実行のテスト."""
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+
+from app.services.job_queue import Job, JobPending, JobQueue, JobRunner
+from app.services.llm_batch import BatchBackend, BatchNotFound, BatchResult, LocalBatchBackend
+from app.services.reextraction import ReextractionHandler
+
+
+class FakeMessages:
+    """プロンプトに "fail" を含むリクエストだけ失敗する messages.create の代わり."""
+
+    async def create(self, **params) -> SimpleNamespace:
+        """プロンプトをそのまま返す応答を作る."""
+        if "fail" in params["messages"][0]["content"]:
+            raise RuntimeError("overloaded")
+        return SimpleNamespace(content=params["messages"][0]["content"], usage=None)
+
+
+def _request(custom_id: str) -> dict:
+    return {"custom_id": custom_id, "params": {"messages": [{"role": "user", "content": custom_id}]}}
+
+
+async def _wait_for_status(queue: JobQueue, job_id: str, status: str) -> Job:
+    """ジョブが指定の状態になるまで待つ."""
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} stayed {job.status}")
+
+
+def test_enqueue_is_idempotent_by_key(tmp_path: Path) -> None:
+    # A queue must return the existing job instead of adding a second one with the same key
+    async def scenario() -> tuple[bool, bool, bool, dict]:
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        first, created_first = await queue.enqueue("reextract", {"session_id": "s1"}, "reextract:s1")
+        second, created_second = await queue.enqueue("reextract", {"session_id": "s1"}, "reextract:s1")
+        counts = await queue.counts()
+        await queue.close()
+        return created_first, created_second, first.id == second.id, counts
+
+    created_first, created_second, same, counts = asyncio.run(scenario())
+    assert created_first and not created_second
+    assert same
+    assert counts["queued"] == 1
+
+
+def test_failed_job_is_retried_until_max_attempts(tmp_path: Path) -> None:
+    # A queue should requeue a failed job with backoff and mark it failed at max_attempts
+    async def scenario() -> tuple[Job, Optional[Job], Job]:
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        job, _ = await queue.enqueue("reextract", {}, max_attempts=2)
+        claimed = await queue.claim("w1", ["reextract"], lease=30.0)
+        await queue.fail(claimed, "w1", "boom")
+        retried = await queue.get(job.id)
+        too_early = await queue.claim("w1", ["reextract"], lease=30.0)
+        await queue._update("UPDATE jobs SET run_after = 0 WHERE id = ?", (job.id,))
+        second = await queue.claim("w1", ["reextract"], lease=30.0)
+        await queue.fail(second, "w1", "boom again")
+        final = await queue.get(job.id)
+        await queue.close()
+        return retried, too_early, final
+
+    retried, too_early, final = asyncio.run(scenario())
+    assert retried.status == "queued"
+    assert retried.error == "boom"
+    assert too_early is None
+    assert final.status == "failed"
+    assert final.attempts == 2
+
+
+def test_expired_lease_is_claimed_by_another_worker(tmp_path: Path) -> None:
+    # A queue should hand a running job to another worker once its lease expires
+    async def scenario() -> tuple[Optional[Job], bool]:
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        await queue.enqueue("reextract", {})
+        stale = await queue.claim("w1", ["reextract"], lease=0.0)
+        await asyncio.sleep(0.01)
+        taken = await queue.claim("w2", ["reextract"], lease=30.0)
+        renewed = await queue.renew(stale, "w1", 30.0)
+        await queue.close()
+        return taken, renewed
+
+    taken, renewed = asyncio.run(scenario())
+    assert taken is not None and taken.attempts == 2
+    assert not renewed
+
+
+def test_runner_defers_pending_job_and_keeps_state(tmp_path: Path) -> None:
+    # A runner should requeue a JobPending job without counting the attempt and keep its state
+    async def scenario() -> Job:
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        runner = JobRunner(queue, concurrency=1, poll_interval=0.01, lease=30.0)
+
+        async def handler(job: Job) -> Optional[dict]:
+            polls = job.state.get("polls", 0) + 1
+            job.state["polls"] = polls
+            if polls < 3:
+                raise JobPending(0.0)
+            return {"polls": polls}
+
+        runner.register("reextract", handler)
+        job, _ = await queue.enqueue("reextract", {})
+        runner.start()
+        done = await _wait_for_status(queue, job.id, "succeeded")
+        await runner.stop()
+        await queue.close()
+        return done
+
+    done = asyncio.run(scenario())
+    assert done.result == {"polls": 3}
+    assert done.state == {"polls": 2}
+    assert done.attempts == 1
+
+
+def test_cancelled_job_stops_running_handler(tmp_path: Path) -> None:
+    # A runner must stop a job whose lease can no longer be renewed because it was cancelled
+    async def scenario() -> tuple[Job, bool]:
+        queue = JobQueue(str(tmp_path / "jobs.db"))
+        runner = JobRunner(queue, concurrency=1, poll_interval=0.01, lease=0.06)
+        started = asyncio.Event()
+
+        async def handler(job: Job) -> Optional[dict]:
+            started.set()
+            await asyncio.sleep(5.0)
+            return None
+
+        runner.register("reextract", handler)
+        job, _ = await queue.enqueue("reextract", {})
+        runner.start()
+        await asyncio.wait_for(started.wait(), 1.0)
+        await queue.cancel(job.id)
+        for _ in range(100):
+            if not runner._running:
+                break
+            await asyncio.sleep(0.01)
+        stopped = not runner._running
+        cancelled = await queue.get(job.id)
+        await runner.stop()
+        await queue.close()
+        return cancelled, stopped
+
+    cancelled, stopped = asyncio.run(scenario())
+    assert cancelled.status == "cancelled"
+    assert stopped
+
+
+def test_batch_backend_requires_all_operations() -> None:
+    # A batch backend must implement submit, is_ended and results
+    with pytest.raises(TypeError):
+        BatchBackend()
+
+
+def test_local_batch_backend_returns_results_by_custom_id() -> None:
+    # A local batch should map each custom_id to its response, recording failed requests as errored
+    async def scenario() -> dict:
+        backend = LocalBatchBackend(SimpleNamespace(messages=FakeMessages()), concurrency=2)
+        batch_id = await backend.submit([_request("a"), _request("fail"), _request("b")])
+        results = await backend.results(batch_id)
+        with pytest.raises(BatchNotFound):
+            await backend.is_ended(batch_id)
+        return results
+
+    results = asyncio.run(scenario())
+    assert results["a"].message.content == "a"
+    assert results["b"].message.content == "b"
+    assert results["fail"].message is None
+    assert "overloaded" in results["fail"].error
+
+
+class LostBatchBackend(BatchBackend):
+    """送ったバッチがどれも見つからないバックエンド（別のワーカーが送ったローカルのバッチ）."""
+
+    name = "lost"
+
+    def __init__(self) -> None:
+        """送った回数を数える."""
+        self.submitted = 0
+
+    async def submit(self, requests: list[dict]) -> str:
+        """送った回数を数えてバッチIDを返す."""
+        self.submitted += 1
+        return f"lost_{self.submitted}"
+
+    async def is_ended(self, batch_id: str) -> bool:
+        """どのバッチも見つからない."""
+        raise BatchNotFound(batch_id)
+
+    async def results(self, batch_id: str) -> dict[str, BatchResult]:
+        """どのバッチも見つからない."""
+        raise BatchNotFound(batch_id)
+
+
+def test_lost_batch_is_resubmitted_only_up_to_the_limit() -> None:
+    # A re-extraction job must resubmit a missing batch at most max_resubmits times and then fail
+    async def scenario() -> tuple[int, int]:
+        backend = LostBatchBackend()
+        handler = ReextractionHandler(
+            store=None, extraction_service=None, backend=backend, poll_interval=0.0, max_resubmits=2
+        )
+
+        async def build_requests(session_ids: list[str]) -> tuple[list[dict], list[str]]:
+            return [_request("s1-0")], []
+
+        handler._build_requests = build_requests
+        job = SimpleNamespace(id="j1", payload={"session_ids": ["s1"]}, state={})
+        pendings = 0
+        with pytest.raises(BatchNotFound):
+            for _ in range(10):
+                try:
+                    await handler(job)
+                except JobPending:
+                    pendings += 1
+        return backend.submitted, pendings
+
+    submitted, pendings = asyncio.run(scenario())
+    assert submitted == 3
+    assert pendings == 5
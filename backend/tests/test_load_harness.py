@@ -0,0 +1,90 @@
+"""負荷試験スクリプトと疑似Claudeサーバーのテスト."""
+import asyncio
+from pathlib import Path
+
+from anthropic import AsyncAnthropic
+
+from fake_anthropic import FakeAnthropic, serve
+from load_test import load_script, percentiles
+
+
+def test_load_script_turns_notes_into_utterances(tmp_path: Path) -> None:
+    # A script loader should ask about each heading and split body lines into seller sentences
+    notes = tmp_path / "notes.md"
+    notes.write_text(
+        "# 会社概要\n---\n| 項目 | 値 |\n- 売上は約12億です。従業員は80名です。\n\n## 後継者\n",
+        encoding="utf-8",
+    )
+    assert load_script(notes, None) == [
+        ("user", "会社概要について教えていただけますか。"),
+        ("customer", "売上は約12億です。"),
+        ("customer", "従業員は80名です。"),
+        ("user", "後継者について教えていただけますか。"),
+    ]
+    assert len(load_script(notes, 2)) == 2
+
+
+def test_percentiles_use_nearest_rank() -> None:
+    # A latency summary should give nearest-rank percentiles and None when nothing was measured
+    summary = percentiles([value / 1000 for value in range(1, 101)])
+    assert summary == {"count": 100, "p50_ms": 50.0, "p95_ms": 95.0, "p99_ms": 99.0, "max_ms": 100.0}
+    assert percentiles([])["p50_ms"] is None
+
+
+def test_fake_server_answers_tool_calls_with_cache_usage() -> None:
+    # A fake server should return the forced tool's input and count the cached system prefix from the second call
+    async def scenario() -> list:
+        fake = FakeAnthropic(latency=0.0, jitter=0.0, error_rate=0.0)
+        server = await serve("127.0.0.1", 0, fake)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncAnthropic(api_key="test", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+        try:
+            request = {
+                "model": "fake",
+                "max_tokens": 100,
+                "system": [{"type": "text", "text": "抽出の指示", "cache_control": {"type": "ephemeral"}}],
+                "messages": [{"role": "user", "content": "## 新しい会話\n売上は12億です\n## 抽出対象"}],
+                "tools": [{"name": "extract_mna_info", "input_schema": {"type": "object"}}],
+                "tool_choice": {"type": "tool", "name": "extract_mna_info"},
+            }
+            first = await client.messages.create(**request)
+            async with client.messages.stream(**request) as stream:
+                second = await stream.get_final_message()
+            return [first, second]
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+
+    first, second = asyncio.run(scenario())
+    assert first.content[0].input == {
+        "extractions": [{"key": "financial.revenue_latest", "value": "約12億円", "confidence": 0.8}]
+    }
+    assert second.content[0].input == first.content[0].input
+    assert first.usage.cache_read_input_tokens == 0
+    assert first.usage.cache_creation_input_tokens > 0
+    assert second.usage.cache_read_input_tokens == first.usage.cache_creation_input_tokens
+
+
+def test_fake_server_ends_batches_after_latency() -> None:
+    # A fake server should keep a batch in progress until its latency passes and then return every result
+    async def scenario() -> tuple[str, str, list[str]]:
+        fake = FakeAnthropic(latency=0.2, jitter=0.0, error_rate=0.0)
+        server = await serve("127.0.0.1", 0, fake)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncAnthropic(api_key="test", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+        try:
+            params = {"model": "fake", "max_tokens": 10, "messages": [{"role": "user", "content": "こんにちは"}]}
+            batch = await client.messages.batches.create(
+                requests=[{"custom_id": custom_id, "params": params} for custom_id in ("a", "b")]
+            )
+            await asyncio.sleep(0.25)
+            ended = await client.messages.batches.retrieve(batch.id)
+            results = [result.custom_id async for result in await client.messages.batches.results(batch.id)]
+            return batch.processing_status, ended.processing_status, results
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(scenario()) == ("in_progress", "ended", ["a", "b"])
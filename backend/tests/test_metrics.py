@@ -0,0 +1,137 @@
+"""メトリクスの集計とテキスト形式の出力のテスト."""
+import asyncio
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from app.core.metrics import MetricsExporter, MetricsRegistry, merge_snapshots, render
+
+# どのプロセスにも割り当てられないPID（pid_max の上限より大きい）
+DEAD_PID = 4194305
+
+
+def _registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.counter("test_requests_total", "Requests", ("route",)).labels("a").inc(2)
+    registry.histogram("test_duration_seconds", "Duration", (0.1, 1.0)).labels().observe(0.5)
+    registry.gauge("test_connections", "Connections", lambda: 3)
+    return registry
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    # A histogram should count each value once in its bucket and render buckets cumulatively
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_duration_seconds", "Duration", (0.1, 1.0)).labels()
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    text = render(merge_snapshots([registry.snapshot()], {os.getpid()}))
+    assert 'test_duration_seconds_bucket{le="0.1"} 2' in text
+    assert 'test_duration_seconds_bucket{le="1"} 3' in text
+    assert 'test_duration_seconds_bucket{le="+Inf"} 4' in text
+    assert "test_duration_seconds_count 4" in text
+    assert "test_duration_seconds_sum 2.65" in text
+
+
+def test_labels_require_every_label_name() -> None:
+    # A metric family must reject label values that do not match its label names
+    family = MetricsRegistry().counter("test_requests_total", "Requests", ("route",))
+    with pytest.raises(ValueError):
+        family.labels()
+
+
+def test_merge_keeps_counters_of_exited_workers_but_not_their_gauges() -> None:
+    # Merging must keep totals from exited workers so counters never decrease, but drop their gauges
+    live = _registry().snapshot()
+    exited = {**_registry().snapshot(), "pid": DEAD_PID}
+
+    text = render(merge_snapshots([live, exited], {live["pid"]}))
+    assert 'test_requests_total{route="a"} 4' in text
+    assert 'test_duration_seconds_bucket{le="1"} 2' in text
+    assert "test_connections 3" in text
+
+
+def test_max_gauges_take_the_largest_worker_value() -> None:
+    # A gauge aggregated by max should report the largest value across live workers
+    snapshots = []
+    for value in (3, 7):
+        registry = MetricsRegistry()
+        registry.gauge("test_lag_seconds", "Lag", lambda value=value: value, aggregate="max")
+        snapshots.append(registry.snapshot())
+
+    merged = merge_snapshots(snapshots, {os.getpid()})
+    assert merged["test_lag_seconds"]["samples"] == {(): 7.0}
+
+
+def test_label_values_are_escaped() -> None:
+    # Rendering must escape quotes, backslashes and newlines in label values
+    registry = MetricsRegistry()
+    registry.counter("test_requests_total", "Requests", ("route",)).labels('a"b\\c\n').inc()
+    text = render(merge_snapshots([registry.snapshot()], {os.getpid()}))
+    assert 'test_requests_total{route="a\\"b\\\\c\\n"} 1' in text
+
+
+def test_exporter_adds_other_worker_files(tmp_path: Path) -> None:
+    # An exporter should add the files of other workers to its own current values
+    (tmp_path / f"{DEAD_PID}.json").write_text(
+        json.dumps({**_registry().snapshot(), "pid": DEAD_PID}), encoding="utf-8"
+    )
+    (tmp_path / "broken.json").write_text("{", encoding="utf-8")
+
+    async def scenario() -> str:
+        exporter = MetricsExporter(_registry(), str(tmp_path), interval=60.0)
+        exporter.start()
+        text = await exporter.collect()
+        await exporter.stop()
+        return text
+
+    text = asyncio.run(scenario())
+    assert 'test_requests_total{route="a"} 4' in text
+    assert "test_connections 3" in text
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def test_exited_worker_files_are_folded_once(tmp_path: Path) -> None:
+    # An exporter must fold an exited worker's file into the retired totals once and delete the file
+    (tmp_path / f"{DEAD_PID}.json").write_text(
+        json.dumps({**_registry().snapshot(), "pid": DEAD_PID}), encoding="utf-8"
+    )
+
+    async def scenario() -> tuple[str, str]:
+        exporter = MetricsExporter(_registry(), str(tmp_path), interval=60.0)
+        exporter.start()
+        first = await exporter.collect()
+        second = await exporter.collect()
+        await exporter.stop()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert 'test_requests_total{route="a"} 4' in first
+    assert 'test_requests_total{route="a"} 4' in second
+    assert "test_duration_seconds_count 2" in second
+    assert "test_connections 3" in second
+    assert not (tmp_path / f"{DEAD_PID}.json").exists()
+    retired = json.loads((tmp_path / "retired.json").read_text(encoding="utf-8"))
+    assert "test_connections" not in retired["metrics"]
+
+
+def test_retired_totals_skip_files_already_folded(tmp_path: Path) -> None:
+    # An exporter must not add a file again when a previous fold stopped before deleting it
+    exited = {**_registry().snapshot(), "pid": DEAD_PID}
+    (tmp_path / f"{DEAD_PID}.json").write_text(json.dumps(exited), encoding="utf-8")
+    retired = {**_registry().snapshot(), "pid": 0, "folded": [[DEAD_PID, exited["time"]]]}
+    del retired["metrics"]["test_connections"]
+    (tmp_path / "retired.json").write_text(json.dumps(retired), encoding="utf-8")
+
+    async def scenario() -> str:
+        exporter = MetricsExporter(_registry(), str(tmp_path), interval=60.0)
+        exporter.start()
+        text = await exporter.collect()
+        await exporter.stop()
+        return text
+
+    assert 'test_requests_total{route="a"} 4' in asyncio.run(scenario())
+    assert not (tmp_path / f"{DEAD_PID}.json").exists()
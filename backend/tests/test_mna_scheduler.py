@@ -0,0 +1,144 @@
+"""抽出・サジェスト処理のスケジューリングのテスト."""
+import asyncio
+
+import pytest
+
+from app.services.mna_scheduler import (
+    AdaptiveTriggerPolicy,
+    BufferStats,
+    FlushReason,
+    RoundScheduler,
+    TriggerPolicy,
+)
+
+
+def test_policy_flushes_early_on_amount() -> None:
+    # A policy should flush immediately when an amount is mentioned
+    policy = AdaptiveTriggerPolicy()
+    stats = BufferStats()
+    stats.add("売上は12億円です", now=0.0)
+    assert policy.evaluate(stats, now=0.0) == FlushReason.HIGH_VALUE_SIGNAL
+
+
+def test_policy_does_not_flush_early_on_bare_number() -> None:
+    # A policy should not flush early just because a bare number appears
+    policy = AdaptiveTriggerPolicy()
+    stats = BufferStats()
+    stats.add("2つ目の話ですが", now=0.0)
+    assert "number" in stats.signals
+    assert policy.evaluate(stats, now=0.0) is None
+
+
+def test_policy_waits_for_min_chars_before_latency_flush() -> None:
+    # A policy must not flush a buffer of short backchannels even after max_latency
+    policy = AdaptiveTriggerPolicy(max_latency=1.0, min_chars=30)
+    stats = BufferStats()
+    stats.add("はい", now=0.0)
+    assert policy.evaluate(stats, now=10.0) is None
+    assert policy.next_deadline(stats) is None
+
+
+def test_policy_flushes_on_latency_once_min_chars_reached() -> None:
+    # A policy should flush by latency once the buffer has enough text
+    policy = AdaptiveTriggerPolicy(max_latency=1.0, min_chars=5, min_utterances=3)
+    stats = BufferStats()
+    stats.add("そういう事情がありまして", now=0.0)
+    assert policy.evaluate(stats, now=0.5) is None
+    assert policy.next_deadline(stats) == 1.0
+    assert policy.evaluate(stats, now=1.0) == FlushReason.MAX_LATENCY
+
+
+def test_scheduler_coalesces_requests_during_round() -> None:
+    # A scheduler should run requests arriving during a round as exactly one follow-up round
+    runs: list[int] = []
+
+    async def scenario() -> None:
+        release = asyncio.Event()
+
+        async def run_round(session_id: str, generation: int) -> None:
+            runs.append(generation)
+            if len(runs) == 1:
+                await release.wait()
+
+        scheduler = RoundScheduler(run_round)
+        scheduler.request("s1")
+        await asyncio.sleep(0)
+        for _ in range(5):
+            scheduler.request("s1")
+        release.set()
+        while scheduler.is_running("s1"):
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert runs == [1, 6]
+
+
+def test_round_is_superseded_only_when_next_round_is_pending() -> None:
+    # A round should be superseded only while a newer round is waiting to run
+    observed: list[bool] = []
+
+    async def scenario() -> None:
+        scheduler: RoundScheduler
+
+        async def run_round(session_id: str, generation: int) -> None:
+            if generation == 1:
+                observed.append(scheduler.is_superseded(session_id, generation))
+                scheduler.request(session_id)
+                observed.append(scheduler.is_superseded(session_id, generation))
+
+        scheduler = RoundScheduler(run_round)
+        scheduler.request("s1")
+        await asyncio.sleep(0)
+        while scheduler.is_running("s1"):
+            await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert observed == [False, True]
+
+
+def test_round_is_not_superseded_after_drain() -> None:
+    # A round must not be superseded by requests the draining scheduler will never run
+    observed: list[bool] = []
+
+    async def scenario() -> None:
+        scheduler: RoundScheduler
+        release = asyncio.Event()
+
+        async def run_round(session_id: str, generation: int) -> None:
+            await release.wait()
+            observed.append(scheduler.is_superseded(session_id, generation))
+
+        scheduler = RoundScheduler(run_round)
+        scheduler.request("s1")
+        await asyncio.sleep(0)
+        drain = asyncio.create_task(scheduler.drain(timeout=1.0))
+        await asyncio.sleep(0)
+        scheduler.request("s1")
+        release.set()
+        assert await drain == 0
+
+    asyncio.run(scenario())
+    assert observed == [False]
+
+
+def test_drain_cancels_rounds_over_timeout() -> None:
+    # A drain should cancel rounds that do not finish within the timeout
+    async def scenario() -> int:
+        async def run_round(session_id: str, generation: int) -> None:
+            await asyncio.sleep(10)
+
+        scheduler = RoundScheduler(run_round)
+        scheduler.request("s1")
+        await asyncio.sleep(0)
+        return await scheduler.drain(timeout=0.01)
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_trigger_policy_requires_evaluate() -> None:
+    # A trigger policy must not be instantiable without implementing evaluate
+    class Incomplete(TriggerPolicy):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
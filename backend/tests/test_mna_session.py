@@ -0,0 +1,271 @@
+"""セッションのWebSocketマネージャーのテスト."""
+import asyncio
+import json
+from datetime import datetime
+from typing import Callable, Optional
+
+import pytest
+
+from app.api.mna_session import (
+    SessionWebSocketManager,
+    active_sessions,
+    get_progress,
+    get_transcript,
+    progress_trackers,
+    transcripts,
+    websocket_endpoint,
+    ws_manager,
+)
+from app.models.mna_schemas import (
+    ExtractionCategory,
+    ExtractionField,
+    InfoLayer,
+    SessionState,
+    Utterance,
+    WSMessage,
+    WSMessageType,
+)
+from app.services.broadcast_bus import broadcast_bus
+from app.services.session_store import session_store
+from conftest import FakeWebSocket
+
+
+def _session(session_id: str, utterances: list[Utterance]) -> SessionState:
+    return SessionState(
+        id=session_id,
+        project_id="p1",
+        status="active",
+        started_at=datetime(2024, 1, 1),
+        utterances=utterances,
+    )
+
+
+def _round_update() -> WSMessage:
+    field = ExtractionField(
+        category=ExtractionCategory.FINANCIAL,
+        field="revenue_latest",
+        value="約12億円",
+        confidence=0.9,
+        layer=InfoLayer.SURFACE,
+    )
+    return WSMessage(
+        type=WSMessageType.ROUND_UPDATE,
+        data={
+            "round": 1,
+            "extractions": {"financial.revenue_latest": field.model_dump(mode="json")},
+            "suggestions": [{"id": "g1", "content": "借入の状況を確認"}],
+            "progress": {"filled": 1, "total": 31},
+            "missing_fields": [],
+        },
+    )
+
+
+async def _disconnect_all(manager: SessionWebSocketManager, session_id: str) -> None:
+    """接続の送信キューを送り切ってから切断し、ワーカーの停止を待つ."""
+    for sender in list(manager.connections.get(session_id, [])):
+        await asyncio.wait_for(sender._idle.wait(), 1.0)
+        manager.disconnect(session_id, sender.websocket)
+    await asyncio.gather(*manager._background_tasks)
+
+
+def _types(websocket: FakeWebSocket) -> list[str]:
+    return [json.loads(frame)["type"] for frame in websocket.sent]
+
+
+def test_round_update_is_one_frame_for_batched_clients() -> None:
+    # A batched client should receive a round as a single round_update frame
+    async def scenario() -> FakeWebSocket:
+        manager = SessionWebSocketManager()
+        websocket = FakeWebSocket()
+        await manager.connect("s1", websocket, batched=True)
+        await manager.broadcast("s1", _round_update())
+        await _disconnect_all(manager, "s1")
+        return websocket
+
+    websocket = asyncio.run(scenario())
+    assert _types(websocket) == ["resume", "round_update"]
+    assert json.loads(websocket.sent[1])["seq"] == 1
+
+
+def test_round_update_is_expanded_for_legacy_clients() -> None:
+    # A legacy client should receive the round as per-item frames sharing the round's seq
+    async def scenario() -> FakeWebSocket:
+        manager = SessionWebSocketManager()
+        websocket = FakeWebSocket()
+        await manager.connect("s1", websocket)
+        await manager.broadcast("s1", _round_update())
+        await _disconnect_all(manager, "s1")
+        return websocket
+
+    websocket = asyncio.run(scenario())
+    assert _types(websocket) == ["resume", "extraction_update", "suggestion", "progress_update"]
+    assert {json.loads(frame)["seq"] for frame in websocket.sent[1:]} == {1}
+
+
+def test_transcript_index_is_kept_only_for_active_sessions(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A worker must not keep transcript indexes of sessions it does not hold, and must drop them on eviction
+    held = _session("held", [make_utterance("a")])
+    loaded = _session("loaded", [make_utterance("b")])
+    active_sessions["held"] = held
+    try:
+        assert get_transcript(held) is get_transcript(held)
+        assert get_transcript(loaded).get(loaded.utterances[0].id) is not None
+        assert "loaded" not in transcripts
+        ws_manager.evict("held")
+        assert "held" not in transcripts
+    finally:
+        active_sessions.pop("held", None)
+
+
+def test_reconnect_replays_only_missed_messages() -> None:
+    # A client reconnecting to the same stream should receive exactly the messages after its last seq
+    async def scenario() -> tuple[dict, list[str]]:
+        manager = SessionWebSocketManager()
+        first = FakeWebSocket()
+        await manager.connect("s1", first, batched=True)
+        for text in ("a", "b", "c"):
+            await manager.broadcast("s1", WSMessage(type=WSMessageType.SESSION_STATUS, data={"text": text}))
+        await _disconnect_all(manager, "s1")
+        stream_id = json.loads(first.sent[0])["data"]["stream_id"]
+
+        second = FakeWebSocket()
+        await manager.connect("s1", second, batched=True, last_seq=1, stream_id=stream_id)
+        await _disconnect_all(manager, "s1")
+        frames = [json.loads(frame) for frame in second.sent]
+        return frames[0]["data"], [frame["data"]["text"] for frame in frames[1:]]
+
+    resume, replayed = asyncio.run(scenario())
+    assert resume["mode"] == "replay"
+    assert replayed == ["b", "c"]
+
+
+def test_reconnect_to_another_stream_gets_snapshot() -> None:
+    # A client whose stream id is unknown must get a snapshot instead of a partial replay
+    async def scenario() -> tuple[dict, int]:
+        manager = SessionWebSocketManager()
+        websocket = FakeWebSocket()
+        await manager.connect("s1", websocket, batched=True, last_seq=5, stream_id="other-worker")
+        await _disconnect_all(manager, "s1")
+        return json.loads(websocket.sent[0])["data"], len(websocket.sent)
+
+    resume, frame_count = asyncio.run(scenario())
+    assert resume["mode"] == "snapshot"
+    assert "snapshot" in resume
+    assert frame_count == 1
+
+
+def test_drain_asks_clients_to_reconnect() -> None:
+    # A draining worker should send the draining notice and close connections with 1012
+    async def scenario() -> tuple[FakeWebSocket, SessionWebSocketManager]:
+        manager = SessionWebSocketManager()
+        websocket = FakeWebSocket()
+        await manager.connect("s1", websocket, batched=True)
+        await manager.drain(timeout=1.0)
+        return websocket, manager
+
+    websocket, manager = asyncio.run(scenario())
+    assert manager.draining
+    assert _types(websocket) == ["resume", "session_status"]
+    assert json.loads(websocket.sent[1])["data"] == {"status": "draining", "reconnect": True}
+    assert websocket.close_codes == [1012]
+
+
+def test_failed_flush_closes_connections_and_raises(monkeypatch: pytest.MonkeyPatch) -> None:
+    # A draining worker must close its connections and then raise when it cannot flush a session
+    async def set_extractions(session_id: str, extractions: dict) -> None:
+        raise RuntimeError("store unavailable")
+
+    monkeypatch.setattr(session_store, "set_extractions", set_extractions)
+
+    async def scenario() -> FakeWebSocket:
+        manager = SessionWebSocketManager()
+        websocket = FakeWebSocket()
+        await manager.connect("drain-s1", websocket, batched=True)
+        with pytest.raises(RuntimeError):
+            await manager.drain(timeout=1.0)
+        return websocket
+
+    active_sessions["drain-s1"] = _session("drain-s1", [])
+    try:
+        websocket = asyncio.run(scenario())
+    finally:
+        active_sessions.pop("drain-s1", None)
+    assert websocket.close_codes == [1012]
+
+
+def test_progress_is_kept_only_for_active_sessions() -> None:
+    # A worker must not keep progress trackers of sessions it does not hold, and must drop them on eviction
+    held = _session("held", [])
+    loaded = _session("loaded", [])
+    active_sessions["held"] = held
+    try:
+        assert get_progress(held) is get_progress(held)
+        assert get_progress(loaded).summary()["filled"] == 0
+        assert "loaded" not in progress_trackers
+        ws_manager.evict("held")
+        assert "held" not in progress_trackers
+    finally:
+        active_sessions.pop("held", None)
+
+
+def test_worker_handles_messages_in_order() -> None:
+    # A session worker should apply queued messages one by one in the order they were received
+    async def scenario() -> None:
+        manager = SessionWebSocketManager(queue_size=4)
+        manager._ensure_worker("s1")
+        for layer in (InfoLayer.STRUCTURE, InfoLayer.ESSENCE):
+            await manager.enqueue("s1", {"type": "set_layer", "layer": layer.value})
+        await asyncio.wait_for(manager.inbound_queues["s1"].join(), 1.0)
+        manager.workers.pop("s1").cancel()
+
+    session = _session("s1", [])
+    active_sessions["s1"] = session
+    try:
+        asyncio.run(scenario())
+    finally:
+        active_sessions.pop("s1", None)
+        progress_trackers.pop("s1", None)
+    assert session.current_layer == InfoLayer.ESSENCE
+
+
+def test_full_inbound_queue_drops_only_interim_transcripts() -> None:
+    # A full inbound queue must drop interim transcripts instead of blocking the receive loop
+    async def scenario() -> list[dict]:
+        manager = SessionWebSocketManager(queue_size=1)
+        queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=1)
+        manager.inbound_queues["s1"] = queue
+        final = {"type": "transcript", "text": "売上は12億です", "is_final": True}
+        await manager.enqueue("s1", final)
+        await asyncio.wait_for(
+            manager.enqueue("s1", {"type": "transcript", "text": "借入", "is_final": False}), 1.0
+        )
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    assert [message["text"] for message in asyncio.run(scenario())] == ["売上は12億です"]
+
+
+def test_failed_subscribe_unregisters_the_connection(monkeypatch: pytest.MonkeyPatch) -> None:
+    # An endpoint must unregister the connection and stop its sender when subscribing to the bus fails
+    async def failing_subscribe(session_id: str) -> None:
+        raise ConnectionError("bus unavailable")
+
+    async def scenario() -> tuple[bool, bool, Optional[str]]:
+        websocket = FakeWebSocket()
+        websocket.query_params = {}
+        await websocket_endpoint(websocket, "s1")
+        await asyncio.gather(*ws_manager._background_tasks)
+        closed = ws_manager.closed_senders.get("s1") or [{}]
+        return "s1" in ws_manager.connections, "s1" in ws_manager.workers, closed[-1].get("close_reason")
+
+    monkeypatch.setattr(broadcast_bus, "subscribe", failing_subscribe)
+    active_sessions["s1"] = _session("s1", [])
+    try:
+        connected, worker_running, close_reason = asyncio.run(scenario())
+    finally:
+        active_sessions.pop("s1", None)
+        ws_manager.closed_senders.pop("s1", None)
+    assert not connected
+    assert not worker_running
+    assert close_reason == "disconnected"
@@ -0,0 +1,102 @@
+"""処理ラウンドの情報量による呼び出しの間引きのテスト."""
+from typing import Callable
+
+from app.models.mna_schemas import InfoLayer, Utterance
+from app.services.relevance_gate import RelevanceGate, RelevanceScore
+
+
+def test_score_is_zero_for_fillers(make_utterance: Callable[..., Utterance]) -> None:
+    # A score should give nothing to utterances made only of fillers and punctuation
+    score = RelevanceScore([make_utterance("はい、そうですね。"), make_utterance("なるほど！")])
+    assert score.score == 0
+    assert score.to_dict() == {
+        "score": 0,
+        "content_chars": 0,
+        "signals": [],
+        "fields": [],
+        "entities": 0,
+    }
+
+
+def test_score_counts_fields_and_entities(make_utterance: Callable[..., Utterance]) -> None:
+    # A score should count field keywords and entity-like words in the utterances
+    score = RelevanceScore([make_utterance("借入は2億で、主な取引先はトヨタです")])
+    assert {"financial.debt", "business.main_clients"} <= score.fields
+    assert score.entities == 1
+    assert score.score >= len(score.fields) + 0.5
+
+
+def test_admit_extraction_defers_low_score_buffers(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A gate should hold back a filler buffer and prepend it to the next informative buffer
+    gate = RelevanceGate(min_score=1.0)
+    filler = make_utterance("はい")
+    admitted, score = gate.admit_extraction("s1", [filler])
+    assert admitted is None
+    assert score.score < 1.0
+
+    informative = make_utterance("売上は12億で、借入は2億です")
+    admitted, _ = gate.admit_extraction("s1", [informative])
+    assert admitted == [filler, informative]
+    admitted, _ = gate.admit_extraction("s1", [informative])
+    assert admitted == [informative]
+
+
+def test_admit_extraction_keeps_only_max_deferred(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A gate must keep only the newest max_deferred utterances it holds back
+    gate = RelevanceGate(min_score=1.0, max_deferred=2)
+    fillers = [make_utterance("はい") for _ in range(3)]
+    for filler in fillers:
+        gate.admit_extraction("s1", [filler])
+    informative = make_utterance("売上は12億です")
+    admitted, _ = gate.admit_extraction("s1", [informative])
+    assert admitted == fillers[1:] + [informative]
+
+    no_carry = RelevanceGate(min_score=1.0, max_deferred=0)
+    no_carry.admit_extraction("s1", [fillers[0]])
+    admitted, _ = no_carry.admit_extraction("s1", [informative])
+    assert admitted == [informative]
+
+
+def test_fingerprint_ignores_fillers(make_utterance: Callable[..., Utterance]) -> None:
+    # A fingerprint should not change when only filler utterances are added
+    informative = make_utterance("借入は2億です")
+    base = RelevanceGate.fingerprint([informative], {}, InfoLayer.SURFACE, [])
+    with_filler = RelevanceGate.fingerprint(
+        [informative, make_utterance("はい")], {}, InfoLayer.SURFACE, []
+    )
+    assert base == with_filler
+    assert base != RelevanceGate.fingerprint([informative], {}, InfoLayer.STRUCTURE, [])
+    assert base != RelevanceGate.fingerprint(
+        [informative, make_utterance("従業員は45名です")], {}, InfoLayer.SURFACE, []
+    )
+
+
+def test_suggestions_unchanged_until_forgotten(make_utterance: Callable[..., Utterance]) -> None:
+    # A gate should report unchanged input only for the recorded fingerprint of the same session
+    gate = RelevanceGate()
+    fingerprint = RelevanceGate.fingerprint(
+        [make_utterance("借入は2億です")], {}, InfoLayer.SURFACE, []
+    )
+    assert not gate.suggestions_unchanged("s1", fingerprint)
+    gate.record_suggestions("s1", fingerprint)
+    assert gate.suggestions_unchanged("s1", fingerprint)
+    assert not gate.suggestions_unchanged("s2", fingerprint)
+    assert not gate.suggestions_unchanged("s1", fingerprint + 1)
+
+
+def test_forget_drops_deferred_utterances_and_fingerprint(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A gate must drop a session's held-back utterances and fingerprint when it is forgotten
+    gate = RelevanceGate(min_score=1.0)
+    gate.admit_extraction("s1", [make_utterance("はい")])
+    gate.record_suggestions("s1", 42)
+    gate.forget("s1")
+    assert not gate.suggestions_unchanged("s1", 42)
+    informative = make_utterance("売上は12億です")
+    admitted, _ = gate.admit_extraction("s1", [informative])
+    assert admitted == [informative]
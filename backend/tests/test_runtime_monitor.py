@@ -0,0 +1,82 @@
+"""ワーカーの実行状況の計測のテスト."""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import runtime_monitor
+from app.services.runtime_monitor import EventLoopMonitor, current_rss_bytes
+
+
+def test_report_uses_nearest_rank_percentiles() -> None:
+    # A report should give the nearest-rank percentiles of the recent lags in milliseconds
+    monitor = EventLoopMonitor(window=100)
+    monitor.samples.extend(value / 1000 for value in range(100, 0, -1))
+    monitor.max_lag = 0.25
+
+    assert monitor.report() == {
+        "samples": 100,
+        "p50_ms": 50.0,
+        "p95_ms": 95.0,
+        "p99_ms": 99.0,
+        "window_max_ms": 100.0,
+        "max_ms": 250.0,
+    }
+
+
+def test_report_of_one_sample_and_of_none() -> None:
+    # A report should give the single sample for every percentile and zeros before any sample
+    monitor = EventLoopMonitor()
+    assert monitor.report() == {
+        "samples": 0,
+        "p50_ms": 0.0,
+        "p95_ms": 0.0,
+        "p99_ms": 0.0,
+        "window_max_ms": 0.0,
+        "max_ms": 0.0,
+    }
+    monitor.samples.append(0.004)
+    report = monitor.report()
+    assert (report["p50_ms"], report["p99_ms"], report["window_max_ms"]) == (4.0, 4.0, 4.0)
+
+
+def test_monitor_records_a_blocked_loop() -> None:
+    # A monitor should record the time a synchronous call held the event loop as lag
+    async def scenario() -> EventLoopMonitor:
+        monitor = EventLoopMonitor(interval=0.01)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)
+        await asyncio.sleep(0.03)
+        await monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    assert monitor.max_lag >= 0.05
+    assert max(monitor.samples) == monitor.max_lag
+
+
+@pytest.mark.parametrize(("sysname", "expected"), [("Linux", 2048 * 1024), ("Darwin", 2048)])
+def test_rss_falls_back_to_peak_without_proc(
+    monkeypatch: pytest.MonkeyPatch, sysname: str, expected: int
+) -> None:
+    # An RSS reading should use the peak usage in the platform's unit when /proc cannot be read
+    def missing_proc(*args: object, **kwargs: object) -> None:
+        raise FileNotFoundError("/proc/self/statm")
+
+    monkeypatch.setattr(runtime_monitor, "open", missing_proc, raising=False)
+    monkeypatch.setattr(
+        runtime_monitor.resource, "getrusage", lambda who: SimpleNamespace(ru_maxrss=2048)
+    )
+    monkeypatch.setattr(runtime_monitor.os, "uname", lambda: SimpleNamespace(sysname=sysname))
+    assert current_rss_bytes() == expected
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc")
+def test_rss_reads_proc_pages() -> None:
+    # An RSS reading should convert the resident pages in /proc to bytes
+    rss = current_rss_bytes()
+    assert rss > 0
+    assert rss % os.sysconf("SC_PAGE_SIZE") == 0
@@ -0,0 +1,214 @@
+"""セッションの先行書き込みジャーナルのテスト."""
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import pytest
+
+from app.models.mna_schemas import SessionState, Utterance
+from app.services.session_journal import JournalError, SessionJournal
+from app.services.session_store import JournaledSessionStore
+
+
+def _store(root: Path) -> JournaledSessionStore:
+    return JournaledSessionStore(SessionJournal(str(root), segment_bytes=1 << 20, commit_interval=0.0))
+
+
+def _session(session_id: str, utterances: list[Utterance]) -> SessionState:
+    return SessionState(
+        id=session_id,
+        project_id="p1",
+        status="active",
+        started_at=datetime(2024, 1, 1),
+        utterances=utterances,
+    )
+
+
+def test_restart_replays_session_updates(tmp_path: Path, make_utterance: Callable[..., Utterance]) -> None:
+    # A restarted store should recover active sessions with every journaled update applied
+    async def scenario() -> tuple[list[str], SessionState]:
+        store = _store(tmp_path)
+        await store.recover()
+        first = make_utterance("売上は12億です")
+        await store.create_session(_session("s1", [first]))
+        await store.append_utterance("s1", make_utterance("借入は2億"))
+        await store.update_utterance("s1", first.model_copy(update={"is_pinned": True}))
+        await store.close()
+
+        restarted = _store(tmp_path)
+        recovered = await restarted.recover()
+        loaded = await restarted.load_session("s1")
+        await restarted.close()
+        assert loaded is not None
+        return recovered, loaded
+
+    recovered, loaded = asyncio.run(scenario())
+    assert recovered == ["s1"]
+    assert [(u.text, u.is_pinned) for u in loaded.utterances] == [
+        ("売上は12億です", True),
+        ("借入は2億", False),
+    ]
+
+
+def test_concurrent_workers_use_separate_slots(
+    tmp_path: Path, make_utterance: Callable[..., Utterance]
+) -> None:
+    # A second worker must get its own journal instead of running without one
+    async def scenario() -> tuple[Path, Path, list[str], list[str]]:
+        first, second = _store(tmp_path), _store(tmp_path)
+        await first.recover()
+        await second.recover()
+        await first.create_session(_session("a", [make_utterance("a")]))
+        await second.create_session(_session("b", [make_utterance("b")]))
+        directories = first.journal.directory, second.journal.directory
+        await first.close()
+        await second.close()
+
+        # ワーカーが1つだけ再起動したら、空いているスロットをすべて引き取る
+        restarted = _store(tmp_path)
+        recovered = sorted(await restarted.recover())
+        await restarted.close()
+        slots = sorted(path.name for path in tmp_path.glob("worker-*"))
+        return *directories, recovered, slots
+
+    first_dir, second_dir, recovered, slots = asyncio.run(scenario())
+    assert first_dir != second_dir
+    assert recovered == ["a", "b"]
+    assert slots == ["worker-0"]
+
+
+def test_legacy_journal_is_adopted(tmp_path: Path, make_utterance: Callable[..., Utterance]) -> None:
+    # A journal written before per-worker slots should be replayed, including positional pins
+    utterance = make_utterance("売上は12億です")
+    pinned = utterance.model_copy(update={"is_pinned": True})
+    records = [
+        {
+            "op": "create_session",
+            "args": ["s1", {"id": '"s1"', "project_id": '"p1"', "status": '"active"',
+                            "started_at": '"2024-01-01T00:00:00"'}, {}, [utterance.model_dump_json()]],
+        },
+        {"op": "update_utterance", "args": ["s1", 0, pinned.model_dump_json()]},
+    ]
+    segment = tmp_path / "segment-00000001.log"
+    segment.write_text(
+        "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records) + '{"op": "tor',
+        encoding="utf-8",
+    )
+
+    async def scenario() -> tuple[list[str], SessionState]:
+        store = _store(tmp_path)
+        recovered = await store.recover()
+        loaded = await store.load_session("s1")
+        await store.close()
+        assert loaded is not None
+        return recovered, loaded
+
+    recovered, loaded = asyncio.run(scenario())
+    assert recovered == ["s1"]
+    assert loaded.utterances[0].is_pinned
+    assert not segment.exists()
+
+
+def test_corrupt_record_before_tail_fails_recovery(
+    tmp_path: Path, make_utterance: Callable[..., Utterance]
+) -> None:
+    # A store must refuse to recover from a journal with a broken record that is not the torn tail
+    async def scenario() -> None:
+        store = _store(tmp_path)
+        await store.recover()
+        await store.create_session(_session("s1", [make_utterance("売上は12億です")]))
+        await store.close()
+        segment = max(tmp_path.glob("worker-0/segment-*.log"))
+        with open(segment, "a", encoding="utf-8") as f:
+            f.write('{"op": "tor\n{"op": "delete_session", "args": ["s1"]}\n')
+        await _store(tmp_path).recover()
+
+    with pytest.raises(JournalError):
+        asyncio.run(scenario())
+
+
+def test_snapshot_view_is_not_changed_by_later_updates(
+    tmp_path: Path, make_utterance: Callable[..., Utterance]
+) -> None:
+    # A snapshot view must keep its contents while the store is updated before it is released
+    async def scenario() -> tuple[dict, list[str]]:
+        store = _store(tmp_path)
+        await store.recover()
+        await store.create_session(_session("s1", [make_utterance("a")]))
+        view = store.snapshot()
+        await store.append_utterance("s1", make_utterance("b"))
+        await store.save_document("projects", "p1", "{}")
+        store.release_snapshot()
+        loaded = await store.load_session("s1")
+        await store.close()
+        assert loaded is not None
+        return view, [u.text for u in loaded.utterances]
+
+    view, texts = asyncio.run(scenario())
+    assert len(view["utterances"]["s1"]) == 1
+    assert "projects" not in view["documents"]
+    assert texts == ["a", "b"]
+
+
+def test_failed_write_stops_the_journal(
+    tmp_path: Path, make_utterance: Callable[..., Utterance]
+) -> None:
+    # A journal must surface a failed write to later updates and to close instead of dropping records
+    async def scenario() -> tuple[bool, bool]:
+        store = _store(tmp_path)
+        await store.recover()
+
+        def fail(lines: list[str], snapshot: Optional[dict]) -> None:
+            raise OSError("disk full")
+
+        store.journal._write = fail
+        await store.create_session(_session("s1", [make_utterance("a")]))
+        await asyncio.sleep(0.05)
+        with pytest.raises(JournalError):
+            await store.append_utterance("s1", make_utterance("b"))
+        with pytest.raises(OSError):
+            await store.close()
+        return store.journal._segment is None, store.journal._lock_file is None
+
+    assert asyncio.run(scenario()) == (True, True)
+
+
+def test_running_byte_count_matches_a_full_count(
+    tmp_path: Path, make_utterance: Callable[..., Utterance]
+) -> None:
+    # A store should keep its byte count equal to a full recount through writes, offload and deletion
+    async def scenario() -> list[tuple[int, int]]:
+        store = JournaledSessionStore(
+            SessionJournal(str(tmp_path / "journal"), segment_bytes=1 << 20, commit_interval=0.0),
+            archive_dir=str(tmp_path / "archive"),
+        )
+        (tmp_path / "archive").mkdir()
+        await store.recover()
+        counts = []
+        first = make_utterance("売上は12億です")
+        await store.create_session(_session("s1", [first]))
+        await store.create_session(_session("s2", [make_utterance("a")]))
+        await store.append_utterances("s1", [make_utterance("借入は2億"), make_utterance("はい")])
+        await store.update_utterance("s1", first.model_copy(update={"is_pinned": True}))
+        await store.save_document("projects", "p1", '{"name": "A"}')
+        await store.save_document("projects", "p1", '{"name": "AB"}')
+        counts.append((store.memory_bytes(), store._measure()))
+        assert await store.offload("s1") > 0
+        counts.append((store.memory_bytes(), store._measure()))
+        await store.append_utterance("s1", make_utterance("従業員は45名"))
+        await store.delete_session("s2")
+        await store.delete_documents("projects", "p1")
+        counts.append((store.memory_bytes(), store._measure()))
+        await store.close()
+
+        restarted = _store(tmp_path / "journal")
+        await restarted.recover()
+        counts.append((restarted.memory_bytes(), restarted._measure()))
+        await restarted.close()
+        return counts
+
+    counts = asyncio.run(scenario())
+    assert all(running == full for running, full in counts)
+    assert counts[1][0] < counts[0][0]
@@ -0,0 +1,142 @@
+"""共有セッションストアのテスト."""
+import asyncio
+from datetime import datetime
+from typing import Callable
+
+import pytest
+
+from app.models.mna_schemas import (
+    ExtractionCategory,
+    ExtractionField,
+    InfoLayer,
+    SessionState,
+    Utterance,
+)
+from app.services.session_store import (
+    InMemorySessionStore,
+    RespClient,
+    RespSessionStore,
+    SessionStore,
+)
+from conftest import resp_standin
+
+
+def _session(utterances: list[Utterance]) -> SessionState:
+    return SessionState(
+        id="s1",
+        project_id="p1",
+        status="active",
+        started_at=datetime(2024, 1, 1),
+        utterances=list(utterances),
+    )
+
+
+def _field(value: str) -> ExtractionField:
+    return ExtractionField(
+        category=ExtractionCategory.FINANCIAL,
+        field="revenue_latest",
+        value=value,
+        confidence=0.9,
+        layer=InfoLayer.SURFACE,
+    )
+
+
+async def _pin_after_concurrent_append(
+    store: SessionStore, make_utterance: Callable[..., Utterance]
+) -> SessionState:
+    """他ワーカーの追記でローカルの位置とストアの位置がずれた状態でピン留めする."""
+    first, second, third = (make_utterance(text) for text in ("a", "b", "c"))
+    await store.create_session(_session([first]))
+    # ローカルのコピーは first, third の順だが、ストアは first, second, third
+    await store.append_utterance("s1", second)
+    await store.append_utterance("s1", third)
+    pinned = third.model_copy(update={"is_pinned": True, "pin_note": "重要"})
+    await store.update_utterance("s1", pinned)
+    loaded = await store.load_session("s1")
+    assert loaded is not None
+    return loaded
+
+
+def test_in_memory_store_round_trips_session(make_utterance: Callable[..., Utterance]) -> None:
+    # A store should return what was written, field by field
+    async def scenario() -> SessionState:
+        store = InMemorySessionStore()
+        await store.create_session(_session([make_utterance("こんにちは")]))
+        await store.set_extractions("s1", {"financial.revenue_latest": _field("約12億円")})
+        await store.append_utterances("s1", [make_utterance("売上は12億です")])
+        loaded = await store.load_session("s1")
+        assert loaded is not None
+        return loaded
+
+    loaded = asyncio.run(scenario())
+    assert [u.text for u in loaded.utterances] == ["こんにちは", "売上は12億です"]
+    assert loaded.extractions["financial.revenue_latest"].value == "約12億円"
+
+
+def test_in_memory_store_pins_by_utterance_id(make_utterance: Callable[..., Utterance]) -> None:
+    # A store should pin the utterance with the given id regardless of its list position
+    loaded = asyncio.run(_pin_after_concurrent_append(InMemorySessionStore(), make_utterance))
+    assert [(u.text, u.is_pinned) for u in loaded.utterances] == [
+        ("a", False),
+        ("b", False),
+        ("c", True),
+    ]
+    assert loaded.utterances[2].pin_note == "重要"
+
+
+def test_in_memory_store_forgets_pins_on_delete(make_utterance: Callable[..., Utterance]) -> None:
+    # A store must not carry pins of a deleted session over to a recreated one
+    async def scenario() -> SessionState:
+        store = InMemorySessionStore()
+        utterance = make_utterance("a")
+        await store.create_session(_session([utterance]))
+        await store.update_utterance("s1", utterance.model_copy(update={"is_pinned": True}))
+        await store.delete_session("s1")
+        assert await store.load_session("s1") is None
+        await store.create_session(_session([utterance]))
+        loaded = await store.load_session("s1")
+        assert loaded is not None
+        return loaded
+
+    assert not asyncio.run(scenario()).utterances[0].is_pinned
+
+
+def test_resp_store_pins_by_utterance_id(make_utterance: Callable[..., Utterance]) -> None:
+    # A RESP store should pin by id even when other workers appended in between
+    async def scenario() -> SessionState:
+        async with resp_standin() as url:
+            store = RespSessionStore(RespClient.from_url(url))
+            loaded = await _pin_after_concurrent_append(store, make_utterance)
+            await store.close()
+            return loaded
+
+    loaded = asyncio.run(scenario())
+    assert [(u.text, u.is_pinned) for u in loaded.utterances] == [
+        ("a", False),
+        ("b", False),
+        ("c", True),
+    ]
+
+
+def test_resp_store_round_trips_documents() -> None:
+    # A RESP store should save, list and delete documents per namespace
+    async def scenario() -> tuple[list[str], list[str]]:
+        async with resp_standin() as url:
+            store = RespSessionStore(RespClient.from_url(url))
+            await store.save_document("project", "p1", '{"id": "p1"}')
+            await store.save_document("project", "p2", '{"id": "p2"}')
+            listed = sorted(await store.list_documents("project"))
+            await store.delete_documents("project", "p1")
+            remaining = await store.list_documents("project")
+            await store.close()
+            return listed, remaining
+
+    listed, remaining = asyncio.run(scenario())
+    assert listed == ['{"id": "p1"}', '{"id": "p2"}']
+    assert remaining == ['{"id": "p2"}']
+
+
+def test_session_store_is_abstract() -> None:
+    # A session store must not be instantiable without the storage operations
+    with pytest.raises(TypeError):
+        SessionStore()
@@ -0,0 +1,62 @@
+"""セッションの処理時間の記録のテスト."""
+from app.services.session_timeline import RoundTrace, SessionTimeline, percentiles
+
+
+def _trace(timeline: SessionTimeline, round: int, outcome: str = "broadcast") -> RoundTrace:
+    trace = timeline.begin(round, "silence", 2, received_at=None)
+    trace.marks.update(received=10.0, flushed=10.5)
+    call = trace.call("extraction")
+    call.marks.update(prompt_built=10.6, request_sent=10.7, first_byte=11.2, parsed=11.7)
+    trace.finish(outcome)
+    if outcome == "broadcast":
+        trace.marks["broadcast"] = 12.0 + round
+    return trace
+
+
+def test_round_spans_cover_round_and_call_stages() -> None:
+    # A round trace should break its time into round spans and per-call spans
+    trace = _trace(SessionTimeline(10), 0)
+    spans = {name: round(value, 3) for name, value in trace.spans().items()}
+    assert spans == {
+        "buffer_wait": 0.5,
+        "total": 2.0,
+        "round": 1.5,
+        "extraction.prompt_build": 0.1,
+        "extraction.ttfb": 0.5,
+        "extraction.generation": 0.5,
+        "extraction.call": 1.0,
+    }
+
+
+def test_round_without_broadcast_has_no_broadcast_spans() -> None:
+    # A round trace must not report spans ending at a stage it never reached
+    trace = _trace(SessionTimeline(10), 0, outcome="no_update")
+    assert "total" not in trace.spans()
+    assert "round" not in trace.spans()
+    assert trace.to_dict()["stages_ms"] == {"received": 0.0, "flushed": 500.0}
+
+
+def test_timeline_keeps_only_recent_rounds() -> None:
+    # A timeline must cap the retained rounds while still counting every round
+    timeline = SessionTimeline(3)
+    for index in range(5):
+        _trace(timeline, index, outcome="broadcast" if index % 2 == 0 else "skipped")
+
+    summary = timeline.to_dict(limit=2)
+    assert summary["total_rounds"] == 5
+    assert summary["retained_rounds"] == 3
+    assert summary["outcomes"] == {"broadcast": 2, "skipped": 1}
+    assert [trace["round"] for trace in summary["recent"]] == [4, 3]
+    assert summary["breakdown"]["total"]["count"] == 2
+    assert summary["breakdown"]["total"]["max_ms"] == 6000.0
+
+
+def test_percentiles_use_nearest_rank() -> None:
+    # Percentiles should pick the sample at each rank and report the maximum
+    assert percentiles([i / 1000 for i in range(1, 101)]) == {
+        "count": 100,
+        "p50_ms": 51.0,
+        "p95_ms": 96.0,
+        "p99_ms": 100.0,
+        "max_ms": 100.0,
+    }
@@ -0,0 +1,70 @@
+"""終了時のドレインのテスト."""
+import asyncio
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.shutdown import GracefulShutdown
+
+
+def test_drain_runs_once_for_concurrent_callers() -> None:
+    # A shutdown should run the drain once and let every caller wait for the same run
+    async def scenario() -> int:
+        calls = 0
+
+        async def drain() -> None:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+
+        shutdown = GracefulShutdown()
+        shutdown.install(drain)
+        await asyncio.gather(shutdown.drain(), shutdown.drain())
+        await shutdown.drain()
+        return calls
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_failed_drain_raises_to_every_caller() -> None:
+    # A shutdown must raise the drain failure to each caller instead of hiding it
+    async def scenario() -> bool:
+        async def drain() -> None:
+            raise RuntimeError("store unavailable")
+
+        shutdown = GracefulShutdown()
+        shutdown.install(drain)
+        with pytest.raises(RuntimeError):
+            await shutdown.drain()
+        with pytest.raises(RuntimeError):
+            await shutdown.drain()
+        return shutdown.draining
+
+    assert asyncio.run(scenario())
+
+
+def test_signal_drain_exits_server_and_leaves_failure_to_lifespan() -> None:
+    # A signal-started drain should ask the server to exit even when the drain fails
+    async def scenario() -> list[int]:
+        async def drain() -> None:
+            raise RuntimeError("store unavailable")
+
+        exits: list[int] = []
+        server = SimpleNamespace(handle_exit=lambda sig, frame: exits.append(sig))
+        shutdown = GracefulShutdown()
+        shutdown.install(drain)
+        shutdown._on_signal(signal.SIGTERM, server)
+        await shutdown._signal_task
+        with pytest.raises(RuntimeError):
+            await shutdown.drain()
+        return exits
+
+    assert asyncio.run(scenario()) == [signal.SIGTERM]
+
+
+def test_drain_without_install_is_noop() -> None:
+    # A shutdown should do nothing when no drain has been installed
+    shutdown = GracefulShutdown()
+    asyncio.run(shutdown.drain())
+    assert not shutdown.draining
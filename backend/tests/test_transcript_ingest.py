@@ -0,0 +1,205 @@
+"""文字起こしの一括取り込みのテスト."""
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Optional
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.mna_session import active_sessions, ingest_transcript
+from app.core.config import settings
+from app.models.mna_schemas import (
+    ExtractionCategory,
+    ExtractionField,
+    ExtractionResult,
+    InfoLayer,
+    SessionState,
+    Utterance,
+)
+from app.services.session_store import session_store
+from app.services.transcript_ingest import TranscriptIngest, TranscriptParser, WindowBuilder
+
+
+class FakeExtractionService:
+    """窓の最初の発話を売上として返し、前の窓ほど遅く終わる抽出."""
+
+    def __init__(self, failing_text: str = "") -> None:
+        self.failing_text = failing_text
+        self.calls: list[list[str]] = []
+
+    async def extract_from_utterances(
+        self,
+        session_id: str,
+        new_utterances: list[Utterance],
+        current_extractions: dict[str, ExtractionField],
+    ) -> ExtractionResult:
+        """窓の発話を記録し、最初の発話を値とするフィールドを返す."""
+        texts = [utterance.text for utterance in new_utterances]
+        self.calls.append(texts)
+        if self.failing_text in texts:
+            raise RuntimeError("overloaded")
+        await asyncio.sleep(0.05 / len(self.calls))
+        field = ExtractionField(
+            category=ExtractionCategory.FINANCIAL,
+            field="revenue_latest",
+            value=texts[0],
+            confidence=0.8,
+            layer=InfoLayer.SURFACE,
+        )
+        return ExtractionResult(session_id=session_id, fields=[field])
+
+
+def test_parser_follows_speaker_labels_and_strips_markup() -> None:
+    # A parser should attribute unlabeled lines to the last speaker and drop markdown decoration
+    parser = TranscriptParser()
+    items = parser.feed(
+        "# 面談記録\n"
+        "アドバイザー：売上を教えてください\n"
+        "---\n"
+        "[売り手] **約12億円**です\n"
+        "- 借入は2億\n"
+        "| 項目 | 金額 |\n"
+        "Note: 補足\n"
+    )
+    assert items == [
+        ("customer", "面談記録"),
+        ("user", "売上を教えてください"),
+        ("customer", "約12億円です"),
+        ("customer", "借入は2億"),
+        ("customer", "項目 金額"),
+        ("customer", "Note: 補足"),
+    ]
+
+
+def test_parser_joins_lines_split_across_chunks() -> None:
+    # A parser must not break a line or a multibyte character split between chunks
+    parser = TranscriptParser()
+    data = "売り手: 従業員は45名\n後継者はいません".encode()
+    split = data.index("45".encode()) - 1
+    assert parser.feed(data[:split]) == []
+    assert parser.feed(data[split:]) == [("customer", "従業員は45名")]
+    assert parser.close() == [("customer", "後継者はいません")]
+
+
+def test_window_builder_carries_overlap_into_next_window(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A window builder should start each window with the tail of the previous one up to the overlap
+    builder = WindowBuilder(max_chars=10, overlap_chars=4)
+    windows = []
+    for text in ("aaaa", "bbb", "ccc", "dddd", "eee", "ff"):
+        window = builder.add(make_utterance(text))
+        if window is not None:
+            windows.append(window)
+    last = builder.close()
+    assert last is not None
+    windows.append(last)
+
+    assert [[u.text for u in window.utterances] for window in windows] == [
+        ["aaaa", "bbb", "ccc"],
+        ["ccc", "dddd", "eee"],
+        ["eee", "ff"],
+    ]
+    assert [window.start for window in windows] == [0, 2, 4]
+
+
+def test_window_builder_skips_window_of_only_carried_utterances(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A window builder must not emit a last window that only repeats the overlap
+    builder = WindowBuilder(max_chars=6, overlap_chars=3)
+    builder.add(make_utterance("aaa"))
+    assert builder.add(make_utterance("bbb")) is not None
+    assert builder.close() is None
+
+
+def test_ingest_merges_windows_in_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    # An ingest should merge window results in transcript order even when later windows finish first
+    monkeypatch.setattr(settings, "BULK_INGEST_WINDOW_CHARS", 5)
+    monkeypatch.setattr(settings, "BULK_INGEST_OVERLAP_CHARS", 0)
+
+    async def scenario() -> tuple[str, list[dict], int]:
+        ingest = TranscriptIngest("s1", FakeExtractionService(), {})
+        ingest.feed_text("売り手: 一番目の話\n二番目の話\n")
+        ingest.feed_utterances([("user", "三番目の話")])
+        ingest.close()
+        updates = [update async for update in ingest.progress()]
+        result = await ingest.result()
+        return result["financial.revenue_latest"].value, updates, len(ingest.utterances)
+
+    value, updates, utterance_count = asyncio.run(scenario())
+    assert value == "三番目の話"
+    assert [update["windows_done"] for update in updates] == [1, 2, 3]
+    assert {update["window"] for update in updates} == {0, 1, 2}
+    assert updates[-1]["windows_total"] == 3
+    assert utterance_count == 3
+
+
+def test_failed_window_is_reported_and_left_out(monkeypatch: pytest.MonkeyPatch) -> None:
+    # An ingest should merge only the successful windows and report the failed ones in its progress
+    monkeypatch.setattr(settings, "BULK_INGEST_WINDOW_CHARS", 5)
+    monkeypatch.setattr(settings, "BULK_INGEST_OVERLAP_CHARS", 0)
+
+    async def scenario() -> tuple[str, int, list[int], list[dict]]:
+        ingest = TranscriptIngest("s1", FakeExtractionService(failing_text="二番目の話"), {})
+        ingest.feed_text("一番目の話\n二番目の話\n")
+        ingest.close()
+        updates = [update async for update in ingest.progress()]
+        result = await ingest.result()
+        return result["financial.revenue_latest"].value, ingest.fields_found, ingest.windows_failed, updates
+
+    value, fields_found, windows_failed, updates = asyncio.run(scenario())
+    assert value == "一番目の話"
+    assert fields_found == 1
+    assert windows_failed == [1]
+    assert {update["window"]: update["failed"] for update in updates} == {0: False, 1: True}
+    assert updates[-1]["windows_failed"] == 1
+
+
+def test_rejected_body_leaves_no_utterances(
+    monkeypatch: pytest.MonkeyPatch, make_utterance: Callable[..., Utterance]
+) -> None:
+    # An ingest request rejected partway through its body must not append any utterances to the session
+    monkeypatch.setattr(settings, "BULK_INGEST_MAX_CHARS", 10)
+
+    async def body() -> AsyncIterator[bytes]:
+        yield "売上は12億です\n".encode()
+        yield ("あ" * 20 + "\n").encode()
+
+    async def scenario() -> tuple[int, int, Optional[SessionState]]:
+        session = SessionState(
+            id="ingest-s1",
+            project_id="p1",
+            status="active",
+            started_at=datetime(2024, 1, 1),
+            utterances=[make_utterance("はじめまして")],
+        )
+        active_sessions[session.id] = session
+        await session_store.create_session(session)
+        request = SimpleNamespace(headers={"content-type": "text/plain"}, stream=body)
+        try:
+            with pytest.raises(HTTPException) as rejected:
+                await ingest_transcript(session.id, request)
+            return rejected.value.status_code, len(session.utterances), await session_store.load_session(session.id)
+        finally:
+            active_sessions.pop(session.id, None)
+            await session_store.delete_session(session.id)
+
+    status_code, utterance_count, stored = asyncio.run(scenario())
+    assert status_code == 413
+    assert utterance_count == 1
+    assert stored is not None
+    assert len(stored.utterances) == 1
+
+
+def test_ingest_rejects_transcript_over_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    # An ingest must refuse text beyond the configured character limit
+    monkeypatch.setattr(settings, "BULK_INGEST_MAX_CHARS", 10)
+
+    async def scenario() -> None:
+        ingest = TranscriptIngest("s1", FakeExtractionService(), {})
+        with pytest.raises(ValueError):
+            ingest.feed_text("あ" * 11 + "\n")
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+"""セッションの発話ログのテスト."""
+from datetime import datetime, timedelta
+from typing import Callable
+
+from app.models.mna_schemas import Utterance
+from app.services.transcript_store import TranscriptStore
+
+
+def test_append_assigns_sequence_and_ignores_duplicate_ids(
+    make_utterance: Callable[..., Utterance],
+) -> None:
+    # A transcript should number utterances in order and not record the same id twice
+    shared: list[Utterance] = []
+    transcript = TranscriptStore(shared)
+    first = make_utterance("a")
+    assert transcript.append(first) == 0
+    assert transcript.append(make_utterance("b")) == 1
+    assert transcript.append(first) is None
+    assert len(shared) == 2
+    assert transcript.seq_of(first.id) == 0
+    assert transcript.get(first.id) is first
+
+
+def test_indexes_existing_utterances(make_utterance: Callable[..., Utterance]) -> None:
+    # A transcript built from a loaded session should index the utterances it already has
+    utterances = [make_utterance("a", "advisor"), make_utterance("b"), make_utterance("c")]
+    transcript = TranscriptStore(utterances)
+    assert utterances[1].id in transcript
+    assert [u.text for u in transcript.by_speaker("customer")] == ["b", "c"]
+    assert [u.text for u in transcript.by_speaker("customer", limit=1)] == ["c"]
+    assert [u.text for u in transcript.recent(2)] == ["b", "c"]
+    assert [u.text for u in transcript.window(1, 2)] == ["b"]
+
+
+def test_between_returns_utterances_in_time_order(make_utterance: Callable[..., Utterance]) -> None:
+    # A transcript should find utterances by time even when they arrived out of order
+    base = datetime(2024, 1, 1)
+    transcript = TranscriptStore([])
+    for text, minutes in (("a", 0), ("c", 2), ("b", 1)):
+        transcript.append(
+            make_utterance(text).model_copy(update={"timestamp": base + timedelta(minutes=minutes)})
+        )
+    window = transcript.between(base + timedelta(minutes=1), base + timedelta(minutes=3))
+    assert [u.text for u in window] == ["b", "c"]
@@ -0,0 +1,101 @@
+"""接続ごとの送信キューと再送バッファのテスト."""
+import asyncio
+from typing import Optional
+
+from fastapi import WebSocket
+
+from app.services.ws_sender import (
+    SLOW_CONSUMER_CLOSE_CODE,
+    ConnectionSender,
+    ReplayBuffer,
+    with_seq,
+)
+from conftest import FakeWebSocket
+
+
+def _sender(
+    websocket: FakeWebSocket, closed: list[WebSocket], max_pending: int = 8, send_timeout: float = 1.0
+) -> ConnectionSender:
+    return ConnectionSender(websocket, max_pending, send_timeout, closed.append)
+
+
+def test_coalesced_messages_keep_only_the_latest() -> None:
+    # A sender should replace an unsent message with the same key and send it after earlier messages
+    async def scenario() -> tuple[list[str], int]:
+        websocket = FakeWebSocket()
+        sender = _sender(websocket, [])
+        sender.offer("interim-1", "interim")
+        sender.offer("final")
+        sender.offer("interim-2", "interim")
+        sender.start()
+        await sender.drain("draining", 1.0)
+        return websocket.sent, sender.stats.coalesced
+
+    sent, coalesced = asyncio.run(scenario())
+    assert sent == ["final", "interim-2"]
+    assert coalesced == 1
+
+
+def test_full_queue_closes_slow_consumer() -> None:
+    # A sender must close a connection whose queue is full instead of growing without bound
+    async def scenario() -> tuple[FakeWebSocket, ConnectionSender, list[WebSocket]]:
+        websocket = FakeWebSocket()
+        closed: list[WebSocket] = []
+        sender = _sender(websocket, closed, max_pending=2)
+        for message in ("a", "b", "c"):
+            sender.offer(message)
+        await sender._close_task
+        return websocket, sender, closed
+
+    websocket, sender, closed = asyncio.run(scenario())
+    assert sender.stats.close_reason == "slow_consumer"
+    assert websocket.close_codes == [SLOW_CONSUMER_CLOSE_CODE]
+    assert closed == [websocket]
+
+
+def test_stalled_send_closes_connection() -> None:
+    # A sender must close a connection whose send does not finish within the timeout
+    async def scenario() -> Optional[str]:
+        websocket = FakeWebSocket(send_delay=1.0)
+        sender = _sender(websocket, [], send_timeout=0.05)
+        sender.start()
+        sender.offer("a")
+        await asyncio.wait_for(sender._task, 1.0)
+        await sender._close_task
+        return sender.stats.close_reason
+
+    assert asyncio.run(scenario()) == "send_timeout"
+
+
+def test_closing_an_already_closed_socket_is_tolerated() -> None:
+    # A sender should not raise when the client has already closed the socket
+    async def scenario() -> Optional[str]:
+        sender = _sender(FakeWebSocket(closed=True), [])
+        sender.close("slow_consumer")
+        await sender._close_task
+        return sender.stats.close_reason
+
+    assert asyncio.run(scenario()) == "slow_consumer"
+
+
+def test_replay_buffer_returns_messages_after_last_seq() -> None:
+    # A replay buffer should return exactly the messages the client missed
+    buffer = ReplayBuffer(size=3)
+    for message in ("a", "b", "c", "d"):
+        buffer.append(message)
+    assert [entry[:2] for entry in buffer.since(2)] == [(3, "c"), (4, "d")]
+    assert buffer.since(4) == []
+
+
+def test_replay_buffer_refuses_gaps_it_cannot_fill() -> None:
+    # A replay buffer must not replay when the missed messages were evicted or the seq is unknown
+    buffer = ReplayBuffer(size=2)
+    for message in ("a", "b", "c"):
+        buffer.append(message)
+    assert buffer.since(0) is None
+    assert buffer.since(9) is None
+
+
+def test_with_seq_appends_the_sequence_number() -> None:
+    # A serialized message should keep its fields and gain a trailing seq
+    assert with_seq('{"type":"a","data":{}}', 7) == '{"type":"a","data":{},"seq":7}'
@@ -1,7 +1,7 @@
 /**
  * セッション（面談）画面
  */
-import { useCallback, useEffect, useState } from 'react';
+import { useCallback, useEffect, useRef, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { ConversationLog } from '../components/ConversationLog';
 import { ExtractionPanel } from '../components/ExtractionPanel';
@@ -26,7 +26,13 @@ export function Session() {
   const [missingFields, setMissingFields] = useState<MissingField[]>([]);
   const [isEnding, setIsEnding] = useState(false);
   const [deepgramApiKey, setDeepgramApiKey] = useState<string | null>(null);
+  // サーバー側で文字起こしする場合、音声はセッションのWebSocketで送る
+  const [serverAudio, setServerAudio] = useState(false);
   const [interimTranscript, setInterimTranscript] = useState<string>('');
+  // 他の画面で録音中の発話の途中経過（発話ID → 全文）
+  const remoteInterimsRef = useRef<Record<string, string>>({});
+  const isRecordingRef = useRef(false);
+  const serverAudioRef = useRef(false);
 
   // セッション状態
   const {
@@ -39,6 +45,8 @@ export function Session() {
     addUtterance,
     updateExtraction,
     addSuggestion,
+    applyRoundUpdate,
+    applySnapshot,
     dismissSuggestion,
     useSuggestion,
     addReframing,
@@ -49,24 +57,70 @@ export function Session() {
   const handleMessage = useCallback(
     (message: WSServerMessage) => {
       switch (message.type) {
+        case 'resume':
+          // 取りこぼしを再送できなかった場合は現在の状態で画面を作り直す
+          if (message.data.snapshot) {
+            const snapshot = message.data.snapshot;
+            applySnapshot(snapshot.extractions, snapshot.utterances);
+            setProgress(snapshot.progress);
+            setMissingFields(snapshot.missing_fields);
+          }
+          break;
+
         case 'transcript':
           if (message.data.is_final) {
             addUtterance(message.data.utterance);
+            delete remoteInterimsRef.current[message.data.utterance.id];
+            if (!isRecordingRef.current || serverAudioRef.current) setInterimTranscript('');
           } else {
             // 中間結果の処理（必要に応じて）
           }
           break;
 
+        case 'transcript_delta': {
+          // 自分で録音中なら音声キャプチャの途中経過を優先する
+          const { utterance_id, offset, text } = message.data;
+          const known = remoteInterimsRef.current[utterance_id] ?? '';
+          if (offset > known.length) break;
+          const fullText = known.slice(0, offset) + text;
+          remoteInterimsRef.current[utterance_id] = fullText;
+          if (!isRecordingRef.current || serverAudioRef.current) setInterimTranscript(fullText);
+          break;
+        }
+
         case 'extraction_update':
+          // 進捗は続いて届く progress_update で更新する
           updateExtraction(message.data.field_key, message.data.field);
-          // 進捗を再取得
-          fetchExtractions();
           break;
 
         case 'suggestion':
           addSuggestion(message.data);
           break;
 
+        case 'round_update':
+          // 1ラウンドの結果を1回の状態更新で反映（進捗もフレームに含まれる）
+          applyRoundUpdate(message.data.extractions, message.data.suggestions);
+          setProgress(message.data.progress);
+          setMissingFields(message.data.missing_fields);
+          break;
+
+        case 'progress_update': {
+          const { by_category, by_layer, missing_fields, ...totals } = message.data;
+          // 初回の取得前は全体が分からないため、取得した進捗に差分を重ねる
+          setProgress((prev) =>
+            prev
+              ? {
+                  ...prev,
+                  ...totals,
+                  by_category: { ...prev.by_category, ...by_category },
+                  by_layer: { ...prev.by_layer, ...by_layer },
+                }
+              : prev
+          );
+          setMissingFields(missing_fields);
+          break;
+        }
+
         case 'reframing':
           addReframing(message.data);
           break;
@@ -76,11 +130,11 @@ export function Session() {
           break;
       }
     },
-    [addUtterance, updateExtraction, addSuggestion, addReframing]
+    [addUtterance, updateExtraction, addSuggestion, applyRoundUpdate, applySnapshot, addReframing]
   );
 
   // WebSocket接続
-  const { status: wsStatus, send } = useWebSocket(sessionId || null, {
+  const { status: wsStatus, send, sendBinary } = useWebSocket(sessionId || null, {
     onMessage: handleMessage,
     onOpen: () => {
       console.log('WebSocket connected');
@@ -144,7 +198,11 @@ export function Session() {
       console.error('Audio capture error:', error);
     },
     language: 'ja',
+    sink: serverAudio ? sendBinary : undefined,
+    onStop: () => send({ type: 'audio_stop' }),
   });
+  isRecordingRef.current = isRecording;
+  serverAudioRef.current = serverAudio;
 
   // 抽出情報を取得
   const fetchExtractions = useCallback(async () => {
@@ -171,6 +229,7 @@ export function Session() {
       // Deepgram APIキーを取得
       configApi.get().then((config) => {
         setDeepgramApiKey(config.deepgram_api_key);
+        setServerAudio(config.server_audio);
       }).catch((error) => {
         console.error('Failed to get config:', error);
       });
@@ -182,7 +241,7 @@ export function Session() {
     if (isRecording) {
       stopRecording();
     } else {
-      if (!deepgramApiKey) {
+      if (!deepgramApiKey && !serverAudio) {
         console.error('Deepgram API key not available');
         return;
       }
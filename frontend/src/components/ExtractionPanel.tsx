@@ -210,6 +210,7 @@ function FieldItem({
       <div className="flex items-center justify-between mb-1">
         <span className="text-sm font-medium text-gray-700">{label}</span>
         <div className="flex items-center gap-2">
+          {field.provisional && <Badge variant="warning">仮</Badge>}
           <Badge
             variant={
               field.layer === 'essence'
@@ -1,6 +1,7 @@
 /**
  * TONARI for M&A - 音声キャプチャフック
  * ブラウザのマイクから音声をキャプチャしてDeepgramに送信
+ * （sinkを指定した場合は音声をsinkに渡し、文字起こしはサーバー側で行う）
  */
 import { useCallback, useRef, useState } from 'react';
 
@@ -8,6 +9,10 @@ interface UseAudioCaptureOptions {
   onTranscript?: (text: string, isFinal: boolean, speaker?: string) => void;
   onError?: (error: Error) => void;
   language?: string;
+  // 指定するとDeepgramに接続せず、録音した音声のチャンクを渡す
+  sink?: (chunk: Blob) => void;
+  // sink指定時、最後のチャンクを渡した後に呼ばれる
+  onStop?: () => void;
 }
 
 interface UseAudioCaptureReturn {
@@ -67,6 +72,25 @@ export function useAudioCapture(
     setIsConnecting(false);
   }, []);
 
+  const startMediaRecorder = useCallback(
+    (stream: MediaStream, onData: (chunk: Blob) => void) => {
+      const mediaRecorder = new MediaRecorder(stream, {
+        mimeType: 'audio/webm;codecs=opus',
+      });
+      mediaRecorderRef.current = mediaRecorder;
+
+      mediaRecorder.ondataavailable = (event) => {
+        if (event.data.size > 0) {
+          onData(event.data);
+        }
+      };
+
+      // 250msごとにデータを送信
+      mediaRecorder.start(250);
+    },
+    []
+  );
+
   const startRecording = useCallback(async () => {
     if (isRecordingRef.current || isConnecting) return;
 
@@ -85,6 +109,17 @@ export function useAudioCapture(
       });
       mediaStreamRef.current = stream;
 
+      const sink = optionsRef.current.sink;
+      if (sink) {
+        setIsConnecting(false);
+        isRecordingRef.current = true;
+        setIsRecording(true);
+        startMediaRecorder(stream, sink);
+        // 停止後の最後のチャンクを渡し終えてから通知する
+        mediaRecorderRef.current!.onstop = () => optionsRef.current.onStop?.();
+        return;
+      }
+
       // Deepgram WebSocket接続を確立
       const params = new URLSearchParams({
         model: 'nova-2',
@@ -106,20 +141,11 @@ export function useAudioCapture(
         isRecordingRef.current = true;
         setIsRecording(true);
 
-        // MediaRecorderを設定
-        const mediaRecorder = new MediaRecorder(stream, {
-          mimeType: 'audio/webm;codecs=opus',
-        });
-        mediaRecorderRef.current = mediaRecorder;
-
-        mediaRecorder.ondataavailable = (event) => {
-          if (event.data.size > 0 && ws.readyState === WebSocket.OPEN) {
-            ws.send(event.data);
+        startMediaRecorder(stream, (chunk) => {
+          if (ws.readyState === WebSocket.OPEN) {
+            ws.send(chunk);
           }
-        };
-
-        // 250msごとにデータを送信
-        mediaRecorder.start(250);
+        });
       };
 
       ws.onmessage = (event) => {
@@ -170,7 +196,7 @@ export function useAudioCapture(
       setIsConnecting(false);
       stopRecording();
     }
-  }, [apiKey, language, isConnecting, stopRecording]);
+  }, [apiKey, language, isConnecting, stopRecording, startMediaRecorder]);
 
   return {
     isRecording,
@@ -2,10 +2,13 @@
  * TONARI for M&A - WebSocket管理フック
  */
 import { useCallback, useEffect, useRef, useState } from 'react';
-import type { WSClientMessage, WSServerMessage } from '../types/websocket';
+import type { WSClientMessage, WSServerFrame, WSServerMessage } from '../types/websocket';
 
 type ConnectionStatus = 'connecting' | 'connected' | 'disconnected' | 'error';
 
+// サーバーにセッションの利用中を知らせる間隔（放置セッションの判定に使われる）
+const HEARTBEAT_INTERVAL = 30000;
+
 interface UseWebSocketOptions {
   onMessage?: (message: WSServerMessage) => void;
   onOpen?: () => void;
@@ -18,6 +21,7 @@ interface UseWebSocketOptions {
 interface UseWebSocketReturn {
   status: ConnectionStatus;
   send: (message: WSClientMessage) => void;
+  sendBinary: (data: Blob) => void;
   connect: () => void;
   disconnect: () => void;
 }
@@ -39,6 +43,9 @@ export function useWebSocket(
   const reconnectCountRef = useRef(0);
   const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout> | undefined>(undefined);
   const isConnectingRef = useRef(false);
+  // 再接続時に取りこぼした分だけを受け取るため、最後に受け取った連番を覚えておく
+  const streamIdRef = useRef<string | null>(null);
+  const lastSeqRef = useRef(0);
 
   // コールバックをrefで保持して依存配列の問題を回避
   const optionsRef = useRef(options);
@@ -46,7 +53,10 @@ export function useWebSocket(
 
   const getWebSocketUrl = useCallback((sid: string) => {
     const baseUrl = import.meta.env.VITE_WS_URL || window.location.origin.replace('http', 'ws');
-    return `${baseUrl}/api/mna/sessions/${sid}/ws`;
+    // protocol=2: 処理ラウンドの結果を round_update の1フレームで受け取る
+    const url = `${baseUrl}/api/mna/sessions/${sid}/ws?protocol=2`;
+    if (!streamIdRef.current) return url;
+    return `${url}&stream=${streamIdRef.current}&last_seq=${lastSeqRef.current}`;
   }, []);
 
   const disconnect = useCallback(() => {
@@ -74,6 +84,12 @@ export function useWebSocket(
 
     const ws = new WebSocket(getWebSocketUrl(sessionId));
 
+    const heartbeat = setInterval(() => {
+      if (ws.readyState === WebSocket.OPEN) {
+        ws.send(JSON.stringify({ type: 'heartbeat' }));
+      }
+    }, HEARTBEAT_INTERVAL);
+
     ws.onopen = () => {
       isConnectingRef.current = false;
       setStatus('connected');
@@ -82,6 +98,7 @@ export function useWebSocket(
     };
 
     ws.onclose = (event) => {
+      clearInterval(heartbeat);
       isConnectingRef.current = false;
       wsRef.current = null;
       setStatus('disconnected');
@@ -93,6 +110,22 @@ export function useWebSocket(
         return;
       }
 
+      // 不正なメッセージを送り続けて切断された場合（1008）も再接続しない
+      if (event.code === 1008) {
+        console.warn('Closed for repeated rejected messages, not reconnecting');
+        return;
+      }
+
+      // ワーカーの再起動で閉じられた場合（1012）は回数に数えず、少しずらしてすぐ再接続する
+      if (event.code === 1012) {
+        reconnectTimeoutRef.current = setTimeout(() => {
+          if (sessionId) {
+            connect();
+          }
+        }, 200 + Math.random() * 800);
+        return;
+      }
+
       // 自動再接続
       if (reconnectCountRef.current < reconnectAttempts) {
         reconnectCountRef.current += 1;
@@ -112,8 +145,15 @@ export function useWebSocket(
 
     ws.onmessage = (event) => {
       try {
-        const message = JSON.parse(event.data) as WSServerMessage;
-        optionsRef.current.onMessage?.(message);
+        const message = JSON.parse(event.data) as WSServerFrame;
+        if (message.type === 'resume') {
+          streamIdRef.current = message.data.stream_id;
+          // replay の場合は続けて届く再送分で連番を進める
+          if (message.data.mode !== 'replay') lastSeqRef.current = message.data.seq;
+        } else if (message.seq !== undefined) {
+          lastSeqRef.current = Math.max(lastSeqRef.current, message.seq);
+        }
+        optionsRef.current.onMessage?.(message as WSServerMessage);
       } catch (error) {
         console.error('Failed to parse WebSocket message:', error);
       }
@@ -130,10 +170,19 @@ export function useWebSocket(
     }
   }, []);
 
+  // 音声のチャンク（サーバー側で文字起こしする場合）
+  const sendBinary = useCallback((data: Blob) => {
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(data);
+    }
+  }, []);
+
   // セッションIDが変わったら再接続
   useEffect(() => {
     if (sessionId) {
       reconnectCountRef.current = 0;
+      streamIdRef.current = null;
+      lastSeqRef.current = 0;
       connect();
     }
 
@@ -145,6 +194,7 @@ export function useWebSocket(
   return {
     status,
     send,
+    sendBinary,
     connect,
     disconnect,
   };
@@ -4,6 +4,7 @@
 import type {
   CreateSessionResponse,
   ExtractionsResponse,
+  IngestEvent,
   Output,
   OutputListResponse,
   Project,
@@ -123,6 +124,8 @@ export const projectApi = {
 
 interface AppConfig {
   deepgram_api_key: string;
+  // true ならサーバー側で文字起こしする（音声はセッションのWebSocketで送る）
+  server_audio: boolean;
 }
 
 export const configApi = {
@@ -184,4 +187,38 @@ export const sessionApi = {
       }
     );
   },
+
+  /**
+   * 録音の文字起こし・議事録をまとめて取り込む（進捗を順に受け取る）
+   */
+  ingestTranscript: async (
+    sessionId: string,
+    text: string,
+    onEvent: (event: IngestEvent) => void
+  ) => {
+    const response = await fetch(`${API_BASE}/api/mna/sessions/${sessionId}/ingest`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'text/markdown; charset=utf-8' },
+      body: text,
+    });
+
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || `API Error: ${response.status}`);
+    }
+
+    // 1行に1つの進捗（NDJSON）
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffered = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffered += value;
+      const lines = buffered.split('\n');
+      buffered = lines.pop() ?? '';
+      for (const line of lines) {
+        if (line.trim()) onEvent(JSON.parse(line) as IngestEvent);
+      }
+    }
+  },
 };
@@ -40,6 +40,18 @@ interface SessionStore {
 
   // サジェスト
   addSuggestion: (suggestion: Suggestion) => void;
+
+  // 処理ラウンドの結果（抽出更新とサジェスト）を1回の更新で反映
+  applyRoundUpdate: (
+    extractions: Record<string, ExtractionField>,
+    suggestions: Suggestion[]
+  ) => void;
+
+  // 再接続時のスナップショット（抽出情報は置き換え、発話は未取得の分を追加）
+  applySnapshot: (
+    extractions: Record<string, ExtractionField>,
+    utterances: Utterance[]
+  ) => void;
   dismissSuggestion: (id: string) => void;
   useSuggestion: (id: string) => void;
 
@@ -133,6 +145,21 @@ export const useSessionStore = create<SessionStore>((set) => ({
       suggestions: [...state.suggestions, suggestion].slice(-10), // 最新10件を保持
     })),
 
+  applyRoundUpdate: (extractions, suggestions) =>
+    set((state) => ({
+      extractions: { ...state.extractions, ...extractions },
+      suggestions: [...state.suggestions, ...suggestions].slice(-10), // 最新10件を保持
+    })),
+
+  applySnapshot: (extractions, utterances) =>
+    set((state) => {
+      const known = new Set(state.utterances.map((u) => u.id));
+      return {
+        extractions,
+        utterances: [...state.utterances, ...utterances.filter((u) => !known.has(u.id))],
+      };
+    }),
+
   dismissSuggestion: (id) =>
     set((state) => ({
       suggestions: state.suggestions.filter((s) => s.id !== id),
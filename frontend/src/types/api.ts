@@ -47,6 +47,8 @@ export interface ExtractionField {
   confidence: number;
   source_utterance_id: string | null;
   layer: InfoLayer;
+  // 発話からルールで取り出した仮の値（抽出ラウンドで確定・上書きされる）
+  provisional?: boolean;
 }
 
 export interface ExtractionProgress {
@@ -180,3 +182,27 @@ export interface CreateSessionResponse {
   project_id: string;
   status: SessionStatus;
 }
+
+// 文字起こしの一括取り込みの進捗（NDJSONの1行）
+export type IngestEvent =
+  | { type: 'accepted'; utterances: number; windows_total: number }
+  | {
+      type: 'progress';
+      window: number;
+      failed: boolean;
+      windows_done: number;
+      windows_failed: number;
+      windows_total: number;
+      utterances: number;
+      fields: number;
+    }
+  | {
+      type: 'done';
+      utterances: number;
+      windows_total: number;
+      windows_failed: number[];
+      elapsed_ms: number;
+      extractions: Record<string, ExtractionField>;
+      progress: ExtractionProgress;
+    }
+  | { type: 'error'; message: string };
@@ -1,7 +1,15 @@
 /**
  * TONARI for M&A - WebSocket型定義
  */
-import type { ExtractionField, ReframingSuggestion, Suggestion, Utterance } from './api';
+import type {
+  ExtractionField,
+  ExtractionProgress,
+  InfoLayer,
+  MissingField,
+  ReframingSuggestion,
+  Suggestion,
+  Utterance,
+} from './api';
 
 // ========================
 // メッセージタイプ
@@ -16,13 +24,19 @@ export type WSMessageType =
   | 'update_extraction'
   | 'set_layer'
   | 'transcript'
+  | 'heartbeat'
+  | 'audio_stop'
   // サーバー → クライアント
+  | 'transcript_delta'
   | 'extraction_update'
   | 'analysis_update'
   | 'suggestion'
+  | 'round_update'
+  | 'progress_update'
   | 'reframing'
   | 'error'
-  | 'session_status';
+  | 'session_status'
+  | 'resume';
 
 // ========================
 // クライアント → サーバー
@@ -62,13 +76,24 @@ export interface WSSetLayerMessage {
   layer: 'surface' | 'structure' | 'essence' | 'exit';
 }
 
+export interface WSHeartbeatMessage {
+  type: 'heartbeat';
+}
+
+// 録音の停止（サーバー側で文字起こしする場合。音声はバイナリフレームで送る）
+export interface WSAudioStopMessage {
+  type: 'audio_stop';
+}
+
 export type WSClientMessage =
   | WSTranscriptMessage
   | WSPinUtteranceMessage
   | WSDismissSuggestionMessage
   | WSUseSuggestionMessage
   | WSUpdateExtractionMessage
-  | WSSetLayerMessage;
+  | WSSetLayerMessage
+  | WSHeartbeatMessage
+  | WSAudioStopMessage;
 
 // ========================
 // サーバー → クライアント
@@ -83,6 +108,19 @@ export interface WSTranscriptResponse {
   timestamp: string;
 }
 
+// 発話中のinterimの差分（?protocol=2 で接続した場合）
+// 全文 = 前回の全文.slice(0, offset) + text。確定時は同じIDの transcript が届く
+export interface WSTranscriptDeltaResponse {
+  type: 'transcript_delta';
+  data: {
+    utterance_id: string;
+    speaker: 'user' | 'customer';
+    offset: number;
+    text: string;
+  };
+  timestamp: string;
+}
+
 export interface WSExtractionUpdateResponse {
   type: 'extraction_update';
   data: {
@@ -98,6 +136,31 @@ export interface WSSuggestionResponse {
   timestamp: string;
 }
 
+// 1回の処理ラウンドの結果をまとめたフレーム（?protocol=2 で接続した場合）
+export interface WSRoundUpdateResponse {
+  type: 'round_update';
+  data: {
+    round: number;
+    extractions: Record<string, ExtractionField>;
+    suggestions: Suggestion[];
+    progress: ExtractionProgress;
+    missing_fields: MissingField[];
+  };
+  timestamp: string;
+}
+
+// 抽出の進捗の差分。by_category / by_layer は変わったものだけが入る
+// missing_fields は画面に出す先頭の未取得項目（差分ではなく置き換える）
+export interface WSProgressUpdateResponse {
+  type: 'progress_update';
+  data: Pick<ExtractionProgress, 'total' | 'filled' | 'percentage'> & {
+    by_category: Partial<ExtractionProgress['by_category']>;
+    by_layer: Partial<ExtractionProgress['by_layer']>;
+    missing_fields: MissingField[];
+  };
+  timestamp: string;
+}
+
 export interface WSReframingResponse {
   type: 'reframing';
   data: ReframingSuggestion;
@@ -113,18 +176,48 @@ export interface WSErrorResponse {
   timestamp: string;
 }
 
+// draining: サーバーのワーカーが終了処理中（この後1012で閉じられるので再接続する）
 export interface WSSessionStatusResponse {
   type: 'session_status';
   data: {
-    status: 'active' | 'completed';
+    status: 'active' | 'completed' | 'draining';
+    reconnect?: boolean;
+  };
+  timestamp: string;
+}
+
+// 接続直後に届くストリーム情報
+// new: 初回接続 / replay: この後に取りこぼした分が届く / snapshot: 取りこぼしを埋められないため現在の状態を含む
+export interface WSResumeResponse {
+  type: 'resume';
+  data: {
+    stream_id: string;
+    seq: number;
+    mode: 'new' | 'replay' | 'snapshot';
+    snapshot?: {
+      status: 'active' | 'completed';
+      current_layer: InfoLayer;
+      extractions: Record<string, ExtractionField>;
+      progress: ExtractionProgress;
+      missing_fields: MissingField[];
+      utterance_count: number;
+      utterances: Utterance[];
+    };
   };
   timestamp: string;
 }
 
 export type WSServerMessage =
+  | WSResumeResponse
   | WSTranscriptResponse
+  | WSTranscriptDeltaResponse
   | WSExtractionUpdateResponse
   | WSSuggestionResponse
+  | WSRoundUpdateResponse
+  | WSProgressUpdateResponse
   | WSReframingResponse
   | WSErrorResponse
   | WSSessionStatusResponse;
+
+// resume 以外のメッセージにはセッションごとの連番が付く（再接続時に last_seq として送る）
+export type WSServerFrame = WSServerMessage & { seq?: number };
@@ -0,0 +1,413 @@
+"""
+Anthropic Messages APIのローカル代替サーバー（負荷試験用）
+ANTHROPIC_BASE_URL=http://localhost:8399 でバックエンドのClaude呼び出しを
+このサーバーに向け、APIの料金やレート制限なしに並行面談の負荷をかける
+
+使い方:
+    uv run python scripts/fake_anthropic.py --port 8399 --latency 1.5 --jitter 0.5
+
+応答は決定的で、ツール指定があればそのツールの入力を返す。
+- extract_mna_info: 会話に含まれる語から抽出項目を返す
+- suggest_questions: 質問のサジェストを2件返す
+- それ以外のツール: input_schema の必須項目を埋めた値を返す
+stream=true のリクエストにはSSEで同じ内容を返す。
+system に cache_control 付きのブロックがあれば、そこまで（ツール定義と system）を
+プロンプトキャッシュとして扱い、2回目以降は cache_read_input_tokens に数える。
+Message Batches API（/v1/messages/batches）は --latency 秒後に全件を処理済みにする。
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+from uuid import uuid4
+
+logger = logging.getLogger("fake_anthropic")
+
+# 会話に含まれる語 → 抽出項目（カテゴリ, フィールド, 値）
+EXTRACTION_RULES: list[tuple[str, str, str, str]] = [
+    ("売上", "financial", "revenue_latest", "約12億円"),
+    ("利益", "financial", "operating_profit", "約1億円"),
+    ("従業員", "basic_info", "employee_count", "80名"),
+    ("設立", "basic_info", "established_year", "1985年"),
+    ("代表", "basic_info", "representative", "代表取締役"),
+    ("後継", "organization", "successor_status", "不在"),
+    ("譲渡", "transfer", "transfer_reason", "後継者不在のため"),
+    ("取引先", "business", "main_clients", "大手メーカー数社"),
+    ("強み", "business", "strengths", "顧客との長期的な関係"),
+    ("事業", "business", "business_description", "製造業向けの業務システム開発"),
+    ("開発", "business", "main_products_services", "業務管理システム"),
+    ("市場", "business", "industry_trends", "DX需要で拡大"),
+]
+
+
+class FakeAnthropic:
+    """Messages APIの応答を作る.
+
+    Attributes:
+        latency: 応答までの平均時間（秒）
+        jitter: 応答時間のばらつき（標準偏差、秒）
+        error_rate: 過負荷（529）を返す割合
+        requests: 受けたリクエスト数
+    """
+
+    def __init__(self, latency: float, jitter: float, error_rate: float) -> None:
+        """サーバーを初期化する.
+
+        Args:
+            latency: 応答までの平均時間（秒）
+            jitter: 応答時間のばらつき（秒）
+            error_rate: 過負荷（529）を返す割合
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        # バッチID → (受け付けた時刻, リクエスト)
+        self.batches: dict[str, tuple[float, list[dict]]] = {}
+        # キャッシュした前置きのハッシュ
+        self.cached_prefixes: set[str] = set()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """1接続のリクエストを順に処理する（keep-alive）.
+
+        Args:
+            reader: 受信ストリーム
+            writer: 送信ストリーム
+        """
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, body = request
+                self.requests += 1
+                if path.startswith("/v1/messages/batches"):
+                    writer.write(self.handle_batch(method, path, body))
+                    await writer.drain()
+                    continue
+                await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+                if method != "POST" or not path.startswith("/v1/messages"):
+                    writer.write(http_response(404, {"type": "error", "error": {"type": "not_found_error"}}))
+                elif random.random() < self.error_rate:
+                    writer.write(
+                        http_response(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+                    )
+                else:
+                    payload = json.loads(body or b"{}")
+                    message = self.build_message(payload)
+                    if payload.get("stream"):
+                        writer.write(sse_response(message))
+                    else:
+                        writer.write(http_response(200, message))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def handle_batch(self, method: str, path: str, body: bytes) -> bytes:
+        """Message Batches APIのリクエストに応答する.
+
+        Args:
+            method: HTTPメソッド
+            path: パス
+            body: リクエストボディ
+
+        Returns:
+            bytes: HTTPレスポンス
+        """
+        parts = path.split("?", 1)[0].rstrip("/").split("/")[4:]
+        if method == "POST" and not parts:
+            batch_id = f"msgbatch_fake_{uuid4().hex[:16]}"
+            self.batches[batch_id] = (time.time(), json.loads(body or b"{}").get("requests", []))
+            return http_response(200, self.batch_object(batch_id))
+        if method == "GET" and parts and parts[0] in self.batches:
+            if len(parts) == 1:
+                return http_response(200, self.batch_object(parts[0]))
+            if parts[1:] == ["results"]:
+                _, requests = self.batches[parts[0]]
+                lines = [
+                    json.dumps(
+                        {
+                            "custom_id": request["custom_id"],
+                            "result": {"type": "succeeded", "message": self.build_message(request["params"])},
+                        },
+                        ensure_ascii=False,
+                    )
+                    for request in requests
+                ]
+                return raw_response(200, "application/x-jsonl", ("\n".join(lines) + "\n").encode())
+        return http_response(404, {"type": "error", "error": {"type": "not_found_error"}})
+
+    def batch_object(self, batch_id: str) -> dict:
+        """MessageBatchオブジェクトを作る（--latency 秒後に処理済みになる）."""
+        created, requests = self.batches[batch_id]
+        ended = time.time() >= created + self.latency
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else len(requests),
+                "succeeded": len(requests) if ended else 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": iso_time(created),
+            "ended_at": iso_time(created + self.latency) if ended else None,
+            "expires_at": iso_time(created + 86400),
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def build_message(self, payload: dict) -> dict:
+        """リクエストに対する応答メッセージを作る.
+
+        Args:
+            payload: Messages APIのリクエスト
+
+        Returns:
+            dict: Messages APIの応答
+        """
+        prompt = prompt_text(payload)
+        tools = payload.get("tools") or []
+        choice = payload.get("tool_choice") or {}
+        tool = next((t for t in tools if t.get("name") == choice.get("name")), tools[0] if tools else None)
+
+        if tool is None:
+            content = [{"type": "text", "text": f"（疑似応答）{prompt[-40:]}"}]
+            stop_reason = "end_turn"
+        else:
+            content = [
+                {
+                    "type": "tool_use",
+                    "id": "toolu_" + hashlib.sha1(prompt.encode()).hexdigest()[:20],
+                    "name": tool["name"],
+                    "input": self.tool_input(tool, prompt),
+                }
+            ]
+            stop_reason = "tool_use"
+
+        output = json.dumps(content, ensure_ascii=False)
+        return {
+            "id": f"msg_fake_{self.requests}",
+            "type": "message",
+            "role": "assistant",
+            "model": payload.get("model", "fake"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": self.usage(payload, prompt, output),
+        }
+
+    def usage(self, payload: dict, prompt: str, output: str) -> dict:
+        """トークン数を見積もる（日本語1文字≒1トークン）."""
+        cached = cache_prefix(payload)
+        if cached is None:
+            return {"input_tokens": len(prompt), "output_tokens": len(output) // 2}
+        key = hashlib.sha1(cached.encode()).hexdigest()
+        hit = key in self.cached_prefixes
+        self.cached_prefixes.add(key)
+        system = prompt_text({"system": payload.get("system")})
+        return {
+            "input_tokens": len(prompt) - len(system),
+            "output_tokens": len(output) // 2,
+            "cache_read_input_tokens": len(cached) if hit else 0,
+            "cache_creation_input_tokens": 0 if hit else len(cached),
+        }
+
+    def tool_input(self, tool: dict, prompt: str) -> dict:
+        """ツールの入力を作る."""
+        if tool["name"] == "extract_mna_info":
+            conversation = prompt.split("## 新しい会話", 1)[-1].split("## 抽出対象", 1)[0]
+            return {
+                "extractions": [
+                    {"key": f"{category}.{field}", "value": value, "confidence": 0.8}
+                    for word, category, field, value in EXTRACTION_RULES
+                    if word in conversation
+                ][:3]
+            }
+        if tool["name"] == "suggest_questions":
+            return {
+                "suggestions": [
+                    {
+                        "question": "直近3期の売上高の推移を教えていただけますか？",
+                        "reason": "財務情報が未取得のため",
+                        "layer": "surface",
+                        "priority": 0.9,
+                        "target_field": "financial.revenue_trend",
+                    },
+                    {
+                        "question": "社長がいなくなっても回る仕組みはありますか？",
+                        "reason": "属人性の確認",
+                        "layer": "structure",
+                        "priority": 0.7,
+                        "target_field": "organization.key_persons",
+                    },
+                ]
+            }
+        return fake_value(tool.get("input_schema") or {"type": "object"})
+
+
+def prompt_text(payload: dict) -> str:
+    """リクエストのsystemとmessagesの文字列をつなげる."""
+    parts: list[str] = []
+
+    def collect(content: Any) -> None:
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            for block in content:
+                if isinstance(block, dict) and block.get("type") == "text":
+                    parts.append(block.get("text", ""))
+
+    collect(payload.get("system"))
+    for message in payload.get("messages", []):
+        collect(message.get("content"))
+    return "\n".join(parts)
+
+
+def cache_prefix(payload: dict) -> Optional[str]:
+    """cache_control が付いた system のブロックまで（ツール定義を含む）の文字列を返す."""
+    system = payload.get("system")
+    if not isinstance(system, list):
+        return None
+    marked = [i for i, block in enumerate(system) if isinstance(block, dict) and block.get("cache_control")]
+    if not marked:
+        return None
+    tools = json.dumps(payload.get("tools") or [], ensure_ascii=False, sort_keys=True)
+    return tools + prompt_text({"system": system[: marked[-1] + 1]})
+
+
+def fake_value(schema: dict) -> Any:
+    """JSON Schemaを満たす最小限の値を作る."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type", "object")
+    if kind == "object":
+        properties = schema.get("properties", {})
+        required = schema.get("required", list(properties))
+        return {name: fake_value(properties.get(name, {})) for name in required}
+    if kind == "array":
+        return [fake_value(schema.get("items", {}))]
+    if kind in ("number", "integer"):
+        return schema.get("minimum", 0) if kind == "integer" else 0.5
+    if kind == "boolean":
+        return False
+    return "テスト"
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[tuple[str, str, bytes]]:
+    """HTTP/1.1のリクエストを1件読む（接続が閉じられたらNone）."""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+
+def iso_time(seconds: float) -> str:
+    """UNIX秒をISO 8601の文字列にする."""
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def http_response(status: int, payload: dict) -> bytes:
+    """JSONのHTTPレスポンスを作る."""
+    return raw_response(status, "application/json", json.dumps(payload, ensure_ascii=False).encode())
+
+
+def raw_response(status: int, content_type: str, body: bytes) -> bytes:
+    """HTTPレスポンスを作る."""
+    reason = {200: "OK", 404: "Not Found", 529: "Overloaded"}.get(status, "Error")
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: keep-alive\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+def sse_response(message: dict) -> bytes:
+    """応答メッセージをストリーミング（SSE）のイベント列にする."""
+    events: list[tuple[str, dict]] = [
+        ("message_start", {"type": "message_start", "message": {**message, "content": [], "stop_reason": None}}),
+    ]
+    for index, block in enumerate(message["content"]):
+        if block["type"] == "text":
+            events.append(("content_block_start", {"type": "content_block_start", "index": index, "content_block": {"type": "text", "text": ""}}))
+            for start in range(0, len(block["text"]), 20):
+                delta = {"type": "text_delta", "text": block["text"][start : start + 20]}
+                events.append(("content_block_delta", {"type": "content_block_delta", "index": index, "delta": delta}))
+        else:
+            events.append(("content_block_start", {"type": "content_block_start", "index": index, "content_block": {**block, "input": {}}}))
+            delta = {"type": "input_json_delta", "partial_json": json.dumps(block["input"], ensure_ascii=False)}
+            events.append(("content_block_delta", {"type": "content_block_delta", "index": index, "delta": delta}))
+        events.append(("content_block_stop", {"type": "content_block_stop", "index": index}))
+    events.append(
+        (
+            "message_delta",
+            {"type": "message_delta", "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None}, "usage": {"output_tokens": message["usage"]["output_tokens"]}},
+        )
+    )
+    events.append(("message_stop", {"type": "message_stop"}))
+
+    body = "".join(f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n" for name, data in events).encode()
+    head = (
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: text/event-stream\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: keep-alive\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+async def serve(host: str, port: int, fake: FakeAnthropic) -> asyncio.AbstractServer:
+    """サーバーを起動する（負荷試験スクリプトから同じプロセスで起動する場合に使う）.
+
+    Args:
+        host: 待ち受けるアドレス
+        port: 待ち受けるポート（0なら空いているポート）
+        fake: 応答を作るインスタンス
+
+    Returns:
+        asyncio.AbstractServer: 起動したサーバー
+    """
+    return await asyncio.start_server(fake.handle_client, host, port)
+
+
+async def main() -> None:
+    """コマンドライン引数に従ってサーバーを起動する."""
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8399)
+    parser.add_argument("--latency", type=float, default=1.5, help="mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="response time stddev in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 529 responses")
+    args = parser.parse_args()
+
+    server = await serve(args.host, args.port, FakeAnthropic(args.latency, args.jitter, args.error_rate))
+    logger.info(f"Fake Anthropic API listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,339 @@
+"""
+並行面談の負荷試験
+N件の面談セッションを作ってWebSocketに接続し、議事録から作った日本語の
+発話を実時間（または倍速）で流して、1ワーカーで何件の面談を同時に
+受け持てるかを測る
+
+使い方:
+    # バックエンドと疑似Claude（scripts/fake_anthropic.py）をこのスクリプトが起動する
+    uv run python scripts/load_test.py --sessions 20 --speed 5 --latency 1.5
+
+    # 起動済みのバックエンドに対して実行する（ANTHROPIC_BASE_URL は起動側で設定しておく）
+    uv run python scripts/load_test.py --url http://localhost:8000 --sessions 20
+
+計測値:
+    echo        確定した文字起こしを送ってから、そのエコー（transcript）を受け取るまで
+    extraction  ラウンド待ちの最も古い発話を送ってから、抽出結果を含む round_update まで
+    suggestion  同上、サジェストを含む round_update まで
+    loop_lag    サーバーのイベントループの遅延（/api/mna/admin/runtime を1秒ごとに取得）
+    memory      試験前後のRSSの差をセッション数で割った値と、サーバー側の見積もり
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fake_anthropic import FakeAnthropic, serve  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TRANSCRIPT = ROOT / "関連資材" / "議事録_1224.md"
+# 話す速さ（日本語の会話はおおよそ毎秒8文字）
+CHARS_PER_SECOND = 8.0
+
+
+def load_script(path: Path, limit: Optional[int]) -> list[tuple[str, str]]:
+    """議事録のMarkdownから面談の発話（話者, テキスト）を作る.
+
+    見出しはアドバイザーの質問に、箇条書き・本文は売り手の回答にする。
+
+    Args:
+        path: 議事録のパス
+        limit: 最大の発話数
+
+    Returns:
+        list[tuple[str, str]]: 話者とテキスト
+    """
+    script: list[tuple[str, str]] = []
+    for raw in path.read_text(encoding="utf-8").splitlines():
+        line = raw.strip()
+        if not line or line.startswith(("---", "|")):
+            continue
+        heading = line.startswith("#")
+        text = re.sub(r"^[#>\-\*\d\.\s]+", "", line).replace("**", "").strip()
+        if not text:
+            continue
+        if heading:
+            script.append(("user", f"{text}について教えていただけますか。"))
+        else:
+            script.extend(("customer", s + "。") for s in text.split("。") if s.strip())
+    return script[:limit] if limit else script
+
+
+def percentiles(values: list[float]) -> dict:
+    """p50 / p95 / p99 / 最大（ミリ秒、最近順位法）を返す."""
+    if not values:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)] * 1000, 1)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+class Results:
+    """全セッションの計測値.
+
+    Attributes:
+        latencies: 計測項目 → 所要時間（秒）
+        errors: サーバーから届いた error の code ごとの件数
+        rounds: 受け取った round_update の数
+        loop_lag: サーバーから取得したループの遅延の p99（ミリ秒）
+        rss: サーバーから取得したRSS（バイト）
+    """
+
+    def __init__(self) -> None:
+        """空の計測値を作る."""
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.rounds = 0
+        self.loop_lag: list[float] = []
+        self.rss: list[int] = []
+        self.failed_sessions = 0
+
+
+async def run_session(
+    index: int,
+    base_url: str,
+    script: list[tuple[str, str]],
+    speed: float,
+    settle: float,
+    headers: dict,
+    results: Results,
+) -> None:
+    """1件の面談を作り、発話を流して応答時間を記録する."""
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30) as client:
+        response = await client.post("/api/mna/sessions", json={"project_id": f"loadtest-{index}"})
+        response.raise_for_status()
+        session_id = response.json()["session_id"]
+
+        ws_url = base_url.replace("http", "ws", 1) + f"/api/mna/sessions/{session_id}/ws?protocol=2"
+        echo_pending: dict[str, deque[float]] = defaultdict(deque)
+        # ラウンド待ちの最も古い発話の送信時刻
+        oldest_unprocessed: list[Optional[float]] = [None]
+
+        async def receive(ws) -> None:
+            async for raw in ws:
+                message = json.loads(raw)
+                now = time.perf_counter()
+                kind = message["type"]
+                data = message["data"]
+                if kind == "transcript" and data.get("is_final"):
+                    sent = echo_pending[data["utterance"]["text"]]
+                    if sent:
+                        results.latencies["echo"].append(now - sent.popleft())
+                elif kind == "round_update":
+                    results.rounds += 1
+                    started = oldest_unprocessed[0]
+                    if started is not None:
+                        if data["extractions"]:
+                            results.latencies["extraction"].append(now - started)
+                        if data["suggestions"]:
+                            results.latencies["suggestion"].append(now - started)
+                    oldest_unprocessed[0] = None
+                elif kind == "error":
+                    results.errors[data.get("code", "unknown")] += 1
+
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            receiver = asyncio.create_task(receive(ws))
+            for speaker, text in script:
+                duration = len(text) / CHARS_PER_SECOND / speed
+                # 話している途中のinterimを2回送る
+                for fraction in (0.33, 0.66):
+                    await asyncio.sleep(duration / 3)
+                    partial = text[: int(len(text) * fraction)]
+                    await ws.send(json.dumps({"type": "transcript", "text": partial, "speaker": speaker}))
+                await asyncio.sleep(duration / 3)
+                sent_at = time.perf_counter()
+                echo_pending[text].append(sent_at)
+                if oldest_unprocessed[0] is None:
+                    oldest_unprocessed[0] = sent_at
+                await ws.send(json.dumps({"type": "transcript", "text": text, "speaker": speaker, "is_final": True}))
+            # 最後のラウンドの結果を待つ
+            await asyncio.sleep(settle)
+            receiver.cancel()
+
+        await client.post(f"/api/mna/sessions/{session_id}/end")
+
+
+async def sample_runtime(base_url: str, headers: dict, results: Results, stop: asyncio.Event) -> None:
+    """サーバーのループの遅延とRSSを1秒ごとに取得する."""
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=5) as client:
+        while not stop.is_set():
+            try:
+                runtime = (await client.get("/api/mna/admin/runtime")).json()
+                results.loop_lag.append(runtime["event_loop_lag"]["p99_ms"])
+                results.rss.append(runtime["rss_bytes"])
+            except (httpx.HTTPError, KeyError, ValueError):
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+
+
+def free_port() -> int:
+    """空いているポートを返す."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    """バックエンドが応答するまで待つ."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Backend did not start at {base_url}")
+
+
+def print_report(results: Results, args: argparse.Namespace, memory: dict) -> None:
+    """計測結果を表にして表示する."""
+    print(f"\nsessions={args.sessions} utterances/session={args.utterances} speed={args.speed}x "
+          f"claude_latency={args.latency}s±{args.jitter}s")
+    print(f"{'metric':<12}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for name in ("echo", "extraction", "suggestion"):
+        p = percentiles(results.latencies[name])
+        cells = [f"{p[k]:>10}" if p[k] is not None else f"{'-':>10}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{name:<12}{p['count']:>8}{''.join(cells)}")
+    if results.loop_lag:
+        lag = sorted(results.loop_lag)
+        print(f"{'loop_lag':<12}{len(lag):>8}{lag[len(lag) // 2]:>10}{'':>10}{lag[-1]:>10}{'':>10}  (server p99 per sample)")
+    print(f"rounds={results.rounds} errors={dict(results.errors)} failed_sessions={results.failed_sessions}")
+    print("memory: " + ", ".join(f"{k}={v}" for k, v in memory.items()))
+
+
+async def main() -> None:
+    """負荷試験を実行する."""
+    parser = argparse.ArgumentParser(description="Concurrent interview session load test")
+    parser.add_argument("--url", help="existing backend URL (default: start one with a fake Claude)")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier (1 = real time)")
+    parser.add_argument("--utterances", type=int, default=60, help="utterances per session")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--settle", type=float, default=15.0, help="seconds to wait for the last round")
+    parser.add_argument("--latency", type=float, default=1.5, help="fake Claude mean latency (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="fake Claude latency stddev (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake Claude 529 rate")
+    parser.add_argument("--transcript", type=Path, default=DEFAULT_TRANSCRIPT)
+    parser.add_argument("--token", help="bearer token for the admin runtime endpoint")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    script = load_script(args.transcript, args.utterances)
+    args.utterances = len(script)
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+
+    fake_server = None
+    backend = None
+    base_url = args.url
+    if base_url is None:
+        fake_server = await serve("127.0.0.1", 0, FakeAnthropic(args.latency, args.jitter, args.error_rate))
+        fake_port = fake_server.sockets[0].getsockname()[1]
+        port = free_port()
+        env = {
+            **os.environ,
+            "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{fake_port}",
+            "ANTHROPIC_API_KEY": "sk-ant-loadtest",
+            "SESSION_STORE_URL": "",
+            "SESSION_JOURNAL_DIR": "",
+            "SUPABASE_URL": "",
+            "SUPABASE_ANON_KEY": "",
+            # 倍速再生でも文字起こしの文字数制限にかからないようにする
+            "WS_SESSION_TRANSCRIPT_CHARS_PER_SEC": str(50 * args.speed),
+        }
+        backend = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT / "backend",
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+
+    results = Results()
+    stop = asyncio.Event()
+    try:
+        await wait_ready(base_url)
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=5) as client:
+            baseline = await client.get("/api/mna/admin/runtime")
+        baseline_rss = baseline.json().get("rss_bytes") if baseline.status_code == 200 else None
+
+        sampler = asyncio.create_task(sample_runtime(base_url, headers, results, stop))
+
+        async def staggered(index: int) -> None:
+            await asyncio.sleep(args.ramp * index / max(args.sessions, 1))
+            try:
+                await run_session(index, base_url, script, args.speed, args.settle, headers, results)
+            except Exception as e:
+                results.failed_sessions += 1
+                print(f"session {index} failed: {e!r}", file=sys.stderr)
+
+        await asyncio.gather(*(staggered(i) for i in range(args.sessions)))
+
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=5) as client:
+            sessions = await client.get("/api/mna/admin/sessions")
+        stop.set()
+        await sampler
+
+        memory: dict = {}
+        if baseline_rss and results.rss:
+            peak = max(results.rss)
+            memory["rss_baseline_mb"] = round(baseline_rss / 2**20, 1)
+            memory["rss_peak_mb"] = round(peak / 2**20, 1)
+            memory["rss_per_session_kb"] = round((peak - baseline_rss) / max(args.sessions, 1) / 1024, 1)
+        if sessions.status_code == 200:
+            report = sessions.json()
+            if report["total_sessions"]:
+                memory["estimated_per_session_kb"] = round(
+                    report["total_estimated_bytes"] / report["total_sessions"] / 1024, 1
+                )
+
+        if args.json:
+            print(json.dumps({
+                "sessions": args.sessions,
+                "utterances": args.utterances,
+                "speed": args.speed,
+                "latency": {name: percentiles(values) for name, values in results.latencies.items()},
+                "loop_lag_p99_ms": results.loop_lag,
+                "rounds": results.rounds,
+                "errors": dict(results.errors),
+                "failed_sessions": results.failed_sessions,
+                "memory": memory,
+            }, ensure_ascii=False, indent=2))
+        else:
+            print_report(results, args, memory)
+    finally:
+        stop.set()
+        if backend is not None:
+            backend.terminate()
+            backend.wait(timeout=10)
+        if fake_server is not None:
+            fake_server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
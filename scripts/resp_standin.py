@@ -0,0 +1,298 @@
+"""
+Redisプロトコル（RESP2）のローカル代替サーバー
+SESSION_STORE_URL=redis://localhost:6399/0 で共有ストアとブロードキャストバスの
+動作を確認するためのもの
+
+使い方:
+    uv run python scripts/resp_standin.py --port 6399
+
+データはプロセス内の辞書に持つだけで永続化しない。共有ストアが使う
+コマンドだけを実装している。
+"""
+import argparse
+import asyncio
+import fnmatch
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger("resp_standin")
+
+
+class RespStandIn:
+    """RESP2サーバーの最小実装.
+
+    Attributes:
+        strings: 文字列キー
+        hashes: ハッシュキー
+        lists: リストキー
+        subscribers: チャンネル → 購読中のクライアント
+    """
+
+    def __init__(self) -> None:
+        """空のデータセットで初期化する."""
+        self.strings: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.lists: dict[str, list[str]] = {}
+        self.subscribers: dict[str, set[asyncio.StreamWriter]] = {}
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """1クライアントのコマンドを処理する.
+
+        Args:
+            reader: 受信ストリーム
+            writer: 送信ストリーム
+        """
+        try:
+            while True:
+                command = await read_command(reader)
+                if command is None:
+                    break
+                name = command[0].upper()
+                if name in ("SUBSCRIBE", "UNSUBSCRIBE"):
+                    writer.write(self.change_subscription(writer, name, command[1:]))
+                else:
+                    writer.write(self.execute(command))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            logger.info("client disconnected")
+        finally:
+            for writers in self.subscribers.values():
+                writers.discard(writer)
+            writer.close()
+
+    def change_subscription(
+        self,
+        writer: asyncio.StreamWriter,
+        name: str,
+        channels: list[str],
+    ) -> bytes:
+        """SUBSCRIBE / UNSUBSCRIBE を処理し、チャンネルごとの確認応答を返す.
+
+        Args:
+            writer: クライアントの送信ストリーム
+            name: コマンド名
+            channels: チャンネル名
+
+        Returns:
+            bytes: 確認応答
+        """
+        replies = []
+        for channel in channels:
+            if name == "SUBSCRIBE":
+                self.subscribers.setdefault(channel, set()).add(writer)
+            else:
+                self.subscribers.get(channel, set()).discard(writer)
+            count = sum(writer in writers for writers in self.subscribers.values())
+            replies.append(encode_reply([name.lower(), channel, count]))
+        return b"".join(replies)
+
+    def execute(self, command: list[str]) -> bytes:
+        """コマンドを実行して応答をエンコードする.
+
+        Args:
+            command: コマンド名と引数
+
+        Returns:
+            bytes: RESP応答
+        """
+        name, args = command[0].upper(), command[1:]
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return encode_error(f"ERR unknown command '{name}'")
+        return encode_reply(handler(*args))
+
+    def _exists(self, key: str) -> bool:
+        """キーが存在するかを返す."""
+        return key in self.strings or key in self.hashes or key in self.lists
+
+    def cmd_ping(self, *args: str) -> Any:
+        """PING."""
+        return args[0] if args else SimpleString("PONG")
+
+    def cmd_select(self, db: str) -> Any:
+        """SELECT（DBは1つだけなので無視する）."""
+        return SimpleString("OK")
+
+    def cmd_auth(self, *args: str) -> Any:
+        """AUTH（常に成功させる）."""
+        return SimpleString("OK")
+
+    def cmd_get(self, key: str) -> Any:
+        """GET."""
+        return self.strings.get(key)
+
+    def cmd_set(self, key: str, value: str, *options: str) -> Any:
+        """SET（オプションは無視する）."""
+        self.strings[key] = value
+        return SimpleString("OK")
+
+    def cmd_del(self, *keys: str) -> Any:
+        """DEL."""
+        removed = 0
+        for key in keys:
+            removed += self._exists(key)
+            self.strings.pop(key, None)
+            self.hashes.pop(key, None)
+            self.lists.pop(key, None)
+        return removed
+
+    def cmd_exists(self, *keys: str) -> Any:
+        """EXISTS."""
+        return sum(self._exists(key) for key in keys)
+
+    def cmd_keys(self, pattern: str) -> Any:
+        """KEYS."""
+        keys = list(self.strings) + list(self.hashes) + list(self.lists)
+        return [key for key in keys if fnmatch.fnmatchcase(key, pattern)]
+
+    def cmd_expire(self, key: str, seconds: str) -> Any:
+        """EXPIRE（有効期限は管理しない）."""
+        return int(self._exists(key))
+
+    def cmd_hset(self, key: str, *pairs: str) -> Any:
+        """HSET."""
+        target = self.hashes.setdefault(key, {})
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in target
+            target[field] = value
+        return added
+
+    def cmd_hget(self, key: str, field: str) -> Any:
+        """HGET."""
+        return self.hashes.get(key, {}).get(field)
+
+    def cmd_hgetall(self, key: str) -> Any:
+        """HGETALL."""
+        return [item for pair in self.hashes.get(key, {}).items() for item in pair]
+
+    def cmd_hdel(self, key: str, *fields: str) -> Any:
+        """HDEL."""
+        target = self.hashes.get(key, {})
+        removed = sum(target.pop(field, None) is not None for field in fields)
+        if key in self.hashes and not target:
+            del self.hashes[key]
+        return removed
+
+    def cmd_hlen(self, key: str) -> Any:
+        """HLEN."""
+        return len(self.hashes.get(key, {}))
+
+    def cmd_rpush(self, key: str, *values: str) -> Any:
+        """RPUSH."""
+        target = self.lists.setdefault(key, [])
+        target.extend(values)
+        return len(target)
+
+    def cmd_lrange(self, key: str, start: str, stop: str) -> Any:
+        """LRANGE."""
+        values = self.lists.get(key, [])
+        begin, end = int(start), int(stop)
+        end = len(values) + end if end < 0 else end
+        return values[begin : end + 1]
+
+    def cmd_lset(self, key: str, index: str, value: str) -> Any:
+        """LSET."""
+        values = self.lists.get(key)
+        if values is None:
+            return ErrorReply("ERR no such key")
+        values[int(index)] = value
+        return SimpleString("OK")
+
+    def cmd_llen(self, key: str) -> Any:
+        """LLEN."""
+        return len(self.lists.get(key, []))
+
+    def cmd_publish(self, channel: str, message: str) -> Any:
+        """PUBLISH（購読中のクライアントへ push する）."""
+        writers = self.subscribers.get(channel, set())
+        payload = encode_reply(["message", channel, message])
+        for writer in writers:
+            writer.write(payload)
+        return len(writers)
+
+
+class SimpleString(str):
+    """+OK 形式で返す文字列."""
+
+
+class ErrorReply(str):
+    """-ERR 形式で返すエラー."""
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[list[str]]:
+    """RESP配列のコマンドを1つ読む.
+
+    Args:
+        reader: 受信ストリーム
+
+    Returns:
+        Optional[list[str]]: コマンド（接続が閉じられたらNone）
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # インラインコマンド（redis-cliの手入力など）
+        return line.decode().split()
+    count = int(line[1:-2])
+    args = []
+    for _ in range(count):
+        header = await reader.readline()
+        length = int(header[1:-2])
+        data = await reader.readexactly(length + 2)
+        args.append(data[:-2].decode())
+    return args
+
+
+def encode_error(message: str) -> bytes:
+    """エラー応答をエンコードする."""
+    return f"-{message}\r\n".encode()
+
+
+def encode_reply(value: Any) -> bytes:
+    """値をRESP応答にエンコードする.
+
+    Args:
+        value: 応答値
+
+    Returns:
+        bytes: エンコード済みの応答
+    """
+    if isinstance(value, ErrorReply):
+        return encode_error(value)
+    if isinstance(value, SimpleString):
+        return f"+{value}\r\n".encode()
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool) or isinstance(value, int):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, str):
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(item) for item in value)
+    raise TypeError(f"Unsupported reply type: {type(value)}")
+
+
+async def serve(host: str, port: int) -> None:
+    """代替サーバーを起動する.
+
+    Args:
+        host: 待ち受けホスト
+        port: 待ち受けポート
+    """
+    standin = RespStandIn()
+    server = await asyncio.start_server(standin.handle_client, host, port)
+    logger.info(f"RESP stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redisプロトコルのローカル代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.host, args.port))